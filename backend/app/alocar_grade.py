@@ -0,0 +1,74 @@
+"""
+Alocação automática da grade de um novo período (linha de comando)
+Execute: python -m app.alocar_grade preferencias.json [--aplicar]
+
+O arquivo tem o mesmo formato do corpo de POST /api/horarios/alocacao:
+
+    {"alunos": [{"aluno_id": 1, "preferencias": [{"dia_semana": "segunda", "horario": "08:00"}]}]}
+
+Sem --aplicar só mostra o diff (dry-run).
+"""
+import argparse
+import json
+import sys
+import time
+
+from app.database import SessionLocal, get_engine
+from app.schemas.alocacao import AlocacaoRequest
+from app.services.alocacao_service import Preferencia, aplicar_alocacao, calcular_alocacao
+from app.services.fila_espera_service import promover_da_fila
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Aloca alunos nos horários a partir das preferências")
+    parser.add_argument("arquivo", help="JSON com as preferências dos alunos")
+    parser.add_argument("--aplicar", action="store_true", help="grava o resultado (padrão: só mostra o diff)")
+    parser.add_argument("--detalhes", action="store_true", help="lista cada matrícula adicionada/removida")
+    args = parser.parse_args(argv)
+
+    with open(args.arquivo, encoding="utf-8") as f:
+        alocacao = AlocacaoRequest.model_validate(json.load(f))
+    preferencias = {
+        aluno.aluno_id: [Preferencia(**pref.model_dump()) for pref in aluno.preferencias]
+        for aluno in alocacao.alunos
+    }
+
+    db = SessionLocal(bind=get_engine())
+    try:
+        inicio = time.perf_counter()
+        plano = calcular_alocacao(db, preferencias)
+        print(f"✅ Alocação calculada em {time.perf_counter() - inicio:.2f}s")
+        print(f"   Alunos: {len(preferencias)} ({len(plano.ignorados)} ignorado(s))")
+        print(f"   Aulas alocadas: {plano.aulas_alocadas}")
+        for posicao, aulas in sorted(plano.por_preferencia.items()):
+            print(f"     {posicao + 1}ª preferência: {aulas}")
+        print(f"   Adicionar: {len(plano.adicionar)} | Remover: {len(plano.remover)} | Manter: {len(plano.manter)}")
+        if plano.nao_alocados:
+            print(f"⚠️  {len(plano.nao_alocados)} aluno(s) com aulas que não couberam nas preferências")
+        for aluno_id, motivo in plano.ignorados.items():
+            print(f"⚠️  Aluno {aluno_id}: {motivo}")
+        if args.detalhes:
+            for horario_id, aluno_id in plano.adicionar:
+                print(f"   + horário {horario_id} / aluno {aluno_id}")
+            for horario_id, aluno_id in plano.remover:
+                print(f"   - horário {horario_id} / aluno {aluno_id}")
+
+        if not args.aplicar:
+            print("\n💡 Dry-run: nada foi gravado (use --aplicar)")
+            return 0
+
+        removidas, incluidas = aplicar_alocacao(db, plano)
+        if removidas.erros or incluidas.erros:
+            db.rollback()
+            print("\n❌ A grade mudou durante o cálculo: rode a alocação de novo")
+            return 1
+        promover_da_fila(db, {horario_id for horario_id, _ in plano.remover})
+        db.commit()
+        print(f"\n✅ Alocação aplicada: {incluidas.sucesso} matrícula(s) criada(s), {removidas.sucesso} removida(s)")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,25 @@
 """
 Configuração do banco de dados PostgreSQL usando SQLAlchemy
+
+A engine é criada sob demanda (get_engine), normalmente no lifespan da
+aplicação: importar este módulo não abre conexões nem carrega o driver do banco.
 """
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import logging
 import os
-from dotenv import load_dotenv
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.utils.env import load_env
+
+logger = logging.getLogger(__name__)
 
 # Carregar variáveis de ambiente
-load_dotenv()
+load_env()
 
 # Obter URL do banco de dados
 DATABASE_URL = os.getenv(
@@ -20,50 +31,117 @@ DATABASE_URL = os.getenv(
 # Railway às vezes retorna formato antigo que não funciona com SQLAlchemy
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-    print(f"✅ DATABASE_URL convertida para formato correto")
-
-print(f"🔗 Conectando ao banco de dados...")
-print(f"📍 Host: {DATABASE_URL.split('@')[1].split('/')[0] if '@' in DATABASE_URL else 'localhost'}")
 
-# Criar engine do SQLAlchemy
-try:
-    engine = create_engine(DATABASE_URL, echo=True, pool_pre_ping=True)
-    print("✅ Engine do banco de dados criada com sucesso!")
-except Exception as e:
-    print(f"❌ Erro ao criar engine do banco: {str(e)}")
-    raise
+# Log de todos os statements SQL (apenas para depuração: custa caro em produção)
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
 
-# Criar SessionLocal para gerenciar sessões do banco
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# SessionLocal para gerenciar sessões do banco (vinculada à engine em get_engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 # Base para os modelos
 Base = declarative_base()
 
+_engine: Optional[Engine] = None
+
+# Sessão compartilhada pelas sub-requisições de um /api/batch (ver shared_session)
+_shared_session: ContextVar = ContextVar("shared_session", default=None)
+
+
+def get_engine() -> Engine:
+    """
+    Retorna a engine da aplicação, criando-a no primeiro uso
+    """
+    global _engine
+    if _engine is None:
+        host = DATABASE_URL.split('@')[1].split('/')[0] if '@' in DATABASE_URL else 'localhost'
+        logger.info("Criando engine do banco de dados (host: %s)", host)
+        _engine = create_engine(DATABASE_URL, echo=DB_ECHO, pool_pre_ping=True)
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+@event.listens_for(Engine, "connect")
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite (testes/desenvolvimento) só aplica chaves estrangeiras se pedido;
+    # o repositório depende delas para responder 404 sem pré-checagem
+    if type(dbapi_connection).__module__.startswith("sqlite3"):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def __getattr__(name: str):
+    # Compatibilidade: "from app.database import engine" cria a engine sob demanda
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def get_db():
     """
     Dependency injection para obter sessão do banco de dados.
     Utilizado nos endpoints do FastAPI.
+    Dentro de shared_session, devolve a sessão compartilhada (sem fechá-la).
     """
+    shared = _shared_session.get()
+    if shared is not None:
+        yield shared
+        return
+
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
-def init_db():
+
+@contextmanager
+def session_scope(app=None) -> Iterator:
     """
-    Inicializa o banco de dados criando todas as tabelas.
-    Esta função é chamada no startup da aplicação.
+    Sessão para trabalho fora do ciclo de dependencies de uma requisição
+    (stream SSE, cálculos em segundo plano)
+
+    Nunca devolve a sessão compartilhada de um batch: este trabalho pode rodar
+    em outra thread, e uma Session não deve ser usada por duas threads ao mesmo tempo.
+
+    Args:
+        app: aplicação FastAPI; se informada, respeita dependency_overrides de get_db
     """
-    from app.models import aluno, pagamento, horario, turma, user, plano
+    provider = app.dependency_overrides.get(get_db, get_db) if app is not None else get_db
+    token = _shared_session.set(None)
+    try:
+        db_gen = provider()
+        db = next(db_gen)
+        try:
+            yield db
+        finally:
+            db_gen.close()
+    finally:
+        _shared_session.reset(token)
+
 
-    # Criar todas as tabelas no banco
-    Base.metadata.create_all(bind=engine)
-    print("✅ Banco de dados inicializado com sucesso!")
+@contextmanager
+def shared_session(db) -> Iterator:
+    """
+    Faz get_db devolver `db` no contexto atual (e nas tasks criadas dentro dele)
 
-    # Criar usuário admin inicial (se não existir)
+    Usado pelo /api/batch para que todas as sub-requisições usem a sessão da
+    requisição externa.
+    """
+    token = _shared_session.set(db)
     try:
-        from app.seed_admin import create_admin_user
-        create_admin_user()
-    except Exception as e:
-        print(f"⚠️  Aviso: Não foi possível criar usuário admin: {str(e)}")
+        yield db
+    finally:
+        _shared_session.reset(token)
+
+
+def init_db():
+    """
+    Inicializa o banco de dados aplicando as migrações pendentes
+    (criação das tabelas e usuário admin inicial fazem parte das migrações).
+    """
+    from app.migrations import run_migrations
+
+    run_migrations(get_engine())
+    logger.info("Banco de dados inicializado com sucesso!")
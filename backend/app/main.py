@@ -9,39 +9,63 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from starlette.middleware.base import BaseHTTPMiddleware
+from sqlalchemy.orm.exc import StaleDataError
+import asyncio
+import logging
 import os
-from app.database import init_db
+from app.database import get_engine
+from app.migrations import run_migrations
+from app.utils.metrics import MetricsMiddleware, metrics_response, mark_process_dead
+from app.utils.profiling import ProfilingMiddleware
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerenciador de ciclo de vida da aplicação"""
-    # Startup: Inicializar banco de dados
-    init_db()
-
-    # Executar migrações
-    try:
-        from app.migrate_add_plano_id import migrate as migrate_plano
-        migrate_plano()
-    except Exception as e:
-        print(f"⚠️  Aviso ao executar migração plano_id: {str(e)}")
-
-    try:
-        from app.migrate_add_professor import migrate as migrate_professor
-        migrate_professor()
-    except Exception as e:
-        print(f"⚠️  Aviso ao executar migração professor: {str(e)}")
-
-    try:
-        from app.migrations import run_migrations
-        run_migrations()
-    except Exception as e:
-        print(f"⚠️  Aviso ao executar migrações automáticas: {str(e)}")
-
-    print("✅ Sistema inicializado com sucesso!")
+    # Startup: a engine é criada aqui (e não no import) para acelerar o cold start
+    # e aplicar migrações pendentes (uma única query quando o banco já está atualizado)
+    run_migrations(get_engine())
+
+    # Limpeza periódica das chaves de idempotência expiradas
+    # (import tardio: o módulo depende das rotas, importadas mais abaixo)
+    from app.utils.idempotency import purge_loop as idempotency_purge_loop
+    purge_task = asyncio.create_task(idempotency_purge_loop(app))
+
+    # Envio das notificações gravadas na outbox (ex: promoção da fila de espera)
+    from app.services.outbox import dispatch_loop as outbox_dispatch_loop
+    outbox_task = asyncio.create_task(outbox_dispatch_loop(app))
+
+    # Janela de aulas datadas usada pelas reposições (remove passadas, cria novas)
+    from app.services.reposicao_service import manutencao_loop as reposicao_manutencao_loop
+    reposicao_task = asyncio.create_task(reposicao_manutencao_loop(app))
+
+    # Gravação em lote dos check-ins de presença (por tempo ou tamanho do buffer)
+    from app.services.presenca_service import flush_loop as presenca_flush_loop, flush_pendentes
+    presenca_task = asyncio.create_task(presenca_flush_loop(app))
+
+    # Passada diária de renovação automática dos contratos
+    from app.services.contrato_service import renovacao_loop as contrato_renovacao_loop
+    renovacao_task = asyncio.create_task(contrato_renovacao_loop(app))
+
+    logger.info("CORS configurado para as origens: %s", ", ".join(ALLOWED_ORIGINS))
+    logger.info(
+        "Security Headers ativos: CSRF (Origin/Referer), nosniff, X-Frame-Options DENY, "
+        "X-XSS-Protection, HSTS, Referrer-Policy, Permissions-Policy"
+    )
+    logger.info("Sistema inicializado com sucesso!")
     yield
     # Shutdown: cleanup se necessário
-    print("🔴 Sistema encerrado")
+    purge_task.cancel()
+    outbox_task.cancel()
+    reposicao_task.cancel()
+    presenca_task.cancel()
+    renovacao_task.cancel()
+    # Check-ins ainda no buffer são gravados antes de o processo sair
+    await flush_pendentes(app)
+    mark_process_dead()
+    logger.info("Sistema encerrado")
 
 
 def get_real_ip(request: Request) -> str:
@@ -147,6 +171,17 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+
+async def _stale_data_handler(request: Request, exc: StaleDataError) -> JSONResponse:
+    """Flush do ORM encontrou o registro com outra versão (alterado por outra requisição)"""
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"detail": "Registro alterado por outro usuário. Recarregue e tente novamente."},
+    )
+
+
+app.add_exception_handler(StaleDataError, _stale_data_handler)
+
 # Configurar CORS
 # Definir origens permitidas
 ALLOWED_ORIGINS_STR = os.getenv(
@@ -170,9 +205,9 @@ if os.getenv("RAILWAY_ENVIRONMENT"):
 # Remover duplicatas
 ALLOWED_ORIGINS = list(set(ALLOWED_ORIGINS))
 
-print(f"🔐 CORS configurado para as seguintes origens:")
-for origin in ALLOWED_ORIGINS:
-    print(f"   ✅ {origin}")
+# Profiling sob demanda (header X-Profile / ?profile= com token admin)
+# Middleware mais interno: o relatório recebe CORS e security headers normalmente
+app.add_middleware(ProfilingMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -186,17 +221,12 @@ app.add_middleware(
 # Adicionar Security Headers Middleware (CSRF Protection + Security Headers)
 app.add_middleware(SecurityHeadersMiddleware, allowed_origins=ALLOWED_ORIGINS)
 
-print("🛡️  Security Headers Middleware ativado:")
-print("   ✅ CSRF Protection via Origin/Referer validation")
-print("   ✅ X-Content-Type-Options: nosniff")
-print("   ✅ X-Frame-Options: DENY")
-print("   ✅ X-XSS-Protection: 1; mode=block")
-print("   ✅ Strict-Transport-Security (HSTS)")
-print("   ✅ Referrer-Policy")
-print("   ✅ Permissions-Policy")
+# Métricas por rota (Prometheus + Server-Timing)
+# Adicionado por último para ser o middleware mais externo e medir a requisição inteira
+app.add_middleware(MetricsMiddleware)
 
 # Importar e incluir routers
-from app.routes import alunos, pagamentos, horarios, auth, users, planos, professores
+from app.routes import alunos, pagamentos, horarios, auth, users, planos, professores, reposicoes, presencas, changes, stream, batch
 
 # Rotas de autenticação e usuários (públicas e protegidas)
 app.include_router(auth.router, prefix="/api", tags=["Autenticação"])
@@ -208,6 +238,15 @@ app.include_router(pagamentos.router, prefix="/api", tags=["Pagamentos"])
 app.include_router(horarios.router, prefix="/api", tags=["Horários"])
 app.include_router(planos.router, prefix="/api", tags=["Planos"])
 app.include_router(professores.router, prefix="/api", tags=["Professores"])
+app.include_router(reposicoes.router, prefix="/api", tags=["Reposições"])
+app.include_router(presencas.router, prefix="/api", tags=["Presenças"])
+
+# Sincronização incremental
+app.include_router(changes.router, prefix="/api", tags=["Sincronização"])
+app.include_router(stream.router, prefix="/api", tags=["Sincronização"])
+
+# Várias leituras em uma requisição
+app.include_router(batch.router, prefix="/api", tags=["Batch"])
 
 
 @app.get("/")
@@ -233,6 +272,18 @@ async def root(request: Request):
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """
+    Métricas no formato Prometheus
+    Se METRICS_TOKEN estiver definido, exige header Authorization: Bearer <token>
+    """
+    metrics_token = os.getenv("METRICS_TOKEN")
+    if metrics_token and request.headers.get("Authorization") != f"Bearer {metrics_token}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de métricas inválido")
+    return metrics_response()
+
+
 @app.get("/health")
 async def health_check():
     """Endpoint de health check"""
@@ -1,81 +1,442 @@
 """
-Database migrations module
-Automatically runs migrations on application startup
+Migrações versionadas do banco de dados
+
+Cada migração é registrada com @migration(versao, nome), em ordem crescente,
+e recebe uma conexão já dentro de uma transação. As versões aplicadas ficam
+gravadas na tabela schema_migrations junto com o checksum do código da
+migração, de modo que:
+
+- No boot, se o banco já está na última versão, basta UMA query
+  (SELECT max(version)) para seguir em frente - caminho rápido
+- Só migrações pendentes são executadas, cada uma em sua transação
+- Com vários workers/réplicas subindo juntos, um advisory lock do PostgreSQL
+  garante que apenas um processo aplica as migrações
+- Alterar uma migração já aplicada gera um aviso (checksum divergente)
+
+Para criar uma migração nova, adicione uma função no fim deste arquivo com a
+próxima versão. Nunca altere nem reordene migrações já publicadas.
 """
-from sqlalchemy import text
-from app.database import engine
+import hashlib
+import inspect
 import logging
+import textwrap
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy import Date, Integer, bindparam, text
+from sqlalchemy.engine import Connection, Engine
 
 logger = logging.getLogger(__name__)
 
+# Chave do pg_advisory_lock usada para serializar migrações entre processos
+MIGRATION_LOCK_ID = 72_430_001
 
-def run_migrations():
-    """
-    Run all pending migrations
-    This function is idempotent - safe to run multiple times
+SCHEMA_MIGRATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        checksum VARCHAR(64) NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+@dataclass(frozen=True)
+class Migration:
+    """Migração registrada"""
+    version: int
+    name: str
+    fn: Callable[[Connection], None]
+
+    @property
+    def checksum(self) -> str:
+        """SHA-256 do código-fonte da migração"""
+        source = textwrap.dedent(inspect.getsource(self.fn))
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, name: str):
+    """Decorator que registra uma migração (versões devem ser crescentes)"""
+    def decorator(fn: Callable[[Connection], None]):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise ValueError(
+                f"Migração {version} ({name}) fora de ordem: "
+                f"última registrada é {MIGRATIONS[-1].version}"
+            )
+        MIGRATIONS.append(Migration(version=version, name=name, fn=fn))
+        return fn
+    return decorator
+
+
+def latest_version() -> int:
+    """Versão da última migração registrada"""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def current_version(engine: Engine) -> Optional[int]:
     """
-    logger.info("Starting database migrations...")
+    Versão atual do banco (uma única query)
 
+    Returns:
+        int | None: versão aplicada ou None se schema_migrations ainda não existe
+    """
     try:
         with engine.connect() as conn:
-            # Migration 1: Add contract management fields
-            migrate_add_contract_fields(conn)
+            return conn.execute(text("SELECT max(version) FROM schema_migrations")).scalar() or 0
+    except Exception:
+        return None
+
+
+def run_migrations(engine: Optional[Engine] = None) -> list[int]:
+    """
+    Aplica as migrações pendentes
+
+    Args:
+        engine: engine alvo (padrão: engine da aplicação)
 
-            # Commit all changes
+    Returns:
+        list[int]: versões aplicadas nesta execução (vazia no caminho rápido)
+    """
+    if engine is None:
+        from app.database import get_engine
+        engine = get_engine()
+
+    # Caminho rápido: banco já está atualizado
+    if current_version(engine) == latest_version():
+        logger.info("Banco de dados na versão %d - nenhuma migração pendente", latest_version())
+        return []
+
+    applied_now = []
+    with engine.connect() as conn:
+        _acquire_lock(conn)
+        try:
+            with conn.begin():
+                conn.execute(text(SCHEMA_MIGRATIONS_DDL))
+
+            # Relê após obter o lock: outro processo pode ter migrado enquanto esperávamos
+            applied = dict(conn.execute(text("SELECT version, checksum FROM schema_migrations")).all())
             conn.commit()
 
-        logger.info("All migrations completed successfully!")
-        return True
+            for item in MIGRATIONS:
+                if item.version in applied:
+                    if applied[item.version] != item.checksum:
+                        logger.warning(
+                            "Migração %d (%s) foi alterada depois de aplicada (checksum divergente)",
+                            item.version, item.name
+                        )
+                    continue
 
-    except Exception as e:
-        logger.error(f"Migration failed: {str(e)}")
-        raise
+                logger.info("Aplicando migração %d: %s", item.version, item.name)
+                with conn.begin():
+                    item.fn(conn)
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, name, checksum) VALUES (:v, :n, :c)"),
+                        {"v": item.version, "n": item.name, "c": item.checksum}
+                    )
+                applied_now.append(item.version)
+        finally:
+            _release_lock(conn)
 
+    logger.info("Migrações concluídas: %d aplicada(s), versão atual %d", len(applied_now), latest_version())
+    return applied_now
 
-def migrate_add_contract_fields(conn):
-    """
-    Migration: Add contract management fields to alunos table
-    - data_fim_contrato (DATE)
-    - duracao_contrato_meses (INTEGER, default 12)
-    """
-    logger.info("Running migration: add_contract_fields")
-
-    # Check if columns already exist
-    result = conn.execute(text("""
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_name='alunos'
-        AND column_name IN ('data_fim_contrato', 'duracao_contrato_meses')
-    """))
-    existing_columns = [row[0] for row in result]
 
-    # Add data_fim_contrato if it doesn't exist
-    if 'data_fim_contrato' not in existing_columns:
-        logger.info("Adding column: data_fim_contrato")
-        conn.execute(text("ALTER TABLE alunos ADD COLUMN data_fim_contrato DATE"))
-    else:
-        logger.info("Column data_fim_contrato already exists - skipping")
+def _acquire_lock(conn: Connection) -> None:
+    """Advisory lock de sessão (somente PostgreSQL; SQLite já serializa escritas)"""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_ID})
+        conn.commit()
+
+
+def _release_lock(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        conn.rollback()
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_ID})
+        conn.commit()
+
+
+def _has_table(conn: Connection, table: str) -> bool:
+    return sa_inspect(conn).has_table(table)
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(col["name"] == column for col in sa_inspect(conn).get_columns(table))
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """ALTER TABLE ADD COLUMN idempotente (bancos antigos já podem ter a coluna)"""
+    if _has_column(conn, table, column):
+        logger.info("Coluna %s.%s já existe - pulando", table, column)
+        return
+    logger.info("Adicionando coluna %s.%s", table, column)
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+# ---------------------------------------------------------------------------
+# Migrações (em ordem - nunca altere as já publicadas)
+# ---------------------------------------------------------------------------
+
+@migration(1, "create_tables")
+def create_tables(conn: Connection) -> None:
+    """Cria as tabelas dos modelos que ainda não existem"""
+    from app.database import Base
+    import app.models  # noqa: F401 - registra todos os modelos no metadata
+
+    Base.metadata.create_all(bind=conn)
 
-    # Add duracao_contrato_meses if it doesn't exist
-    if 'duracao_contrato_meses' not in existing_columns:
-        logger.info("Adding column: duracao_contrato_meses")
-        conn.execute(text("ALTER TABLE alunos ADD COLUMN duracao_contrato_meses INTEGER DEFAULT 12"))
+
+@migration(2, "add_plano_id")
+def add_plano_id(conn: Connection) -> None:
+    """Coluna plano_id em alunos (antigo migrate_add_plano_id)"""
+    _add_column(conn, "alunos", "plano_id", "INTEGER REFERENCES planos(id)")
+
+
+@migration(3, "add_professor")
+def add_professor(conn: Connection) -> None:
+    """Tabela professores e colunas professor_id/fila_espera em horarios (antigo migrate_add_professor)"""
+    if not _has_table(conn, "professores"):
+        from app.models.professor import Professor
+        Professor.__table__.create(bind=conn)
+
+    _add_column(conn, "horarios", "professor_id", "INTEGER REFERENCES professores(id)")
+    _add_column(conn, "horarios", "fila_espera", "INTEGER NOT NULL DEFAULT 0")
+
+
+@migration(4, "add_contract_fields")
+def add_contract_fields(conn: Connection) -> None:
+    """Campos de gestão de contrato em alunos"""
+    _add_column(conn, "alunos", "data_fim_contrato", "DATE")
+    _add_column(conn, "alunos", "duracao_contrato_meses", "INTEGER DEFAULT 12")
+
+    if conn.dialect.name == "postgresql":
+        data_fim = "data_inicio_contrato + INTERVAL '12 months'"
     else:
-        logger.info("Column duracao_contrato_meses already exists - skipping")
+        data_fim = "date(data_inicio_contrato, '+12 months')"
 
-    # Update existing records that have data_inicio but no data_fim
-    logger.info("Calculating contract end dates for existing students...")
-    result = conn.execute(text("""
+    result = conn.execute(text(f"""
         UPDATE alunos
-        SET
-            data_fim_contrato = data_inicio_contrato + INTERVAL '12 months',
+        SET data_fim_contrato = {data_fim},
             duracao_contrato_meses = 12
-        WHERE
-            data_inicio_contrato IS NOT NULL
-            AND data_fim_contrato IS NULL
+        WHERE data_inicio_contrato IS NOT NULL
+          AND data_fim_contrato IS NULL
+    """))
+    logger.info("Data de fim de contrato calculada para %d aluno(s)", result.rowcount)
+
+
+@migration(5, "seed_admin")
+def seed_admin(conn: Connection) -> None:
+    """Cria o usuário admin inicial (se ainda não houver nenhum admin)"""
+    from app.seed_admin import create_admin_user
+    create_admin_user(conn)
+
+
+@migration(6, "create_cache_versions")
+def create_cache_versions(conn: Connection) -> None:
+    """Contadores de versão por tabela (cache de respostas compartilhado entre workers)"""
+    from app.models.cache_version import CacheVersion
+    CacheVersion.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(7, "create_change_log")
+def create_change_log(conn: Connection) -> None:
+    """Log de alterações para sincronização incremental (/api/changes)"""
+    from app.models.change_log import ChangeLog
+    ChangeLog.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(8, "add_row_versions")
+def add_row_versions(conn: Connection) -> None:
+    """Coluna version (concorrência otimista / If-Match) em alunos, pagamentos e horarios"""
+    for table in ("alunos", "pagamentos", "horarios"):
+        _add_column(conn, table, "version", "INTEGER NOT NULL DEFAULT 1")
+
+
+@migration(9, "create_idempotency_keys")
+def create_idempotency_keys(conn: Connection) -> None:
+    """Respostas guardadas de POSTs com Idempotency-Key"""
+    from app.models.idempotency_key import IdempotencyKey
+    IdempotencyKey.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(10, "create_fila_espera_outbox")
+def create_fila_espera_outbox(conn: Connection) -> None:
+    """Entradas da fila de espera dos horários e outbox de notificações"""
+    from app.models.fila_espera import FilaEspera
+    from app.models.outbox import OutboxMessage
+    FilaEspera.__table__.create(bind=conn, checkfirst=True)
+    OutboxMessage.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(11, "add_agenda_professor")
+def add_agenda_professor(conn: Connection) -> None:
+    """Duração das aulas, índice da agenda do professor e (PostgreSQL) constraint contra sobreposição"""
+    _add_column(conn, "horarios", "duracao_minutos", "INTEGER NOT NULL DEFAULT 50")
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_horarios_professor_agenda "
+        "ON horarios (professor_id, dia_semana, horario)"
+    ))
+    if conn.dialect.name != "postgresql":
+        return
+
+    # EXCLUDE precisa do btree_gist (igualdade em gist); sem permissão para a
+    # extensão, ou com sobreposições já gravadas, fica só a checagem da aplicação
+    minutos = "(EXTRACT(HOUR FROM horario)::int * 60 + EXTRACT(MINUTE FROM horario)::int)"
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+            conn.execute(text(f"""
+                ALTER TABLE horarios ADD CONSTRAINT ex_horarios_agenda_professor
+                EXCLUDE USING gist (
+                    professor_id WITH =,
+                    dia_semana WITH =,
+                    int4range({minutos}, {minutos} + duracao_minutos) WITH &&
+                ) WHERE (professor_id IS NOT NULL)
+            """))
+    except Exception as e:
+        logger.warning("Constraint de sobreposição da agenda não criada (%s) - valendo só a checagem da aplicação", e)
+
+
+@migration(12, "add_dia_semana_numero")
+def add_dia_semana_numero(conn: Connection) -> None:
+    """Número do dia da semana (coluna gerada) e índice (dia, horário) para a grade em ordem"""
+    from app.models.horario import DIA_SEMANA_NUMERO_SQL
+
+    # Coluna gerada: o banco preenche as linhas existentes e mantém em dia
+    # nos UPDATEs. SQLite só aceita VIRTUAL em ALTER TABLE (indexável do mesmo jeito)
+    armazenamento = "STORED" if conn.dialect.name == "postgresql" else "VIRTUAL"
+    _add_column(
+        conn, "horarios", "dia_semana_numero",
+        f"SMALLINT GENERATED ALWAYS AS ({DIA_SEMANA_NUMERO_SQL}) {armazenamento}",
+    )
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_horarios_dia_numero_horario "
+        "ON horarios (dia_semana_numero, horario)"
+    ))
+
+
+@migration(13, "create_reposicoes")
+def create_reposicoes(conn: Connection) -> None:
+    """Reposições de aula e aulas datadas (índice de vagas), já preenchidas para a janela inicial"""
+    # SQL congelado: não depende dos modelos nem do reposicao_service atuais
+    janela_dias = 28
+    chave = "SERIAL" if conn.dialect.name == "postgresql" else "INTEGER"
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS ocorrencias_aula (
+            horario_id INTEGER NOT NULL REFERENCES horarios(id) ON DELETE CASCADE,
+            data DATE NOT NULL,
+            ocupadas INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (horario_id, data)
+        )
+    """))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_ocorrencias_aula_data "
+        "ON ocorrencias_aula (data, horario_id, ocupadas)"
+    ))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS reposicoes (
+            id {chave} NOT NULL PRIMARY KEY,
+            aluno_id INTEGER NOT NULL REFERENCES alunos(id) ON DELETE CASCADE,
+            horario_id INTEGER NOT NULL REFERENCES horarios(id) ON DELETE CASCADE,
+            data DATE NOT NULL,
+            observacao VARCHAR(200),
+            created_at TIMESTAMP NOT NULL,
+            CONSTRAINT uq_reposicoes_aula_aluno UNIQUE (horario_id, data, aluno_id)
+        )
     """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_reposicoes_aluno_id ON reposicoes (aluno_id)"))
+
+    # Aulas de hoje até hoje + janela_dias; ocupadas = matriculados + reposições da data
+    hoje = date.today()
+    linhas = [
+        {"h": horario_id, "d": hoje + timedelta(days=dias)}
+        for horario_id, numero in conn.execute(text(
+            "SELECT id, dia_semana_numero FROM horarios WHERE dia_semana_numero IS NOT NULL"
+        ))
+        for dias in range(janela_dias + 1)
+        if (hoje + timedelta(days=dias)).isoweekday() == numero
+    ]
+    if linhas:
+        conn.execute(text("""
+            INSERT INTO ocorrencias_aula (horario_id, data, ocupadas)
+            SELECT :h, :d,
+                   (SELECT count(*) FROM aluno_horario WHERE horario_id = :h)
+                   + (SELECT count(*) FROM reposicoes WHERE horario_id = :h AND data = :d)
+            WHERE TRUE
+            ON CONFLICT (horario_id, data) DO NOTHING
+        """).bindparams(bindparam("h", type_=Integer), bindparam("d", type_=Date)), linhas)
+    logger.info("Aulas datadas geradas para as reposições: %d", len(linhas))
+
+
+@migration(14, "create_presencas")
+def create_presencas(conn: Connection) -> None:
+    """Presenças (check-in) e o resumo mensal por aluno e horário"""
+    from app.models.presenca import Presenca, PresencaResumo
+
+    Presenca.__table__.create(bind=conn, checkfirst=True)
+    PresencaResumo.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(15, "add_renovacao_contrato")
+def add_renovacao_contrato(conn: Connection) -> None:
+    """Opção de renovação automática e índice parcial dos contratos de alunos ativos"""
+    _add_column(conn, "alunos", "renovacao_automatica", "BOOLEAN NOT NULL DEFAULT FALSE")
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_alunos_contratos_ativos "
+        "ON alunos (data_fim_contrato) WHERE ativo"
+    ))
+
+
+@migration(16, "add_telefone_e164")
+def add_telefone_e164(conn: Connection) -> None:
+    """Telefone normalizado (E.164) de alunos e professores, indexado e preenchido para os registros existentes"""
+    # Normalização congelada: a regra de app.utils.helpers pode mudar depois desta migração
+    def normalizar(numero: Optional[str]) -> Optional[str]:
+        if not numero:
+            return None
+        digitos = "".join(filter(str.isdigit, numero))
+        if numero.strip().startswith("+"):
+            return f"+{digitos}" if 8 <= len(digitos) <= 15 else None
+        if len(digitos) in (10, 11):
+            return f"+55{digitos}"
+        if digitos.startswith("55") and len(digitos) in (12, 13):
+            return f"+{digitos}"
+        return None
+
+    for tabela, origem in (("alunos", "telefone_whatsapp"), ("professores", "telefone")):
+        _add_column(conn, tabela, "telefone_e164", "VARCHAR(16)")
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{tabela}_telefone_e164 ON {tabela} (telefone_e164)"
+        ))
+
+        # Em lotes pela chave primária; inválidos ficam sem telefone_e164
+        ultimo_id, total = 0, 0
+        while True:
+            linhas = conn.execute(text(f"""
+                SELECT id, {origem} FROM {tabela}
+                WHERE id > :ultimo AND {origem} IS NOT NULL AND telefone_e164 IS NULL
+                ORDER BY id LIMIT 1000
+            """), {"ultimo": ultimo_id}).all()
+            if not linhas:
+                break
+            ultimo_id = linhas[-1][0]
+            valores = [
+                {"id": id_, "e164": e164}
+                for id_, telefone in linhas if (e164 := normalizar(telefone)) is not None
+            ]
+            if valores:
+                conn.execute(text(f"UPDATE {tabela} SET telefone_e164 = :e164 WHERE id = :id"), valores)
+                total += len(valores)
+        logger.info("Telefones E.164: %d registro(s) de %s preenchido(s)", total, tabela)
 
-    rows_updated = result.rowcount
-    logger.info(f"Updated {rows_updated} student records with contract end dates")
 
-    logger.info("Migration add_contract_fields completed successfully!")
+@migration(17, "add_outbox_reserva")
+def add_outbox_reserva(conn: Connection) -> None:
+    """Reserva das mensagens da outbox pelo despachante (vários workers)"""
+    _add_column(conn, "outbox", "reservado_por", "VARCHAR(100)")
+    _add_column(conn, "outbox", "reservado_em", "TIMESTAMP")
@@ -8,5 +8,12 @@ from app.models.turma import AlunoHorario
 from app.models.user import User
 from app.models.plano import Plano
 from app.models.professor import Professor
+from app.models.cache_version import CacheVersion
+from app.models.change_log import ChangeLog
+from app.models.idempotency_key import IdempotencyKey
+from app.models.fila_espera import FilaEspera
+from app.models.outbox import OutboxMessage
+from app.models.reposicao import OcorrenciaAula, Reposicao
+from app.models.presenca import Presenca, PresencaResumo
 
-__all__ = ["Aluno", "Pagamento", "Horario", "AlunoHorario", "User", "Plano", "Professor"]
+__all__ = ["Aluno", "Pagamento", "Horario", "AlunoHorario", "User", "Plano", "Professor", "CacheVersion", "ChangeLog", "IdempotencyKey", "FilaEspera", "OutboxMessage", "OcorrenciaAula", "Reposicao", "Presenca", "PresencaResumo"]
@@ -1,13 +1,21 @@
 """
 Model SQLAlchemy para Alunos
 """
-from sqlalchemy import Column, Integer, String, Numeric, Date, Boolean, Text, DateTime, func, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Numeric, Date, Boolean, Text, DateTime, func, ForeignKey, Index, false, text
+from sqlalchemy.orm import relationship, validates
 from app.database import Base
+from app.utils.helpers import normalizar_telefone_e164
 
 class Aluno(Base):
     """Modelo de Aluno da academia de natação"""
     __tablename__ = "alunos"
+    __table_args__ = (
+        # Contratos expirando e renovação automática: só alunos ativos, por data de fim
+        Index(
+            "ix_alunos_contratos_ativos", "data_fim_contrato",
+            postgresql_where=text("ativo"), sqlite_where=text("ativo"),
+        ),
+    )
 
     # Campos principais
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -21,6 +29,8 @@ class Aluno(Base):
     data_inicio_contrato = Column(Date, nullable=True)
     data_fim_contrato = Column(Date, nullable=True)
     duracao_contrato_meses = Column(Integer, nullable=True, default=12)  # Duração padrão: 12 meses
+    # Renovação automática: o contrato é estendido por duracao_contrato_meses ao vencer
+    renovacao_automatica = Column(Boolean, nullable=False, default=False, server_default=false())
 
     # Plano associado
     plano_id = Column(Integer, ForeignKey('planos.id'), nullable=True)
@@ -29,11 +39,25 @@ class Aluno(Base):
     # Status e contato
     ativo = Column(Boolean, default=True, nullable=False)
     telefone_whatsapp = Column(String(20), nullable=True)
+    # E.164 (+5511999999999) calculado na gravação: envio de WhatsApp e busca por telefone.
+    # Índice não único: irmãos costumam compartilhar o telefone do responsável
+    telefone_e164 = Column(String(16), nullable=True, index=True)
     observacoes = Column(Text, nullable=True)
 
     # Timestamps
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, onupdate=func.now(), nullable=True)
 
+    # Controle de concorrência otimista: todo UPDATE incrementa a versão
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    @validates("telefone_whatsapp")
+    def _normalizar_telefone(self, key, telefone):
+        """Mantém telefone_e164 em dia nas gravações pelo ORM (UPDATEs do repositório usam derived_columns)"""
+        self.telefone_e164 = normalizar_telefone_e164(telefone)
+        return telefone
+
     def __repr__(self):
         return f"<Aluno(id={self.id}, nome='{self.nome_completo}', tipo_aula='{self.tipo_aula}', ativo={self.ativo})>"
@@ -0,0 +1,13 @@
+"""
+Modelo de versão de tabela (invalidação de cache entre workers)
+"""
+from sqlalchemy import Column, String, BigInteger
+from app.database import Base
+
+
+class CacheVersion(Base):
+    """Contador de alterações por tabela, compartilhado entre workers"""
+    __tablename__ = "cache_versions"
+
+    table_name = Column(String(64), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,22 @@
+"""
+Model SQLAlchemy para o log de alterações (change feed)
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, func
+from app.database import Base
+
+
+class ChangeLog(Base):
+    """
+    Registro append-only de inserções, atualizações e exclusões.
+    O id é monotônico e serve de cursor para sincronização incremental (/api/changes?since=).
+    """
+    __tablename__ = "change_log"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    operation = Column(String(10), nullable=False)  # 'insert', 'update' ou 'delete'
+    changed_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<ChangeLog(id={self.id}, {self.operation} {self.table_name}#{self.row_id})>"
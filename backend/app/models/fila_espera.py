@@ -0,0 +1,33 @@
+"""
+Model SQLAlchemy para a fila de espera dos horários
+"""
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+
+class FilaEspera(Base):
+    """
+    Entrada de um aluno na fila de espera de um horário.
+    Ordem da fila: maior prioridade primeiro e, na mesma prioridade, quem entrou antes.
+    Horario.fila_espera guarda o total de entradas do horário.
+    """
+    __tablename__ = "fila_espera"
+    __table_args__ = (
+        UniqueConstraint("horario_id", "aluno_id", name="uq_fila_espera_horario_aluno"),
+        # Mesma ordem da fila: próximo da fila e posição saem do índice
+        Index("ix_fila_espera_ordem", "horario_id", "prioridade", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    horario_id = Column(Integer, ForeignKey("horarios.id", ondelete="CASCADE"), nullable=False)
+    aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="CASCADE"), nullable=False, index=True)
+    prioridade = Column(Integer, nullable=False, default=0)  # maior = atendido antes
+    created_at = Column(DateTime, nullable=False)
+
+    # Relacionamentos
+    aluno = relationship("Aluno")
+    horario = relationship("Horario")
+
+    def __repr__(self):
+        return f"<FilaEspera(id={self.id}, horario_id={self.horario_id}, aluno_id={self.aluno_id}, prioridade={self.prioridade})>"
@@ -1,25 +1,74 @@
 """
 Model SQLAlchemy para Horários
 """
-from sqlalchemy import Column, Integer, String, Time, ForeignKey
+from sqlalchemy import Column, Computed, Integer, SmallInteger, String, Time, ForeignKey, Index
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.functions import FunctionElement
 from app.database import Base
 
+
+DIAS_SEMANA = ["segunda", "terca", "quarta", "quinta", "sexta", "sabado", "domingo"]
+
+# 1 = segunda ... 7 = domingo (ISO); usado em coluna gerada e na migração 12
+DIA_SEMANA_NUMERO_SQL = "CASE dia_semana {} END".format(
+    " ".join(f"WHEN '{dia}' THEN {numero}" for numero, dia in enumerate(DIAS_SEMANA, start=1))
+)
+
+
 class Horario(Base):
     """Modelo de Horário de aulas"""
     __tablename__ = "horarios"
+    __table_args__ = (
+        # Agenda do professor: aulas de um professor em um dia, em ordem de início
+        # (checagem de sobreposição e carga horária)
+        Index("ix_horarios_professor_agenda", "professor_id", "dia_semana", "horario"),
+        # Grade em ordem de dia da semana (e não alfabética) e mapa de ocupação
+        Index("ix_horarios_dia_numero_horario", "dia_semana_numero", "horario"),
+    )
 
     # Campos principais
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     dia_semana = Column(String(20), nullable=False, index=True)  # 'segunda', 'terca', etc
+    # Gerada pelo banco a partir de dia_semana (nunca gravada pela aplicação)
+    dia_semana_numero = Column(SmallInteger, Computed(DIA_SEMANA_NUMERO_SQL, persisted=True))
     horario = Column(Time, nullable=False)
+    duracao_minutos = Column(Integer, nullable=False, default=50, server_default="50")
     capacidade_maxima = Column(Integer, nullable=False, default=10)
     tipo_aula = Column(String(50), nullable=False)  # 'natacao' ou 'hidroginastica'
     professor_id = Column(Integer, ForeignKey("professores.id"), nullable=True)
-    fila_espera = Column(Integer, nullable=False, default=0)  # Quantidade de alunos na fila
+    fila_espera = Column(Integer, nullable=False, default=0)  # Entradas em fila_espera (contador mantido pelo serviço da fila)
+
+    # Controle de concorrência otimista: todo UPDATE incrementa a versão
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relacionamento com professor
     professor = relationship("Professor", back_populates="horarios")
 
+    __mapper_args__ = {"version_id_col": version}
+
     def __repr__(self):
         return f"<Horario(id={self.id}, dia='{self.dia_semana}', horario={self.horario}, tipo='{self.tipo_aula}', professor_id={self.professor_id})>"
+
+
+class minutos_do_dia(FunctionElement):
+    """
+    Minutos desde a meia-noite de uma coluna Time (ex: 08:30 -> 510)
+    Use só com colunas: no SQLite a coluna aparece duas vezes na expressão
+    """
+    type = Integer()
+    name = "minutos_do_dia"
+    inherit_cache = True
+
+
+@compiles(minutos_do_dia)
+def _minutos_do_dia_sqlite(element, compiler, **kw):
+    # SQLite guarda Time como texto 'HH:MM:SS.ffffff'
+    coluna = compiler.process(element.clauses, **kw)
+    return f"(CAST(substr({coluna}, 1, 2) AS INTEGER) * 60 + CAST(substr({coluna}, 4, 2) AS INTEGER))"
+
+
+@compiles(minutos_do_dia, "postgresql")
+def _minutos_do_dia_postgresql(element, compiler, **kw):
+    coluna = compiler.process(element.clauses, **kw)
+    return f"(CAST(EXTRACT(HOUR FROM {coluna}) AS INTEGER) * 60 + CAST(EXTRACT(MINUTE FROM {coluna}) AS INTEGER))"
@@ -0,0 +1,29 @@
+"""
+Model SQLAlchemy para chaves de idempotência (Idempotency-Key)
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, UniqueConstraint
+from app.database import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Resposta guardada de um POST enviado com Idempotency-Key.
+    A chave vale por usuário + endpoint (método e path) até expires_at.
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("user_id", "endpoint", "key", name="uq_idempotency_keys_user_endpoint_key"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    endpoint = Column(String(200), nullable=False)  # ex: 'POST /api/pagamentos'
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # SHA-256 do corpo da requisição
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(user_id={self.user_id}, endpoint='{self.endpoint}', key='{self.key}')>"
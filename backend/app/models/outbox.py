@@ -0,0 +1,30 @@
+"""
+Model SQLAlchemy para a outbox de notificações
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Index
+from app.database import Base
+
+
+class OutboxMessage(Base):
+    """
+    Notificação gravada na mesma transação da alteração que a originou.
+    Um despachante em segundo plano envia as pendentes (enviado_em nulo).
+    """
+    __tablename__ = "outbox"
+    __table_args__ = (
+        Index("ix_outbox_pendentes", "enviado_em", "id"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    tipo = Column(String(50), nullable=False)  # ex: 'fila_espera_promocao'
+    payload = Column(Text, nullable=False)  # JSON com tudo que o envio precisa
+    created_at = Column(DateTime, nullable=False)
+    enviado_em = Column(DateTime, nullable=True)
+    tentativas = Column(Integer, nullable=False, default=0)
+    ultimo_erro = Column(Text, nullable=True)
+    # Reserva do despachante (um processo por mensagem); expira após OUTBOX_RESERVA_SECONDS
+    reservado_por = Column(String(100), nullable=True)
+    reservado_em = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<OutboxMessage(id={self.id}, tipo='{self.tipo}', enviado_em={self.enviado_em})>"
@@ -23,8 +23,13 @@ class Pagamento(Base):
     # Timestamp
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
+    # Controle de concorrência otimista: todo UPDATE incrementa a versão
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
     # Relacionamento com Aluno (com cascade configurado)
     aluno = relationship("Aluno", backref="pagamentos", passive_deletes=True)
 
+    __mapper_args__ = {"version_id_col": version}
+
     def __repr__(self):
         return f"<Pagamento(id={self.id}, aluno_id={self.aluno_id}, valor={self.valor}, mes='{self.mes_referencia}')>"
@@ -0,0 +1,57 @@
+"""
+Models SQLAlchemy para presenças (check-in nas aulas) e o resumo mensal por aluno e horário
+"""
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Date, DateTime, ForeignKey, Index, UniqueConstraint
+)
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+
+class Presenca(Base):
+    """
+    Presença de um aluno matriculado em uma aula datada (catraca, tablet ou recepção).
+    Gravada em lote pelo buffer de check-ins (services/presenca_service.py);
+    leituras repetidas do mesmo aluno na mesma aula contam uma vez.
+    """
+    __tablename__ = "presencas"
+    __table_args__ = (
+        UniqueConstraint("horario_id", "data", "aluno_id", name="uq_presencas_aula_aluno"),
+        Index("ix_presencas_aluno_data", "aluno_id", "data"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    # Matrícula de origem; a presença continua no histórico após a desmatrícula
+    aluno_horario_id = Column(Integer, ForeignKey("aluno_horario.id", ondelete="SET NULL"), nullable=True)
+    aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="CASCADE"), nullable=False)
+    horario_id = Column(Integer, ForeignKey("horarios.id", ondelete="CASCADE"), nullable=False)
+    data = Column(Date, nullable=False)
+    registrado_em = Column(DateTime, nullable=False)  # horário da leitura no dispositivo
+    origem = Column(String(20), nullable=False, default="recepcao")  # catraca, tablet, recepcao
+
+    # Relacionamentos
+    matricula = relationship("AlunoHorario")
+
+    def __repr__(self):
+        return f"<Presenca(id={self.id}, aluno_id={self.aluno_id}, horario_id={self.horario_id}, data={self.data})>"
+
+
+class PresencaResumo(Base):
+    """
+    Resumo mensal de presenças por aluno e horário (rollup).
+    Incrementado na mesma transação que grava cada lote de presenças: os
+    relatórios de frequência leem daqui, sem agregar a tabela presencas.
+    """
+    __tablename__ = "presencas_resumo"
+    __table_args__ = (
+        Index("ix_presencas_resumo_horario", "horario_id", "mes"),
+    )
+
+    aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="CASCADE"), primary_key=True)
+    horario_id = Column(Integer, ForeignKey("horarios.id", ondelete="CASCADE"), primary_key=True)
+    mes = Column(Date, primary_key=True)  # primeiro dia do mês
+    total = Column(Integer, nullable=False, default=0)
+    ultima_presenca = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<PresencaResumo(aluno_id={self.aluno_id}, horario_id={self.horario_id}, mes={self.mes}, total={self.total})>"
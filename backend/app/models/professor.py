@@ -2,8 +2,9 @@
 Model SQLAlchemy para Professores
 """
 from sqlalchemy import Column, Integer, String, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from app.database import Base
+from app.utils.helpers import normalizar_telefone_e164
 
 
 class Professor(Base):
@@ -16,11 +17,18 @@ class Professor(Base):
     email = Column(String(100), unique=True, nullable=False, index=True)
     cpf = Column(String(14), unique=True, nullable=False, index=True)
     telefone = Column(String(20), nullable=True)
+    telefone_e164 = Column(String(16), nullable=True, index=True)  # calculado na gravação
     especialidade = Column(String(100), nullable=True)  # 'natacao', 'hidroginastica', 'ambos'
     is_active = Column(Boolean, default=True, nullable=False)
 
     # Relacionamento com horários (um professor pode ter vários horários)
     horarios = relationship("Horario", back_populates="professor")
 
+    @validates("telefone")
+    def _normalizar_telefone(self, key, telefone):
+        """Mantém telefone_e164 em dia nas gravações pelo ORM"""
+        self.telefone_e164 = normalizar_telefone_e164(telefone)
+        return telefone
+
     def __repr__(self):
         return f"<Professor(id={self.id}, nome='{self.nome}', especialidade='{self.especialidade}', ativo={self.is_active})>"
@@ -0,0 +1,52 @@
+"""
+Models SQLAlchemy para reposições de aula e ocupação das aulas datadas
+"""
+from sqlalchemy import Column, Integer, Date, DateTime, String, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+
+class OcorrenciaAula(Base):
+    """
+    Aula de um horário em uma data concreta (ex: horário de segunda 08:00 em 2026-10-19).
+
+    Índice de vagas das reposições: ocupadas = matriculados do horário +
+    reposições marcadas para a data. Mantido de forma incremental pelas
+    matrículas, desmatrículas e reposições (services/reposicao_service.py);
+    as vagas livres são capacidade_maxima - ocupadas, então mudar a capacidade
+    do horário não exige atualizar as ocorrências.
+    """
+    __tablename__ = "ocorrencias_aula"
+    __table_args__ = (
+        # Busca de vagas por período: aulas em ordem de data
+        Index("ix_ocorrencias_aula_data", "data", "horario_id", "ocupadas"),
+    )
+
+    horario_id = Column(Integer, ForeignKey("horarios.id", ondelete="CASCADE"), primary_key=True)
+    data = Column(Date, primary_key=True)
+    ocupadas = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<OcorrenciaAula(horario_id={self.horario_id}, data={self.data}, ocupadas={self.ocupadas})>"
+
+
+class Reposicao(Base):
+    """Reposição: aluno assiste a uma aula datada de um horário em que não está matriculado"""
+    __tablename__ = "reposicoes"
+    __table_args__ = (
+        UniqueConstraint("horario_id", "data", "aluno_id", name="uq_reposicoes_aula_aluno"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="CASCADE"), nullable=False, index=True)
+    horario_id = Column(Integer, ForeignKey("horarios.id", ondelete="CASCADE"), nullable=False)
+    data = Column(Date, nullable=False)
+    observacao = Column(String(200), nullable=True)  # ex: aula que o aluno perdeu
+    created_at = Column(DateTime, nullable=False)
+
+    # Relacionamentos
+    aluno = relationship("Aluno")
+    horario = relationship("Horario")
+
+    def __repr__(self):
+        return f"<Reposicao(id={self.id}, aluno_id={self.aluno_id}, horario_id={self.horario_id}, data={self.data})>"
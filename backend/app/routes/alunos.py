@@ -1,38 +1,90 @@
 """
 Rotas para gerenciamento de Alunos
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.database import get_db
-from app.routes.auth import require_role
+from app.routes.auth import get_current_user, require_role
+from app.models.user import User
 from app.models.aluno import Aluno
 from app.models.pagamento import Pagamento
 from app.models.turma import AlunoHorario
 from app.models.horario import Horario
-from app.schemas.aluno import AlunoCreate, AlunoUpdate, AlunoResponse, AlunoComPagamentos
+from app.models.fila_espera import FilaEspera
+from app.schemas.aluno import (
+    AlunoCreate, AlunoUpdate, AlunoResponse, AlunoComPagamentos, RenovacaoPrevia, RenovacaoResultado
+)
 from app.schemas.pagamento import PagamentoResponse
 from app.schemas.horario import HorarioResponse
+from app.schemas.fila_espera import FilaEsperaPosicao
+from app.schemas.matricula import CotaPlanoAluno
+from app.services.contrato_service import ANTECEDENCIA_DIAS, data_limite, previa_renovacao, renovar_contratos
+from app.services.event_bus import event_bus
+from app.services.fila_espera_service import posicoes
+from app.services.matricula_service import relatorio_cotas
+from app.utils.idempotency import IdempotentRequest, idempotency
+from app.utils.conditional import ConditionalGet, cache_control_for, if_match_version, set_version_etag, version_etag
+from app.utils.helpers import normalizar_telefone_e164
+from app.utils.repository import Repository
+from app.utils.single_flight import coalesced_json_response
 
 
 router = APIRouter(
     dependencies=[Depends(require_role(["admin", "recepcionista"]))]
 )
 
+# ETag da listagem: muda a cada commit que altera a tabela alunos
+etag_alunos = ConditionalGet(["alunos"], cache_control_for("alunos"))
+
+alunos_repo = Repository(
+    Aluno,
+    "Aluno não encontrado",
+    constraint_errors={"plano_id": (404, "Plano não encontrado")},
+    derived_columns={"telefone_e164": ("telefone_whatsapp", normalizar_telefone_e164)},
+)
+
+
+def _evento_aluno(aluno: Aluno, op: str) -> dict:
+    """Dados do evento de aluno para o stream SSE"""
+    return {
+        "op": op,
+        "aluno_id": aluno.id,
+        "nome_completo": aluno.nome_completo,
+        "ativo": aluno.ativo,
+    }
+
 
 @router.post("/alunos", response_model=AlunoResponse, status_code=200)
-async def criar_aluno(aluno: AlunoCreate, db: Session = Depends(get_db)):
-    """Criar novo aluno"""
+async def criar_aluno(
+    aluno: AlunoCreate,
+    db: Session = Depends(get_db),
+    idem: IdempotentRequest = Depends(idempotency)
+):
+    """
+    Criar novo aluno
+    Com Idempotency-Key, repetições devolvem o aluno já criado
+    """
+    if idem.replay is not None:
+        return idem.replay
+
     try:
         print(f"📝 Criando aluno: {aluno.nome_completo}")
         print(f"   Dados: {aluno.model_dump()}")
         db_aluno = Aluno(**aluno.model_dump())
         db.add(db_aluno)
-        db.commit()
-        db.refresh(db_aluno)
-        print(f"✅ Aluno criado com sucesso: ID {db_aluno.id}")
-        return db_aluno
+        db.flush()
+
+        # Resposta montada antes do commit (que expira o objeto)
+        resposta = AlunoResponse.model_validate(db_aluno)
+        evento = _evento_aluno(db_aluno, "insert")
+        replay = idem.commit(db, 200, resposta)
+        if replay is not None:
+            return replay
+        print(f"✅ Aluno criado com sucesso: ID {resposta.id}")
+        event_bus.publish("aluno", evento)
+        return resposta
     except Exception as e:
         print(f"❌ Erro ao criar aluno: {str(e)}")
         print(f"   Tipo do erro: {type(e).__name__}")
@@ -47,9 +99,13 @@ async def criar_aluno(aluno: AlunoCreate, db: Session = Depends(get_db)):
 async def listar_alunos(
     ativo: Optional[bool] = Query(True, description="Filtrar por status ativo (padrão: apenas ativos)"),
     tipo_aula: Optional[str] = Query(None, description="Filtrar por tipo de aula (natacao ou hidroginastica)"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    _: None = Depends(etag_alunos)
 ):
-    """Listar alunos com filtros opcionais - por padrão lista apenas ativos"""
+    """
+    Listar alunos com filtros opcionais - por padrão lista apenas ativos
+    Suporta If-None-Match: responde 304 sem consultar a lista se nada mudou
+    """
     query = db.query(Aluno)
 
     if ativo is not None:
@@ -62,17 +118,10 @@ async def listar_alunos(
     return alunos
 
 
-@router.get("/alunos/inadimplentes", response_model=List[AlunoResponse])
-async def listar_alunos_inadimplentes(db: Session = Depends(get_db)):
-    """
-    Listar alunos inadimplentes (OTIMIZADO - 1 query em vez de N+1)
-    Considera inadimplente: aluno ativo sem pagamento nos últimos 45 dias
-    """
+def _consultar_inadimplentes(db: Session, data_limite) -> List[Aluno]:
+    """Alunos ativos sem pagamento desde data_limite (1 query com LEFT JOIN)"""
     from sqlalchemy import func, or_
 
-    # Data limite: 45 dias atrás
-    data_limite = datetime.now().date() - timedelta(days=45)
-
     # Subquery para obter a data do último pagamento de cada aluno
     subquery = db.query(
         Pagamento.aluno_id,
@@ -80,7 +129,7 @@ async def listar_alunos_inadimplentes(db: Session = Depends(get_db)):
     ).group_by(Pagamento.aluno_id).subquery()
 
     # Query principal com LEFT JOIN (1 query apenas!)
-    alunos_inadimplentes = db.query(Aluno).outerjoin(
+    return db.query(Aluno).outerjoin(
         subquery, Aluno.id == subquery.c.aluno_id
     ).filter(
         Aluno.ativo == True,
@@ -90,7 +139,31 @@ async def listar_alunos_inadimplentes(db: Session = Depends(get_db)):
         )
     ).order_by(Aluno.nome_completo).all()
 
-    return alunos_inadimplentes
+
+@router.get("/alunos/inadimplentes", response_model=List[AlunoResponse])
+async def listar_alunos_inadimplentes(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Listar alunos inadimplentes (OTIMIZADO - 1 query em vez de N+1)
+    Considera inadimplente: aluno ativo sem pagamento nos últimos 45 dias
+    Requisições simultâneas compartilham a mesma consulta (single-flight)
+    """
+    # Data limite: 45 dias atrás
+    data_limite = datetime.now().date() - timedelta(days=45)
+
+    return await coalesced_json_response(
+        request,
+        "inadimplentes",
+        ["alunos", "pagamentos"],
+        {"data_limite": data_limite.isoformat()},
+        current_user.role,
+        lambda session: _consultar_inadimplentes(session, data_limite),
+        List[AlunoResponse],
+        db,
+    )
 
 
 @router.get("/alunos/contratos/expirando", response_model=List[AlunoResponse])
@@ -101,6 +174,7 @@ async def listar_contratos_expirando(
     """
     Listar alunos cujos contratos estão expirando nos próximos X dias
     Útil para enviar propostas de renovação proativas
+    Usa o índice parcial ix_alunos_contratos_ativos (data_fim_contrato dos alunos ativos)
     """
     from datetime import date
 
@@ -118,42 +192,117 @@ async def listar_contratos_expirando(
     return contratos_expirando
 
 
+@router.get("/alunos/contratos/renovacao", response_model=RenovacaoPrevia)
+async def previa_renovacao_contratos(
+    dias: int = Query(default=ANTECEDENCIA_DIAS, ge=0, le=90, description="Dias de antecedência da renovação"),
+    limite: int = Query(default=100, ge=1, le=1000, description="Máximo de contratos listados"),
+    db: Session = Depends(get_db)
+):
+    """
+    Prévia da renovação automática: contratos de alunos ativos com renovação
+    automática que vencem em até X dias e a nova data de fim (1 query, nada é alterado)
+    """
+    ate = data_limite(dias)
+    contratos = previa_renovacao(db, ate, limite)
+    return RenovacaoPrevia(
+        ate=ate,
+        total=contratos[0].total if contratos else 0,
+        contratos=[row._mapping for row in contratos],
+    )
+
+
+@router.post("/alunos/contratos/renovacao", response_model=RenovacaoResultado)
+async def renovar_contratos_agora(
+    dias: int = Query(default=ANTECEDENCIA_DIAS, ge=0, le=90, description="Dias de antecedência da renovação"),
+    db: Session = Depends(get_db)
+):
+    """
+    Roda a passada de renovação automática agora (a mesma da tarefa diária)
+    Um único UPDATE para todos os contratos; cada aluno renovado tem a versão incrementada
+    """
+    ate = data_limite(dias)
+    ids = renovar_contratos(db, ate)
+    db.commit()
+    return RenovacaoResultado(ate=ate, renovados=len(ids), aluno_ids=ids)
+
+
+@router.get("/alunos/cotas", response_model=List[CotaPlanoAluno])
+async def listar_cotas_plano(
+    situacao: Optional[str] = Query(None, pattern="^(acima|abaixo)$", description="acima ou abaixo da cota (padrão: os dois)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Alunos ativos com matrículas fora das aulas por semana do plano (1 query agregada)
+    Acima: matriculados em mais horários que o plano permite (ex: matrículas
+    anteriores à validação); abaixo: ainda têm aulas do plano para marcar
+    """
+    return [
+        CotaPlanoAluno(**row._mapping, situacao="acima" if row.diferenca > 0 else "abaixo")
+        for row in relatorio_cotas(db, situacao)
+    ]
+
+
+@router.get("/alunos/por-telefone", response_model=List[AlunoResponse])
+async def buscar_alunos_por_telefone(
+    numero: str = Query(..., min_length=1, max_length=30, description="Telefone em qualquer formato"),
+    db: Session = Depends(get_db)
+):
+    """
+    Alunos com o telefone informado (ex: resposta recebida no WhatsApp)
+    Busca pelo índice de telefone_e164; irmãos com o mesmo telefone vêm todos
+    """
+    telefone = normalizar_telefone_e164(numero)
+    if telefone is None:
+        raise HTTPException(status_code=400, detail="Telefone inválido")
+
+    return db.query(Aluno).filter(Aluno.telefone_e164 == telefone).order_by(Aluno.nome_completo).all()
+
+
 @router.get("/alunos/{id}", response_model=AlunoResponse)
-async def obter_aluno(id: int, db: Session = Depends(get_db)):
-    """Obter aluno por ID"""
+async def obter_aluno(id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    """Obter aluno por ID (ETag = versão do registro)"""
     aluno = db.query(Aluno).filter(Aluno.id == id).first()
     if not aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
+    set_version_etag(request, response, aluno.version)
     return aluno
 
 
 @router.put("/alunos/{id}", response_model=AlunoResponse)
-async def atualizar_aluno(id: int, aluno_update: AlunoUpdate, db: Session = Depends(get_db)):
-    """Atualizar dados do aluno"""
-    db_aluno = db.query(Aluno).filter(Aluno.id == id).first()
-    if not db_aluno:
-        raise HTTPException(status_code=404, detail="Aluno não encontrado")
-
+async def atualizar_aluno(
+    id: int,
+    aluno_update: AlunoUpdate,
+    response: Response,
+    if_match: Optional[int] = Depends(if_match_version),
+    db: Session = Depends(get_db)
+):
+    """
+    Atualizar dados do aluno (1 UPDATE ... RETURNING)
+    Com If-Match (ou "version" no corpo) só altera se a versão não mudou: 409 em conflito
+    """
     # Atualizar apenas campos fornecidos
-    update_data = aluno_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_aluno, field, value)
-
+    db_aluno = alunos_repo.update(
+        db, id, aluno_update.model_dump(exclude_unset=True, exclude={"version"}),
+        expected_version=if_match if if_match is not None else aluno_update.version,
+    )
+
+    # Resposta montada antes do commit (que expira o objeto)
+    resposta = AlunoResponse.model_validate(db_aluno)
+    evento = _evento_aluno(db_aluno, "update")
     db.commit()
-    db.refresh(db_aluno)
-    return db_aluno
+    event_bus.publish("aluno", evento)
+    response.headers["ETag"] = version_etag(resposta.version)
+    return resposta
 
 
 @router.delete("/alunos/{id}", status_code=200)
 async def deletar_aluno(id: int, db: Session = Depends(get_db)):
     """Soft delete - desativar aluno (set ativo=False)"""
-    db_aluno = db.query(Aluno).filter(Aluno.id == id).first()
-    if not db_aluno:
-        raise HTTPException(status_code=404, detail="Aluno não encontrado")
-
     # Soft delete: apenas marcar como inativo
-    db_aluno.ativo = False
+    db_aluno = alunos_repo.update(db, id, {"ativo": False})
+    evento = _evento_aluno(db_aluno, "update")
     db.commit()
+    event_bus.publish("aluno", evento)
 
     return {"message": "Aluno desativado com sucesso", "id": id}
 
@@ -181,13 +330,17 @@ async def listar_horarios_aluno(id: int, db: Session = Depends(get_db)):
     if not aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
 
-    # Buscar horários matriculados via relacionamento AlunoHorario
-    matriculas = db.query(AlunoHorario).filter(AlunoHorario.aluno_id == id).all()
-    horarios = []
-
-    for matricula in matriculas:
-        horario = db.query(Horario).filter(Horario.id == matricula.horario_id).first()
-        if horario:
-            horarios.append(horario)
+    # Buscar horários matriculados via JOIN com AlunoHorario (1 query em vez de N+1)
+    horarios = db.query(Horario).join(
+        AlunoHorario, AlunoHorario.horario_id == Horario.id
+    ).filter(
+        AlunoHorario.aluno_id == id
+    ).order_by(AlunoHorario.id).all()
 
     return horarios
+
+
+@router.get("/alunos/{id}/fila-espera", response_model=List[FilaEsperaPosicao])
+async def listar_filas_aluno(id: int, db: Session = Depends(get_db)):
+    """Posição do aluno em cada fila de espera em que está (1 query)"""
+    return posicoes(db, FilaEspera.aluno_id == id)
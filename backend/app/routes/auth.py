@@ -47,10 +47,28 @@ def get_current_user(
     Raises:
         HTTPException: Se token inválido ou usuário não encontrado
     """
-    token = credentials.credentials
-    payload = decode_access_token(token)
+    return get_token_user(decode_access_token(credentials.credentials), db)
 
-    if payload is None:
+
+def get_token_user(payload: Optional[dict], db: Session, scope: Optional[str] = None) -> User:
+    """
+    Usuário de um token JWT já decodificado
+
+    Tokens de escopo restrito (ex: "stream") só valem onde o escopo é pedido;
+    o token de login (sem escopo) não vale nesses lugares.
+
+    Args:
+        payload: Dados do token (None se inválido ou expirado)
+        db: Sessão do banco de dados
+        scope: Escopo exigido (None = token de login)
+
+    Returns:
+        User: Usuário autenticado
+
+    Raises:
+        HTTPException: Se token inválido, de outro escopo ou usuário não encontrado
+    """
+    if payload is None or payload.get("scope") != scope:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido ou expirado",
@@ -65,8 +83,9 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Buscar usuário no banco
-    user = db.query(User).filter(User.id == user_id).first()
+    # Buscar usuário no banco (get usa o identity map: numa sessão compartilhada,
+    # como nas sub-requisições de /api/batch, o usuário é carregado uma única vez)
+    user = db.get(User, user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,168 @@
+"""
+Rota de batch: várias leituras em uma única requisição
+
+As páginas do frontend começam com várias chamadas GET em sequência, cada uma
+pagando conexão, autenticação e sessão de banco. POST /api/batch recebe a
+lista de leituras e as executa dentro da aplicação:
+
+- uma única sessão de banco (a da requisição externa) para todas
+- sub-requisições executadas uma após a outra: as dependencies síncronas
+  (autenticação, ETag) rodam em threads do threadpool e uma Session não pode
+  ser usada por várias threads ao mesmo tempo
+- cada sub-requisição passa pelas dependencies da própria rota, então
+  autenticação e roles continuam valendo individualmente (o token da
+  requisição externa é repassado)
+
+As sub-requisições vão direto ao roteador, sem os middlewares (métricas,
+CORS, headers de segurança), que já rodam uma vez para a requisição externa.
+"""
+import json
+import logging
+import os
+import posixpath
+from contextlib import AsyncExitStack
+from urllib.parse import unquote
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from sqlalchemy.orm import Session
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.routing import Match
+
+from app.database import get_db, shared_session
+from app.routes.auth import get_current_user
+from app.models.user import User
+from app.schemas.batch import BatchRequest, BatchRequestItem, BatchResponse, BatchResponseItem
+
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+
+# Rotas que não fazem sentido dentro de um batch (recursão e stream infinito),
+# comparadas com o caminho da rota resolvida (não com o texto enviado)
+BLOCKED_PATHS = {"/api/batch", "/api/stream"}
+
+# Headers da requisição externa repassados às sub-requisições
+FORWARDED_HEADERS = {b"authorization", b"accept-language"}
+
+# Headers das sub-respostas devolvidos ao cliente
+RESPONSE_HEADERS = {"etag", "cache-control", "x-cache", "x-single-flight", "www-authenticate"}
+
+
+async def _executar(request: Request, item: BatchRequestItem) -> BatchResponseItem:
+    """Executa uma sub-requisição GET no roteador da aplicação"""
+    raw_path, _, query_string = item.path.partition("?")
+    # Mesmo caminho que o roteador vai usar: %-decodificado e sem "." / ".." / "//"
+    path = posixpath.normpath(unquote(raw_path))
+    if path.startswith("//"):
+        path = path[1:]
+
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": request.scope.get("scheme", "http"),
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "path": path,
+        "raw_path": raw_path.encode(),
+        "query_string": query_string.encode(),
+        "headers": [(k, v) for k, v in request.scope["headers"] if k in FORWARDED_HEADERS],
+        "app": request.app,
+    }
+
+    if _bloqueada(request.app, scope):
+        return BatchResponseItem(id=item.id, status=400, body={"detail": "Rota não permitida em batch"})
+
+    status_code = 500
+    headers: dict = {}
+    chunks: list = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            for key, value in message.get("headers", []):
+                if key.decode("latin-1").lower() in RESPONSE_HEADERS:
+                    headers[key.decode("latin-1")] = value.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        # Pilha de saída das dependencies com yield (normalmente criada por um middleware do FastAPI)
+        async with AsyncExitStack() as stack:
+            scope["fastapi_astack"] = stack
+            await request.app.router(scope, receive, send)
+    except StarletteHTTPException as exc:
+        return BatchResponseItem(
+            id=item.id,
+            status=exc.status_code,
+            headers={k: v for k, v in (exc.headers or {}).items() if k.lower() in RESPONSE_HEADERS},
+            body=None if exc.status_code == 304 else {"detail": exc.detail},
+        )
+    except RequestValidationError as exc:
+        return BatchResponseItem(id=item.id, status=422, body={"detail": jsonable_encoder(exc.errors())})
+    except Exception:
+        logger.exception("Erro na sub-requisição %s do batch", item.path)
+        return BatchResponseItem(id=item.id, status=500, body={"detail": "Erro interno do servidor"})
+
+    return BatchResponseItem(id=item.id, status=status_code, headers=headers, body=_decode(b"".join(chunks)))
+
+
+def _bloqueada(app, scope: dict) -> bool:
+    """A rota que atenderia a sub-requisição está em BLOCKED_PATHS? (ou o caminho, se nenhuma casar)"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", None) in BLOCKED_PATHS
+    return scope["path"].rstrip("/") in BLOCKED_PATHS
+
+
+def _decode(body: bytes):
+    """Corpo da sub-resposta: JSON quando possível, texto caso contrário"""
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode("utf-8", errors="replace")
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def executar_batch(
+    batch: BatchRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Executa várias leituras (GET) em uma única requisição
+
+    Exemplo de corpo:
+        {"requests": [{"id": "alunos", "path": "/api/alunos"},
+                      {"id": "grade", "path": "/api/horarios/grade-completa"}]}
+
+    Cada resultado traz o status e o corpo que a chamada direta retornaria;
+    uma sub-requisição com erro (404, 403...) não afeta as demais.
+    """
+    if len(batch.requests) > MAX_REQUESTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo de {MAX_REQUESTS} sub-requisições por batch"
+        )
+
+    # O usuário autenticado fica no identity map da sessão compartilhada:
+    # a autenticação de cada sub-requisição não consulta o banco de novo
+    with shared_session(db):
+        responses = [await _executar(request, item) for item in batch.requests]
+
+    return BatchResponse(responses=responses)
@@ -0,0 +1,97 @@
+"""
+Rotas do change feed (sincronização incremental dos clientes)
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.database import get_db
+from app.routes.auth import require_role
+from app.models.aluno import Aluno
+from app.models.pagamento import Pagamento
+from app.models.horario import Horario
+from app.models.turma import AlunoHorario
+from app.models.change_log import ChangeLog
+from app.schemas.aluno import AlunoResponse
+from app.schemas.pagamento import PagamentoResponse
+from app.schemas.horario import HorarioResponse
+from app.schemas.change import ChangeEntry, ChangeFeedResponse, MatriculaResponse
+from app.utils.change_log import TRACKED_TABLES
+
+
+router = APIRouter(
+    dependencies=[Depends(require_role(["admin", "recepcionista"]))]
+)
+
+# Nome no feed -> (modelo, schema de resposta)
+FEED_RESOURCES = {
+    "alunos": (Aluno, AlunoResponse),
+    "pagamentos": (Pagamento, PagamentoResponse),
+    "horarios": (Horario, HorarioResponse),
+    "matriculas": (AlunoHorario, MatriculaResponse),
+}
+
+FEED_TO_TABLE = {feed: table for table, feed in TRACKED_TABLES.items()}
+
+
+@router.get("/changes", response_model=ChangeFeedResponse)
+async def listar_alteracoes(
+    since: int = Query(0, ge=0, description="Cursor da última alteração aplicada pelo cliente (0 = desde o início)"),
+    limit: int = Query(500, ge=1, le=5000, description="Máximo de entradas do log lidas por página"),
+    tabelas: Optional[str] = Query(None, description="Filtrar tabelas (ex: alunos,matriculas)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Alterações desde o cursor `since`, em ordem
+
+    - insert/update trazem o registro atual em `data`
+    - delete traz `data` nulo (tombstone)
+    - Várias alterações do mesmo registro na página viram uma só (a última)
+
+    O cliente aplica as alterações e guarda `next_since` para a próxima chamada;
+    enquanto `has_more` for verdadeiro, há mais páginas a buscar.
+    """
+    recursos = list(FEED_RESOURCES)
+    if tabelas:
+        recursos = [nome.strip() for nome in tabelas.split(",") if nome.strip()]
+        invalidas = [nome for nome in recursos if nome not in FEED_RESOURCES]
+        if invalidas:
+            raise HTTPException(status_code=400, detail=f"Tabelas inválidas: {', '.join(invalidas)}")
+
+    # Busca limit + 1 para saber se há mais páginas sem um COUNT
+    entradas = db.query(ChangeLog).filter(
+        ChangeLog.id > since,
+        ChangeLog.table_name.in_([FEED_TO_TABLE[nome] for nome in recursos])
+    ).order_by(ChangeLog.id).limit(limit + 1).all()
+
+    has_more = len(entradas) > limit
+    entradas = entradas[:limit]
+    next_since = entradas[-1].id if entradas else since
+
+    # Última alteração de cada registro na página
+    ultimas: dict = {}
+    for entrada in entradas:
+        chave = (TRACKED_TABLES[entrada.table_name], entrada.row_id)
+        ultimas.pop(chave, None)
+        ultimas[chave] = entrada
+
+    # Registros atuais: uma query por tabela presente na página
+    ids_por_recurso: dict = {}
+    for (recurso, row_id), entrada in ultimas.items():
+        if entrada.operation != "delete":
+            ids_por_recurso.setdefault(recurso, []).append(row_id)
+
+    registros: dict = {}
+    for recurso, ids in ids_por_recurso.items():
+        modelo, schema = FEED_RESOURCES[recurso]
+        for obj in db.query(modelo).filter(modelo.id.in_(ids)).all():
+            registros[(recurso, obj.id)] = schema.model_validate(obj).model_dump(mode="json")
+
+    changes = []
+    for (recurso, row_id), entrada in ultimas.items():
+        data = registros.get((recurso, row_id))
+        # Registro excluído depois desta página: a exclusão chega numa página seguinte
+        operacao = entrada.operation if data is not None or entrada.operation == "delete" else "delete"
+        changes.append(ChangeEntry(seq=entrada.id, table=recurso, id=row_id, op=operacao, data=data))
+
+    return ChangeFeedResponse(changes=changes, next_since=next_since, has_more=has_more)
@@ -1,141 +1,514 @@
 """
 Rotas para gerenciamento de Horários
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+from datetime import datetime, time
+import os
 from app.database import get_db
-from app.routes.auth import require_role
+from app.routes.auth import get_current_user, require_role
+from app.models.user import User
 from app.models.horario import Horario
 from app.models.aluno import Aluno
 from app.models.turma import AlunoHorario
-from app.schemas.horario import HorarioCreate, HorarioUpdate, HorarioResponse, HorarioComAlunos, AlunoSimplificado
+from app.models.fila_espera import FilaEspera
+from app.schemas.horario import (
+    HorarioCreate, HorarioUpdate, HorarioResponse, HorarioComAlunos, AlunoSimplificado, OcupacaoCelula, OcupacaoGrade,
+    OcupacaoHorario
+)
+from app.schemas.alocacao import AlocacaoRequest, AlocacaoResponse
+from app.schemas.fila_espera import FilaEsperaCreate, FilaEsperaPosicao, FilaEsperaAluno, FilaEsperaResponse
+from app.schemas.matricula import MatriculaLoteRequest, MatriculasLoteRequest, MatriculaLoteResponse, MatriculaLoteResultado
+from app.services.agenda_professor_service import (
+    CAMPOS_AGENDA, mensagem_conflito, primeiro_conflito, sem_sobreposicao
+)
+from app.services.alocacao_service import Preferencia, PlanoAlocacao, aplicar_alocacao, calcular_alocacao
+from app.services.event_bus import event_bus
+from app.services.fila_espera_service import ORDEM_FILA, atualizar_contador, posicoes, promover_da_fila
+from app.services.matricula_service import (
+    LIMITE_PLANO, ResultadoLote, desmatricular_em_lote, matricular, matricular_em_lote, ocupacao_horarios
+)
+from app.services.reposicao_service import ajustar_ocupadas, gerar_ocorrencias, ocupar_vagas, recriar_ocorrencias
+from app.utils.idempotency import IdempotentRequest, idempotency
+from app.utils.conditional import ConditionalGet, cache_control_for, if_match_version, set_version_etag, version_etag
+from app.utils.repository import Repository
+from app.utils.response_cache import cached_json_response
+from app.utils.single_flight import coalesced_json_response
 
 
 router = APIRouter(
     dependencies=[Depends(require_role(["admin", "recepcionista"]))]
 )
 
+# ETag da grade: depende dos horários, matrículas, alunos e professores
+etag_grade = ConditionalGet(
+    ["horarios", "aluno_horario", "alunos", "professores"], cache_control_for("horarios")
+)
+
+horarios_repo = Repository(
+    Horario,
+    "Horário não encontrado",
+    constraint_errors={
+        "professor_id": (404, "Professor não encontrado"),
+        # ex_horarios_agenda_professor (PostgreSQL): aulas sobrepostas do mesmo professor
+        "agenda": (409, "Professor já tem aula neste horário"),
+    },
+)
+matriculas_repo = Repository(AlunoHorario, "Aluno não está matriculado neste horário")
+
+# Máximo de itens por matrícula/desmatrícula em lote
+MAX_ITENS_LOTE = int(os.getenv("MATRICULA_LOTE_MAX_ITENS", "5000"))
+
+
+def _verificar_tamanho_lote(quantidade: int) -> None:
+    if quantidade > MAX_ITENS_LOTE:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_ITENS_LOTE} itens por lote")
+
+
+def _resposta_lote(resultado: ResultadoLote) -> MatriculaLoteResponse:
+    return MatriculaLoteResponse(
+        resultados=[MatriculaLoteResultado(**vars(item)) for item in resultado.itens],
+        sucesso=resultado.sucesso,
+        erros=resultado.erros,
+    )
+
+
+def _publicar_lote(op: str, db: Session, resultado: ResultadoLote) -> None:
+    """Publica as matrículas/desmatrículas do lote e a ocupação final de cada horário alterado"""
+    alterados = [item for item in resultado.itens if item.status < 400]
+    if not alterados or not event_bus.subscriber_count:
+        return
+    ocupacao = resultado.ocupacao or ocupacao_horarios(db, (item.horario_id for item in alterados))
+    for item in alterados:
+        event_bus.publish("matricula", {
+            "op": op,
+            "matricula_id": item.matricula_id,
+            "horario_id": item.horario_id,
+            "aluno_id": item.aluno_id,
+        })
+    for horario_id in dict.fromkeys(item.horario_id for item in alterados):
+        capacidade_maxima, matriculados = ocupacao[horario_id]
+        event_bus.publish("ocupacao", {
+            "horario_id": horario_id,
+            "matriculados": matriculados,
+            "capacidade_maxima": capacidade_maxima,
+            "vagas_disponiveis": capacidade_maxima - matriculados,
+        })
+
+
+def _publicar_matricula(
+    op: str, horario_id: int, capacidade_maxima: int, aluno_id: int, matricula_id: int, matriculados: int
+) -> None:
+    """Publica matrícula/desmatrícula e a nova ocupação do horário no stream SSE"""
+    event_bus.publish("matricula", {
+        "op": op,
+        "matricula_id": matricula_id,
+        "horario_id": horario_id,
+        "aluno_id": aluno_id,
+    })
+    event_bus.publish("ocupacao", {
+        "horario_id": horario_id,
+        "matriculados": matriculados,
+        "capacidade_maxima": capacidade_maxima,
+        "vagas_disponiveis": capacidade_maxima - matriculados,
+    })
+
 
 @router.post("/horarios", response_model=HorarioResponse, status_code=201)
 async def criar_horario(horario: HorarioCreate, db: Session = Depends(get_db)):
-    """Criar novo horário"""
+    """Criar novo horário (409 se o professor já tiver aula sobreposta no mesmo dia)"""
+    conflito = primeiro_conflito(
+        db, horario.professor_id, horario.dia_semana, horario.horario, horario.duracao_minutos
+    )
+    if conflito is not None:
+        raise HTTPException(status_code=409, detail=mensagem_conflito(conflito))
     db_horario = Horario(**horario.model_dump())
     db.add(db_horario)
-    db.commit()
+    try:
+        db.flush()
+        gerar_ocorrencias(db, [db_horario.id])  # aulas datadas para as reposições
+        db.commit()
+    except IntegrityError as exc:
+        # Gravação simultânea barrada pela constraint de agenda (PostgreSQL)
+        db.rollback()
+        if "ex_horarios_agenda_professor" not in str(exc.orig):
+            raise
+        raise HTTPException(status_code=409, detail="Professor já tem aula neste horário") from exc
     db.refresh(db_horario)
     return db_horario
 
 
 @router.get("/horarios", response_model=List[HorarioResponse])
 async def listar_horarios(db: Session = Depends(get_db)):
-    """Listar todos os horários"""
-    horarios = db.query(Horario).order_by(Horario.dia_semana, Horario.horario).all()
-    return horarios
-
-
-@router.get("/horarios/grade-completa", response_model=List[HorarioComAlunos])
-async def obter_grade_completa(db: Session = Depends(get_db)):
-    """
-    Obter grade completa de horários com lista de alunos matriculados
-    Útil para visualização da grade semanal
-    """
-    from app.models.professor import Professor
-
-    horarios = db.query(Horario).order_by(Horario.dia_semana, Horario.horario).all()
+    """Listar todos os horários (servido do cache até um horário mudar)"""
+    def consultar():
+        return db.query(Horario).order_by(Horario.dia_semana_numero, Horario.horario).all()
+
+    return cached_json_response(
+        "horarios", ["horarios"], "", consultar, List[HorarioResponse], db
+    )
+
+
+def _montar_grade(db: Session) -> List[HorarioComAlunos]:
+    """Grade com alunos matriculados (2 queries fixas em vez de N+1 por horário/aluno/professor)"""
+    horarios = db.query(Horario).options(
+        joinedload(Horario.professor)
+    ).order_by(Horario.dia_semana_numero, Horario.horario).all()
+
+    # Todas as matrículas com dados do aluno em uma única query
+    matriculas = db.query(
+        AlunoHorario.horario_id,
+        Aluno.id,
+        Aluno.nome_completo,
+        Aluno.telefone_whatsapp
+    ).join(
+        Aluno, Aluno.id == AlunoHorario.aluno_id
+    ).order_by(AlunoHorario.id).all()
+
+    alunos_por_horario = defaultdict(list)
+    for matricula in matriculas:
+        alunos_por_horario[matricula.horario_id].append(AlunoSimplificado(
+            id=matricula.id,
+            nome_completo=matricula.nome_completo,
+            telefone_whatsapp=matricula.telefone_whatsapp
+        ))
 
     grade_completa = []
     for horario in horarios:
-        # Buscar alunos matriculados neste horário
-        matriculas = db.query(AlunoHorario).filter(AlunoHorario.horario_id == horario.id).all()
-        alunos = []
-
-        for matricula in matriculas:
-            aluno = db.query(Aluno).filter(Aluno.id == matricula.aluno_id).first()
-            if aluno:
-                alunos.append(AlunoSimplificado(
-                    id=aluno.id,
-                    nome_completo=aluno.nome_completo,
-                    telefone_whatsapp=aluno.telefone_whatsapp
-                ))
-
-        # Calcular vagas disponíveis
-        vagas_disponiveis = horario.capacidade_maxima - len(alunos)
-
-        # Buscar nome do professor
-        professor_nome = None
-        if horario.professor_id:
-            professor = db.query(Professor).filter(Professor.id == horario.professor_id).first()
-            if professor:
-                professor_nome = professor.nome
+        alunos = alunos_por_horario.get(horario.id, [])
 
         # Adicionar à grade
         grade_completa.append(HorarioComAlunos(
             id=horario.id,
             dia_semana=horario.dia_semana,
             horario=horario.horario,
+            duracao_minutos=horario.duracao_minutos,
             capacidade_maxima=horario.capacidade_maxima,
             tipo_aula=horario.tipo_aula,
             professor_id=horario.professor_id,
             fila_espera=horario.fila_espera,
+            version=horario.version,
             alunos=alunos,
-            vagas_disponiveis=vagas_disponiveis,
-            professor_nome=professor_nome
+            vagas_disponiveis=horario.capacidade_maxima - len(alunos),
+            professor_nome=horario.professor.nome if horario.professor else None
         ))
 
     return grade_completa
 
 
+@router.get("/horarios/grade-completa", response_model=List[HorarioComAlunos])
+async def obter_grade_completa(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    _: None = Depends(etag_grade)
+):
+    """
+    Obter grade completa de horários com lista de alunos matriculados
+    Útil para visualização da grade semanal
+    Suporta If-None-Match: responde 304 sem montar a grade se nada mudou
+    Requisições simultâneas compartilham a mesma montagem (single-flight)
+    """
+    return await coalesced_json_response(
+        request,
+        "grade_completa",
+        etag_grade.tables,
+        {},
+        current_user.role,
+        _montar_grade,
+        List[HorarioComAlunos],
+        db,
+        headers=response.headers,  # ETag e Cache-Control definidos por etag_grade
+    )
+
+
+def _celula(turmas: int, matriculados: int, capacidade: int, fila_espera: int) -> OcupacaoCelula:
+    return OcupacaoCelula(
+        turmas=turmas,
+        matriculados=matriculados,
+        capacidade=capacidade,
+        fila_espera=fila_espera,
+        percentual=round(matriculados * 100 / capacidade, 1) if capacidade else 0.0,
+    )
+
+
+def _somar(turmas: List[OcupacaoHorario]) -> OcupacaoCelula:
+    return _celula(
+        len(turmas),
+        sum(turma.matriculados for turma in turmas),
+        sum(turma.capacidade for turma in turmas),
+        sum(turma.fila_espera for turma in turmas),
+    )
+
+
+def _mapa_ocupacao(db: Session, tipo_aula: Optional[str]) -> OcupacaoGrade:
+    """
+    Matriz dia x horário da ocupação e a ocupação de cada turma, em uma única
+    query (matrículas agrupadas por horário, em ordem de dia_semana_numero, horario)
+    """
+    matriculas = (
+        select(AlunoHorario.horario_id, func.count(AlunoHorario.id).label("alunos"))
+        .group_by(AlunoHorario.horario_id)
+        .subquery()
+    )
+    query = (
+        select(
+            Horario.id,
+            Horario.dia_semana,
+            Horario.horario,
+            Horario.tipo_aula,
+            Horario.capacidade_maxima,
+            Horario.fila_espera,
+            func.coalesce(matriculas.c.alunos, 0).label("matriculados"),
+        )
+        .outerjoin(matriculas, matriculas.c.horario_id == Horario.id)
+        .order_by(Horario.dia_semana_numero.nulls_last(), Horario.horario, Horario.id)
+    )
+    if tipo_aula:
+        query = query.where(Horario.tipo_aula == tipo_aula)
+    rows = db.execute(query).all()
+
+    por_horario = [
+        OcupacaoHorario(
+            horario_id=row.id,
+            dia_semana=row.dia_semana,
+            horario=row.horario,
+            tipo_aula=row.tipo_aula,
+            matriculados=row.matriculados,
+            capacidade=row.capacidade_maxima,
+            fila_espera=row.fila_espera,
+            percentual=round(row.matriculados * 100 / row.capacidade_maxima, 1) if row.capacidade_maxima else 0.0,
+        )
+        for row in rows
+    ]
+
+    # Turmas no mesmo dia/horário somadas na célula; linhas já vêm em ordem de dia
+    por_celula: Dict[Tuple[str, time], List[OcupacaoHorario]] = defaultdict(list)
+    for turma in por_horario:
+        por_celula[(turma.dia_semana, turma.horario)].append(turma)
+    dias = list(dict.fromkeys(dia for dia, _ in por_celula))
+    horarios = sorted({horario for _, horario in por_celula})
+    linha = {dia: i for i, dia in enumerate(dias)}
+    coluna = {horario: j for j, horario in enumerate(horarios)}
+    celulas: List[List[Optional[OcupacaoCelula]]] = [[None] * len(horarios) for _ in dias]
+    for (dia, horario), turmas in por_celula.items():
+        celulas[linha[dia]][coluna[horario]] = _somar(turmas)
+
+    total = _somar(por_horario)
+    percentuais = [turma.percentual for turma in por_horario if turma.capacidade > 0]
+    return OcupacaoGrade(
+        dias=dias,
+        horarios=horarios,
+        celulas=celulas,
+        por_horario=por_horario,
+        total=total,
+        percentual_medio=round(sum(percentuais) / len(percentuais), 1) if percentuais else 0.0,
+    )
+
+
+@router.get("/horarios/ocupacao", response_model=OcupacaoGrade)
+async def obter_mapa_ocupacao(
+    tipo_aula: Optional[str] = Query(None, pattern="^(natacao|hidroginastica)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Mapa de ocupação da semana (dia x horário): matriculados, capacidade,
+    fila de espera e percentual, prontos para o frontend desenhar
+    Servido do cache até um horário ou matrícula mudar
+    """
+    return cached_json_response(
+        "horarios_ocupacao",
+        ["horarios", "aluno_horario"],
+        f"tipo_aula={tipo_aula or ''}",
+        lambda: _mapa_ocupacao(db, tipo_aula),
+        OcupacaoGrade,
+        db,
+    )
+
+
+@router.post("/horarios/matriculas:batch", response_model=MatriculaLoteResponse)
+async def matricular_em_varios_horarios(
+    lote: MatriculasLoteRequest,
+    db: Session = Depends(get_db),
+    idem: IdempotentRequest = Depends(idempotency)
+):
+    """
+    Matricular vários pares horário-aluno de uma vez (ex: grade de um novo período)
+
+    Validação de capacidade, aluno ativo e duplicidade feita para o lote
+    inteiro em poucas queries e um único INSERT. Cada item traz o status e
+    o detail que a matrícula individual retornaria; itens com erro não
+    impedem os demais.
+    """
+    if idem.replay is not None:
+        return idem.replay
+    _verificar_tamanho_lote(len(lote.matriculas))
+
+    resultado = matricular_em_lote(db, [(item.horario_id, item.aluno_id) for item in lote.matriculas])
+    resposta = _resposta_lote(resultado)
+    replay = idem.commit(db, 200, resposta)
+    if replay is not None:
+        return replay
+    _publicar_lote("insert", db, resultado)
+    return resposta
+
+
+@router.delete("/horarios/matriculas:batch", response_model=MatriculaLoteResponse)
+async def desmatricular_de_varios_horarios(lote: MatriculasLoteRequest, db: Session = Depends(get_db)):
+    """Remover vários pares horário-aluno de uma vez (1 DELETE ... RETURNING)"""
+    _verificar_tamanho_lote(len(lote.matriculas))
+
+    resultado = desmatricular_em_lote(db, [(item.horario_id, item.aluno_id) for item in lote.matriculas])
+    promovidos = promover_da_fila(db, {item.horario_id for item in resultado.itens if item.status < 400})
+    db.commit()
+    _publicar_lote("delete", db, resultado)
+    _publicar_lote("insert", db, ResultadoLote(itens=promovidos))
+    return _resposta_lote(resultado)
+
+
+def _resposta_alocacao(plano: PlanoAlocacao, aplicado: bool) -> AlocacaoResponse:
+    return AlocacaoResponse(
+        aplicado=aplicado,
+        aulas_alocadas=plano.aulas_alocadas,
+        por_preferencia=plano.por_preferencia,
+        adicionar=[{"horario_id": h, "aluno_id": a} for h, a in plano.adicionar],
+        remover=[{"horario_id": h, "aluno_id": a} for h, a in plano.remover],
+        manter=len(plano.manter),
+        nao_alocados=[{"aluno_id": a, "aulas_faltando": n} for a, n in plano.nao_alocados.items()],
+        ignorados=[{"aluno_id": a, "detail": d} for a, d in plano.ignorados.items()],
+        ocupacao=[
+            {"horario_id": h, "capacidade_maxima": capacidade, "matriculados": matriculados}
+            for h, (capacidade, matriculados) in plano.ocupacao.items()
+        ],
+    )
+
+
+@router.post("/horarios/alocacao", response_model=AlocacaoResponse)
+async def alocar_grade(alocacao: AlocacaoRequest, db: Session = Depends(get_db)):
+    """
+    Alocação automática dos alunos nos horários a partir das preferências
+    Sem "aplicar" devolve só o diff (dry-run); com "aplicar" grava o diff em lote
+    """
+    _verificar_tamanho_lote(len(alocacao.alunos))
+    preferencias = {
+        aluno.aluno_id: [Preferencia(**pref.model_dump()) for pref in aluno.preferencias]
+        for aluno in alocacao.alunos
+    }
+    # O cálculo é CPU-bound: fora do event loop
+    plano = await run_in_threadpool(calcular_alocacao, db, preferencias)
+    if not alocacao.aplicar:
+        return _resposta_alocacao(plano, aplicado=False)
+
+    removidas, incluidas = aplicar_alocacao(db, plano)
+    if removidas.erros or incluidas.erros:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="A grade mudou durante o cálculo: calcule a alocação de novo")
+    promovidos = promover_da_fila(db, {horario_id for horario_id, _ in plano.remover})
+    db.commit()
+    _publicar_lote("delete", db, removidas)
+    _publicar_lote("insert", db, incluidas)
+    _publicar_lote("insert", db, ResultadoLote(itens=promovidos))
+    return _resposta_alocacao(plano, aplicado=True)
+
+
 @router.get("/horarios/{id}", response_model=HorarioResponse)
-async def obter_horario(id: int, db: Session = Depends(get_db)):
-    """Obter horário por ID"""
+async def obter_horario(id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    """Obter horário por ID (ETag = versão do registro)"""
     horario = db.query(Horario).filter(Horario.id == id).first()
     if not horario:
         raise HTTPException(status_code=404, detail="Horário não encontrado")
+    set_version_etag(request, response, horario.version)
     return horario
 
 
 @router.put("/horarios/{id}", response_model=HorarioResponse)
-async def atualizar_horario(id: int, horario_update: HorarioUpdate, db: Session = Depends(get_db)):
-    """Atualizar horário"""
-    db_horario = db.query(Horario).filter(Horario.id == id).first()
-    if not db_horario:
-        raise HTTPException(status_code=404, detail="Horário não encontrado")
-
+async def atualizar_horario(
+    id: int,
+    horario_update: HorarioUpdate,
+    response: Response,
+    if_match: Optional[int] = Depends(if_match_version),
+    db: Session = Depends(get_db)
+):
+    """
+    Atualizar horário (1 UPDATE ... RETURNING)
+    Com If-Match (ou "version" no corpo) só altera se a versão não mudou: 409 em conflito
+    Aumentar a capacidade de um horário com fila matricula os próximos da fila
+    Mudanças de professor, dia, início ou duração levam a regra de agenda no
+    próprio WHERE: 409 se o professor já tiver aula sobreposta
+    """
     # Atualizar apenas campos fornecidos
-    update_data = horario_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_horario, field, value)
-
+    campos = horario_update.model_dump(exclude_unset=True, exclude={"version"})
+    versao = if_match if if_match is not None else horario_update.version
+    if not campos.keys() & CAMPOS_AGENDA:
+        db_horario = horarios_repo.update(db, id, campos, expected_version=versao)
+    else:
+        db_horario = horarios_repo.update_returning(db, id, campos, sem_sobreposicao(campos), expected_version=versao)
+        if db_horario is None:
+            # Só no caminho de erro: 404/409 de versão ou conflito de agenda
+            atual = horarios_repo.update(db, id, {}, expected_version=versao)
+            novo = {campo: campos.get(campo, getattr(atual, campo)) for campo in CAMPOS_AGENDA}
+            conflito = primeiro_conflito(db, **novo, ignorar_id=id)
+            raise HTTPException(
+                status_code=409,
+                detail=mensagem_conflito(conflito) if conflito else "Professor já tem aula neste horário",
+            )
+    promovidos = []
+    if "capacidade_maxima" in campos and db_horario.fila_espera:
+        promovidos = promover_da_fila(db, [id])
+    if "dia_semana" in campos:
+        recriar_ocorrencias(db, [id])
+
+    # Resposta montada antes do commit (que expira o objeto)
+    resposta = HorarioResponse.model_validate(db_horario)
     db.commit()
-    db.refresh(db_horario)
-    return db_horario
+    _publicar_lote("insert", db, ResultadoLote(itens=promovidos))
+    response.headers["ETag"] = version_etag(resposta.version)
+    return resposta
 
 
 @router.delete("/horarios/{id}", status_code=200)
 async def deletar_horario(id: int, db: Session = Depends(get_db)):
-    """Deletar horário"""
-    db_horario = db.query(Horario).filter(Horario.id == id).first()
-    if not db_horario:
-        raise HTTPException(status_code=404, detail="Horário não encontrado")
-
-    # Verificar se há alunos matriculados
-    alunos_matriculados = db.query(AlunoHorario).filter(AlunoHorario.horario_id == id).count()
-    if alunos_matriculados > 0:
+    """
+    Deletar horário (1 DELETE ... RETURNING)
+    A chave estrangeira das matrículas é ON DELETE CASCADE, então a regra
+    "sem alunos matriculados" vai no próprio WHERE do DELETE
+    """
+    sem_matriculas = ~exists().where(AlunoHorario.horario_id == Horario.id)
+    if horarios_repo.delete_where(db, Horario.id == id, sem_matriculas) is None:
+        # Nada excluído: só agora descobre o motivo
+        if db.query(Horario.id).filter(Horario.id == id).first() is None:
+            raise HTTPException(status_code=404, detail="Horário não encontrado")
+        alunos_matriculados = db.query(AlunoHorario).filter(AlunoHorario.horario_id == id).count()
         raise HTTPException(
             status_code=400,
             detail=f"Não é possível deletar. Existem {alunos_matriculados} aluno(s) matriculado(s) neste horário."
         )
 
-    db.delete(db_horario)
     db.commit()
 
     return {"message": "Horário deletado com sucesso", "id": id}
 
 
 @router.post("/horarios/{id}/alunos/{aluno_id}", status_code=201)
-async def adicionar_aluno_horario(id: int, aluno_id: int, db: Session = Depends(get_db)):
-    """Adicionar aluno a um horário (matrícula)"""
+async def adicionar_aluno_horario(
+    id: int,
+    aluno_id: int,
+    db: Session = Depends(get_db),
+    idem: IdempotentRequest = Depends(idempotency)
+):
+    """
+    Adicionar aluno a um horário (matrícula)
+    Com Idempotency-Key, repetições devolvem a matrícula já criada
+    """
+    if idem.replay is not None:
+        return idem.replay
+
     # Verificar se horário existe
     horario = db.query(Horario).filter(Horario.id == id).first()
     if not horario:
@@ -156,46 +529,64 @@ async def adicionar_aluno_horario(id: int, aluno_id: int, db: Session = Depends(
     if matricula_existente:
         raise HTTPException(status_code=400, detail="Aluno já está matriculado neste horário")
 
-    # Verificar capacidade do horário
-    alunos_matriculados = db.query(AlunoHorario).filter(AlunoHorario.horario_id == id).count()
-    if alunos_matriculados >= horario.capacidade_maxima:
+    # Verificar capacidade do horário (com a linha do horário bloqueada): matrículas
+    # e, nas aulas datadas, as reposições marcadas
+    _, alunos_matriculados = ocupacao_horarios(db, [id], bloquear=True)[id]
+    if alunos_matriculados >= horario.capacidade_maxima or not ocupar_vagas(db, {id: 1})[id]:
         raise HTTPException(
             status_code=400,
             detail=f"Horário já está com capacidade máxima ({horario.capacidade_maxima} alunos)"
         )
 
-    # Criar matrícula
-    nova_matricula = AlunoHorario(horario_id=id, aluno_id=aluno_id)
-    db.add(nova_matricula)
-    db.commit()
-    db.refresh(nova_matricula)
-
-    return {
+    # Criar matrícula (a cota semanal do plano é verificada no próprio INSERT)
+    capacidade_maxima = horario.capacidade_maxima
+    matricula_id = matricular(db, id, aluno_id)
+    if matricula_id is None:
+        ajustar_ocupadas(db, {id: -1})
+        raise HTTPException(status_code=400, detail=LIMITE_PLANO)
+    resposta = {
         "message": "Aluno adicionado ao horário com sucesso",
         "horario_id": id,
         "aluno_id": aluno_id,
-        "matricula_id": nova_matricula.id
+        "matricula_id": matricula_id
     }
+    replay = idem.commit(db, 201, resposta)
+    if replay is not None:
+        return replay
+    _publicar_matricula("insert", id, capacidade_maxima, aluno_id, matricula_id, alunos_matriculados + 1)
+
+    return resposta
 
 
 @router.delete("/horarios/{id}/alunos/{aluno_id}", status_code=200)
 async def remover_aluno_horario(id: int, aluno_id: int, db: Session = Depends(get_db)):
-    """Remover aluno de um horário (desmatrícula)"""
-    # Verificar se matrícula existe
-    matricula = db.query(AlunoHorario).filter(
+    """
+    Remover aluno de um horário (desmatrícula - 1 DELETE ... RETURNING)
+    A vaga liberada vai para o próximo da fila de espera na mesma transação
+    """
+    matricula = matriculas_repo.delete_where(
+        db,
         AlunoHorario.horario_id == id,
         AlunoHorario.aluno_id == aluno_id
-    ).first()
-
-    if not matricula:
+    )
+    if matricula is None:
         raise HTTPException(
             status_code=404,
             detail="Aluno não está matriculado neste horário"
         )
 
-    db.delete(matricula)
+    matricula_id = matricula.id
+    ajustar_ocupadas(db, {id: -1})
+    promovidos = promover_da_fila(db, [id])
     db.commit()
 
+    # Ocupação só é calculada se há alguma recepção conectada ao stream
+    if event_bus.subscriber_count:
+        capacidade_maxima = db.query(Horario.capacidade_maxima).filter(Horario.id == id).scalar()
+        matriculados = db.query(AlunoHorario).filter(AlunoHorario.horario_id == id).count()
+        _publicar_matricula("delete", id, capacidade_maxima, aluno_id, matricula_id, matriculados - len(promovidos))
+        _publicar_lote("insert", db, ResultadoLote(itens=promovidos))
+
     return {
         "message": "Aluno removido do horário com sucesso",
         "horario_id": id,
@@ -203,6 +594,45 @@ async def remover_aluno_horario(id: int, aluno_id: int, db: Session = Depends(ge
     }
 
 
+@router.post("/horarios/{id}/alunos:batch", response_model=MatriculaLoteResponse)
+async def matricular_alunos_em_lote(
+    id: int,
+    lote: MatriculaLoteRequest,
+    db: Session = Depends(get_db),
+    idem: IdempotentRequest = Depends(idempotency)
+):
+    """
+    Matricular vários alunos em um horário
+    Mesmas regras da matrícula individual, com resultado por aluno
+    """
+    if idem.replay is not None:
+        return idem.replay
+    _verificar_tamanho_lote(len(lote.aluno_ids))
+
+    resultado = matricular_em_lote(db, [(id, aluno_id) for aluno_id in lote.aluno_ids])
+    if id not in resultado.ocupacao:
+        raise HTTPException(status_code=404, detail="Horário não encontrado")
+    resposta = _resposta_lote(resultado)
+    replay = idem.commit(db, 200, resposta)
+    if replay is not None:
+        return replay
+    _publicar_lote("insert", db, resultado)
+    return resposta
+
+
+@router.delete("/horarios/{id}/alunos:batch", response_model=MatriculaLoteResponse)
+async def desmatricular_alunos_em_lote(id: int, lote: MatriculaLoteRequest, db: Session = Depends(get_db)):
+    """Remover vários alunos de um horário (1 DELETE ... RETURNING)"""
+    _verificar_tamanho_lote(len(lote.aluno_ids))
+
+    resultado = desmatricular_em_lote(db, [(id, aluno_id) for aluno_id in lote.aluno_ids])
+    promovidos = promover_da_fila(db, [id] if resultado.sucesso else [])
+    db.commit()
+    _publicar_lote("delete", db, resultado)
+    _publicar_lote("insert", db, ResultadoLote(itens=promovidos))
+    return _resposta_lote(resultado)
+
+
 @router.get("/horarios/{id}/vagas", response_model=dict)
 async def obter_vagas_horario(id: int, db: Session = Depends(get_db)):
     """Obter informações sobre vagas disponíveis em um horário"""
@@ -225,3 +655,101 @@ async def obter_vagas_horario(id: int, db: Session = Depends(get_db)):
         "vagas_disponiveis": vagas_disponiveis,
         "percentual_ocupacao": round((alunos_matriculados / horario.capacidade_maxima) * 100, 2)
     }
+
+
+@router.post("/horarios/{id}/fila-espera", response_model=FilaEsperaPosicao, status_code=201)
+async def entrar_fila_espera(id: int, entrada: FilaEsperaCreate, db: Session = Depends(get_db)):
+    """
+    Colocar aluno na fila de espera de um horário lotado
+    Retorna a posição do aluno na fila
+    """
+    ocupacao = ocupacao_horarios(db, [id])
+    if id not in ocupacao:
+        raise HTTPException(status_code=404, detail="Horário não encontrado")
+
+    aluno = db.query(Aluno.ativo).filter(Aluno.id == entrada.aluno_id).first()
+    if not aluno:
+        raise HTTPException(status_code=404, detail="Aluno não encontrado")
+    if not aluno.ativo:
+        raise HTTPException(status_code=400, detail="Aluno está inativo")
+
+    matriculado = db.query(exists().where(
+        AlunoHorario.horario_id == id, AlunoHorario.aluno_id == entrada.aluno_id
+    )).scalar()
+    if matriculado:
+        raise HTTPException(status_code=400, detail="Aluno já está matriculado neste horário")
+
+    capacidade_maxima, matriculados = ocupacao[id]
+    if matriculados < capacidade_maxima:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Horário tem {capacidade_maxima - matriculados} vaga(s) disponível(is): matricule o aluno diretamente"
+        )
+
+    try:
+        # Savepoint: a entrada repetida (constraint única) não desfaz a transação inteira
+        with db.begin_nested():
+            db.add(FilaEspera(
+                horario_id=id, aluno_id=entrada.aluno_id, prioridade=entrada.prioridade, created_at=datetime.utcnow()
+            ))
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Aluno já está na fila de espera deste horário")
+    atualizar_contador(db, [id])
+
+    (posicao,) = posicoes(db, FilaEspera.horario_id == id, FilaEspera.aluno_id == entrada.aluno_id)
+    db.commit()
+    return posicao
+
+
+@router.get("/horarios/{id}/fila-espera", response_model=FilaEsperaResponse)
+async def listar_fila_espera(id: int, db: Session = Depends(get_db)):
+    """Fila de espera do horário, na ordem de atendimento"""
+    if db.query(Horario.id).filter(Horario.id == id).first() is None:
+        raise HTTPException(status_code=404, detail="Horário não encontrado")
+
+    entradas = (
+        db.query(FilaEspera.aluno_id, Aluno.nome_completo, FilaEspera.prioridade, FilaEspera.created_at)
+        .join(Aluno, Aluno.id == FilaEspera.aluno_id)
+        .filter(FilaEspera.horario_id == id)
+        .order_by(*ORDEM_FILA)
+        .all()
+    )
+    return FilaEsperaResponse(
+        horario_id=id,
+        total=len(entradas),
+        alunos=[
+            FilaEsperaAluno(posicao=posicao, **entrada._asdict())
+            for posicao, entrada in enumerate(entradas, start=1)
+        ],
+    )
+
+
+@router.get("/horarios/{id}/fila-espera/{aluno_id}", response_model=FilaEsperaPosicao)
+async def obter_posicao_fila_espera(id: int, aluno_id: int, db: Session = Depends(get_db)):
+    """Posição do aluno na fila do horário (1 query, pelo índice da fila)"""
+    encontrada = posicoes(db, FilaEspera.horario_id == id, FilaEspera.aluno_id == aluno_id)
+    if not encontrada:
+        raise HTTPException(status_code=404, detail="Aluno não está na fila de espera deste horário")
+    return encontrada[0]
+
+
+@router.delete("/horarios/{id}/fila-espera/{aluno_id}", status_code=200)
+async def sair_fila_espera(id: int, aluno_id: int, db: Session = Depends(get_db)):
+    """Remover aluno da fila de espera do horário"""
+    removida = db.execute(
+        delete(FilaEspera)
+        .where(FilaEspera.horario_id == id, FilaEspera.aluno_id == aluno_id)
+        .returning(FilaEspera.id),
+        execution_options={"synchronize_session": False},
+    ).first()
+    if removida is None:
+        raise HTTPException(status_code=404, detail="Aluno não está na fila de espera deste horário")
+
+    atualizar_contador(db, [id])
+    db.commit()
+
+    return {
+        "message": "Aluno removido da fila de espera",
+        "horario_id": id,
+        "aluno_id": aluno_id
+    }
@@ -1,26 +1,63 @@
 """
 Rotas para gerenciamento de Pagamentos
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func, extract
 from typing import List, Optional
 from datetime import date
 from app.database import get_db
-from app.routes.auth import require_role
+from app.routes.auth import get_current_user, require_role
+from app.models.user import User
 from app.models.pagamento import Pagamento
 from app.models.aluno import Aluno
 from app.schemas.pagamento import PagamentoCreate, PagamentoUpdate, PagamentoResponse
+from app.services.event_bus import event_bus
+from app.utils.idempotency import IdempotentRequest, idempotency
+from app.utils.conditional import ConditionalGet, cache_control_for, if_match_version, set_version_etag, version_etag
+from app.utils.repository import Repository
+from app.utils.single_flight import coalesced_json_response
 
 
 router = APIRouter(
     dependencies=[Depends(require_role(["admin", "recepcionista"]))]
 )
 
+# ETag da listagem: muda a cada commit que altera a tabela pagamentos
+etag_pagamentos = ConditionalGet(["pagamentos"], cache_control_for("pagamentos"))
+
+pagamentos_repo = Repository(
+    Pagamento,
+    "Pagamento não encontrado",
+    constraint_errors={"aluno_id": (404, "Aluno não encontrado")},
+)
+
+
+def _evento_pagamento(pagamento: Pagamento, op: str) -> dict:
+    """Dados do evento de pagamento para o stream SSE"""
+    return {
+        "op": op,
+        "pagamento_id": pagamento.id,
+        "aluno_id": pagamento.aluno_id,
+        "valor": str(pagamento.valor),
+        "data_pagamento": str(pagamento.data_pagamento),
+        "mes_referencia": pagamento.mes_referencia,
+    }
+
 
 @router.post("/pagamentos", response_model=PagamentoResponse, status_code=201)
-async def criar_pagamento(pagamento: PagamentoCreate, db: Session = Depends(get_db)):
-    """Criar novo pagamento"""
+async def criar_pagamento(
+    pagamento: PagamentoCreate,
+    db: Session = Depends(get_db),
+    idem: IdempotentRequest = Depends(idempotency)
+):
+    """
+    Criar novo pagamento
+    Com Idempotency-Key, repetições devolvem o pagamento já criado
+    """
+    if idem.replay is not None:
+        return idem.replay
+
     # Verificar se aluno existe
     aluno = db.query(Aluno).filter(Aluno.id == pagamento.aluno_id).first()
     if not aluno:
@@ -28,9 +65,16 @@ async def criar_pagamento(pagamento: PagamentoCreate, db: Session = Depends(get_
 
     db_pagamento = Pagamento(**pagamento.model_dump())
     db.add(db_pagamento)
-    db.commit()
-    db.refresh(db_pagamento)
-    return db_pagamento
+    db.flush()
+
+    # Resposta montada antes do commit (que expira o objeto)
+    resposta = PagamentoResponse.model_validate(db_pagamento)
+    evento = _evento_pagamento(db_pagamento, "insert")
+    replay = idem.commit(db, 201, resposta)
+    if replay is not None:
+        return replay
+    event_bus.publish("pagamento", evento)
+    return resposta
 
 
 @router.get("/pagamentos", response_model=List[PagamentoResponse])
@@ -38,9 +82,13 @@ async def listar_pagamentos(
     data_inicio: Optional[date] = Query(None, description="Data inicial para filtro"),
     data_fim: Optional[date] = Query(None, description="Data final para filtro"),
     aluno_id: Optional[int] = Query(None, description="Filtrar por ID do aluno"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    _: None = Depends(etag_pagamentos)
 ):
-    """Listar pagamentos com filtros opcionais"""
+    """
+    Listar pagamentos com filtros opcionais
+    Suporta If-None-Match: responde 304 sem consultar a lista se nada mudou
+    """
     query = db.query(Pagamento)
 
     if aluno_id:
@@ -56,16 +104,8 @@ async def listar_pagamentos(
     return pagamentos
 
 
-@router.get("/pagamentos/relatorio-mensal", response_model=List[dict])
-async def relatorio_mensal(
-    ano: Optional[int] = Query(None, description="Ano para o relatório"),
-    mes: Optional[int] = Query(None, ge=1, le=12, description="Mês para o relatório (1-12)"),
-    db: Session = Depends(get_db)
-):
-    """
-    Gerar relatório mensal de pagamentos
-    Retorna total de pagamentos e soma por forma de pagamento
-    """
+def _consultar_relatorio_mensal(db: Session, ano: Optional[int], mes: Optional[int]) -> List[dict]:
+    """Total de pagamentos e soma por forma de pagamento, por mês de referência"""
     query = db.query(
         Pagamento.mes_referencia,
         Pagamento.forma_pagamento,
@@ -102,46 +142,74 @@ async def relatorio_mensal(
     return resultado
 
 
+@router.get("/pagamentos/relatorio-mensal", response_model=List[dict])
+async def relatorio_mensal(
+    request: Request,
+    ano: Optional[int] = Query(None, description="Ano para o relatório"),
+    mes: Optional[int] = Query(None, ge=1, le=12, description="Mês para o relatório (1-12)"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Gerar relatório mensal de pagamentos
+    Retorna total de pagamentos e soma por forma de pagamento
+    Requisições simultâneas compartilham a mesma consulta (single-flight)
+    """
+    return await coalesced_json_response(
+        request,
+        "relatorio_mensal",
+        ["pagamentos"],
+        {"ano": ano, "mes": mes},
+        current_user.role,
+        lambda session: _consultar_relatorio_mensal(session, ano, mes),
+        List[dict],
+        db,
+    )
+
+
 @router.get("/pagamentos/{id}", response_model=PagamentoResponse)
-async def obter_pagamento(id: int, db: Session = Depends(get_db)):
-    """Obter pagamento por ID"""
+async def obter_pagamento(id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    """Obter pagamento por ID (ETag = versão do registro)"""
     pagamento = db.query(Pagamento).filter(Pagamento.id == id).first()
     if not pagamento:
         raise HTTPException(status_code=404, detail="Pagamento não encontrado")
+    set_version_etag(request, response, pagamento.version)
     return pagamento
 
 
 @router.put("/pagamentos/{id}", response_model=PagamentoResponse)
-async def atualizar_pagamento(id: int, pagamento_update: PagamentoUpdate, db: Session = Depends(get_db)):
-    """Atualizar pagamento"""
-    db_pagamento = db.query(Pagamento).filter(Pagamento.id == id).first()
-    if not db_pagamento:
-        raise HTTPException(status_code=404, detail="Pagamento não encontrado")
-
-    # Se está alterando aluno_id, verificar se novo aluno existe
-    if pagamento_update.aluno_id:
-        aluno = db.query(Aluno).filter(Aluno.id == pagamento_update.aluno_id).first()
-        if not aluno:
-            raise HTTPException(status_code=404, detail="Aluno não encontrado")
-
+async def atualizar_pagamento(
+    id: int,
+    pagamento_update: PagamentoUpdate,
+    response: Response,
+    if_match: Optional[int] = Depends(if_match_version),
+    db: Session = Depends(get_db)
+):
+    """
+    Atualizar pagamento (1 UPDATE ... RETURNING)
+    aluno_id inexistente é recusado pela chave estrangeira (404)
+    Com If-Match (ou "version" no corpo) só altera se a versão não mudou: 409 em conflito
+    """
     # Atualizar apenas campos fornecidos
-    update_data = pagamento_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_pagamento, field, value)
+    db_pagamento = pagamentos_repo.update(
+        db, id, pagamento_update.model_dump(exclude_unset=True, exclude={"version"}),
+        expected_version=if_match if if_match is not None else pagamento_update.version,
+    )
 
+    # Resposta montada antes do commit (que expira o objeto)
+    resposta = PagamentoResponse.model_validate(db_pagamento)
+    evento = _evento_pagamento(db_pagamento, "update")
     db.commit()
-    db.refresh(db_pagamento)
-    return db_pagamento
+    event_bus.publish("pagamento", evento)
+    response.headers["ETag"] = version_etag(resposta.version)
+    return resposta
 
 
 @router.delete("/pagamentos/{id}", status_code=200)
 async def deletar_pagamento(id: int, db: Session = Depends(get_db)):
-    """Deletar pagamento"""
-    db_pagamento = db.query(Pagamento).filter(Pagamento.id == id).first()
-    if not db_pagamento:
-        raise HTTPException(status_code=404, detail="Pagamento não encontrado")
-
-    db.delete(db_pagamento)
+    """Deletar pagamento (1 DELETE ... RETURNING)"""
+    evento = _evento_pagamento(pagamentos_repo.delete(db, id), "delete")
     db.commit()
+    event_bus.publish("pagamento", evento)
 
     return {"message": "Pagamento deletado com sucesso", "id": id}
@@ -9,12 +9,16 @@ from app.database import get_db
 from app.routes.auth import require_role
 from app.models.plano import Plano
 from app.schemas.plano import PlanoCreate, PlanoUpdate, PlanoResponse
+from app.utils.repository import Repository
+from app.utils.response_cache import cached_json_response
 
 
 router = APIRouter(
     dependencies=[Depends(require_role(["admin", "recepcionista"]))]
 )
 
+planos_repo = Repository(Plano, "Plano não encontrado")
+
 
 @router.post("/planos", response_model=PlanoResponse, status_code=201)
 async def criar_plano(plano: PlanoCreate, db: Session = Depends(get_db)):
@@ -31,12 +35,16 @@ async def listar_planos(
     ativo: bool = True,
     db: Session = Depends(get_db)
 ):
-    """Listar planos - por padrão apenas ativos"""
-    query = db.query(Plano)
-    if ativo is not None:
-        query = query.filter(Plano.ativo == ativo)
-    planos = query.order_by(Plano.valor_mensal).all()
-    return planos
+    """Listar planos - por padrão apenas ativos (servido do cache até um plano mudar)"""
+    def consultar():
+        query = db.query(Plano)
+        if ativo is not None:
+            query = query.filter(Plano.ativo == ativo)
+        return query.order_by(Plano.valor_mensal).all()
+
+    return cached_json_response(
+        "planos", ["planos"], f"ativo={ativo}", consultar, List[PlanoResponse], db
+    )
 
 
 @router.get("/planos/{id}", response_model=PlanoResponse)
@@ -50,28 +58,20 @@ async def obter_plano(id: int, db: Session = Depends(get_db)):
 
 @router.put("/planos/{id}", response_model=PlanoResponse)
 async def atualizar_plano(id: int, plano_data: PlanoUpdate, db: Session = Depends(get_db)):
-    """Atualizar plano"""
-    db_plano = db.query(Plano).filter(Plano.id == id).first()
-    if not db_plano:
-        raise HTTPException(status_code=404, detail="Plano não encontrado")
-
+    """Atualizar plano (1 UPDATE ... RETURNING)"""
     # Atualizar apenas campos fornecidos
-    for field, value in plano_data.model_dump(exclude_unset=True).items():
-        setattr(db_plano, field, value)
+    db_plano = planos_repo.update(db, id, plano_data.model_dump(exclude_unset=True))
 
+    # Resposta montada antes do commit (que expira o objeto)
+    resposta = PlanoResponse.model_validate(db_plano)
     db.commit()
-    db.refresh(db_plano)
-    return db_plano
+    return resposta
 
 
 @router.delete("/planos/{id}", status_code=200)
 async def deletar_plano(id: int, db: Session = Depends(get_db)):
     """Soft delete - desativar plano"""
-    db_plano = db.query(Plano).filter(Plano.id == id).first()
-    if not db_plano:
-        raise HTTPException(status_code=404, detail="Plano não encontrado")
-
     # Soft delete: apenas marcar como inativo
-    db_plano.ativo = False
+    planos_repo.update(db, id, {"ativo": False})
     db.commit()
     return {"message": "Plano desativado com sucesso", "id": id}
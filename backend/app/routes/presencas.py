@@ -0,0 +1,63 @@
+"""
+Rotas para check-in de presença e frequência
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, datetime
+from app.database import get_db
+from app.routes.auth import require_role
+from app.schemas.presenca import CheckInCreate, CheckInLote, CheckInResponse, FrequenciaAluno
+from app.services.presenca_service import CheckIn, presencas_buffer, resumo_presencas
+
+
+router = APIRouter(
+    dependencies=[Depends(require_role(["admin", "recepcionista"]))]
+)
+
+
+def _leitura(checkin: CheckInCreate) -> CheckIn:
+    registrado_em = checkin.registrado_em or datetime.now()
+    if registrado_em.tzinfo is not None:
+        # Dispositivo com fuso: a data da aula é a do horário local do servidor
+        registrado_em = registrado_em.astimezone().replace(tzinfo=None)
+    return CheckIn(checkin.aluno_id, checkin.horario_id, registrado_em, checkin.origem)
+
+
+def _enfileirar(leituras: List[CheckIn]) -> CheckInResponse:
+    if not presencas_buffer.adicionar(leituras):
+        raise HTTPException(
+            status_code=503,
+            detail="Registro de presenças sobrecarregado. Tente novamente em instantes."
+        )
+    return CheckInResponse(recebidas=len(leituras), pendentes=len(presencas_buffer))
+
+
+@router.post("/presencas", response_model=CheckInResponse, status_code=202)
+async def registrar_presenca(checkin: CheckInCreate):
+    """
+    Check-in de um aluno matriculado no horário (catraca, tablet ou recepção)
+    Responde sem tocar no banco: a leitura vai para o buffer e é gravada no próximo lote
+    """
+    return _enfileirar([_leitura(checkin)])
+
+
+@router.post("/presencas:batch", response_model=CheckInResponse, status_code=202)
+async def registrar_presencas_em_lote(lote: CheckInLote):
+    """Leituras acumuladas por um dispositivo (repetidas são ignoradas na gravação)"""
+    return _enfileirar([_leitura(checkin) for checkin in lote.leituras])
+
+
+@router.get("/presencas/frequencia", response_model=List[FrequenciaAluno])
+async def obter_frequencia(
+    aluno_id: Optional[int] = Query(None, description="Filtrar por aluno"),
+    horario_id: Optional[int] = Query(None, description="Filtrar por horário"),
+    mes_inicio: Optional[date] = Query(None, description="Primeiro mês (qualquer dia do mês)"),
+    mes_fim: Optional[date] = Query(None, description="Último mês (qualquer dia do mês)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Presenças por aluno e horário no período
+    Lidas do resumo mensal (uma linha por aluno, horário e mês), sem agregar a tabela de presenças
+    """
+    return resumo_presencas(db, aluno_id, horario_id, mes_inicio, mes_fim)
@@ -4,16 +4,33 @@ Rotas para gerenciamento de Professores
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import time
 from app.database import get_db
 from app.routes.auth import require_role
 from app.models.professor import Professor
-from app.schemas.professor import ProfessorCreate, ProfessorUpdate, ProfessorResponse
+from app.schemas.professor import (
+    ProfessorCreate, ProfessorUpdate, ProfessorResponse, CargaProfessor, AulaProfessor, CargaProfessorDetalhe
+)
+from app.services.agenda_professor_service import agenda_professor, relatorio_carga
+from app.utils.helpers import normalizar_telefone_e164
+from app.utils.repository import Repository
+from app.utils.response_cache import cached_json_response
 
 
 router = APIRouter(
     dependencies=[Depends(require_role(["admin", "recepcionista"]))]
 )
 
+professores_repo = Repository(
+    Professor,
+    "Professor não encontrado",
+    constraint_errors={
+        "email": (400, "Já existe um professor cadastrado com este email"),
+        "cpf": (400, "Já existe um professor cadastrado com este CPF"),
+    },
+    derived_columns={"telefone_e164": ("telefone", normalizar_telefone_e164)},
+)
+
 
 @router.post("/professores", response_model=ProfessorResponse, status_code=200)
 async def criar_professor(professor: ProfessorCreate, db: Session = Depends(get_db)):
@@ -62,17 +79,85 @@ async def listar_professores(
     especialidade: Optional[str] = Query(None, description="Filtrar por especialidade (natacao, hidroginastica, ambos)"),
     db: Session = Depends(get_db)
 ):
-    """Listar professores com filtros opcionais"""
-    query = db.query(Professor)
+    """Listar professores com filtros opcionais (servido do cache até um professor mudar)"""
+    def consultar():
+        query = db.query(Professor)
+
+        if ativo is not None:
+            query = query.filter(Professor.is_active == ativo)
+
+        if especialidade:
+            query = query.filter(Professor.especialidade == especialidade.lower())
+
+        return query.order_by(Professor.nome).all()
+
+    return cached_json_response(
+        "professores",
+        ["professores"],
+        f"ativo={ativo}&especialidade={especialidade.lower() if especialidade else ''}",
+        consultar,
+        List[ProfessorResponse],
+        db,
+    )
+
+
+def _carga(professor_id: int, nome: str, aulas: int, minutos: int, dias: int, vagas: int, alunos: int) -> dict:
+    return {
+        "professor_id": professor_id,
+        "nome": nome,
+        "aulas_semana": aulas,
+        "minutos_semana": minutos,
+        "horas_semana": round(minutos / 60, 2),
+        "dias_com_aula": dias,
+        "vagas": vagas,
+        "alunos": alunos,
+        "ocupacao_percentual": round(alunos * 100 / vagas, 1) if vagas else 0.0,
+    }
+
+
+@router.get("/professores/carga", response_model=List[CargaProfessor])
+async def relatorio_carga_professores(
+    apenas_ativos: bool = Query(True, description="Somente professores ativos"),
+    db: Session = Depends(get_db)
+):
+    """Carga semanal de todos os professores (1 query agregada), da maior para a menor"""
+    return [
+        _carga(row.professor_id, row.nome, row.aulas, row.minutos, row.dias, row.vagas, row.alunos)
+        for row in relatorio_carga(db, apenas_ativos)
+    ]
 
-    if ativo is not None:
-        query = query.filter(Professor.is_active == ativo)
 
-    if especialidade:
-        query = query.filter(Professor.especialidade == especialidade.lower())
+@router.get("/professores/{professor_id}/carga", response_model=CargaProfessorDetalhe)
+async def obter_carga_professor(professor_id: int, db: Session = Depends(get_db)):
+    """Carga semanal e agenda de um professor (2 queries)"""
+    professor = db.query(Professor.id, Professor.nome).filter(Professor.id == professor_id).first()
+    if not professor:
+        raise HTTPException(status_code=404, detail="Professor não encontrado")
 
-    professores = query.order_by(Professor.nome).all()
-    return professores
+    agenda = agenda_professor(db, professor_id)
+    minutos_por_dia = {}
+    for aula in agenda:
+        minutos_por_dia[aula.dia_semana] = minutos_por_dia.get(aula.dia_semana, 0) + aula.duracao_minutos
+    minutos = sum(minutos_por_dia.values())
+    vagas = sum(aula.capacidade_maxima for aula in agenda)
+    alunos = sum(aula.alunos for aula in agenda)
+
+    def fim(aula) -> time:
+        total = (aula.horario.hour * 60 + aula.horario.minute + aula.duracao_minutos) % (24 * 60)
+        return time(total // 60, total % 60)
+
+    return {
+        **_carga(professor.id, professor.nome, len(agenda), minutos, len(minutos_por_dia), vagas, alunos),
+        "minutos_por_dia": minutos_por_dia,  # dias em ordem (a agenda já vem ordenada)
+        "agenda": [
+            AulaProfessor(
+                horario_id=aula.id, dia_semana=aula.dia_semana, inicio=aula.horario, fim=fim(aula),
+                duracao_minutos=aula.duracao_minutos, tipo_aula=aula.tipo_aula,
+                capacidade_maxima=aula.capacidade_maxima, alunos=aula.alunos,
+            )
+            for aula in agenda
+        ],
+    }
 
 
 @router.get("/professores/{professor_id}", response_model=ProfessorResponse)
@@ -90,55 +175,21 @@ async def atualizar_professor(
     professor_update: ProfessorUpdate,
     db: Session = Depends(get_db)
 ):
-    """Atualizar dados de um professor"""
+    """
+    Atualizar dados de um professor (1 UPDATE ... RETURNING)
+    Email ou CPF duplicado é recusado pelo índice único do banco (400)
+    """
     print(f"🔄 Atualizando professor ID {professor_id}")
     print(f"   Dados: {professor_update.model_dump(exclude_unset=True)}")
 
-    db_professor = db.query(Professor).filter(Professor.id == professor_id).first()
-    if not db_professor:
-        raise HTTPException(status_code=404, detail="Professor não encontrado")
-
-    # Validar email único (se estiver sendo atualizado)
-    if professor_update.email and professor_update.email != db_professor.email:
-        existing_email = db.query(Professor).filter(
-            Professor.email == professor_update.email,
-            Professor.id != professor_id
-        ).first()
-        if existing_email:
-            raise HTTPException(
-                status_code=400,
-                detail="Já existe um professor cadastrado com este email"
-            )
-
-    # Validar CPF único (se estiver sendo atualizado)
-    if professor_update.cpf and professor_update.cpf != db_professor.cpf:
-        existing_cpf = db.query(Professor).filter(
-            Professor.cpf == professor_update.cpf,
-            Professor.id != professor_id
-        ).first()
-        if existing_cpf:
-            raise HTTPException(
-                status_code=400,
-                detail="Já existe um professor cadastrado com este CPF"
-            )
-
-    try:
-        # Atualizar apenas campos fornecidos
-        update_data = professor_update.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_professor, field, value)
+    # Atualizar apenas campos fornecidos
+    db_professor = professores_repo.update(db, professor_id, professor_update.model_dump(exclude_unset=True))
 
-        db.commit()
-        db.refresh(db_professor)
-        print(f"✅ Professor atualizado com sucesso")
-        return db_professor
-    except Exception as e:
-        print(f"❌ Erro ao atualizar professor: {str(e)}")
-        db.rollback()
-        raise HTTPException(
-            status_code=500,
-            detail=f"Erro ao atualizar professor: {str(e)}"
-        )
+    # Resposta montada antes do commit (que expira o objeto)
+    resposta = ProfessorResponse.model_validate(db_professor)
+    db.commit()
+    print(f"✅ Professor atualizado com sucesso")
+    return resposta
 
 
 @router.delete("/professores/{professor_id}", status_code=200)
@@ -146,20 +197,8 @@ async def deletar_professor(professor_id: int, db: Session = Depends(get_db)):
     """Deletar professor (soft delete - marca como inativo)"""
     print(f"🗑️  Deletando professor ID {professor_id}")
 
-    db_professor = db.query(Professor).filter(Professor.id == professor_id).first()
-    if not db_professor:
-        raise HTTPException(status_code=404, detail="Professor não encontrado")
-
-    try:
-        # Soft delete - apenas marca como inativo
-        db_professor.is_active = False
-        db.commit()
-        print(f"✅ Professor marcado como inativo")
-        return {"message": "Professor removido com sucesso"}
-    except Exception as e:
-        print(f"❌ Erro ao deletar professor: {str(e)}")
-        db.rollback()
-        raise HTTPException(
-            status_code=500,
-            detail=f"Erro ao deletar professor: {str(e)}"
-        )
+    # Soft delete - apenas marca como inativo
+    professores_repo.update(db, professor_id, {"is_active": False})
+    db.commit()
+    print(f"✅ Professor marcado como inativo")
+    return {"message": "Professor removido com sucesso"}
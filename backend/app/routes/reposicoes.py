@@ -0,0 +1,90 @@
+"""
+Rotas para reposições de aula
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, timedelta
+from app.database import get_db
+from app.routes.auth import require_role
+from app.models.reposicao import Reposicao
+from app.schemas.reposicao import ReposicaoCreate, ReposicaoResponse, VagaReposicao
+from app.services.reposicao_service import JANELA_DIAS, buscar_vagas, cancelar, reservar
+from app.utils.idempotency import IdempotentRequest, idempotency
+
+
+router = APIRouter(
+    dependencies=[Depends(require_role(["admin", "recepcionista"]))]
+)
+
+
+@router.get("/reposicoes/vagas", response_model=List[VagaReposicao])
+async def listar_vagas_reposicao(
+    tipo_aula: Optional[str] = Query(None, pattern="^(natacao|hidroginastica)$"),
+    a_partir_de: Optional[date] = Query(None, description="Primeiro dia da busca (padrão: hoje)"),
+    dias: int = Query(7, ge=1, le=JANELA_DIAS, description="Quantidade de dias da busca"),
+    limite: Optional[int] = Query(None, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """
+    Aulas datadas com vaga para reposição (ex: natação nos próximos 7 dias)
+    Uma única query pelo índice de vagas das aulas datadas
+    """
+    inicio = max(a_partir_de or date.today(), date.today())
+    return buscar_vagas(db, inicio, inicio + timedelta(days=dias - 1), tipo_aula, limite)
+
+
+@router.post("/reposicoes", response_model=ReposicaoResponse, status_code=201)
+async def marcar_reposicao(
+    reposicao: ReposicaoCreate,
+    db: Session = Depends(get_db),
+    idem: IdempotentRequest = Depends(idempotency)
+):
+    """
+    Marcar reposição em uma aula datada (o plano do aluno precisa permitir reposição)
+    A vaga é ocupada com um UPDATE condicional: duas reservas simultâneas não
+    ficam com o último lugar. Com Idempotency-Key, repetições devolvem a reposição já marcada
+    """
+    if idem.replay is not None:
+        return idem.replay
+
+    resultado = reservar(db, **reposicao.model_dump())
+    if resultado.status >= 400:
+        raise HTTPException(status_code=resultado.status, detail=resultado.detail)
+
+    db.flush()
+    resposta = ReposicaoResponse.model_validate(resultado.reposicao)
+    replay = idem.commit(db, 201, resposta)
+    if replay is not None:
+        return replay
+    return resposta
+
+
+@router.get("/reposicoes", response_model=List[ReposicaoResponse])
+async def listar_reposicoes(
+    aluno_id: Optional[int] = Query(None, description="Filtrar por aluno"),
+    horario_id: Optional[int] = Query(None, description="Filtrar por horário"),
+    data_inicio: Optional[date] = Query(None, description="Data inicial"),
+    data_fim: Optional[date] = Query(None, description="Data final"),
+    db: Session = Depends(get_db)
+):
+    """Listar reposições com filtros opcionais, em ordem de data"""
+    query = db.query(Reposicao)
+    if aluno_id is not None:
+        query = query.filter(Reposicao.aluno_id == aluno_id)
+    if horario_id is not None:
+        query = query.filter(Reposicao.horario_id == horario_id)
+    if data_inicio:
+        query = query.filter(Reposicao.data >= data_inicio)
+    if data_fim:
+        query = query.filter(Reposicao.data <= data_fim)
+    return query.order_by(Reposicao.data, Reposicao.id).all()
+
+
+@router.delete("/reposicoes/{id}", status_code=200)
+async def desmarcar_reposicao(id: int, db: Session = Depends(get_db)):
+    """Desmarcar reposição (a vaga volta para a aula)"""
+    if not cancelar(db, id):
+        raise HTTPException(status_code=404, detail="Reposição não encontrada")
+    db.commit()
+    return {"message": "Reposição desmarcada com sucesso", "id": id}
@@ -0,0 +1,175 @@
+"""
+Stream de eventos em tempo real (Server-Sent Events)
+
+GET /api/stream envia eventos de matrícula, ocupação, pagamento e aluno para
+as recepções abertas, substituindo o polling das telas de grade e pagamentos.
+
+A autenticação é feita uma única vez na abertura, com uma sessão de banco
+de vida curta: a conexão SSE não segura conexão do pool enquanto fica aberta
+(por isso GET /stream não usa as dependencies de autenticação dos demais).
+O stream é encerrado quando o token expira (evento token_expirado).
+
+Como o EventSource do navegador não envia headers, o cliente pede antes um
+token de stream (POST /stream/token, com o token de login no header) e o
+passa em ?token=. Esse token dura poucos minutos e só vale aqui; o token de
+login nunca vai na URL (onde ficaria nos logs de acesso e proxies).
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.database import session_scope
+from app.models.user import User
+from app.routes.auth import get_token_user, require_role
+from app.schemas.user import StreamToken
+from app.services.event_bus import EVENT_TYPES, event_bus
+from app.utils.auth import create_access_token, decode_access_token
+
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+MAX_CLIENTS = int(os.getenv("SSE_MAX_CLIENTS", "500"))
+RETRY_MS = 3000
+STREAM_TOKEN_SECONDS = int(os.getenv("SSE_TOKEN_SECONDS", "300"))
+STREAM_SCOPE = "stream"
+ROLES_STREAM = ["admin", "recepcionista"]
+
+
+def _autenticar(app, token: Optional[str], scope: Optional[str]) -> int:
+    """
+    Valida o token com as mesmas regras das rotas (admin ou recepcionista)
+
+    Returns:
+        Expiração do token (timestamp), quando o stream deve ser encerrado
+    """
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token não informado")
+
+    payload = decode_access_token(token)
+    with session_scope(app) as db:
+        user = get_token_user(payload, db, scope)
+        require_role(ROLES_STREAM)(current_user=user)
+    return payload["exp"]
+
+
+def format_sse(event_type: str, data: dict, event_id: Optional[int] = None) -> str:
+    """Formata uma mensagem no protocolo SSE"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def event_stream(
+    types: Optional[set] = None,
+    filters: Optional[dict] = None,
+    heartbeat: float = HEARTBEAT_SECONDS,
+    expira_em: Optional[float] = None,
+):
+    """
+    Gera as mensagens SSE de uma inscrição até o cliente desconectar
+    (ou até `expira_em`, a expiração do token, quando envia token_expirado)
+    Sem eventos, envia um comentário a cada `heartbeat` segundos (mantém proxies abertos)
+
+    A inscrição é criada só quando o stream começa a ser enviado e removida
+    quando o cliente desconecta (o gerador é cancelado).
+    """
+    subscription = event_bus.subscribe(types, filters)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            espera = heartbeat
+            if expira_em is not None:
+                restante = expira_em - time.time()
+                if restante <= 0:
+                    # Cliente pede um novo token e reabre o stream
+                    yield format_sse("token_expirado", {"motivo": "token do stream expirou"})
+                    return
+                espera = min(heartbeat, restante)
+
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=espera)
+            except asyncio.TimeoutError:
+                if expira_em is None or time.time() < expira_em:
+                    yield ": ping\n\n"
+                continue
+
+            yield format_sse(event.type, event.data, event.id)
+
+            if subscription.lagged and subscription.queue.empty():
+                # Eventos foram descartados: cliente deve recarregar pelo /api/changes
+                subscription.lagged = False
+                yield format_sse("resync", {"motivo": "eventos descartados por fila cheia"})
+    finally:
+        event_bus.unsubscribe(subscription)
+
+
+@router.post("/stream/token", response_model=StreamToken)
+async def criar_token_stream(current_user: User = Depends(require_role(ROLES_STREAM))):
+    """
+    Token de curta duração para abrir o stream pelo EventSource (?token=)
+
+    Só vale para GET /stream; o stream é encerrado quando ele expira e o
+    cliente pede outro para reconectar.
+    """
+    token = create_access_token(
+        data={"user_id": current_user.id, "scope": STREAM_SCOPE},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_SECONDS),
+    )
+    return StreamToken(token=token, expires_in=STREAM_TOKEN_SECONDS)
+
+
+@router.get("/stream")
+async def stream(
+    request: Request,
+    tipos: Optional[str] = Query(None, description="Tipos de evento (matricula, ocupacao, pagamento, aluno)"),
+    horario_id: Optional[int] = Query(None, description="Apenas eventos deste horário"),
+    aluno_id: Optional[int] = Query(None, description="Apenas eventos deste aluno"),
+    token: Optional[str] = Query(None, description="Token de stream (POST /api/stream/token); alternativa ao header Authorization"),
+):
+    """
+    Stream SSE de eventos da recepção
+
+    Eventos: matricula, ocupacao, pagamento, aluno (e resync quando o cliente
+    ficou para trás e precisa recarregar os dados; token_expirado antes de
+    encerrar o stream na expiração do token).
+    """
+    # Header: token de login; query string: apenas o token de stream
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, header_token = authorization.partition(" ")
+    if scheme.lower() == "bearer":
+        expira_em = await run_in_threadpool(_autenticar, request.app, header_token, None)
+    else:
+        expira_em = await run_in_threadpool(_autenticar, request.app, token, STREAM_SCOPE)
+
+    types = None
+    if tipos:
+        types = {tipo.strip() for tipo in tipos.split(",") if tipo.strip()}
+        invalidos = types - EVENT_TYPES
+        if invalidos:
+            raise HTTPException(status_code=400, detail=f"Tipos inválidos: {', '.join(sorted(invalidos))}")
+
+    if event_bus.subscriber_count >= MAX_CLIENTS:
+        raise HTTPException(status_code=503, detail="Limite de conexões de stream atingido")
+
+    filters = {}
+    if horario_id is not None:
+        filters["horario_id"] = horario_id
+    if aluno_id is not None:
+        filters["aluno_id"] = aluno_id
+
+    return StreamingResponse(
+        event_stream(types, filters, expira_em=expira_em),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
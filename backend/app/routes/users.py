@@ -11,9 +11,19 @@ from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
 from app.routes.auth import get_current_user, require_role
 from app.utils.auth import get_password_hash
+from app.utils.repository import Repository
 
 router = APIRouter()
 
+users_repo = Repository(
+    User,
+    "Usuário não encontrado",
+    constraint_errors={
+        "email": (400, "Email já cadastrado"),
+        "username": (400, "Username já cadastrado"),
+    },
+)
+
 
 @router.post("/users", response_model=UserResponse, status_code=201)
 async def criar_usuario(
@@ -154,26 +164,9 @@ async def atualizar_usuario(
     Raises:
         HTTPException: Se usuário não encontrado ou email/username duplicado
     """
-    # Buscar usuário
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="Usuário não encontrado")
-
     # Atualizar apenas campos fornecidos
     update_data = user_update.model_dump(exclude_unset=True)
 
-    # Verificar unicidade de email
-    if "email" in update_data and update_data["email"] != db_user.email:
-        existing_email = db.query(User).filter(User.email == update_data["email"]).first()
-        if existing_email:
-            raise HTTPException(status_code=400, detail="Email já cadastrado")
-
-    # Verificar unicidade de username
-    if "username" in update_data and update_data["username"] != db_user.username:
-        existing_username = db.query(User).filter(User.username == update_data["username"]).first()
-        if existing_username:
-            raise HTTPException(status_code=400, detail="Username já cadastrado")
-
     # Se senha foi fornecida, fazer hash
     if "password" in update_data:
         update_data["password_hash"] = get_password_hash(update_data.pop("password"))
@@ -182,14 +175,14 @@ async def atualizar_usuario(
     if "role" in update_data:
         update_data["is_superuser"] = (update_data["role"] == "admin")
 
-    # Aplicar atualizações
-    for field, value in update_data.items():
-        setattr(db_user, field, value)
+    # Email/username duplicados são recusados pelo índice único do banco (400)
+    db_user = users_repo.update(db, user_id, update_data)
 
+    # Resposta montada antes do commit (que expira o objeto)
+    resposta = UserResponse.model_validate(db_user)
     db.commit()
-    db.refresh(db_user)
 
-    return UserResponse.model_validate(db_user)
+    return resposta
 
 
 @router.delete("/users/{user_id}", status_code=200)
@@ -212,20 +205,15 @@ async def deletar_usuario(
     Raises:
         HTTPException: Se usuário não encontrado ou tentativa de deletar a si mesmo
     """
-    # Buscar usuário
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="Usuário não encontrado")
-
     # Não permitir que admin delete a si mesmo
-    if db_user.id == current_user.id:
+    if user_id == current_user.id:
         raise HTTPException(
             status_code=400,
             detail="Você não pode desativar sua própria conta"
         )
 
     # Soft delete: apenas marcar como inativo
-    db_user.is_active = False
+    users_repo.update(db, user_id, {"is_active": False})
     db.commit()
 
     return {
@@ -254,14 +242,8 @@ async def ativar_usuario(
     Raises:
         HTTPException: Se usuário não encontrado
     """
-    # Buscar usuário
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="Usuário não encontrado")
-
     # Reativar usuário
-    db_user.is_active = True
+    resposta = UserResponse.model_validate(users_repo.update(db, user_id, {"is_active": True}))
     db.commit()
-    db.refresh(db_user)
 
-    return UserResponse.model_validate(db_user)
+    return resposta
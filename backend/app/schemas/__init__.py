@@ -6,7 +6,10 @@ from app.schemas.aluno import (
     AlunoCreate,
     AlunoUpdate,
     AlunoResponse,
-    AlunoComPagamentos
+    AlunoComPagamentos,
+    ContratoRenovacao,
+    RenovacaoPrevia,
+    RenovacaoResultado
 )
 from app.schemas.pagamento import (
     PagamentoBase,
@@ -20,13 +23,64 @@ from app.schemas.horario import (
     HorarioUpdate,
     HorarioResponse,
     HorarioComAlunos,
-    AlunoSimplificado
+    AlunoSimplificado,
+    OcupacaoCelula,
+    OcupacaoHorario,
+    OcupacaoGrade
 )
 from app.schemas.professor import (
     ProfessorBase,
     ProfessorCreate,
     ProfessorUpdate,
-    ProfessorResponse
+    ProfessorResponse,
+    CargaProfessor,
+    AulaProfessor,
+    CargaProfessorDetalhe
+)
+from app.schemas.change import (
+    MatriculaResponse,
+    ChangeEntry,
+    ChangeFeedResponse
+)
+from app.schemas.matricula import (
+    MatriculaLoteRequest,
+    MatriculaItem,
+    MatriculasLoteRequest,
+    MatriculaLoteResultado,
+    MatriculaLoteResponse,
+    CotaPlanoAluno
+)
+from app.schemas.fila_espera import (
+    FilaEsperaCreate,
+    FilaEsperaPosicao,
+    FilaEsperaAluno,
+    FilaEsperaResponse
+)
+from app.schemas.alocacao import (
+    PreferenciaHorario,
+    AlunoPreferencias,
+    AlocacaoRequest,
+    AlocacaoOcupacao,
+    AlunoNaoAlocado,
+    AlunoIgnorado,
+    AlocacaoResponse
+)
+from app.schemas.reposicao import (
+    ReposicaoCreate,
+    ReposicaoResponse,
+    VagaReposicao
+)
+from app.schemas.presenca import (
+    CheckInCreate,
+    CheckInLote,
+    CheckInResponse,
+    FrequenciaAluno
+)
+from app.schemas.batch import (
+    BatchRequestItem,
+    BatchRequest,
+    BatchResponseItem,
+    BatchResponse
 )
 
 __all__ = [
@@ -36,6 +90,9 @@ __all__ = [
     "AlunoUpdate",
     "AlunoResponse",
     "AlunoComPagamentos",
+    "ContratoRenovacao",
+    "RenovacaoPrevia",
+    "RenovacaoResultado",
     # Pagamento schemas
     "PagamentoBase",
     "PagamentoCreate",
@@ -48,9 +105,53 @@ __all__ = [
     "HorarioResponse",
     "HorarioComAlunos",
     "AlunoSimplificado",
+    "OcupacaoCelula",
+    "OcupacaoHorario",
+    "OcupacaoGrade",
     # Professor schemas
     "ProfessorBase",
     "ProfessorCreate",
     "ProfessorUpdate",
-    "ProfessorResponse"
+    "ProfessorResponse",
+    "CargaProfessor",
+    "AulaProfessor",
+    "CargaProfessorDetalhe",
+    # Change feed schemas
+    "MatriculaResponse",
+    "ChangeEntry",
+    "ChangeFeedResponse",
+    # Matrícula em lote schemas
+    "MatriculaLoteRequest",
+    "MatriculaItem",
+    "MatriculasLoteRequest",
+    "MatriculaLoteResultado",
+    "MatriculaLoteResponse",
+    "CotaPlanoAluno",
+    # Fila de espera schemas
+    "FilaEsperaCreate",
+    "FilaEsperaPosicao",
+    "FilaEsperaAluno",
+    "FilaEsperaResponse",
+    # Alocação da grade schemas
+    "PreferenciaHorario",
+    "AlunoPreferencias",
+    "AlocacaoRequest",
+    "AlocacaoOcupacao",
+    "AlunoNaoAlocado",
+    "AlunoIgnorado",
+    "AlocacaoResponse",
+    # Reposição schemas
+    "ReposicaoCreate",
+    "ReposicaoResponse",
+    "VagaReposicao",
+    # Presença schemas
+    "CheckInCreate",
+    "CheckInLote",
+    "CheckInResponse",
+    "FrequenciaAluno",
+    # Batch schemas
+    "BatchRequestItem",
+    "BatchRequest",
+    "BatchResponseItem",
+    "BatchResponse"
 ]
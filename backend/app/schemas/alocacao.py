@@ -0,0 +1,59 @@
+"""
+Schemas Pydantic para a alocação automática da grade
+"""
+from pydantic import BaseModel, Field
+from datetime import time
+from typing import Dict, List, Optional
+
+from app.schemas.matricula import MatriculaItem
+
+
+class PreferenciaHorario(BaseModel):
+    """Dia aceito pelo aluno; horário e professor restringem a preferência"""
+    dia_semana: str = Field(..., pattern="^(segunda|terca|quarta|quinta|sexta|sabado|domingo)$")
+    horario: Optional[time] = None
+    professor_id: Optional[int] = None
+
+
+class AlunoPreferencias(BaseModel):
+    """Preferências de um aluno, da preferida para a menos preferida"""
+    aluno_id: int = Field(..., gt=0)
+    preferencias: List[PreferenciaHorario] = Field(..., min_length=1)
+
+
+class AlocacaoRequest(BaseModel):
+    """Alunos a alocar; sem "aplicar" só o diff é calculado (dry-run)"""
+    alunos: List[AlunoPreferencias] = Field(..., min_length=1)
+    aplicar: bool = False
+
+
+class AlocacaoOcupacao(BaseModel):
+    """Ocupação de um horário depois da alocação"""
+    horario_id: int
+    capacidade_maxima: int
+    matriculados: int
+
+
+class AlunoNaoAlocado(BaseModel):
+    """Aluno com aulas do plano que não couberam nas preferências"""
+    aluno_id: int
+    aulas_faltando: int
+
+
+class AlunoIgnorado(BaseModel):
+    """Aluno fora da alocação (inexistente ou inativo)"""
+    aluno_id: int
+    detail: str
+
+
+class AlocacaoResponse(BaseModel):
+    """Diff da alocação contra as matrículas atuais dos alunos informados"""
+    aplicado: bool
+    aulas_alocadas: int
+    por_preferencia: Dict[int, int] = Field(..., description="Aulas alocadas por posição de preferência (0 = primeira opção)")
+    adicionar: List[MatriculaItem]
+    remover: List[MatriculaItem]
+    manter: int
+    nao_alocados: List[AlunoNaoAlocado]
+    ignorados: List[AlunoIgnorado]
+    ocupacao: List[AlocacaoOcupacao]
@@ -17,6 +17,7 @@ class AlunoBase(BaseModel):
     data_inicio_contrato: Optional[date] = None
     data_fim_contrato: Optional[date] = None
     duracao_contrato_meses: Optional[int] = Field(default=12, ge=1, le=60)
+    renovacao_automatica: bool = False
     ativo: bool = True
     telefone_whatsapp: Optional[str] = Field(None, max_length=20)
     observacoes: Optional[str] = None
@@ -37,21 +38,48 @@ class AlunoUpdate(BaseModel):
     data_inicio_contrato: Optional[date] = None
     data_fim_contrato: Optional[date] = None
     duracao_contrato_meses: Optional[int] = Field(None, ge=1, le=60)
+    renovacao_automatica: Optional[bool] = None
     ativo: Optional[bool] = None
     telefone_whatsapp: Optional[str] = Field(None, max_length=20)
     observacoes: Optional[str] = None
+    version: Optional[int] = Field(None, ge=1, description="Versão esperada do registro (alternativa ao If-Match)")
 
 
 class AlunoResponse(AlunoBase):
     """Schema de resposta para Aluno incluindo metadados"""
     id: int
+    telefone_e164: Optional[str] = None  # telefone normalizado (+55DDDNUMERO)
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int
 
     class Config:
         from_attributes = True
 
 
+class ContratoRenovacao(BaseModel):
+    """Contrato incluído na passada de renovação automática"""
+    aluno_id: int
+    nome_completo: str
+    data_fim_contrato: date
+    duracao_contrato_meses: int
+    nova_data_fim: date
+
+
+class RenovacaoPrevia(BaseModel):
+    """Contratos que a renovação automática estenderia (nada é alterado)"""
+    ate: date
+    total: int
+    contratos: List[ContratoRenovacao]
+
+
+class RenovacaoResultado(BaseModel):
+    """Resultado da passada de renovação"""
+    ate: date
+    renovados: int
+    aluno_ids: List[int]
+
+
 class AlunoComPagamentos(AlunoResponse):
     """Schema de Aluno incluindo lista de pagamentos"""
     pagamentos: List["PagamentoResponse"] = []
@@ -0,0 +1,44 @@
+"""
+Schemas Pydantic para o endpoint de batch (várias leituras em uma requisição)
+"""
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Dict, List
+
+
+class BatchRequestItem(BaseModel):
+    """Sub-requisição de leitura (GET) a uma rota da API"""
+    id: str = Field(..., min_length=1, max_length=50, description="Identificador da sub-requisição na resposta")
+    path: str = Field(..., description="Caminho com query string (ex: /api/alunos?limit=50)")
+
+    @field_validator("path")
+    @classmethod
+    def validar_path(cls, v: str) -> str:
+        if not v.startswith("/api/"):
+            raise ValueError("path deve começar com /api/")
+        return v
+
+
+class BatchRequest(BaseModel):
+    """Lista de sub-requisições executadas em uma única requisição"""
+    requests: List[BatchRequestItem] = Field(..., min_length=1)
+
+    @field_validator("requests")
+    @classmethod
+    def validar_ids_unicos(cls, v: List[BatchRequestItem]) -> List[BatchRequestItem]:
+        ids = [item.id for item in v]
+        if len(ids) != len(set(ids)):
+            raise ValueError("ids das sub-requisições devem ser únicos")
+        return v
+
+
+class BatchResponseItem(BaseModel):
+    """Resultado de uma sub-requisição (status e corpo como na chamada direta)"""
+    id: str
+    status: int
+    headers: Dict[str, str] = {}
+    body: Any = None
+
+
+class BatchResponse(BaseModel):
+    """Resultados na mesma ordem das sub-requisições"""
+    responses: List[BatchResponseItem]
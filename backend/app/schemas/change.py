@@ -0,0 +1,31 @@
+"""
+Schemas Pydantic para o change feed
+"""
+from pydantic import BaseModel
+from typing import Optional, List
+
+
+class MatriculaResponse(BaseModel):
+    """Schema de resposta para Matrícula (aluno em horário)"""
+    id: int
+    aluno_id: int
+    horario_id: int
+
+    class Config:
+        from_attributes = True
+
+
+class ChangeEntry(BaseModel):
+    """Alteração de um registro (data é None para exclusões - tombstone)"""
+    seq: int
+    table: str
+    id: int
+    op: str
+    data: Optional[dict] = None
+
+
+class ChangeFeedResponse(BaseModel):
+    """Página do change feed"""
+    changes: List[ChangeEntry]
+    next_since: int
+    has_more: bool
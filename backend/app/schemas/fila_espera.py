@@ -0,0 +1,41 @@
+"""
+Schemas Pydantic para a fila de espera dos horários
+"""
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List
+
+
+class FilaEsperaCreate(BaseModel):
+    """Entrada de um aluno na fila de espera de um horário"""
+    aluno_id: int = Field(..., gt=0)
+    prioridade: int = Field(default=0, ge=0, le=100, description="Maior prioridade é atendida antes")
+
+
+class FilaEsperaPosicao(BaseModel):
+    """Posição de um aluno na fila (ex: 3º de 12)"""
+    horario_id: int
+    aluno_id: int
+    prioridade: int
+    created_at: datetime
+    posicao: int
+    total: int
+
+    class Config:
+        from_attributes = True
+
+
+class FilaEsperaAluno(BaseModel):
+    """Aluno na fila de espera, na ordem de atendimento"""
+    posicao: int
+    aluno_id: int
+    nome_completo: str
+    prioridade: int
+    created_at: datetime
+
+
+class FilaEsperaResponse(BaseModel):
+    """Fila de espera completa de um horário"""
+    horario_id: int
+    total: int
+    alunos: List[FilaEsperaAluno]
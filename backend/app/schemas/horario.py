@@ -10,10 +10,10 @@ class HorarioBase(BaseModel):
     """Schema base para Horário"""
     dia_semana: str = Field(..., pattern="^(segunda|terca|quarta|quinta|sexta|sabado|domingo)$")
     horario: time
+    duracao_minutos: int = Field(default=50, ge=15, le=240)
     capacidade_maxima: int = Field(default=10, ge=1, le=50)
     tipo_aula: str = Field(..., pattern="^(natacao|hidroginastica)$")
     professor_id: Optional[int] = None
-    fila_espera: int = Field(default=0, ge=0)
 
 
 class HorarioCreate(HorarioBase):
@@ -25,15 +25,18 @@ class HorarioUpdate(BaseModel):
     """Schema para atualização de Horário - todos os campos opcionais"""
     dia_semana: Optional[str] = Field(None, pattern="^(segunda|terca|quarta|quinta|sexta|sabado|domingo)$")
     horario: Optional[time] = None
+    duracao_minutos: Optional[int] = Field(None, ge=15, le=240)
     capacidade_maxima: Optional[int] = Field(None, ge=1, le=50)
     tipo_aula: Optional[str] = Field(None, pattern="^(natacao|hidroginastica)$")
     professor_id: Optional[int] = None
-    fila_espera: Optional[int] = Field(None, ge=0)
+    version: Optional[int] = Field(None, ge=1, description="Versão esperada do registro (alternativa ao If-Match)")
 
 
 class HorarioResponse(HorarioBase):
     """Schema de resposta para Horário incluindo metadados"""
     id: int
+    fila_espera: int = Field(default=0, description="Alunos na fila de espera (mantido pelas rotas da fila)")
+    version: int
 
     class Config:
         from_attributes = True
@@ -57,3 +60,38 @@ class HorarioComAlunos(HorarioResponse):
 
     class Config:
         from_attributes = True
+
+
+class OcupacaoCelula(BaseModel):
+    """Ocupação de um dia/horário (soma das turmas no mesmo horário)"""
+    turmas: int
+    matriculados: int
+    capacidade: int
+    fila_espera: int
+    percentual: float
+
+
+class OcupacaoHorario(BaseModel):
+    """Ocupação de um horário (turma) da grade"""
+    horario_id: int
+    dia_semana: str
+    horario: time
+    tipo_aula: str
+    matriculados: int
+    capacidade: int
+    fila_espera: int
+    percentual: float
+
+
+class OcupacaoGrade(BaseModel):
+    """
+    Mapa de ocupação da semana: celulas[i][j] é o dia dias[i] no horário
+    horarios[j] (None se não há aula); por_horario traz cada turma separada
+    e percentual_medio é a média dos percentuais das turmas
+    """
+    dias: List[str]
+    horarios: List[time]
+    celulas: List[List[Optional[OcupacaoCelula]]]
+    por_horario: List[OcupacaoHorario]
+    total: OcupacaoCelula
+    percentual_medio: float
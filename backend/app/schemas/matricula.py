@@ -0,0 +1,49 @@
+"""
+Schemas Pydantic para matrícula e desmatrícula em lote
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class MatriculaLoteRequest(BaseModel):
+    """Alunos a matricular (ou remover) em um horário"""
+    aluno_ids: List[int] = Field(..., min_length=1, description="IDs dos alunos, processados na ordem enviada")
+
+
+class MatriculaItem(BaseModel):
+    """Par horário-aluno de um lote entre vários horários"""
+    horario_id: int = Field(..., gt=0)
+    aluno_id: int = Field(..., gt=0)
+
+
+class MatriculasLoteRequest(BaseModel):
+    """Matrículas (ou desmatrículas) em vários horários de uma vez"""
+    matriculas: List[MatriculaItem] = Field(..., min_length=1)
+
+
+class MatriculaLoteResultado(BaseModel):
+    """Resultado de um item do lote (status e detail como na chamada individual)"""
+    horario_id: int
+    aluno_id: int
+    status: int
+    matricula_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class MatriculaLoteResponse(BaseModel):
+    """Resultados na mesma ordem dos itens enviados"""
+    resultados: List[MatriculaLoteResultado]
+    sucesso: int
+    erros: int
+
+
+class CotaPlanoAluno(BaseModel):
+    """Aluno com matrículas acima ou abaixo das aulas por semana do plano"""
+    aluno_id: int
+    nome_completo: str
+    plano_id: int
+    plano_nome: str
+    aulas_por_semana: int
+    matriculadas: int
+    diferenca: int = Field(..., description="matriculadas - aulas_por_semana (positivo = acima da cota)")
+    situacao: str = Field(..., description="acima ou abaixo")
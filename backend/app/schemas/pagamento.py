@@ -30,12 +30,14 @@ class PagamentoUpdate(BaseModel):
     mes_referencia: Optional[str] = Field(None, pattern="^\\d{4}-\\d{2}$")
     forma_pagamento: Optional[str] = Field(None, pattern="^(dinheiro|pix|cartao_credito|cartao_debito|transferencia)$")
     observacoes: Optional[str] = None
+    version: Optional[int] = Field(None, ge=1, description="Versão esperada do registro (alternativa ao If-Match)")
 
 
 class PagamentoResponse(PagamentoBase):
     """Schema de resposta para Pagamento incluindo metadados"""
     id: int
     created_at: datetime
+    version: int
 
     class Config:
         from_attributes = True
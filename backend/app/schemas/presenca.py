@@ -0,0 +1,36 @@
+"""
+Schemas Pydantic para presenças (check-in)
+"""
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+
+class CheckInCreate(BaseModel):
+    """Leitura da catraca, do tablet ou da recepção"""
+    aluno_id: int = Field(..., gt=0)
+    horario_id: int = Field(..., gt=0)
+    registrado_em: Optional[datetime] = Field(None, description="Momento da leitura no dispositivo (padrão: agora)")
+    origem: str = Field(default="recepcao", pattern="^(catraca|tablet|recepcao)$")
+
+
+class CheckInLote(BaseModel):
+    """Leituras acumuladas por um dispositivo (ex: tablet que ficou sem rede)"""
+    leituras: List[CheckInCreate] = Field(..., min_length=1, max_length=500)
+
+
+class CheckInResponse(BaseModel):
+    """Leituras aceitas no buffer (a gravação é feita em lote, depois da resposta)"""
+    recebidas: int
+    pendentes: int
+
+
+class FrequenciaAluno(BaseModel):
+    """Presenças de um aluno em um horário no período (do resumo mensal)"""
+    aluno_id: int
+    horario_id: int
+    presencas: int
+    ultima_presenca: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
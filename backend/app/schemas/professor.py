@@ -2,7 +2,8 @@
 Schemas Pydantic para Professor
 """
 from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional
+from datetime import time
+from typing import List, Optional
 import re
 
 
@@ -87,6 +88,38 @@ class ProfessorResponse(ProfessorBase):
     """Schema de resposta de Professor"""
     id: int
     is_active: bool
+    telefone_e164: Optional[str] = None  # telefone normalizado (+55DDDNUMERO)
 
     class Config:
         from_attributes = True
+
+
+class CargaProfessor(BaseModel):
+    """Carga semanal de um professor"""
+    professor_id: int
+    nome: str
+    aulas_semana: int
+    minutos_semana: int
+    horas_semana: float
+    dias_com_aula: int
+    vagas: int
+    alunos: int
+    ocupacao_percentual: float
+
+
+class AulaProfessor(BaseModel):
+    """Aula da agenda semanal do professor"""
+    horario_id: int
+    dia_semana: str
+    inicio: time
+    fim: time
+    duracao_minutos: int
+    tipo_aula: str
+    capacidade_maxima: int
+    alunos: int
+
+
+class CargaProfessorDetalhe(CargaProfessor):
+    """Carga semanal com a agenda do professor"""
+    minutos_por_dia: dict
+    agenda: List[AulaProfessor]
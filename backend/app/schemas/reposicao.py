@@ -0,0 +1,41 @@
+"""
+Schemas Pydantic para reposições de aula
+"""
+from pydantic import BaseModel, Field
+from datetime import date, datetime, time
+from typing import Optional
+
+
+class ReposicaoCreate(BaseModel):
+    """Reserva de reposição em uma aula datada"""
+    aluno_id: int = Field(..., gt=0)
+    horario_id: int = Field(..., gt=0)
+    data: date
+    observacao: Optional[str] = Field(None, max_length=200, description="Ex: aula perdida que está sendo reposta")
+
+
+class ReposicaoResponse(BaseModel):
+    """Reposição marcada"""
+    id: int
+    aluno_id: int
+    horario_id: int
+    data: date
+    observacao: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class VagaReposicao(BaseModel):
+    """Aula datada com vagas para reposição"""
+    horario_id: int
+    data: date
+    dia_semana: str
+    horario: time
+    tipo_aula: str
+    professor_id: Optional[int] = None
+    vagas: int
+
+    class Config:
+        from_attributes = True
@@ -124,6 +124,12 @@ class Token(BaseModel):
     user: UserResponse
 
 
+class StreamToken(BaseModel):
+    """Token de curta duração, válido só para abrir o stream SSE (?token=)"""
+    token: str
+    expires_in: int
+
+
 class TokenData(BaseModel):
     """Schema de dados decodificados do token"""
     user_id: int
@@ -2,15 +2,25 @@
 Script de Seed para Criar Usuário Admin Inicial
 Execute: python -m app.seed_admin
 """
-from app.database import SessionLocal
+from typing import Optional
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, get_engine
 from app.models.user import User
 from app.utils.auth import get_password_hash
 import os
 
 
-def create_admin_user():
-    """Cria usuário admin padrão se não existir"""
-    db = SessionLocal()
+def create_admin_user(bind: Optional[Connection] = None):
+    """
+    Cria usuário admin padrão se não existir
+
+    Args:
+        bind: conexão a usar (as migrações passam a conexão da transação corrente)
+    """
+    db = Session(bind=bind) if bind is not None else SessionLocal(bind=get_engine())
 
     try:
         # Verificar se já existe admin
@@ -0,0 +1,145 @@
+"""
+Agenda e carga horária dos professores
+
+Cada horário tem início (horario) e duração (duracao_minutos). Um professor
+não pode ter duas aulas que se sobreponham no mesmo dia da semana:
+
+- PUT /horarios/{id}: a regra vai no próprio WHERE do UPDATE (NOT EXISTS de
+  outra aula sobreposta), então a checagem e a gravação são um só statement
+- POST /horarios: consulta de conflito antes do INSERT
+- PostgreSQL: a constraint EXCLUDE ex_horarios_agenda_professor (migração 11)
+  garante a regra mesmo com gravações simultâneas
+
+As consultas usam o índice ix_horarios_professor_agenda
+(professor_id, dia_semana, horario).
+"""
+from datetime import time
+from typing import Any, List, Mapping, Optional
+
+from sqlalchemy import exists, func, select, true
+from sqlalchemy.orm import Session, aliased
+
+from app.models.horario import Horario, minutos_do_dia
+from app.models.professor import Professor
+from app.models.turma import AlunoHorario
+
+
+# Campos de Horario que mudam a agenda do professor
+CAMPOS_AGENDA = {"professor_id", "dia_semana", "horario", "duracao_minutos"}
+
+
+def _minutos(horario: time) -> int:
+    return horario.hour * 60 + horario.minute
+
+
+def formatar_minutos(minutos: int) -> str:
+    """510 -> '08:30'"""
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def sem_sobreposicao(valores: Mapping[str, Any]) -> Any:
+    """
+    Condição do WHERE de um UPDATE em horarios: nenhuma outra aula do
+    professor se sobrepõe à aula com os valores novos
+
+    Args:
+        valores: campos alterados; os ausentes vêm da própria linha
+    """
+    professor_id = valores.get("professor_id", Horario.professor_id)
+    if professor_id is None:
+        return true()  # sem professor não há conflito
+    inicio = _minutos(valores["horario"]) if "horario" in valores else minutos_do_dia(Horario.horario)
+    duracao = valores.get("duracao_minutos", Horario.duracao_minutos)
+
+    outro = aliased(Horario)
+    return ~exists().where(
+        outro.id != Horario.id,
+        outro.professor_id == professor_id,
+        outro.dia_semana == valores.get("dia_semana", Horario.dia_semana),
+        minutos_do_dia(outro.horario) < inicio + duracao,
+        minutos_do_dia(outro.horario) + outro.duracao_minutos > inicio,
+    )
+
+
+def primeiro_conflito(
+    db: Session, professor_id: Optional[int], dia_semana: str, horario: time, duracao_minutos: int,
+    ignorar_id: Optional[int] = None
+) -> Optional[Horario]:
+    """Aula do professor que se sobrepõe ao intervalo informado (1 query pelo índice da agenda)"""
+    if professor_id is None:
+        return None
+    inicio = _minutos(horario)
+    fim = inicio + duracao_minutos
+    query = db.query(Horario).filter(
+        Horario.professor_id == professor_id,
+        Horario.dia_semana == dia_semana,
+        minutos_do_dia(Horario.horario) < fim,
+        minutos_do_dia(Horario.horario) + Horario.duracao_minutos > inicio,
+    )
+    if fim < 24 * 60:
+        # Faixa do índice: só aulas que começam antes do fim desta
+        query = query.filter(Horario.horario < time(fim // 60, fim % 60))
+    if ignorar_id is not None:
+        query = query.filter(Horario.id != ignorar_id)
+    return query.order_by(Horario.horario).first()
+
+
+def mensagem_conflito(conflito: Horario) -> str:
+    inicio = _minutos(conflito.horario)
+    return (
+        f"Professor já tem aula neste horário: {conflito.dia_semana} "
+        f"{formatar_minutos(inicio)}-{formatar_minutos(inicio + conflito.duracao_minutos)} "
+        f"(horário {conflito.id})"
+    )
+
+
+def _alunos_por_horario():
+    return (
+        select(AlunoHorario.horario_id, func.count(AlunoHorario.id).label("alunos"))
+        .group_by(AlunoHorario.horario_id)
+        .subquery()
+    )
+
+
+def agenda_professor(db: Session, professor_id: int) -> List[Any]:
+    """Aulas do professor com o número de alunos, em ordem de dia e início (1 query)"""
+    alunos = _alunos_por_horario()
+    return db.execute(
+        select(
+            Horario.id, Horario.dia_semana, Horario.horario, Horario.duracao_minutos,
+            Horario.tipo_aula, Horario.capacidade_maxima, func.coalesce(alunos.c.alunos, 0).label("alunos"),
+        )
+        .outerjoin(alunos, alunos.c.horario_id == Horario.id)
+        .where(Horario.professor_id == professor_id)
+        .order_by(Horario.dia_semana_numero, Horario.horario)
+    ).all()
+
+
+def relatorio_carga(db: Session, apenas_ativos: bool = True) -> List[Any]:
+    """
+    Carga semanal de todos os professores em uma única query agregada
+
+    Returns:
+        Linhas (professor_id, nome, aulas, minutos, dias, vagas, alunos),
+        da maior para a menor carga
+    """
+    alunos = _alunos_por_horario()
+    minutos = func.coalesce(func.sum(Horario.duracao_minutos), 0)
+    query = (
+        select(
+            Professor.id.label("professor_id"),
+            Professor.nome,
+            func.count(Horario.id).label("aulas"),
+            minutos.label("minutos"),
+            func.count(func.distinct(Horario.dia_semana)).label("dias"),
+            func.coalesce(func.sum(Horario.capacidade_maxima), 0).label("vagas"),
+            func.coalesce(func.sum(alunos.c.alunos), 0).label("alunos"),
+        )
+        .outerjoin(Horario, Horario.professor_id == Professor.id)
+        .outerjoin(alunos, alunos.c.horario_id == Horario.id)
+        .group_by(Professor.id, Professor.nome)
+        .order_by(minutos.desc(), Professor.nome)
+    )
+    if apenas_ativos:
+        query = query.where(Professor.is_active.is_(True))
+    return db.execute(query).all()
@@ -0,0 +1,297 @@
+"""
+Alocação automática da grade de um novo período
+
+Recebe os dias/horários preferidos de cada aluno (em ordem de preferência) e
+calcula as matrículas com um fluxo de custo mínimo (utils/min_cost_flow.py):
+
+    origem -> aluno            capacidade = aulas_por_semana do plano (1 sem plano)
+    aluno  -> dia do aluno     capacidade 1: no máximo uma aula por dia
+    dia    -> preferência      custo = PESO_PREFERENCIA x posição da preferência
+    preferência -> horário     horários aceitos pela preferência (nó compartilhado
+                               pelos alunos com a mesma preferência e tipo de aula)
+    horário -> destino         uma aresta por faixa de ocupação, custo crescente
+
+Restrições: mesmo tipo_aula do aluno, capacidade_maxima do horário (menos
+as reposições marcadas na aula datada mais cheia) e professor, quando a
+preferência indica um. O fluxo é máximo (o maior número
+possível de aulas alocadas) e, entre as soluções máximas, a de menor custo:
+primeiro as preferências mais altas (uma posição de preferência pesa mais
+que qualquer diferença de ocupação) e depois a ocupação equilibrada entre
+horários equivalentes.
+
+Os alunos informados são realocados do zero: matrículas atuais deles que
+não estão na solução entram em "remover". Vagas ocupadas por outros alunos
+não são mexidas. calcular_alocacao não altera o banco (dry-run);
+aplicar_alocacao grava o resultado em lote.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.aluno import Aluno
+from app.models.horario import Horario
+from app.models.plano import Plano
+from app.models.reposicao import OcorrenciaAula
+from app.models.turma import AlunoHorario
+from app.services.matricula_service import ResultadoLote, desmatricular_em_lote, matricular_em_lote
+from app.utils.min_cost_flow import MinCostFlow
+
+
+# Uma posição de preferência vale mais que a maior diferença de ocupação
+PESO_PREFERENCIA = 10
+PESO_EQUILIBRIO = PESO_PREFERENCIA - 1
+
+
+@dataclass
+class Preferencia:
+    """Dia (obrigatório), horário e professor (opcionais) aceitos pelo aluno"""
+    dia_semana: str
+    horario: Optional[time] = None
+    professor_id: Optional[int] = None
+
+    def aceita(self, horario: "HorarioLivre") -> bool:
+        return (
+            self.dia_semana == horario.dia_semana
+            and (self.horario is None or self.horario == horario.horario)
+            and (self.professor_id is None or self.professor_id == horario.professor_id)
+        )
+
+
+@dataclass
+class HorarioLivre:
+    id: int
+    dia_semana: str
+    horario: time
+    tipo_aula: str
+    professor_id: Optional[int]
+    capacidade_maxima: int
+    ocupados: int  # matrículas de alunos fora da alocação
+    reservados: int = 0  # reposições da aula datada mais cheia (ocupar_vagas também as conta)
+
+    @property
+    def livres(self) -> int:
+        return self.capacidade_maxima - self.ocupados - self.reservados
+
+
+@dataclass
+class PlanoAlocacao:
+    """
+    Resultado da alocação (diff contra as matrículas atuais)
+
+    Attributes:
+        adicionar / remover: pares (horario_id, aluno_id)
+        manter: matrículas atuais que continuam na solução
+        nao_alocados: aluno_id -> aulas do plano que não couberam
+        ignorados: aluno_id -> motivo (inexistente ou inativo)
+        por_preferencia: aulas alocadas por posição de preferência (0 = primeira opção)
+        ocupacao: horario_id -> (capacidade_maxima, matriculados depois da alocação)
+    """
+    adicionar: List[Tuple[int, int]] = field(default_factory=list)
+    remover: List[Tuple[int, int]] = field(default_factory=list)
+    manter: List[Tuple[int, int]] = field(default_factory=list)
+    nao_alocados: Dict[int, int] = field(default_factory=dict)
+    ignorados: Dict[int, str] = field(default_factory=dict)
+    por_preferencia: Dict[int, int] = field(default_factory=dict)
+    ocupacao: Dict[int, Tuple[int, int]] = field(default_factory=dict)
+
+    @property
+    def aulas_alocadas(self) -> int:
+        return len(self.adicionar) + len(self.manter)
+
+
+def _carregar(db: Session, aluno_ids: Sequence[int]):
+    """
+    Alunos, horários com vagas de terceiros e matrículas atuais (3 queries)
+
+    As reposições de cada horário são as da aula datada mais cheia, de hoje em
+    diante: maior ocupadas menos as matrículas do horário (de qualquer aluno,
+    então as dos alunos realocados não contam duas vezes).
+    """
+    alunos = {
+        row.id: row for row in db.execute(
+            select(Aluno.id, Aluno.ativo, Aluno.tipo_aula, Plano.aulas_por_semana)
+            .outerjoin(Plano, Plano.id == Aluno.plano_id)
+            .where(Aluno.id.in_(aluno_ids))
+        )
+    }
+    ocupados_por_terceiros = (
+        select(AlunoHorario.horario_id, func.count(AlunoHorario.id).label("ocupados"))
+        .where(AlunoHorario.aluno_id.notin_(aluno_ids))
+        .group_by(AlunoHorario.horario_id)
+        .subquery()
+    )
+    matriculados = (
+        select(AlunoHorario.horario_id, func.count(AlunoHorario.id).label("matriculados"))
+        .group_by(AlunoHorario.horario_id)
+        .subquery()
+    )
+    aula_mais_cheia = (
+        select(OcorrenciaAula.horario_id, func.max(OcorrenciaAula.ocupadas).label("ocupadas"))
+        .where(OcorrenciaAula.data >= date.today())
+        .group_by(OcorrenciaAula.horario_id)
+        .subquery()
+    )
+    horarios = [
+        HorarioLivre(*row[:7], reservados=max(0, row.ocupadas - row.matriculados)) for row in db.execute(
+            select(
+                Horario.id, Horario.dia_semana, Horario.horario, Horario.tipo_aula, Horario.professor_id,
+                Horario.capacidade_maxima, func.coalesce(ocupados_por_terceiros.c.ocupados, 0),
+                func.coalesce(matriculados.c.matriculados, 0).label("matriculados"),
+                func.coalesce(aula_mais_cheia.c.ocupadas, 0).label("ocupadas"),
+            )
+            .outerjoin(ocupados_por_terceiros, ocupados_por_terceiros.c.horario_id == Horario.id)
+            .outerjoin(matriculados, matriculados.c.horario_id == Horario.id)
+            .outerjoin(aula_mais_cheia, aula_mais_cheia.c.horario_id == Horario.id)
+            .order_by(Horario.id)
+        )
+    ]
+    atuais = set(db.execute(
+        select(AlunoHorario.horario_id, AlunoHorario.aluno_id).where(AlunoHorario.aluno_id.in_(aluno_ids))
+    ).all())
+    return alunos, horarios, atuais
+
+
+def _custo_vaga(ocupados: int, capacidade: int) -> int:
+    """Custo de ocupar a vaga de número `ocupados + 1`: cresce com a ocupação (0 a PESO_EQUILIBRIO - 1)"""
+    return PESO_EQUILIBRIO * ocupados // capacidade
+
+
+def calcular_alocacao(db: Session, preferencias: Dict[int, List[Preferencia]]) -> PlanoAlocacao:
+    """
+    Calcula a alocação sem alterar o banco (dry-run)
+
+    Args:
+        db: sessão (só leitura)
+        preferencias: aluno_id -> preferências em ordem (a primeira é a preferida)
+
+    Returns:
+        PlanoAlocacao com o diff contra as matrículas atuais dos alunos
+    """
+    alunos, horarios, atuais = _carregar(db, list(preferencias))
+    plano = PlanoAlocacao()
+
+    validos = {}
+    for aluno_id in preferencias:
+        aluno = alunos.get(aluno_id)
+        if aluno is None:
+            plano.ignorados[aluno_id] = "Aluno não encontrado"
+        elif not aluno.ativo:
+            plano.ignorados[aluno_id] = "Aluno está inativo"
+        else:
+            validos[aluno_id] = aluno
+    # Matrículas de alunos ignorados não são mexidas: continuam ocupando a vaga
+    por_id = {horario.id: horario for horario in horarios}
+    for horario_id, aluno_id in atuais:
+        if aluno_id in plano.ignorados:
+            por_id[horario_id].ocupados += 1
+
+    grafo = MinCostFlow(2)
+    origem, destino = 0, 1
+
+    # Um nó por horário com vaga, ligado ao destino por faixas de custo crescente
+    no_horario: Dict[int, int] = {}
+    por_tipo_dia: Dict[Tuple[str, str], List[HorarioLivre]] = defaultdict(list)
+    for horario in horarios:
+        if horario.livres <= 0:
+            continue
+        no_horario[horario.id] = grafo.add_node()
+        por_tipo_dia[(horario.tipo_aula, horario.dia_semana)].append(horario)
+        faixas: Dict[int, int] = defaultdict(int)
+        for ocupados in range(horario.capacidade_maxima - horario.livres, horario.capacidade_maxima):
+            faixas[_custo_vaga(ocupados, horario.capacidade_maxima)] += 1
+        for custo, vagas in faixas.items():
+            grafo.add_edge(no_horario[horario.id], destino, vagas, custo)
+
+    # Preferências iguais (mesmo tipo de aula) aceitam os mesmos horários: um nó
+    # compartilhado por preferência liga-se a eles, em vez de uma aresta por aluno e horário
+    no_preferencia: Dict[tuple, Optional[int]] = {}
+
+    def no_da_preferencia(tipo_aula: str, pref: Preferencia) -> Optional[int]:
+        chave = (tipo_aula, pref.dia_semana, pref.horario, pref.professor_id)
+        if chave not in no_preferencia:
+            aceitos = [h for h in por_tipo_dia.get((tipo_aula, pref.dia_semana), ()) if pref.aceita(h)]
+            no = grafo.add_node() if aceitos else None
+            for horario in aceitos:
+                grafo.add_edge(no, no_horario[horario.id], horario.livres, 0)
+            no_preferencia[chave] = no
+        return no_preferencia[chave]
+
+    # aresta aluno -> preferência: (índice, aluno_id, nó da preferência, posição)
+    arestas: List[Tuple[int, int, int, int]] = []
+    for aluno_id, aluno in validos.items():
+        aulas = aluno.aulas_por_semana or 1
+        plano.nao_alocados[aluno_id] = aulas
+
+        # Melhor posição de cada nó de preferência, agrupado por dia
+        por_dia: Dict[str, Dict[int, int]] = defaultdict(dict)
+        for posicao, pref in enumerate(preferencias[aluno_id]):
+            no = no_da_preferencia(aluno.tipo_aula, pref)
+            if no is not None:
+                por_dia[pref.dia_semana].setdefault(no, posicao)
+        if not por_dia:
+            continue
+
+        no_aluno = grafo.add_node()
+        grafo.add_edge(origem, no_aluno, aulas, 0)
+        for opcoes in por_dia.values():
+            if len(opcoes) == 1:
+                no_dia = no_aluno  # uma única preferência no dia: o limite de 1 vem da própria aresta
+            else:
+                no_dia = grafo.add_node()
+                grafo.add_edge(no_aluno, no_dia, 1, 0)
+            for no, posicao in opcoes.items():
+                e = grafo.add_edge(no_dia, no, 1, PESO_PREFERENCIA * posicao)
+                arestas.append((e, aluno_id, no, posicao))
+
+    grafo.solve(origem, destino)
+
+    # Cada nó de preferência distribui seus alunos entre os horários que recebeu fluxo.
+    # Um aluno manda no máximo uma unidade por dia, então não repete horário.
+    vagas_por_no: Dict[int, List[int]] = {}
+    for no in no_preferencia.values():
+        if no is None:
+            continue
+        vagas_por_no[no] = [
+            grafo.to[e] for e in grafo.adj[no]
+            if e % 2 == 0 for _ in range(grafo.flow(e))
+        ]
+    horario_do_no = {no: horario_id for horario_id, no in no_horario.items()}
+
+    solucao = set()
+    matriculados = {horario.id: horario.ocupados for horario in horarios}
+    for e, aluno_id, no, posicao in arestas:
+        if grafo.flow(e):
+            horario_id = horario_do_no[vagas_por_no[no].pop()]
+            solucao.add((horario_id, aluno_id))
+            matriculados[horario_id] += 1
+            plano.nao_alocados[aluno_id] -= 1
+            plano.por_preferencia[posicao] = plano.por_preferencia.get(posicao, 0) + 1
+
+    plano.adicionar = sorted(solucao - atuais)
+    plano.manter = sorted(solucao & atuais)
+    plano.remover = sorted(par for par in atuais if par not in solucao and par[1] not in plano.ignorados)
+    plano.nao_alocados = {aluno_id: faltam for aluno_id, faltam in plano.nao_alocados.items() if faltam}
+    envolvidos = {horario_id for horario_id, _ in solucao} | {horario_id for horario_id, _ in plano.remover}
+    plano.ocupacao = {
+        horario.id: (horario.capacidade_maxima, matriculados[horario.id])
+        for horario in horarios
+        if horario.id in envolvidos
+    }
+    return plano
+
+
+def aplicar_alocacao(db: Session, plano: PlanoAlocacao) -> Tuple[ResultadoLote, ResultadoLote]:
+    """
+    Grava o diff (DELETE e INSERT em lote, sem commit)
+
+    Returns:
+        (remoções, inclusões); se algum item falhar, a grade mudou desde o
+        cálculo e quem chama deve desfazer a transação
+    """
+    removidas = desmatricular_em_lote(db, plano.remover) if plano.remover else ResultadoLote(itens=[])
+    incluidas = matricular_em_lote(db, plano.adicionar) if plano.adicionar else ResultadoLote(itens=[])
+    return removidas, incluidas
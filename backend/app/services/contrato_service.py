@@ -0,0 +1,160 @@
+"""
+Renovação automática de contratos
+
+Alunos ativos com renovacao_automatica têm o contrato estendido por
+duracao_contrato_meses quando data_fim_contrato chega (com
+CONTRATO_RENOVACAO_ANTECEDENCIA_DIAS de antecedência). Em vez de um PUT por
+aluno, a passada é um único UPDATE ... RETURNING sobre o conjunto, pelo
+índice parcial ix_alunos_contratos_ativos: dezenas de milhares de contratos
+em uma transação, com a versão de cada registro incrementada (If-Match de
+quem editou o aluno antes continua detectando o conflito) e as alterações
+gravadas no change_log.
+
+A passada roda na inicialização e depois uma vez por
+CONTRATO_RENOVACAO_INTERVAL_SECONDS (tarefa em segundo plano), então um
+deploy não adia a renovação por mais um intervalo; também pode ser
+antecipada/conferida pelas rotas de renovação.
+Rodar de novo no mesmo dia não renova duas vezes: o contrato renovado sai
+do critério (a nova data de fim fica além da antecedência). A exceção é o
+contrato vencido há mais que a própria duração (ex: opção ligada meses
+depois do fim): cada passada o estende por mais uma duração até alcançar a
+data, mantendo o dia de aniversário do contrato.
+"""
+import asyncio
+import logging
+import os
+from datetime import date, timedelta
+from typing import Any, List, Optional
+
+from sqlalchemy import Date, func, select, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
+from starlette.concurrency import run_in_threadpool
+
+from app.database import session_scope
+from app.models.aluno import Aluno
+from app.utils.change_log import record_changes
+
+logger = logging.getLogger(__name__)
+
+ANTECEDENCIA_DIAS = int(os.getenv("CONTRATO_RENOVACAO_ANTECEDENCIA_DIAS", "7"))
+RENOVACAO_INTERVAL_SECONDS = float(os.getenv("CONTRATO_RENOVACAO_INTERVAL_SECONDS", "86400"))
+# Primeira passada logo na inicialização (desligada nos testes)
+RENOVACAO_NA_INICIALIZACAO = os.getenv("CONTRATO_RENOVACAO_NA_INICIALIZACAO", "true").lower() in ("1", "true", "yes")
+DURACAO_PADRAO_MESES = 12
+
+
+class somar_meses(FunctionElement):
+    """
+    Data + N meses, com o dia limitado ao fim do mês (31/01 + 1 mês = 28/02)
+    Use só com colunas: no SQLite as expressões aparecem duas vezes
+    """
+    type = Date()
+    name = "somar_meses"
+    inherit_cache = True
+
+
+@compiles(somar_meses)
+def _somar_meses_sqlite(element, compiler, **kw):
+    # date(d, '+N months') normaliza 31/01 + 1 mês para 03/03: o mínimo com o
+    # último dia do mês de destino faz o mesmo que o PostgreSQL
+    data, meses = (compiler.process(clause, **kw) for clause in element.clauses)
+    return (
+        f"min(date({data}, '+' || ({meses}) || ' months'), "
+        f"date({data}, 'start of month', '+' || (({meses}) + 1) || ' months', '-1 day'))"
+    )
+
+
+@compiles(somar_meses, "postgresql")
+def _somar_meses_postgresql(element, compiler, **kw):
+    data, meses = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"CAST({data} + make_interval(months => {meses}) AS DATE)"
+
+
+def _duracao():
+    return func.coalesce(Aluno.duracao_contrato_meses, DURACAO_PADRAO_MESES)
+
+
+def _a_renovar(ate: date) -> list:
+    """Critério da passada: ativo (predicado do índice parcial), com opção e vencendo até `ate`"""
+    # "ativo = true" (e não IS TRUE): o PostgreSQL reconhece a forma como o predicado "WHERE ativo" do índice
+    return [
+        Aluno.ativo == True,
+        Aluno.data_fim_contrato.isnot(None),
+        Aluno.data_fim_contrato <= ate,
+        Aluno.renovacao_automatica.is_(True),
+    ]
+
+
+def data_limite(antecedencia_dias: int = ANTECEDENCIA_DIAS, hoje: Optional[date] = None) -> date:
+    """Contratos que terminam até esta data entram na passada"""
+    return (hoje or date.today()) + timedelta(days=antecedencia_dias)
+
+
+def previa_renovacao(db: Session, ate: date, limite: Optional[int] = None) -> List[Any]:
+    """
+    Contratos que a passada renovaria (1 query, nada é alterado)
+
+    Returns:
+        Linhas (aluno_id, nome_completo, data_fim_contrato, duracao_contrato_meses,
+        nova_data_fim, total) em ordem de data de fim; total = todos os
+        contratos do critério, mesmo além do limite
+    """
+    query = (
+        select(
+            Aluno.id.label("aluno_id"), Aluno.nome_completo, Aluno.data_fim_contrato,
+            _duracao().label("duracao_contrato_meses"),
+            somar_meses(Aluno.data_fim_contrato, _duracao()).label("nova_data_fim"),
+            func.count().over().label("total"),
+        )
+        .where(*_a_renovar(ate))
+        .order_by(Aluno.data_fim_contrato, Aluno.id)
+    )
+    if limite:
+        query = query.limit(limite)
+    return db.execute(query).all()
+
+
+def renovar_contratos(db: Session, ate: date) -> List[int]:
+    """
+    Estende os contratos do critério em um UPDATE ... RETURNING (sem commit)
+
+    Returns:
+        ids dos alunos renovados
+    """
+    ids = db.execute(
+        update(Aluno)
+        .where(*_a_renovar(ate))
+        .values(
+            data_fim_contrato=somar_meses(Aluno.data_fim_contrato, _duracao()),
+            version=Aluno.version + 1,
+        )
+        .returning(Aluno.id),
+        execution_options={"synchronize_session": False},
+    ).scalars().all()
+    record_changes(db, Aluno.__tablename__, ids, "update")
+    return ids
+
+
+def _renovar_once(app=None) -> int:
+    with session_scope(app) as db:
+        ids = renovar_contratos(db, data_limite())
+        db.commit()
+        return len(ids)
+
+
+async def renovacao_loop(
+    app=None, interval: float = RENOVACAO_INTERVAL_SECONDS, na_inicializacao: bool = RENOVACAO_NA_INICIALIZACAO
+) -> None:
+    """Tarefa em segundo plano: passada de renovação dos contratos na inicialização e a cada intervalo"""
+    if not na_inicializacao:
+        await asyncio.sleep(interval)
+    while True:
+        try:
+            renovados = await run_in_threadpool(_renovar_once, app)
+            if renovados:
+                logger.info("Contratos: %d renovado(s) automaticamente", renovados)
+        except Exception:
+            logger.exception("Falha na renovação automática de contratos")
+        await asyncio.sleep(interval)
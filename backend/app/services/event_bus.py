@@ -0,0 +1,107 @@
+"""
+Barramento de eventos em memória para o stream SSE (/api/stream)
+
+Os routers publicam eventos depois do commit (matrícula, ocupação, pagamento,
+aluno) e cada conexão SSE inscrita recebe os que passam pelos seus filtros.
+Uma conexão ociosa custa apenas uma fila e uma corrotina esperando nela.
+
+O barramento é por processo: com mais de um worker, cada conexão só recebe
+eventos originados no próprio worker. Em caso de dúvida o cliente pode
+sempre reconciliar pelo change feed (/api/changes).
+"""
+import asyncio
+import itertools
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Eventos enfileirados por conexão antes de considerar o cliente atrasado
+QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+
+EVENT_TYPES = {"matricula", "ocupacao", "pagamento", "aluno"}
+
+
+@dataclass(frozen=True)
+class Event:
+    """Evento publicado no barramento"""
+    id: int
+    type: str
+    data: dict
+
+
+@dataclass(eq=False)
+class Subscription:
+    """Inscrição de uma conexão SSE"""
+    types: Optional[set] = None
+    filters: dict = field(default_factory=dict)
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=QUEUE_SIZE))
+    loop: asyncio.AbstractEventLoop = field(default_factory=asyncio.get_running_loop)
+    # Eventos descartados por fila cheia: o cliente deve ressincronizar
+    lagged: bool = False
+
+    def matches(self, event: Event) -> bool:
+        if self.types and event.type not in self.types:
+            return False
+        return all(event.data.get(key) == value for key, value in self.filters.items())
+
+    def deliver(self, event: Event) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+
+class EventBus:
+    """Distribui eventos para as inscrições ativas"""
+
+    def __init__(self):
+        self._subscriptions: set = set()
+        self._ids = itertools.count(1)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self, types: Optional[set] = None, filters: Optional[dict] = None) -> Subscription:
+        """Cria uma inscrição (deve ser chamado dentro do event loop)"""
+        subscription = Subscription(types=types or None, filters=filters or {})
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def publish(self, type: str, data: dict) -> None:
+        """
+        Publica um evento para as inscrições interessadas
+
+        Pode ser chamado do event loop (rotas async) ou de outra thread
+        (rotas síncronas, jobs): a entrega é sempre feita no loop da inscrição.
+        """
+        if not self._subscriptions:
+            return
+
+        event = Event(id=next(self._ids), type=type, data=data)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        for subscription in list(self._subscriptions):
+            if not subscription.matches(event):
+                continue
+            if subscription.loop is running:
+                subscription.deliver(event)
+            else:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+                except RuntimeError:
+                    # Loop encerrado: conexão morta que ainda não saiu da lista
+                    self.unsubscribe(subscription)
+
+
+event_bus = EventBus()
@@ -0,0 +1,203 @@
+"""
+Fila de espera dos horários
+
+A fila era só um número em horarios.fila_espera, ajustado à mão. Agora cada
+aluno tem uma entrada em fila_espera (prioridade + horário de entrada) e:
+
+- quando uma vaga abre (desmatrícula, desmatrícula em lote ou aumento de
+  capacidade), promover_da_fila matricula os próximos alunos ativos da fila
+  NA MESMA transação que liberou a vaga e grava a notificação de cada um na
+  outbox (enviada depois do commit pelo despachante)
+- a posição de um aluno ("3º de 12") sai de uma única query: contagem das
+  entradas à frente pelo índice (horario_id, prioridade, created_at, id) e o
+  total do contador horarios.fila_espera
+
+Ordem da fila: maior prioridade primeiro; na mesma prioridade, quem entrou
+antes. horarios.fila_espera é recalculado a cada alteração da fila.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List
+
+from sqlalchemy import and_, delete, exists, func, insert, or_, select, tuple_, update
+from sqlalchemy.orm import Session, aliased
+
+from app.models.aluno import Aluno
+from app.models.fila_espera import FilaEspera
+from app.models.horario import Horario
+from app.models.turma import AlunoHorario
+from app.services import outbox
+from app.services.matricula_service import ResultadoItem, bloquear_linhas, dentro_da_cota, ocupacao_horarios
+from app.services.reposicao_service import deltas_por_horario, ocupar_vagas
+from app.utils.change_log import record_changes
+
+
+# Ordem de atendimento (a mesma do índice ix_fila_espera_ordem)
+ORDEM_FILA = (FilaEspera.prioridade.desc(), FilaEspera.created_at, FilaEspera.id)
+
+NOTIFICACAO_PROMOCAO = "fila_espera_promocao"
+
+
+@dataclass
+class PosicaoFila:
+    """Posição de um aluno na fila de um horário"""
+    horario_id: int
+    aluno_id: int
+    prioridade: int
+    created_at: datetime
+    posicao: int
+    total: int
+
+
+def _ja_matriculado():
+    return exists().where(
+        AlunoHorario.horario_id == FilaEspera.horario_id,
+        AlunoHorario.aluno_id == FilaEspera.aluno_id,
+    )
+
+
+def atualizar_contador(db: Session, horario_ids: Iterable[int]) -> None:
+    """Recalcula horarios.fila_espera (e a versão) dos horários a partir das entradas"""
+    ids = set(horario_ids)
+    if not ids:
+        return
+    total = (
+        select(func.count(FilaEspera.id))
+        .where(FilaEspera.horario_id == Horario.id)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Horario)
+        .where(Horario.id.in_(ids))
+        .values(fila_espera=total, version=Horario.version + 1),
+        execution_options={"synchronize_session": "fetch"},
+    )
+    record_changes(db, Horario.__tablename__, ids, "update")
+
+
+def posicoes(db: Session, *criterios) -> List[PosicaoFila]:
+    """
+    Posição das entradas que atendem aos critérios (1 query)
+
+    Cada posição é 1 + entradas à frente no mesmo horário, contadas pelo
+    índice da fila; o total vem de horarios.fila_espera.
+
+    Exemplo:
+        posicoes(db, FilaEspera.horario_id == 3, FilaEspera.aluno_id == 7)
+    """
+    outra = aliased(FilaEspera)
+    a_frente = (
+        select(func.count(outra.id))
+        .where(
+            outra.horario_id == FilaEspera.horario_id,
+            or_(
+                outra.prioridade > FilaEspera.prioridade,
+                and_(
+                    outra.prioridade == FilaEspera.prioridade,
+                    tuple_(outra.created_at, outra.id) < tuple_(FilaEspera.created_at, FilaEspera.id),
+                ),
+            ),
+        )
+        .correlate(FilaEspera)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(
+            FilaEspera.horario_id, FilaEspera.aluno_id, FilaEspera.prioridade, FilaEspera.created_at,
+            a_frente + 1, Horario.fila_espera,
+        )
+        .join(Horario, Horario.id == FilaEspera.horario_id)
+        .where(*criterios)
+        .order_by(FilaEspera.horario_id, *ORDEM_FILA)
+    ).all()
+    return [PosicaoFila(*row) for row in rows]
+
+
+def promover_da_fila(db: Session, horario_ids: Iterable[int]) -> List[ResultadoItem]:
+    """
+    Matricula os próximos da fila nas vagas livres dos horários (sem commit)
+
+    Só olha horários com fila (horarios.fila_espera > 0): sem fila, custa uma
+    query. Alunos inativos ou que já atingiram a cota semanal do plano
+    continuam na fila e são pulados; entradas de quem já está matriculado no
+    horário são removidas.
+
+    Returns:
+        Matrículas criadas (status 201), na ordem da fila de cada horário
+    """
+    ocupacao = ocupacao_horarios(db, horario_ids, Horario.fila_espera > 0, bloquear=True)
+    vagas = {
+        horario_id: capacidade - matriculados
+        for horario_id, (capacidade, matriculados) in ocupacao.items()
+        if matriculados < capacidade
+    }
+    if not vagas:
+        return []
+
+    # Cota do plano conferida com as linhas dos alunos da fila bloqueadas
+    bloquear_linhas(db, Aluno, Aluno.id.in_(select(FilaEspera.aluno_id).where(FilaEspera.horario_id.in_(vagas))))
+    ordem = func.row_number().over(partition_by=FilaEspera.horario_id, order_by=ORDEM_FILA).label("ordem")
+    candidatos = (
+        select(FilaEspera.horario_id, FilaEspera.aluno_id, ordem)
+        .join(Aluno, Aluno.id == FilaEspera.aluno_id)
+        .where(FilaEspera.horario_id.in_(vagas), Aluno.ativo.is_(True), dentro_da_cota(), ~_ja_matriculado())
+        .subquery()
+    )
+    promovidos = db.execute(
+        select(
+            candidatos.c.horario_id, candidatos.c.aluno_id, candidatos.c.ordem,
+            Aluno.nome_completo, Aluno.telefone_e164,
+            Horario.dia_semana, Horario.horario, Horario.tipo_aula,
+        )
+        .join(Aluno, Aluno.id == candidatos.c.aluno_id)
+        .join(Horario, Horario.id == candidatos.c.horario_id)
+        .where(or_(*(
+            and_(candidatos.c.horario_id == horario_id, candidatos.c.ordem <= livres)
+            for horario_id, livres in vagas.items()
+        )))
+        .order_by(candidatos.c.horario_id, candidatos.c.ordem)
+    ).all()
+
+    # Aulas datadas lotadas por reposições: só os primeiros da fila que cabem
+    aceitos = ocupar_vagas(db, deltas_por_horario(p.horario_id for p in promovidos))
+    promovidos = [p for p in promovidos if aceitos[p.horario_id] >= p.ordem]
+    if not promovidos:
+        return []
+
+    rows = db.execute(
+        insert(AlunoHorario).returning(AlunoHorario.id, AlunoHorario.horario_id, AlunoHorario.aluno_id),
+        [{"horario_id": p.horario_id, "aluno_id": p.aluno_id} for p in promovidos],
+        execution_options={"insertmanyvalues_page_size": len(promovidos)},
+    ).all()
+    ids = {(horario_id, aluno_id): matricula_id for matricula_id, horario_id, aluno_id in rows}
+    record_changes(db, AlunoHorario.__tablename__, ids.values(), "insert")
+
+    # Os promovidos agora estão matriculados: saem da fila junto com entradas obsoletas
+    alterados = {p.horario_id for p in promovidos}
+    db.execute(
+        delete(FilaEspera).where(FilaEspera.horario_id.in_(alterados), _ja_matriculado()),
+        execution_options={"synchronize_session": False},
+    )
+    atualizar_contador(db, alterados)
+
+    outbox.enqueue(db, NOTIFICACAO_PROMOCAO, [
+        {
+            "aluno_id": p.aluno_id,
+            "horario_id": p.horario_id,
+            "matricula_id": ids[(p.horario_id, p.aluno_id)],
+            "nome": p.nome_completo,
+            "telefone": p.telefone_e164,
+            "dia_semana": p.dia_semana,
+            "horario": p.horario.strftime("%H:%M"),
+            "tipo_aula": p.tipo_aula,
+        }
+        for p in promovidos
+    ])
+
+    return [
+        ResultadoItem(
+            horario_id=p.horario_id, aluno_id=p.aluno_id, status=201,
+            matricula_id=ids[(p.horario_id, p.aluno_id)],
+        )
+        for p in promovidos
+    ]
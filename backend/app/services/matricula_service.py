@@ -0,0 +1,358 @@
+"""
+Matrícula e desmatrícula em lote
+
+Montar a grade de um novo período exigia centenas de chamadas a
+POST /horarios/{id}/alunos/{aluno_id}, cada uma com 4 queries e um commit.
+Aqui o lote inteiro é validado com consultas sobre o conjunto:
+
+- horários + ocupação atual: 1 query (contagem agrupada; no PostgreSQL
+  antes dela um SELECT ... FOR UPDATE dos horários, para que lotes
+  simultâneos não passem da capacidade)
+- alunos (existência, ativo e cota semanal do plano): 1 query (no
+  PostgreSQL depois do SELECT ... FOR UPDATE das linhas dos alunos)
+- matrículas já existentes dos pares: 1 query
+- lugares ocupados das aulas datadas: 1 UPDATE (ocupar_vagas; os itens
+  que não cabem por causa de reposições recebem erro de capacidade)
+- INSERT ... SELECT sobre os pares com RETURNING dos ids, com a cota do
+  plano conferida no próprio statement: 1 statement
+
+As regras são as mesmas da matrícula individual, aplicadas na ordem dos
+itens: horário e aluno existentes, aluno ativo, sem matrícula repetida,
+dentro da capacidade (itens além da última vaga recebem erro) e dentro da
+cota do plano (Plano.aulas_por_semana; sem plano ou com acesso livre não há
+limite). Cada item tem seu próprio resultado; o commit fica com quem chama.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, column, delete, func, insert, literal, or_, select, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import Values
+
+from app.models.aluno import Aluno
+from app.models.horario import Horario
+from app.models.plano import Plano
+from app.models.turma import AlunoHorario
+from app.services.reposicao_service import ajustar_ocupadas, deltas_por_horario, ocupar_vagas
+from app.utils.change_log import record_changes
+
+
+LIMITE_PLANO = "Aluno já atingiu o limite de aulas por semana do plano"
+
+
+def cota_semanal():
+    """
+    aulas_por_semana do plano do aluno, correlacionada a Aluno
+
+    NULL quando não há limite: aluno sem plano ou plano com acesso livre
+    """
+    return (
+        select(Plano.aulas_por_semana)
+        .where(Plano.id == Aluno.plano_id, Plano.acesso_livre.isnot(True))
+        .correlate(Aluno)
+        .scalar_subquery()
+    )
+
+
+def aulas_matriculadas():
+    """Número de matrículas do aluno, correlacionado a Aluno (índice de aluno_horario.aluno_id)"""
+    return (
+        select(func.count(AlunoHorario.id))
+        .where(AlunoHorario.aluno_id == Aluno.id)
+        .correlate(Aluno)
+        .scalar_subquery()
+    )
+
+
+def dentro_da_cota():
+    """Condição SQL: o aluno ainda pode se matricular em mais uma aula por semana"""
+    cota = cota_semanal()
+    return or_(cota.is_(None), aulas_matriculadas() < cota)
+
+
+class tabela_valores(Values):
+    """VALUES nomeado; no SQLite é compilado como SELECT sobre o VALUES"""
+    inherit_cache = True
+
+
+@compiles(tabela_valores, "sqlite")
+def _tabela_valores_sqlite(element, compiler, asfrom=False, **kw):
+    # SQLite não aceita a lista de colunas no alias do VALUES: as colunas
+    # vêm como column1..N e são renomeadas num SELECT
+    colunas = ", ".join(f"column{i} AS {c.name}" for i, c in enumerate(element.columns, 1))
+    return f"(SELECT {colunas} FROM ({compiler._render_values(element, **kw)})) AS {element.name}"
+
+
+def _candidatos(pares: Iterable[Tuple[int, int]]) -> tabela_valores:
+    """Pares a matricular como linhas (ordem, horario_id, aluno_id), para o FROM do INSERT do lote"""
+    return tabela_valores(
+        column("ordem", Integer), column("horario_id", Integer), column("aluno_id", Integer), name="candidatos"
+    ).data([(ordem, horario_id, aluno_id) for ordem, (horario_id, aluno_id) in enumerate(pares)])
+
+
+@dataclass
+class ResultadoItem:
+    """Resultado de um par horário-aluno (status/detail como na rota individual)"""
+    horario_id: int
+    aluno_id: int
+    status: int
+    matricula_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+@dataclass
+class ResultadoLote:
+    """
+    Resultados na ordem dos itens e ocupação final dos horários envolvidos
+
+    Attributes:
+        itens: resultado de cada par, na ordem recebida
+        ocupacao: horario_id -> (capacidade_maxima, matriculados) dos horários existentes
+    """
+    itens: List[ResultadoItem]
+    ocupacao: Dict[int, Tuple[int, int]] = field(default_factory=dict)
+
+    @property
+    def sucesso(self) -> int:
+        return sum(item.status < 400 for item in self.itens)
+
+    @property
+    def erros(self) -> int:
+        return len(self.itens) - self.sucesso
+
+
+def bloquear_linhas(db: Session, modelo, *criterios) -> None:
+    """
+    SELECT id ... FOR UPDATE das linhas que atendem aos critérios, em ordem de id (só PostgreSQL)
+
+    É o que garante capacidade e cota com matrículas simultâneas: horários
+    antes da contagem de matriculados, alunos antes da contagem de aulas do
+    plano. Sempre horários e depois alunos, na ordem dos ids, para que duas
+    transações não se bloqueiem em ordem invertida. No SQLite as escritas já
+    são serializadas.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(modelo.id).where(*criterios).order_by(modelo.id).with_for_update())
+
+
+def ocupacao_horarios(
+    db: Session, horario_ids: Iterable[int], *criterios, bloquear: bool = False
+) -> Dict[int, Tuple[int, int]]:
+    """
+    Capacidade e número de matriculados de cada horário (1 query; 2 com bloqueio no PostgreSQL)
+
+    Args:
+        criterios: filtros extras sobre Horario (ex: só horários com fila)
+        bloquear: SELECT ... FOR UPDATE nas linhas dos horários (PostgreSQL)
+            antes da contagem, para que duas transações não ocupem a mesma vaga
+    """
+    ids = set(horario_ids)
+    if not ids:
+        return {}
+    if bloquear:
+        # Bloqueio em statement próprio: no READ COMMITTED cada statement tem o
+        # seu snapshot, então a contagem abaixo (tirada depois de obter o lock)
+        # já vê as matrículas de quem segurava as linhas e fez commit. Com o
+        # FOR UPDATE na própria contagem, quem esperou usaria a contagem antiga.
+        bloquear_linhas(db, Horario, Horario.id.in_(ids), *criterios)
+    contagem = (
+        select(AlunoHorario.horario_id, func.count(AlunoHorario.id).label("matriculados"))
+        .where(AlunoHorario.horario_id.in_(ids))
+        .group_by(AlunoHorario.horario_id)
+        .subquery()
+    )
+    stmt = (
+        select(Horario.id, Horario.capacidade_maxima, func.coalesce(contagem.c.matriculados, 0))
+        .outerjoin(contagem, contagem.c.horario_id == Horario.id)
+        .where(Horario.id.in_(ids), *criterios)
+    )
+    rows = db.execute(stmt).all()
+    return {horario_id: (capacidade, matriculados) for horario_id, capacidade, matriculados in rows}
+
+
+def matricular(db: Session, horario_id: int, aluno_id: int) -> Optional[int]:
+    """
+    Matrícula individual com a cota do plano no próprio INSERT (sem commit)
+
+    INSERT ... SELECT ... WHERE dentro_da_cota() RETURNING id: a contagem das
+    matrículas do aluno e o limite do plano são avaliados no statement que
+    grava, sem consulta prévia (no PostgreSQL, depois do lock da linha do
+    aluno, para que duas matrículas simultâneas não passem da cota).
+
+    Returns:
+        id da matrícula, ou None se o aluno já atingiu a cota do plano
+    """
+    bloquear_linhas(db, Aluno, Aluno.id == aluno_id)
+    origem = select(literal(horario_id), Aluno.id).where(Aluno.id == aluno_id, dentro_da_cota())
+    matricula_id = db.execute(
+        insert(AlunoHorario)
+        .from_select(["horario_id", "aluno_id"], origem)
+        .returning(AlunoHorario.id)
+    ).scalar()
+    if matricula_id is not None:
+        record_changes(db, AlunoHorario.__tablename__, [matricula_id], "insert")
+    return matricula_id
+
+
+def matricular_em_lote(db: Session, pares: List[Tuple[int, int]]) -> ResultadoLote:
+    """
+    Matricula os pares (horario_id, aluno_id) válidos
+
+    Args:
+        db: sessão (a transação não é commitada aqui)
+        pares: pares (horario_id, aluno_id) na ordem de processamento
+
+    Returns:
+        ResultadoLote com status 201 (matriculado) ou o erro de cada item
+    """
+    # Linhas dos horários bloqueadas até o commit antes da contagem, como na promoção da fila
+    ocupacao = ocupacao_horarios(db, (horario_id for horario_id, _ in pares), bloquear=True)
+    aluno_ids = {aluno_id for _, aluno_id in pares}
+    bloquear_linhas(db, Aluno, Aluno.id.in_(aluno_ids))
+    alunos = {
+        row.id: row for row in db.execute(
+            select(Aluno.id, Aluno.ativo, cota_semanal().label("cota"), aulas_matriculadas().label("matriculadas"))
+            .where(Aluno.id.in_(aluno_ids))
+        )
+    }
+    existentes = set(db.execute(
+        select(AlunoHorario.horario_id, AlunoHorario.aluno_id)
+        .where(tuple_(AlunoHorario.horario_id, AlunoHorario.aluno_id).in_(set(pares)))
+    ).all())
+
+    matriculados = {horario_id: atual for horario_id, (_, atual) in ocupacao.items()}
+    aulas = {aluno_id: aluno.matriculadas for aluno_id, aluno in alunos.items()}
+    itens: List[ResultadoItem] = []
+    novos: List[ResultadoItem] = []
+    for horario_id, aluno_id in pares:
+        item = ResultadoItem(horario_id=horario_id, aluno_id=aluno_id, status=201)
+        if horario_id not in ocupacao:
+            item.status, item.detail = 404, "Horário não encontrado"
+        elif aluno_id not in alunos:
+            item.status, item.detail = 404, "Aluno não encontrado"
+        elif not alunos[aluno_id].ativo:
+            item.status, item.detail = 400, "Aluno está inativo"
+        elif (horario_id, aluno_id) in existentes:
+            item.status, item.detail = 400, "Aluno já está matriculado neste horário"
+        elif matriculados[horario_id] >= ocupacao[horario_id][0]:
+            item.status = 400
+            item.detail = f"Horário já está com capacidade máxima ({ocupacao[horario_id][0]} alunos)"
+        elif alunos[aluno_id].cota is not None and aulas[aluno_id] >= alunos[aluno_id].cota:
+            item.status, item.detail = 400, f"{LIMITE_PLANO} ({alunos[aluno_id].cota})"
+        else:
+            existentes.add((horario_id, aluno_id))
+            matriculados[horario_id] += 1
+            aulas[aluno_id] += 1
+            novos.append(item)
+        itens.append(item)
+
+    # Aulas datadas lotadas por reposições: os últimos itens do horário ficam sem vaga
+    aceitos = ocupar_vagas(db, deltas_por_horario(item.horario_id for item in novos))
+    for item in reversed(novos):
+        if aceitos[item.horario_id] < matriculados[item.horario_id] - ocupacao[item.horario_id][1]:
+            item.status = 400
+            item.detail = f"Horário já está com capacidade máxima ({ocupacao[item.horario_id][0]} alunos)"
+            matriculados[item.horario_id] -= 1
+            aulas[item.aluno_id] -= 1
+    novos = [item for item in novos if item.status == 201]
+
+    if novos:
+        # Um único INSERT ... SELECT sobre os pares: a cota é conferida no
+        # statement que grava, somando às matrículas do aluno as linhas dele
+        # que vêm antes no lote (row_number por aluno, na ordem dos itens)
+        lote = _candidatos((item.horario_id, item.aluno_id) for item in novos)
+        numerados = select(
+            lote.c.horario_id, lote.c.aluno_id,
+            func.row_number().over(partition_by=lote.c.aluno_id, order_by=lote.c.ordem).label("novas"),
+        ).subquery()
+        cota = cota_semanal()
+        origem = (
+            select(numerados.c.horario_id, Aluno.id)
+            .join_from(numerados, Aluno, Aluno.id == numerados.c.aluno_id)
+            .where(or_(cota.is_(None), aulas_matriculadas() + numerados.c.novas <= cota))
+        )
+        rows = db.execute(
+            insert(AlunoHorario)
+            .from_select(["horario_id", "aluno_id"], origem)
+            .returning(AlunoHorario.id, AlunoHorario.horario_id, AlunoHorario.aluno_id)
+        ).all()
+        ids = {(horario_id, aluno_id): matricula_id for matricula_id, horario_id, aluno_id in rows}
+        record_changes(db, AlunoHorario.__tablename__, ids.values(), "insert")
+
+        # Pares que o INSERT não devolveu: a cota acabou depois da leitura dos alunos
+        fora_da_cota = []
+        for item in novos:
+            item.matricula_id = ids.get((item.horario_id, item.aluno_id))
+            if item.matricula_id is None:
+                item.status, item.detail = 400, f"{LIMITE_PLANO} ({alunos[item.aluno_id].cota})"
+                matriculados[item.horario_id] -= 1
+                fora_da_cota.append(item.horario_id)
+        ajustar_ocupadas(db, deltas_por_horario(fora_da_cota, sinal=-1))
+
+    return ResultadoLote(
+        itens=itens,
+        ocupacao={horario_id: (capacidade, matriculados[horario_id]) for horario_id, (capacidade, _) in ocupacao.items()},
+    )
+
+
+def desmatricular_em_lote(db: Session, pares: List[Tuple[int, int]]) -> ResultadoLote:
+    """
+    Remove as matrículas dos pares (horario_id, aluno_id) em um DELETE ... RETURNING
+
+    Returns:
+        ResultadoLote com status 200 (removido) ou 404 de cada item; a
+        ocupação não é calculada (veja ocupacao_horarios)
+    """
+    rows = db.execute(
+        delete(AlunoHorario)
+        .where(tuple_(AlunoHorario.horario_id, AlunoHorario.aluno_id).in_(set(pares)))
+        .returning(AlunoHorario.id, AlunoHorario.horario_id, AlunoHorario.aluno_id),
+        execution_options={"synchronize_session": False},
+    ).all()
+    removidos = {(horario_id, aluno_id): matricula_id for matricula_id, horario_id, aluno_id in rows}
+    record_changes(db, AlunoHorario.__tablename__, removidos.values(), "delete")
+    ajustar_ocupadas(db, deltas_por_horario((horario_id for horario_id, _ in removidos), sinal=-1))
+
+    itens: List[ResultadoItem] = []
+    for horario_id, aluno_id in pares:
+        matricula_id = removidos.pop((horario_id, aluno_id), None)
+        if matricula_id is None:
+            itens.append(ResultadoItem(
+                horario_id=horario_id, aluno_id=aluno_id, status=404,
+                detail="Aluno não está matriculado neste horário"
+            ))
+        else:
+            itens.append(ResultadoItem(horario_id=horario_id, aluno_id=aluno_id, status=200, matricula_id=matricula_id))
+    return ResultadoLote(itens=itens)
+
+
+def relatorio_cotas(db: Session, situacao: Optional[str] = None) -> List[Any]:
+    """
+    Alunos ativos fora da cota semanal do plano (1 query agregada)
+
+    Args:
+        situacao: "acima" (mais matrículas que aulas_por_semana), "abaixo"
+            (menos) ou None (os dois)
+
+    Returns:
+        Linhas (aluno_id, nome_completo, plano_id, plano_nome,
+        aulas_por_semana, matriculadas, diferenca), das maiores diferenças
+        para as menores; planos com acesso livre ficam de fora
+    """
+    matriculadas = func.count(AlunoHorario.id)
+    diferenca = matriculadas - Plano.aulas_por_semana
+    filtro = {"acima": diferenca > 0, "abaixo": diferenca < 0}.get(situacao, diferenca != 0)
+    return db.execute(
+        select(
+            Aluno.id.label("aluno_id"), Aluno.nome_completo, Plano.id.label("plano_id"),
+            Plano.nome.label("plano_nome"), Plano.aulas_por_semana,
+            matriculadas.label("matriculadas"), diferenca.label("diferenca"),
+        )
+        .join(Plano, Plano.id == Aluno.plano_id)
+        .outerjoin(AlunoHorario, AlunoHorario.aluno_id == Aluno.id)
+        .where(Aluno.ativo.is_(True), Plano.acesso_livre.isnot(True))
+        .group_by(Aluno.id, Aluno.nome_completo, Plano.id, Plano.nome, Plano.aulas_por_semana)
+        .having(filtro)
+        .order_by(func.abs(diferenca).desc(), Aluno.nome_completo)
+    ).all()
@@ -1,13 +1,25 @@
 """
 Serviço de notificações automáticas com APScheduler
+
+Lembrete de vencimento: irmãos costumam ter o mesmo responsável e o mesmo
+WhatsApp. Em vez de uma mensagem por aluno, os alunos a lembrar são
+agrupados pelo telefone normalizado (telefone_e164) em uma única query e cada responsável
+recebe uma mensagem com todos os filhos e valores (gravada na outbox e
+enviada pelo despachante).
 """
+import calendar
 import logging
 from datetime import datetime, date, timedelta
+from typing import Any, List
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import JSON, exists, func, select
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
 from app.models.aluno import Aluno
 from app.models.pagamento import Pagamento
+from app.services import outbox
 from app.services.whatsapp_service import EvolutionWhatsAppService
 from app.database import SessionLocal
 
@@ -18,6 +30,81 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+DIAS_AVISO_VENCIMENTO = 3
+NOTIFICACAO_VENCIMENTO = "lembrete_vencimento"
+
+
+class alunos_json(FunctionElement):
+    """Lista JSON [[id, nome, valor], ...] dos alunos do grupo (agregação)"""
+    type = JSON()
+    name = "alunos_json"
+    inherit_cache = True
+
+
+@compiles(alunos_json)
+def _alunos_json_sqlite(element, compiler, **kw):
+    return f"json_group_array(json_array({compiler.process(element.clauses, **kw)}))"
+
+
+@compiles(alunos_json, "postgresql")
+def _alunos_json_postgresql(element, compiler, **kw):
+    return f"json_agg(json_build_array({compiler.process(element.clauses, **kw)}))"
+
+
+def lembretes_vencimento(db: Session, dia_aviso: date) -> List[Any]:
+    """
+    Alunos ativos com vencimento em dia_aviso e sem pagamento do mês,
+    agrupados por telefone_e164 (1 query)
+
+    No último dia do mês entram também os vencimentos nos dias que o mês
+    não tem (ex: dia 31 em novembro).
+
+    Returns:
+        Linhas (telefone, responsavel, total, alunos), uma por telefone;
+        alunos = [[aluno_id, nome_completo, valor_mensalidade], ...]
+    """
+    mes_referencia = f"{dia_aviso.year}-{dia_aviso.month:02d}"
+    ultimo_dia = calendar.monthrange(dia_aviso.year, dia_aviso.month)[1]
+    vence = Aluno.dia_vencimento >= dia_aviso.day if dia_aviso.day == ultimo_dia else Aluno.dia_vencimento == dia_aviso.day
+    pago = exists().where(Pagamento.aluno_id == Aluno.id, Pagamento.mes_referencia == mes_referencia)
+
+    return db.execute(
+        select(
+            Aluno.telefone_e164.label("telefone"),
+            func.min(Aluno.responsavel).label("responsavel"),
+            func.sum(Aluno.valor_mensalidade).label("total"),
+            alunos_json(Aluno.id, Aluno.nome_completo, Aluno.valor_mensalidade).label("alunos"),
+        )
+        .where(Aluno.ativo == True, vence, ~pago, Aluno.telefone_e164.isnot(None))
+        .group_by(Aluno.telefone_e164)
+        .order_by(Aluno.telefone_e164)
+    ).all()
+
+
+def enfileirar_lembretes(db: Session, dia_aviso: date, dias_antes: int = DIAS_AVISO_VENCIMENTO) -> int:
+    """
+    Grava na outbox um lembrete por responsável (sem commit)
+
+    Returns:
+        Quantidade de mensagens (telefones distintos)
+    """
+    grupos = lembretes_vencimento(db, dia_aviso)
+    outbox.enqueue(db, NOTIFICACAO_VENCIMENTO, [
+        {
+            "telefone": grupo.telefone,
+            "responsavel": grupo.responsavel,
+            "vencimento": dia_aviso.isoformat(),
+            "dias_antes": dias_antes,
+            "total": float(grupo.total),
+            "alunos": [
+                {"aluno_id": aluno_id, "nome": nome, "valor": float(valor)}
+                for aluno_id, nome, valor in sorted(grupo.alunos, key=lambda aluno: aluno[1])
+            ],
+        }
+        for grupo in grupos
+    ])
+    return len(grupos)
+
 
 class NotificacaoService:
     """Serviço para gerenciar notificações automáticas de pagamentos"""
@@ -30,58 +117,22 @@ class NotificacaoService:
 
     def verificar_vencimentos(self):
         """
-        Verifica alunos com vencimento próximo (3 dias antes) e envia avisos
+        Lembra os responsáveis dos vencimentos em 3 dias (uma mensagem por telefone)
         Executado diariamente às 9h
         """
         logger.info("Iniciando verificação de vencimentos...")
 
         db: Session = SessionLocal()
         try:
-            hoje = date.today()
-            dia_aviso = hoje + timedelta(days=3)  # 3 dias antes do vencimento
-
-            # Buscar alunos ativos com vencimento próximo
-            alunos = db.query(Aluno).filter(
-                Aluno.ativo == True,
-                Aluno.dia_vencimento == dia_aviso.day
-            ).all()
-
-            logger.info(f"Encontrados {len(alunos)} alunos com vencimento em {dia_aviso.day}/{dia_aviso.month}")
-
-            # Enviar avisos
-            enviados = 0
-            falhas = 0
-
-            for aluno in alunos:
-                # Verificar se já existe pagamento para o mês atual
-                mes_referencia = f"{hoje.year}-{hoje.month:02d}"
-                pagamento_existente = db.query(Pagamento).filter(
-                    Pagamento.aluno_id == aluno.id,
-                    Pagamento.mes_referencia == mes_referencia,
-                    Pagamento.pago == True
-                ).first()
-
-                # Se já pagou, não enviar aviso
-                if pagamento_existente:
-                    logger.info(f"Aluno {aluno.nome_completo} já efetuou o pagamento de {mes_referencia}")
-                    continue
-
-                # Enviar aviso de vencimento
-                try:
-                    sucesso = self.whatsapp_service.send_aviso_vencimento(aluno, dias_antes=3)
-                    if sucesso:
-                        enviados += 1
-                        logger.info(f"Aviso de vencimento enviado para {aluno.nome_completo}")
-                    else:
-                        falhas += 1
-                        logger.warning(f"Falha ao enviar aviso para {aluno.nome_completo}")
-                except Exception as e:
-                    falhas += 1
-                    logger.error(f"Erro ao enviar aviso para {aluno.nome_completo}: {str(e)}")
-
-            logger.info(f"Verificação de vencimentos concluída. Enviados: {enviados}, Falhas: {falhas}")
+            dia_aviso = date.today() + timedelta(days=DIAS_AVISO_VENCIMENTO)
+            mensagens = enfileirar_lembretes(db, dia_aviso)
+            db.commit()
+            logger.info(
+                f"Verificação de vencimentos concluída: {mensagens} lembrete(s) de {dia_aviso:%d/%m} na outbox"
+            )
 
         except Exception as e:
+            db.rollback()
             logger.error(f"Erro na verificação de vencimentos: {str(e)}")
         finally:
             db.close()
@@ -125,8 +176,7 @@ class NotificacaoService:
                     mes_referencia = f"{hoje.year}-{hoje.month:02d}"
                     pagamento_existente = db.query(Pagamento).filter(
                         Pagamento.aluno_id == aluno.id,
-                        Pagamento.mes_referencia == mes_referencia,
-                        Pagamento.pago == True
+                        Pagamento.mes_referencia == mes_referencia
                     ).first()
 
                     # Se já pagou, não enviar aviso
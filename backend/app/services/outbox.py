@@ -0,0 +1,219 @@
+"""
+Outbox de notificações
+
+Notificações (WhatsApp) não podem sair de dentro de uma transação: se o
+commit falhar, o aluno recebe a mensagem de algo que não aconteceu; se o
+envio for feito depois do commit e o processo cair, a mensagem se perde.
+
+Com a outbox a mensagem é gravada (enqueue) na MESMA transação da alteração
+e um despachante em segundo plano (dispatch_loop, iniciado no lifespan da
+aplicação) envia as pendentes. Envios com falha são tentados de novo até
+OUTBOX_MAX_TENTATIVAS vezes.
+
+Com vários workers (uvicorn --workers N) cada processo roda o seu
+dispatch_loop: antes de enviar, o despachante reserva o lote em um único
+UPDATE ... RETURNING (reservado_por/reservado_em; no PostgreSQL com FOR
+UPDATE SKIP LOCKED) e só envia as mensagens que conseguiu reservar. A
+reserva vale OUTBOX_RESERVA_SECONDS: se o processo cair no meio do lote, as
+mensagens não enviadas voltam a ficar disponíveis depois desse prazo.
+
+Cada tipo de mensagem tem um handler registrado com @handler(tipo), que
+recebe o payload (JSON) e retorna True quando o envio foi feito. O payload
+carrega tudo que o envio precisa, sem consultas no momento do envio.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import session_scope
+from app.models.outbox import OutboxMessage
+
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_INTERVAL_SECONDS = float(os.getenv("OUTBOX_DISPATCH_INTERVAL_SECONDS", "30"))
+MAX_TENTATIVAS = int(os.getenv("OUTBOX_MAX_TENTATIVAS", "5"))
+RESERVA_SECONDS = float(os.getenv("OUTBOX_RESERVA_SECONDS", "300"))
+LOTE_ENVIO = 100
+
+# Identifica o processo nas reservas (útil para investigar mensagens presas)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+Handler = Callable[[Dict[str, Any]], bool]
+_handlers: Dict[str, Handler] = {}
+
+
+def handler(tipo: str) -> Callable[[Handler], Handler]:
+    """Registra a função que envia as mensagens de um tipo"""
+    def registrar(func: Handler) -> Handler:
+        _handlers[tipo] = func
+        return func
+    return registrar
+
+
+def enqueue(db: Session, tipo: str, payloads: list) -> None:
+    """
+    Grava mensagens na outbox dentro da transação corrente (sem commit)
+
+    Args:
+        db: sessão da alteração que originou as mensagens
+        tipo: tipo da mensagem (precisa de um handler registrado)
+        payloads: lista de dicts serializáveis em JSON
+    """
+    if not payloads:
+        return
+    agora = datetime.utcnow()
+    db.execute(insert(OutboxMessage), [
+        {"tipo": tipo, "payload": json.dumps(payload, ensure_ascii=False, default=str), "created_at": agora, "tentativas": 0}
+        for payload in payloads
+    ])
+
+
+def _disponivel(agora: datetime):
+    """Pendente, abaixo do limite de tentativas e sem reserva válida"""
+    return and_(
+        OutboxMessage.enviado_em.is_(None),
+        OutboxMessage.tentativas < MAX_TENTATIVAS,
+        or_(
+            OutboxMessage.reservado_em.is_(None),
+            OutboxMessage.reservado_em < agora - timedelta(seconds=RESERVA_SECONDS),
+        ),
+    )
+
+
+def reservar_pendentes(db: Session, limit: int = LOTE_ENVIO, worker: str = WORKER_ID) -> List[int]:
+    """
+    Reserva um lote de mensagens pendentes para este processo (1 UPDATE ... RETURNING, com commit)
+
+    O critério é repetido no WHERE externo: no PostgreSQL, um UPDATE que
+    esperou a reserva concorrente da mesma linha reavalia a linha atualizada e
+    a deixa de fora. SKIP LOCKED evita essa espera.
+
+    Returns:
+        ids reservados, em ordem de gravação
+    """
+    agora = datetime.utcnow()
+    candidatas = (
+        select(OutboxMessage.id)
+        .where(_disponivel(agora))
+        .order_by(OutboxMessage.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    ids = db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(candidatas.scalar_subquery()), _disponivel(agora))
+        .values(reservado_por=worker, reservado_em=agora)
+        .returning(OutboxMessage.id),
+        execution_options={"synchronize_session": False},
+    ).scalars().all()
+    db.commit()
+    return sorted(ids)
+
+
+def dispatch_pending(db: Session, limit: int = LOTE_ENVIO) -> int:
+    """
+    Reserva e envia as mensagens pendentes (na ordem de gravação)
+
+    Returns:
+        Quantidade de mensagens enviadas
+    """
+    ids = reservar_pendentes(db, limit)
+    if not ids:
+        return 0
+    reservadas = db.query(OutboxMessage).filter(OutboxMessage.id.in_(ids)).order_by(OutboxMessage.id).all()
+    enviadas = 0
+    for mensagem in reservadas:
+        mensagem.tentativas += 1
+        enviar = _handlers.get(mensagem.tipo)
+        try:
+            if enviar is None:
+                raise LookupError(f"Nenhum handler para o tipo '{mensagem.tipo}'")
+            if not enviar(json.loads(mensagem.payload)):
+                raise RuntimeError("Envio recusado")
+        except Exception as e:
+            mensagem.ultimo_erro = str(e)
+            logger.warning("Outbox: falha ao enviar mensagem %d (%s): %s", mensagem.id, mensagem.tipo, e)
+        else:
+            mensagem.enviado_em = datetime.utcnow()
+            mensagem.ultimo_erro = None
+            enviadas += 1
+        # Libera a reserva: com falha, a mensagem volta para a próxima passada
+        mensagem.reservado_em = None
+        # Commit por mensagem: um envio feito não é repetido se o processo cair
+        db.commit()
+    return enviadas
+
+
+def _dispatch_once(app=None) -> int:
+    with session_scope(app) as db:
+        return dispatch_pending(db)
+
+
+async def dispatch_loop(app=None, interval: float = DISPATCH_INTERVAL_SECONDS) -> None:
+    """Tarefa em segundo plano: envio periódico das mensagens pendentes"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            enviadas = await run_in_threadpool(_dispatch_once, app)
+            if enviadas:
+                logger.info("Outbox: %d mensagem(ns) enviada(s)", enviadas)
+        except Exception:
+            logger.exception("Falha no envio das mensagens da outbox")
+
+
+@handler("fila_espera_promocao")
+def _enviar_promocao_fila(payload: Dict[str, Any]) -> bool:
+    """WhatsApp para o aluno que saiu da fila de espera e foi matriculado"""
+    if not payload.get("telefone"):
+        # Sem telefone não há o que enviar: a mensagem é dada como entregue
+        logger.info("Outbox: aluno %s promovido da fila sem telefone cadastrado", payload.get("aluno_id"))
+        return True
+
+    from app.services.whatsapp_service import EvolutionWhatsAppService
+
+    mensagem = (
+        f"Olá, {payload['nome']}! 👋\n\n"
+        f"Abriu uma vaga e você saiu da fila de espera: sua matrícula na turma de "
+        f"{payload['tipo_aula']} de {payload['dia_semana']} às {payload['horario']} está confirmada. 🏊\n\n"
+        f"Até a aula!"
+    )
+    return EvolutionWhatsAppService().send_text_message(payload["telefone"], mensagem)
+
+
+@handler("lembrete_vencimento")
+def _enviar_lembrete_vencimento(payload: Dict[str, Any]) -> bool:
+    """WhatsApp de vencimento próximo, um por responsável, com todos os alunos e valores"""
+    if not payload.get("telefone"):
+        logger.info("Outbox: lembrete de vencimento sem telefone (%d aluno(s))", len(payload.get("alunos", [])))
+        return True
+
+    from app.services.whatsapp_service import EvolutionWhatsAppService
+
+    alunos = payload["alunos"]
+    vencimento = datetime.fromisoformat(payload["vencimento"]).strftime("%d/%m/%Y")
+    if len(alunos) == 1:
+        saudacao = alunos[0]["nome"]
+        valores = f"💰 *Valor:* R$ {alunos[0]['valor']:.2f}"
+    else:
+        saudacao = payload.get("responsavel") or "responsável"
+        valores = "\n".join(f"• {aluno['nome']}: R$ {aluno['valor']:.2f}" for aluno in alunos)
+        valores += f"\n\n💰 *Total:* R$ {payload['total']:.2f}"
+    mensagem = (
+        f"Olá, {saudacao}! 👋\n\n"
+        f"Este é um lembrete amigável sobre {'sua mensalidade' if len(alunos) == 1 else 'as mensalidades'} de natação.\n\n"
+        f"{valores}\n"
+        f"📅 *Vencimento:* {vencimento}\n"
+        f"⏰ *Faltam {payload['dias_antes']} dias para o vencimento*\n\n"
+        f"Caso já tenha efetuado o pagamento, desconsidere esta mensagem.\n\n"
+        f"Obrigado! 🏊‍♂️\nAcademia de Natação"
+    )
+    return EvolutionWhatsAppService().send_text_message(payload["telefone"], mensagem)
@@ -0,0 +1,279 @@
+"""
+Check-in de presença com gravação em lote
+
+No pico a catraca e o tablet da piscina mandam centenas de check-ins por
+minuto. Gravar cada um na requisição (validação + INSERT + commit) deixaria
+a API presa ao banco; aqui o POST /presencas só acrescenta a leitura a um
+buffer em memória e responde 202. O buffer é gravado em lote:
+
+- quando atinge PRESENCA_LOTE_TAMANHO leituras (a requisição que enche o
+  buffer acorda a tarefa de gravação)
+- a cada PRESENCA_FLUSH_INTERVAL_SECONDS (tarefa em segundo plano)
+- no encerramento da aplicação (lifespan)
+
+Cada lote custa 3 statements, qualquer que seja o tamanho: matrículas dos
+pares aluno-horário (1 SELECT), INSERT multi-linha das presenças ignorando
+as repetidas (ON CONFLICT DO NOTHING ... RETURNING) e o incremento do resumo
+mensal (INSERT ... ON CONFLICT DO UPDATE), tudo em uma transação.
+
+Durabilidade: o 202 significa "recebido", não "gravado". Leituras ainda no
+buffer se perdem se o processo morrer sem encerramento normal (no máximo um
+intervalo de gravação ou um lote); os dispositivos devem reenviar as
+leituras do dia em caso de dúvida (check-in repetido é ignorado). Se a
+gravação falhar, o lote volta para o início do buffer e é tentado de novo;
+acima de PRESENCA_BUFFER_LIMITE leituras pendentes o POST responde 503 em vez
+de acumular memória sem limite. Com vários workers cada processo tem o seu
+buffer.
+
+Leituras de alunos sem matrícula no horário são descartadas na gravação (com
+aviso no log): a validação não acontece na requisição para não custar uma
+query por check-in.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import session_scope
+from app.models.presenca import Presenca, PresencaResumo
+from app.models.turma import AlunoHorario
+
+logger = logging.getLogger(__name__)
+
+LOTE_TAMANHO = int(os.getenv("PRESENCA_LOTE_TAMANHO", "200"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("PRESENCA_FLUSH_INTERVAL_SECONDS", "5"))
+BUFFER_LIMITE = int(os.getenv("PRESENCA_BUFFER_LIMITE", "10000"))
+
+
+@dataclass(frozen=True)
+class CheckIn:
+    """Leitura recebida de um dispositivo"""
+    aluno_id: int
+    horario_id: int
+    registrado_em: datetime
+    origem: str
+
+
+@dataclass
+class ResultadoGravacao:
+    """Resultado da gravação de um lote"""
+    recebidas: int = 0
+    gravadas: int = 0
+    repetidas: int = 0
+    sem_matricula: int = 0
+
+
+def _insert(db: Session, model):
+    """INSERT com ON CONFLICT do dialeto da sessão (PostgreSQL em produção, SQLite nos testes)"""
+    dialeto = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialeto.insert(model)
+
+
+def _mes(dia: date) -> date:
+    return dia.replace(day=1)
+
+
+def gravar_presencas(db: Session, leituras: List[CheckIn]) -> ResultadoGravacao:
+    """
+    Grava um lote de leituras e atualiza o resumo mensal (3 statements, sem commit)
+
+    A primeira leitura de cada aluno em cada aula vale; as demais são
+    repetidas (no lote ou já gravadas antes).
+    """
+    resultado = ResultadoGravacao(recebidas=len(leituras))
+    primeiras: Dict[Tuple[int, date, int], CheckIn] = {}
+    for leitura in sorted(leituras, key=lambda l: l.registrado_em):
+        primeiras.setdefault((leitura.horario_id, leitura.registrado_em.date(), leitura.aluno_id), leitura)
+    if not primeiras:
+        return resultado
+
+    matriculas = {
+        (aluno_id, horario_id): matricula_id for matricula_id, aluno_id, horario_id in db.execute(
+            select(AlunoHorario.id, AlunoHorario.aluno_id, AlunoHorario.horario_id)
+            .where(tuple_(AlunoHorario.aluno_id, AlunoHorario.horario_id).in_(
+                {(l.aluno_id, l.horario_id) for l in primeiras.values()}
+            ))
+        )
+    }
+    linhas = [
+        {
+            "aluno_horario_id": matriculas[(l.aluno_id, l.horario_id)],
+            "aluno_id": l.aluno_id,
+            "horario_id": l.horario_id,
+            "data": dia,
+            "registrado_em": l.registrado_em,
+            "origem": l.origem,
+        }
+        for (_, dia, _), l in primeiras.items()
+        if (l.aluno_id, l.horario_id) in matriculas
+    ]
+    resultado.sem_matricula = len(primeiras) - len(linhas)
+    if resultado.sem_matricula:
+        logger.warning("Presenças: %d leitura(s) de aluno sem matrícula no horário descartada(s)", resultado.sem_matricula)
+    if not linhas:
+        resultado.repetidas = len(leituras) - resultado.sem_matricula
+        return resultado
+
+    # Um único INSERT multi-linha; presenças já gravadas ficam de fora do RETURNING
+    stmt = _insert(db, Presenca).on_conflict_do_nothing(index_elements=["horario_id", "data", "aluno_id"])
+    gravadas = db.execute(
+        stmt.values(linhas).returning(Presenca.aluno_id, Presenca.horario_id, Presenca.data, Presenca.registrado_em)
+    ).all()
+    resultado.gravadas = len(gravadas)
+    resultado.repetidas = len(leituras) - resultado.sem_matricula - resultado.gravadas
+    if not gravadas:
+        return resultado
+
+    totais = Counter((p.aluno_id, p.horario_id, _mes(p.data)) for p in gravadas)
+    ultimas: Dict[Tuple[int, int, date], datetime] = {}
+    for p in gravadas:
+        chave = (p.aluno_id, p.horario_id, _mes(p.data))
+        ultimas[chave] = max(ultimas.get(chave, p.registrado_em), p.registrado_em)
+
+    rollup = _insert(db, PresencaResumo).values([
+        {"aluno_id": aluno_id, "horario_id": horario_id, "mes": mes, "total": total,
+         "ultima_presenca": ultimas[(aluno_id, horario_id, mes)]}
+        for (aluno_id, horario_id, mes), total in totais.items()
+    ])
+    db.execute(rollup.on_conflict_do_update(
+        index_elements=["aluno_id", "horario_id", "mes"],
+        set_={
+            "total": PresencaResumo.total + rollup.excluded.total,
+            "ultima_presenca": case(
+                (PresencaResumo.ultima_presenca >= rollup.excluded.ultima_presenca, PresencaResumo.ultima_presenca),
+                else_=rollup.excluded.ultima_presenca,
+            ),
+        },
+    ))
+    return resultado
+
+
+class BufferPresencas:
+    """
+    Buffer de check-ins do processo
+
+    adicionar() é chamado pela rota (loop de eventos) e flush() pela tarefa
+    de gravação (threadpool): a lista é trocada sob um lock e só um flush
+    grava por vez, preservando a ordem das leituras. ao_encher é chamado
+    quando o buffer atinge o tamanho do lote (a tarefa de gravação registra
+    ali o aviso para acordar).
+    """
+
+    def __init__(self, tamanho_lote: int = LOTE_TAMANHO, limite: int = BUFFER_LIMITE):
+        self.tamanho_lote = tamanho_lote
+        self.limite = limite
+        self._leituras: List[CheckIn] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.ao_encher: Optional[Callable[[], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._leituras)
+
+    def adicionar(self, leituras: List[CheckIn]) -> bool:
+        """Acrescenta as leituras; False (nada acrescentado) se o buffer passou do limite"""
+        with self._lock:
+            if len(self._leituras) + len(leituras) > self.limite:
+                return False
+            self._leituras.extend(leituras)
+            cheio = len(self._leituras) >= self.tamanho_lote
+        if cheio and self.ao_encher is not None:
+            self.ao_encher()
+        return True
+
+    def flush(self, db: Session) -> ResultadoGravacao:
+        """Grava e commita tudo que está no buffer; em caso de erro as leituras voltam para o início"""
+        with self._flush_lock:
+            with self._lock:
+                leituras, self._leituras = self._leituras, []
+            if not leituras:
+                return ResultadoGravacao()
+            try:
+                resultado = gravar_presencas(db, leituras)
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    self._leituras[:0] = leituras
+                raise
+            return resultado
+
+    def clear(self) -> None:
+        with self._lock:
+            self._leituras.clear()
+
+
+presencas_buffer = BufferPresencas()
+
+
+def _flush_once(app=None) -> ResultadoGravacao:
+    with session_scope(app) as db:
+        return presencas_buffer.flush(db)
+
+
+async def flush_pendentes(app=None) -> None:
+    """Grava o que restou no buffer (encerramento da aplicação)"""
+    if len(presencas_buffer):
+        try:
+            resultado = await run_in_threadpool(_flush_once, app)
+            logger.info("Presenças: %d gravada(s) no encerramento", resultado.gravadas)
+        except Exception:
+            logger.exception("Falha ao gravar as presenças pendentes: %d leitura(s) perdida(s)", len(presencas_buffer))
+
+
+async def flush_loop(app=None, interval: float = FLUSH_INTERVAL_SECONDS) -> None:
+    """Tarefa em segundo plano: grava o buffer por tempo ou tamanho"""
+    cheio = asyncio.Event()
+    presencas_buffer.ao_encher = cheio.set
+    while True:
+        try:
+            await asyncio.wait_for(cheio.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        cheio.clear()
+        if not len(presencas_buffer):
+            continue
+        try:
+            resultado = await run_in_threadpool(_flush_once, app)
+            logger.debug("Presenças: lote de %d leitura(s), %d gravada(s)", resultado.recebidas, resultado.gravadas)
+        except Exception:
+            logger.exception("Falha ao gravar o lote de presenças (%d pendente(s))", len(presencas_buffer))
+
+
+def resumo_presencas(
+    db: Session, aluno_id: Optional[int] = None, horario_id: Optional[int] = None,
+    mes_inicio: Optional[date] = None, mes_fim: Optional[date] = None
+) -> List[Any]:
+    """
+    Frequência por aluno e horário a partir do resumo mensal (1 query)
+
+    Returns:
+        Linhas (aluno_id, horario_id, presencas, ultima_presenca), em ordem de aluno e horário
+    """
+    query = (
+        select(
+            PresencaResumo.aluno_id, PresencaResumo.horario_id,
+            func.sum(PresencaResumo.total).label("presencas"),
+            func.max(PresencaResumo.ultima_presenca).label("ultima_presenca"),
+        )
+        .group_by(PresencaResumo.aluno_id, PresencaResumo.horario_id)
+        .order_by(PresencaResumo.aluno_id, PresencaResumo.horario_id)
+    )
+    if aluno_id is not None:
+        query = query.where(PresencaResumo.aluno_id == aluno_id)
+    if horario_id is not None:
+        query = query.where(PresencaResumo.horario_id == horario_id)
+    if mes_inicio:
+        query = query.where(PresencaResumo.mes >= _mes(mes_inicio))
+    if mes_fim:
+        query = query.where(PresencaResumo.mes <= _mes(mes_fim))
+    return db.execute(query).all()
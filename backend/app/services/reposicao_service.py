@@ -0,0 +1,329 @@
+"""
+Reposições de aula e índice de vagas por aula datada
+
+A grade é semanal (Horario), mas a reposição é marcada para uma aula
+concreta: o horário de segunda 08:00 no dia 2026-10-19. Cada aula datada
+tem uma linha em ocorrencias_aula com o número de lugares ocupados
+(matriculados + reposições da data), para que a busca de vagas seja uma
+única query pelo índice (data, horario_id) em vez de contar as matrículas
+de cada horário:
+
+- gerar_ocorrencias: cria as aulas que faltam de hoje até JANELA_DIAS
+  (na criação do horário, na migração e periodicamente em segundo plano)
+- ajustar_ocupadas: soma/subtrai os deltas de matrícula, desmatrícula e
+  reposição (um UPDATE para todos os horários envolvidos)
+- ocupar_vagas: ocupa os lugares das matrículas novas só até a capacidade
+  de cada aula, contando as reposições já marcadas
+- reservar: ocupa a vaga com UPDATE ... WHERE ocupadas < capacidade, então
+  duas reservas simultâneas não ficam com o último lugar
+"""
+import asyncio
+import logging
+import os
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from sqlalchemy import case, delete, exists, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import session_scope
+from app.models.aluno import Aluno
+from app.models.horario import Horario
+from app.models.plano import Plano
+from app.models.reposicao import OcorrenciaAula, Reposicao
+from app.models.turma import AlunoHorario
+
+logger = logging.getLogger(__name__)
+
+# Dias à frente com aulas datadas (limite da busca de vagas sem reserva)
+JANELA_DIAS = int(os.getenv("REPOSICAO_JANELA_DIAS", "28"))
+# Intervalo da manutenção da janela (remove aulas passadas, cria as novas)
+MANUTENCAO_INTERVAL_SECONDS = float(os.getenv("REPOSICAO_MANUTENCAO_INTERVAL_SECONDS", "21600"))
+
+
+def _datas(dia_semana_numero: int, inicio: date, fim: date) -> List[date]:
+    """Datas entre inicio e fim (inclusive) que caem no dia da semana (1 = segunda)"""
+    primeira = inicio + timedelta(days=(dia_semana_numero - inicio.isoweekday()) % 7)
+    return [primeira + timedelta(weeks=i) for i in range((fim - primeira).days // 7 + 1)] if primeira <= fim else []
+
+
+def gerar_ocorrencias(
+    db: Session, horario_ids: Optional[Iterable[int]] = None,
+    inicio: Optional[date] = None, fim: Optional[date] = None
+) -> int:
+    """
+    Cria as aulas datadas que ainda não existem no período (sem commit)
+
+    Args:
+        horario_ids: horários a gerar (None = todos)
+        inicio / fim: período (padrão: hoje até hoje + JANELA_DIAS)
+
+    Returns:
+        Número de aulas criadas
+    """
+    inicio = inicio or date.today()
+    fim = fim or inicio + timedelta(days=JANELA_DIAS)
+    ids = None if horario_ids is None else set(horario_ids)
+    if ids is not None and not ids:
+        return 0
+
+    def filtro(coluna):
+        return [coluna.in_(ids)] if ids is not None else []
+
+    horarios = db.execute(
+        select(Horario.id, Horario.dia_semana_numero)
+        .where(Horario.dia_semana_numero.isnot(None), *filtro(Horario.id))
+    ).all()
+    if not horarios:
+        return 0
+    existentes = set(db.execute(
+        select(OcorrenciaAula.horario_id, OcorrenciaAula.data)
+        .where(OcorrenciaAula.data.between(inicio, fim), *filtro(OcorrenciaAula.horario_id))
+    ).all())
+    matriculados = dict(db.execute(
+        select(AlunoHorario.horario_id, func.count(AlunoHorario.id))
+        .where(*filtro(AlunoHorario.horario_id))
+        .group_by(AlunoHorario.horario_id)
+    ).all())
+    reposicoes = {
+        (horario_id, data): total for horario_id, data, total in db.execute(
+            select(Reposicao.horario_id, Reposicao.data, func.count(Reposicao.id))
+            .where(Reposicao.data.between(inicio, fim), *filtro(Reposicao.horario_id))
+            .group_by(Reposicao.horario_id, Reposicao.data)
+        )
+    }
+
+    linhas = [
+        {
+            "horario_id": horario_id,
+            "data": data,
+            "ocupadas": matriculados.get(horario_id, 0) + reposicoes.get((horario_id, data), 0),
+        }
+        for horario_id, numero in horarios
+        for data in _datas(numero, inicio, fim)
+        if (horario_id, data) not in existentes
+    ]
+    if linhas:
+        db.execute(insert(OcorrenciaAula), linhas)
+    return len(linhas)
+
+
+def recriar_ocorrencias(db: Session, horario_ids: Iterable[int]) -> int:
+    """Refaz as aulas futuras de horários que mudaram de dia da semana (sem commit)"""
+    ids = set(horario_ids)
+    db.execute(
+        delete(OcorrenciaAula).where(OcorrenciaAula.horario_id.in_(ids), OcorrenciaAula.data >= date.today()),
+        execution_options={"synchronize_session": False},
+    )
+    return gerar_ocorrencias(db, ids)
+
+
+def ajustar_ocupadas(db: Session, deltas: Mapping[int, int], data: Optional[date] = None) -> None:
+    """
+    Soma deltas de ocupação às aulas datadas (1 UPDATE, sem commit)
+
+    Args:
+        deltas: horario_id -> lugares ocupados (+) ou liberados (-)
+        data: só a aula desta data (reposição); None = todas as aulas
+            de hoje em diante (matrícula vale para todas as semanas)
+    """
+    deltas = {horario_id: delta for horario_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    periodo = OcorrenciaAula.data == data if data is not None else OcorrenciaAula.data >= date.today()
+    db.execute(
+        update(OcorrenciaAula)
+        .where(OcorrenciaAula.horario_id.in_(deltas), periodo)
+        .values(ocupadas=OcorrenciaAula.ocupadas + case(deltas, value=OcorrenciaAula.horario_id)),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def ocupar_vagas(db: Session, deltas: Mapping[int, int]) -> Dict[int, int]:
+    """
+    Ocupa lugares de matrícula em todas as aulas de hoje em diante, sem
+    passar da capacidade em nenhuma delas (sem commit)
+
+    Um UPDATE soma os deltas e devolve a ocupação de cada aula: as linhas
+    ficam bloqueadas até o fim da transação, então uma reserva simultânea
+    (_ocupar_vaga) espera e vê o valor final. Se alguma aula de um horário
+    passou da capacidade (reposições da data), o horário fica só com os
+    lugares que cabiam na aula mais cheia e o excesso é devolvido com
+    ajustar_ocupadas.
+
+    Args:
+        deltas: horario_id -> lugares a ocupar (matrículas novas)
+
+    Returns:
+        horario_id -> lugares efetivamente ocupados (0 a delta); horário sem
+        aulas datadas aceita o delta inteiro
+    """
+    deltas = {horario_id: delta for horario_id, delta in deltas.items() if delta > 0}
+    if not deltas:
+        return {}
+    capacidade = (
+        select(Horario.capacidade_maxima)
+        .where(Horario.id == OcorrenciaAula.horario_id)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        update(OcorrenciaAula)
+        .where(OcorrenciaAula.horario_id.in_(deltas), OcorrenciaAula.data >= date.today())
+        .values(ocupadas=OcorrenciaAula.ocupadas + case(deltas, value=OcorrenciaAula.horario_id))
+        .returning(OcorrenciaAula.horario_id, OcorrenciaAula.ocupadas - capacidade),
+        execution_options={"synchronize_session": False},
+    ).all()
+    excesso: Dict[int, int] = {}
+    for horario_id, acima in rows:
+        excesso[horario_id] = max(excesso.get(horario_id, 0), acima)
+    aceitos = {horario_id: delta - min(delta, excesso.get(horario_id, 0)) for horario_id, delta in deltas.items()}
+    ajustar_ocupadas(db, {horario_id: aceitos[horario_id] - delta for horario_id, delta in deltas.items()})
+    return aceitos
+
+
+def deltas_por_horario(horario_ids: Iterable[int], sinal: int = 1) -> Dict[int, int]:
+    """Deltas para ajustar_ocupadas a partir dos horários de cada matrícula criada (+1) ou removida (-1)"""
+    return {horario_id: sinal * total for horario_id, total in Counter(horario_ids).items()}
+
+
+def buscar_vagas(
+    db: Session, inicio: date, fim: date, tipo_aula: Optional[str] = None, limite: Optional[int] = None
+) -> List[Any]:
+    """Aulas datadas com vaga no período, em ordem de data e horário (1 query pelo índice de data)"""
+    vagas = Horario.capacidade_maxima - OcorrenciaAula.ocupadas
+    query = (
+        select(
+            OcorrenciaAula.horario_id, OcorrenciaAula.data, Horario.dia_semana, Horario.horario,
+            Horario.tipo_aula, Horario.professor_id, vagas.label("vagas"),
+        )
+        .join(Horario, Horario.id == OcorrenciaAula.horario_id)
+        .where(OcorrenciaAula.data.between(inicio, fim), vagas > 0)
+        .order_by(OcorrenciaAula.data, Horario.horario, OcorrenciaAula.horario_id)
+    )
+    if tipo_aula:
+        query = query.where(Horario.tipo_aula == tipo_aula)
+    if limite:
+        query = query.limit(limite)
+    return db.execute(query).all()
+
+
+@dataclass
+class ResultadoReserva:
+    """Resultado da reserva (status/detail como na resposta HTTP)"""
+    status: int
+    detail: Optional[str] = None
+    reposicao: Optional[Reposicao] = None
+
+
+def _ocupar_vaga(db: Session, horario_id: int, data: date) -> bool:
+    capacidade = select(Horario.capacidade_maxima).where(Horario.id == horario_id).scalar_subquery()
+    return db.execute(
+        update(OcorrenciaAula)
+        .where(
+            OcorrenciaAula.horario_id == horario_id,
+            OcorrenciaAula.data == data,
+            OcorrenciaAula.ocupadas < capacidade,
+        )
+        .values(ocupadas=OcorrenciaAula.ocupadas + 1)
+        .returning(OcorrenciaAula.ocupadas),
+        execution_options={"synchronize_session": False},
+    ).first() is not None
+
+
+def reservar(
+    db: Session, aluno_id: int, horario_id: int, data: date, observacao: Optional[str] = None
+) -> ResultadoReserva:
+    """
+    Marca a reposição do aluno na aula datada (sem commit)
+
+    Returns:
+        ResultadoReserva com status 201 e a reposição; 404 aluno/horário
+        inexistente; 400 aluno inativo, plano sem reposição, aluno já
+        matriculado no horário, data inválida, aula lotada ou reposição repetida
+    """
+    aluno = db.execute(
+        select(Aluno.ativo, Plano.permite_reposicao)
+        .outerjoin(Plano, Plano.id == Aluno.plano_id)
+        .where(Aluno.id == aluno_id)
+    ).first()
+    if aluno is None:
+        return ResultadoReserva(404, "Aluno não encontrado")
+    if not aluno.ativo:
+        return ResultadoReserva(400, "Aluno está inativo")
+    if aluno.permite_reposicao is False:
+        return ResultadoReserva(400, "O plano do aluno não permite reposição")
+
+    matriculado = exists().where(AlunoHorario.horario_id == Horario.id, AlunoHorario.aluno_id == aluno_id)
+    horario = db.execute(
+        select(Horario.dia_semana, Horario.dia_semana_numero, matriculado.label("matriculado"))
+        .where(Horario.id == horario_id)
+    ).first()
+    if horario is None:
+        return ResultadoReserva(404, "Horário não encontrado")
+    if horario.matriculado:
+        return ResultadoReserva(400, "Aluno já está matriculado neste horário")
+    if data < date.today():
+        return ResultadoReserva(400, "Reposição só pode ser marcada para hoje ou datas futuras")
+    if data.isoweekday() != horario.dia_semana_numero:
+        return ResultadoReserva(400, f"A data não é um dia de aula deste horário ({horario.dia_semana})")
+
+    # Aula além da janela ainda não tem linha: cria e tenta de novo
+    if not _ocupar_vaga(db, horario_id, data) and not (
+        gerar_ocorrencias(db, [horario_id], data, data) and _ocupar_vaga(db, horario_id, data)
+    ):
+        return ResultadoReserva(400, "Não há vagas nesta aula")
+
+    reposicao = Reposicao(
+        aluno_id=aluno_id, horario_id=horario_id, data=data, observacao=observacao, created_at=datetime.utcnow()
+    )
+    try:
+        with db.begin_nested():
+            db.add(reposicao)
+    except IntegrityError:
+        ajustar_ocupadas(db, {horario_id: -1}, data)
+        return ResultadoReserva(400, "Aluno já tem reposição marcada nesta aula")
+    return ResultadoReserva(201, reposicao=reposicao)
+
+
+def cancelar(db: Session, reposicao_id: int) -> bool:
+    """Desmarca a reposição e libera a vaga da aula (sem commit); False se não existe"""
+    row = db.execute(
+        delete(Reposicao).where(Reposicao.id == reposicao_id).returning(Reposicao.horario_id, Reposicao.data),
+        execution_options={"synchronize_session": False},
+    ).first()
+    if row is None:
+        return False
+    ajustar_ocupadas(db, {row.horario_id: -1}, row.data)
+    return True
+
+
+def manter_janela(db: Session) -> int:
+    """Remove as aulas datadas passadas e cria as que entraram na janela (sem commit)"""
+    db.execute(
+        delete(OcorrenciaAula).where(OcorrenciaAula.data < date.today()),
+        execution_options={"synchronize_session": False},
+    )
+    return gerar_ocorrencias(db)
+
+
+def _manter_janela_once(app=None) -> int:
+    with session_scope(app) as db:
+        criadas = manter_janela(db)
+        db.commit()
+        return criadas
+
+
+async def manutencao_loop(app=None, interval: float = MANUTENCAO_INTERVAL_SECONDS) -> None:
+    """Tarefa em segundo plano: mantém a janela de aulas datadas"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            criadas = await run_in_threadpool(_manter_janela_once, app)
+            if criadas:
+                logger.info("Reposições: %d aula(s) datada(s) criada(s)", criadas)
+        except Exception:
+            logger.exception("Falha na manutenção das aulas datadas")
@@ -0,0 +1,73 @@
+"""
+Telefones normalizados (E.164)
+
+Alunos e professores guardam, além do telefone digitado, o telefone_e164
+(+5511999999999) calculado na gravação: pelos @validates dos modelos nos
+INSERTs e pelo derived_columns do repositório nos UPDATEs. O envio de
+WhatsApp e a busca por telefone usam essa coluna (indexada) em vez de
+normalizar o texto a cada envio ou varrer a tabela.
+
+backfill_telefones preenche os registros sem telefone_e164 depois de cargas
+feitas direto no banco (os gravados antes da coluna existir são preenchidos
+pela migração 16, com sua própria cópia da regra): só lê linhas com telefone
+e sem telefone_e164, em lotes pela chave primária.
+"""
+import logging
+from typing import Dict, Union
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.aluno import Aluno
+from app.models.professor import Professor
+from app.utils.helpers import normalizar_telefone_e164
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_LOTE = 1000
+
+# tabela -> coluna com o telefone digitado
+ORIGENS = {
+    Aluno.__table__: "telefone_whatsapp",
+    Professor.__table__: "telefone",
+}
+
+
+def backfill_telefones(db: Union[Session, Connection], lote: int = BACKFILL_LOTE) -> Dict[str, int]:
+    """
+    Preenche telefone_e164 de alunos e professores que ainda não têm (sem commit)
+
+    Telefones inválidos ficam sem telefone_e164 (e são lidos de novo na próxima passada).
+
+    Returns:
+        tabela -> quantidade de registros preenchidos
+    """
+    preenchidos = {}
+    for tabela, origem in ORIGENS.items():
+        telefone, ultimo_id, total = tabela.c[origem], 0, 0
+        atualizar = (
+            update(tabela)
+            .where(tabela.c.id == bindparam("_id"))
+            .values(telefone_e164=bindparam("_e164"))
+        )
+        while True:
+            linhas = db.execute(
+                select(tabela.c.id, telefone)
+                .where(tabela.c.id > ultimo_id, telefone.isnot(None), tabela.c.telefone_e164.is_(None))
+                .order_by(tabela.c.id)
+                .limit(lote)
+            ).all()
+            if not linhas:
+                break
+            ultimo_id = linhas[-1].id
+            valores = [
+                {"_id": linha.id, "_e164": e164}
+                for linha in linhas if (e164 := normalizar_telefone_e164(linha[1])) is not None
+            ]
+            if valores:
+                db.execute(atualizar, valores)
+                total += len(valores)
+        preenchidos[tabela.name] = total
+        logger.info("Telefones E.164: %d registro(s) de %s preenchido(s)", total, tabela.name)
+    return preenchidos
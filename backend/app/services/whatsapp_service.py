@@ -100,6 +100,10 @@ class EvolutionWhatsAppService:
         Returns:
             str: Número formatado (ex: 5511999999999)
         """
+        # Telefone já em E.164 (telefone_e164 de alunos e professores): só tira o "+"
+        if numero.startswith('+') and numero[1:].isdigit():
+            return numero[1:]
+
         # Remover caracteres não numéricos
         numero_limpo = ''.join(filter(str.isdigit, numero))
 
@@ -149,10 +153,10 @@ Obrigado! 🏊‍♂️
 Academia de Natação
 """.strip()
 
-            # Usar telefone do aluno
-            telefone = aluno.telefone_whatsapp
+            # Telefone do aluno já normalizado na gravação
+            telefone = aluno.telefone_e164
             if not telefone:
-                logger.warning(f"Aluno {aluno.nome_completo} não possui telefone cadastrado")
+                logger.warning(f"Aluno {aluno.nome_completo} não possui telefone válido cadastrado")
                 return False
 
             return self.send_text_message(telefone, mensagem)
@@ -191,10 +195,10 @@ Contamos com sua compreensão! 🏊‍♂️
 Academia de Natação
 """.strip()
 
-            # Usar telefone do aluno
-            telefone = aluno.telefone_whatsapp
+            # Telefone do aluno já normalizado na gravação
+            telefone = aluno.telefone_e164
             if not telefone:
-                logger.warning(f"Aluno {aluno.nome_completo} não possui telefone cadastrado")
+                logger.warning(f"Aluno {aluno.nome_completo} não possui telefone válido cadastrado")
                 return False
 
             return self.send_text_message(telefone, mensagem)
@@ -2,21 +2,29 @@
 Utilitários de Autenticação e Segurança
 """
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from app.utils.env import load_env
+
+load_env()
 
 # Configurações de segurança
 SECRET_KEY = os.getenv("SECRET_KEY", "sua_chave_secreta_super_forte_aqui_mudar_em_producao")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))  # 1 hora padrão (segurança)
 
-# Contexto para hash de senhas (bcrypt)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """
+    Contexto para hash de senhas (bcrypt)
+    passlib/bcrypt só são importados no primeiro login/cadastro (acelera o cold start)
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -30,7 +38,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: True se a senha corresponde, False caso contrário
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
@@ -43,7 +51,7 @@ def get_password_hash(password: str) -> str:
     Returns:
         str: Hash da senha
     """
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -68,6 +76,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire, "iat": datetime.utcnow()})
 
     # Codificar token
+    from jose import jwt
+
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -82,6 +92,8 @@ def decode_access_token(token: str) -> Optional[dict]:
     Returns:
         dict: Dados decodificados do token ou None se inválido
     """
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
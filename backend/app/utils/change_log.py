@@ -0,0 +1,126 @@
+"""
+Gravação do log de alterações (change feed) via eventos da Session
+
+Cada flush que insere, altera ou exclui alunos, pagamentos, horários ou
+matrículas grava uma linha em change_log na MESMA transação: se a transação
+for desfeita, o registro some junto.
+
+Ordem de commit: um cursor monotônico só é seguro se nenhum id menor for
+commitado depois de um maior já lido pelo cliente. No PostgreSQL as
+transações que escrevem nas tabelas do feed pegam um advisory lock de
+transação, serializando só esses commits; escritas nas demais tabelas
+(planos, professores, fila_espera, reposições, aulas datadas, outbox...) não
+esperam por ele. No SQLite as escritas já são serializadas.
+
+O lock não protege mais nada além da ordem do feed: as regras de capacidade
+e de cota das matrículas têm os seus próprios locks de linha (horários e
+alunos, veja matricula_service.bloquear).
+
+O lock é pego no primeiro statement da transação que toca uma tabela do feed
+(flush, INSERT/UPDATE/DELETE em massa ou SELECT ... FOR UPDATE), e não só ao
+gravar no log: pegá-lo depois, já segurando linhas do feed, causa deadlock
+com outra transação que tem o advisory lock e espera essas linhas (ex:
+desmatrícula promovendo da fila x PUT no mesmo horário). Por isso as rotas
+que também bloqueiam linhas fora do feed (aulas datadas) começam pelas
+tabelas do feed; se a ordem se inverter, o PostgreSQL detecta o deadlock e
+desfaz uma das transações.
+
+UPDATE/DELETE em massa (session.execute(update(...))) não passam pelo flush:
+quem os executa deve chamar record_changes com os ids afetados.
+"""
+from typing import Iterable
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.models.change_log import ChangeLog
+
+
+# Tabela -> nome usado no feed
+TRACKED_TABLES = {
+    "alunos": "alunos",
+    "pagamentos": "pagamentos",
+    "horarios": "horarios",
+    "aluno_horario": "matriculas",
+}
+
+CHANGE_LOG_LOCK_ID = 72_430_002
+
+_LOCKED_KEY = "change_log_locked"
+
+
+def _lock(session: Session) -> None:
+    """Advisory lock de transação do change feed (uma vez por transação; só PostgreSQL)"""
+    if session.info.get(_LOCKED_KEY):
+        return
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_LOG_LOCK_ID})
+    session.info[_LOCKED_KEY] = True
+
+
+def record_changes(session: Session, table: str, ids: Iterable[int], operation: str) -> None:
+    """
+    Grava alterações no log dentro da transação corrente da sessão
+
+    Args:
+        session: sessão com a transação que fez a alteração
+        table: nome da tabela (ex: "alunos")
+        ids: ids das linhas alteradas
+        operation: "insert", "update" ou "delete"
+    """
+    rows = [{"table_name": table, "row_id": row_id, "operation": operation} for row_id in ids]
+    if not rows or table not in TRACKED_TABLES:
+        return
+
+    # Normalmente já pego por _before_flush/_do_orm_execute; cobre escritas pela Connection
+    _lock(session)
+    session.connection().execute(ChangeLog.__table__.insert(), rows)
+
+
+@event.listens_for(Session, "before_flush")
+def _before_flush(session, flush_context, instances):
+    if any(
+        getattr(obj, "__tablename__", None) in TRACKED_TABLES
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        _lock(session)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _do_orm_execute(orm_execute_state):
+    statement = orm_execute_state.statement
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        tables = {getattr(statement.table, "name", None)}
+    elif orm_execute_state.is_select and getattr(statement, "_for_update_arg", None) is not None:
+        tables = {getattr(from_, "name", None) for from_ in statement.get_final_froms()}
+    else:
+        return
+    if not tables.isdisjoint(TRACKED_TABLES):
+        _lock(orm_execute_state.session)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    changes: dict = {}
+    for operation, objects in (
+        ("insert", session.new),
+        ("update", session.dirty),
+        ("delete", session.deleted),
+    ):
+        for obj in objects:
+            table = getattr(obj, "__tablename__", None)
+            if table not in TRACKED_TABLES:
+                continue
+            if operation == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            changes.setdefault((table, operation), []).append(obj.id)
+
+    for (table, operation), ids in changes.items():
+        record_changes(session, table, ids, operation)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _end_transaction(session):
+    session.info.pop(_LOCKED_KEY, None)
@@ -0,0 +1,104 @@
+"""
+GET condicional (ETag / If-None-Match) para listagens
+
+O ETag é derivado da versão das tabelas de que a listagem depende
+(app.utils.table_versions) e dos parâmetros da requisição - não do conteúdo.
+Calcular o ETag não consulta o banco (ou faz uma leitura barata e espaçada
+no modo compartilhado), então um cliente com a lista em dia recebe 304 sem
+que a query principal rode ou que algo seja serializado.
+
+Uso em um router:
+
+    etag_alunos = ConditionalGet(["alunos"], cache_control_for("alunos"))
+
+    @router.get("/alunos")
+    async def listar_alunos(..., _: None = Depends(etag_alunos)):
+
+A política de Cache-Control de cada router pode ser ajustada pela variável
+CACHE_CONTROL_<ROUTER> (ex: CACHE_CONTROL_ALUNOS="private, max-age=30").
+
+Registros com coluna de versão (alunos, pagamentos, horarios) usam a própria
+versão como ETag no GET/PUT por ID; o cliente a devolve no If-Match do PUT
+para que a alteração só valha se ninguém mexeu no registro desde a leitura
+(app.utils.repository -> 409 em conflito).
+"""
+import hashlib
+import os
+from typing import Iterable, Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.utils.table_versions import table_versions
+
+
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+
+def cache_control_for(router_name: str, default: str = DEFAULT_CACHE_CONTROL) -> str:
+    """Política de Cache-Control do router (variável CACHE_CONTROL_<ROUTER>)"""
+    return os.getenv(f"CACHE_CONTROL_{router_name.upper()}", default)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Comparação fraca do If-None-Match (RFC 9110): ignora o prefixo W/"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def version_etag(version: int) -> str:
+    """ETag de um registro versionado"""
+    return f'"{version}"'
+
+
+def if_match_version(request: Request) -> Optional[int]:
+    """
+    Dependency: versão esperada informada no If-Match (None se ausente ou "*")
+
+    Aceita o ETag devolvido pelo GET/PUT do registro ("3" ou W/"3").
+    """
+    if_match = request.headers.get("if-match")
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.strip().removeprefix("W/")
+    if len(tag) < 3 or tag[0] != '"' or tag[-1] != '"' or not tag[1:-1].isdigit():
+        raise HTTPException(status_code=400, detail="If-Match inválido: use o ETag retornado pelo registro")
+    return int(tag[1:-1])
+
+
+def set_version_etag(request: Request, response: Response, version: int) -> None:
+    """ETag do registro na resposta; 304 se o cliente já tem essa versão"""
+    etag = version_etag(version)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+
+class ConditionalGet:
+    """
+    Dependency que calcula o ETag da listagem e responde 304 quando o cliente já a possui
+    """
+
+    def __init__(self, tables: Iterable[str], cache_control: str = DEFAULT_CACHE_CONTROL):
+        self.tables = list(tables)
+        self.cache_control = cache_control
+
+    def etag(self, request: Request, db: Session) -> str:
+        version = table_versions.get(self.tables, db)
+        params = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        digest = hashlib.sha1(f"{request.url.path}?{params}#{version}".encode()).hexdigest()
+        return f'"{digest[:20]}"'
+
+    def __call__(self, request: Request, response: Response, db: Session = Depends(get_db)) -> None:
+        etag = self.etag(request, db)
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response.headers.update(headers)
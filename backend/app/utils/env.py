@@ -0,0 +1,12 @@
+"""
+Carregamento do arquivo .env (uma única vez por processo)
+"""
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def load_env() -> None:
+    """Carrega o .env mais próximo; chamadas seguintes não fazem nada"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
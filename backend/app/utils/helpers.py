@@ -79,6 +79,34 @@ def formatar_telefone_brasileiro(numero: str) -> str:
         return numero
 
 
+def normalizar_telefone_e164(numero: Optional[str]) -> Optional[str]:
+    """
+    Normaliza telefone para E.164 (+55DDDNUMERO), forma gravada em telefone_e164
+
+    Números sem DDI (10 ou 11 dígitos) são brasileiros; com "+" na frente o
+    DDI informado é mantido.
+
+    Args:
+        numero: Número de telefone em qualquer formato
+
+    Returns:
+        Optional[str]: Telefone normalizado (ex: +5511999999999) ou None se vazio/inválido
+    """
+    if not numero:
+        return None
+
+    # Remover caracteres não numéricos
+    numero_limpo = ''.join(filter(str.isdigit, numero))
+
+    if numero.strip().startswith('+'):
+        return f"+{numero_limpo}" if 8 <= len(numero_limpo) <= 15 else None
+    if len(numero_limpo) in (10, 11):
+        return f"+55{numero_limpo}"
+    if numero_limpo.startswith('55') and len(numero_limpo) in (12, 13):
+        return f"+{numero_limpo}"
+    return None
+
+
 def validar_telefone_brasileiro(numero: str) -> bool:
     """
     Valida se o número de telefone brasileiro é válido
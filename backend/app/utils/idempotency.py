@@ -0,0 +1,199 @@
+"""
+Idempotency-Key para POSTs (criar pagamento, criar aluno, matrícula)
+
+O frontend repete requisições em timeout e o app móvel às vezes envia o
+mesmo pagamento duas vezes. Com o header Idempotency-Key:
+
+- a primeira requisição executa normalmente e a resposta de sucesso é gravada
+  em idempotency_keys NA MESMA transação do registro criado
+- repetições com a mesma chave (por usuário + endpoint) recebem a resposta
+  gravada, com o header Idempotent-Replayed: true, sem consultar nem alterar
+  as tabelas de negócio (uma única leitura por chave única)
+- duas requisições simultâneas com a mesma chave: a segunda esbarra na
+  constraint única ao gravar a chave, desfaz o que fez e devolve a resposta
+  da primeira
+- a mesma chave com outro corpo é recusada (422)
+
+Respostas de erro não são gravadas: a repetição é validada de novo.
+As chaves expiram após IDEMPOTENCY_TTL_HOURS e são removidas por uma tarefa
+em segundo plano (purge_loop, iniciada no lifespan da aplicação).
+
+Uso em um router:
+
+    @router.post("/pagamentos", status_code=201)
+    async def criar_pagamento(..., idem: IdempotentRequest = Depends(idempotency)):
+        if idem.replay is not None:
+            return idem.replay
+        ...
+        return idem.commit(db, 201, resposta) or resposta
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import get_db, session_scope
+from app.models.idempotency_key import IdempotencyKey
+from app.models.user import User
+from app.routes.auth import get_current_user
+
+
+logger = logging.getLogger(__name__)
+
+TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+PURGE_INTERVAL_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "3600"))
+
+MAX_KEY_LENGTH = 255
+
+
+def _replay_response(row: IdempotencyKey) -> Response:
+    return Response(
+        content=row.response_body,
+        status_code=row.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+@dataclass
+class IdempotentRequest:
+    """
+    Estado da chave de idempotência da requisição corrente
+
+    Attributes:
+        key: valor do header (None = requisição sem chave, comportamento normal)
+        replay: resposta gravada a devolver (a chave já foi usada)
+    """
+    key: Optional[str] = None
+    user_id: Optional[int] = None
+    endpoint: str = ""
+    request_hash: str = ""
+    replay: Optional[Response] = None
+
+    def commit(self, db: Session, status_code: int, body: Any) -> Optional[Response]:
+        """
+        Grava a resposta junto com a transação corrente e faz o commit
+
+        Args:
+            db: sessão com o registro criado (já com flush)
+            status_code: status da resposta de sucesso
+            body: corpo da resposta (schema ou dict)
+
+        Returns:
+            None quando esta requisição venceu; a resposta gravada por uma
+            requisição simultânea com a mesma chave, caso contrário
+        """
+        if self.key is None:
+            db.commit()
+            return None
+
+        now = datetime.utcnow()
+        db.add(IdempotencyKey(
+            user_id=self.user_id,
+            endpoint=self.endpoint,
+            key=self.key,
+            request_hash=self.request_hash,
+            status_code=status_code,
+            response_body=json.dumps(jsonable_encoder(body), ensure_ascii=False),
+            created_at=now,
+            expires_at=now + timedelta(hours=TTL_HOURS),
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Outra requisição com a mesma chave commitou antes: desfaz esta
+            db.rollback()
+            row = _lookup(db, self.user_id, self.endpoint, self.key)
+            if row is None:
+                raise
+            return _replay_response(row)
+        return None
+
+
+def _lookup(db: Session, user_id: int, endpoint: str, key: str) -> Optional[IdempotencyKey]:
+    return db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.endpoint == endpoint,
+        IdempotencyKey.key == key,
+    ).first()
+
+
+async def idempotency(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> IdempotentRequest:
+    """Dependency: lê o Idempotency-Key e busca a resposta já gravada"""
+    key = request.headers.get("idempotency-key")
+    if key is None:
+        return IdempotentRequest()
+
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key deve ter entre 1 e {MAX_KEY_LENGTH} caracteres"
+        )
+
+    idem = IdempotentRequest(
+        key=key,
+        user_id=current_user.id,
+        endpoint=f"{request.method} {request.url.path}",
+        request_hash=hashlib.sha256(await request.body()).hexdigest(),
+    )
+
+    row = _lookup(db, idem.user_id, idem.endpoint, key)
+    if row is None:
+        return idem
+
+    if row.expires_at <= datetime.utcnow():
+        # Expirada e ainda não removida pela limpeza: libera a chave
+        db.delete(row)
+        db.flush()
+        return idem
+
+    if row.request_hash != idem.request_hash:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key já utilizada com outra requisição"
+        )
+
+    idem.replay = _replay_response(row)
+    return idem
+
+
+def purge_expired(db: Session) -> int:
+    """Remove as chaves expiradas; retorna quantas foram removidas"""
+    removed = db.query(IdempotencyKey).filter(
+        IdempotencyKey.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+
+def _purge_once(app=None) -> int:
+    with session_scope(app) as db:
+        return purge_expired(db)
+
+
+async def purge_loop(app=None, interval: float = PURGE_INTERVAL_SECONDS) -> None:
+    """Tarefa em segundo plano: limpeza periódica das chaves expiradas"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await run_in_threadpool(_purge_once, app)
+            if removed:
+                logger.info("Idempotency-Key: %d chave(s) expirada(s) removida(s)", removed)
+        except Exception:
+            logger.exception("Falha na limpeza das chaves de idempotência")
@@ -0,0 +1,155 @@
+"""
+Métricas de latência por rota no formato Prometheus
+
+- Histograma de duração por template de rota, método e status
+- Tempo de banco e quantidade de queries por requisição
+- Header Server-Timing em todas as respostas
+
+Com múltiplos workers (uvicorn --workers N), defina PROMETHEUS_MULTIPROC_DIR
+apontando para um diretório vazio e gravável antes de iniciar a aplicação:
+cada processo grava suas amostras ali e o /metrics agrega todos.
+"""
+import logging
+import os
+import time
+
+from fastapi import Request
+from fastapi.responses import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.utils.query_stats import repeated_statements, start_tracking, stop_tracking
+
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Quantas repetições do mesmo formato de statement numa requisição disparam o aviso de N+1
+NPLUSONE_THRESHOLD = int(os.getenv("NPLUSONE_THRESHOLD", "5"))
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Duração das requisições HTTP",
+    ["method", "route", "status"],
+)
+
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Tempo gasto no banco de dados por requisição",
+    ["method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Quantidade de queries SQL por requisição",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250),
+)
+
+NPLUSONE_WARNINGS = Counter(
+    "http_request_nplusone_warnings",
+    "Requisições que repetiram o mesmo statement SQL acima do limite (possível N+1)",
+    ["method", "route"],
+)
+
+RESPONSE_CACHE_HITS = Counter(
+    "response_cache_hits",
+    "Respostas servidas do cache de respostas",
+    ["resource"],
+)
+
+RESPONSE_CACHE_MISSES = Counter(
+    "response_cache_misses",
+    "Respostas reconstruídas (cache vazio ou dados alterados)",
+    ["resource"],
+)
+
+SINGLE_FLIGHT_REQUESTS = Counter(
+    "single_flight_requests",
+    "Requisições de leituras coalescidas por resultado (computed, shared, hit, stale)",
+    ["resource", "result"],
+)
+
+# Cache endpoint -> template de rota (ex: /api/alunos/{id})
+_route_templates: dict = {}
+
+
+def get_route_template(request: Request) -> str:
+    """
+    Retorna o template da rota atendida (evita cardinalidade explosiva com IDs na URL)
+    """
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+
+    if endpoint not in _route_templates:
+        for route in request.app.routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                _route_templates[endpoint] = route.path
+                break
+        else:
+            _route_templates[endpoint] = request.url.path
+
+    return _route_templates[endpoint]
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware que mede cada requisição e publica as métricas Prometheus
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        stats, token = start_tracking()
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            stop_tracking(token)
+        duration = time.perf_counter() - start
+
+        route = get_route_template(request)
+        REQUEST_DURATION.labels(request.method, route, str(response.status_code)).observe(duration)
+        REQUEST_DB_DURATION.labels(request.method, route).observe(stats.duration)
+        REQUEST_DB_QUERIES.labels(request.method, route).observe(stats.count)
+
+        repeated = repeated_statements(stats, NPLUSONE_THRESHOLD)
+        if repeated:
+            NPLUSONE_WARNINGS.labels(request.method, route).inc()
+            for statement, count in repeated:
+                logger.warning(
+                    "Possível N+1 em %s %s: statement executado %d vezes: %s",
+                    request.method, route, count, statement[:300]
+                )
+
+        response.headers["Server-Timing"] = (
+            f'app;dur={duration * 1000:.1f}, '
+            f'db;dur={stats.duration_ms:.1f};desc="{stats.count} queries"'
+        )
+        return response
+
+
+def metrics_response() -> Response:
+    """Gera o payload do endpoint /metrics (agregando workers se multiprocess)"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead() -> None:
+    """Remove os arquivos de gauges do worker ao encerrar (modo multiprocess)"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,192 @@
+"""
+Profiling sob demanda de requisições (apenas admin)
+
+Uso: enviar o header "X-Profile: json" (ou "html") ou o parâmetro ?profile=json
+junto com um token de admin. A requisição roda normalmente sob o profiler por
+amostragem (pyinstrument) e a resposta é substituída pelo relatório:
+
+- json: árvore de chamadas em texto + statements SQL com tempos
+- html: flame graph/call tree interativo do pyinstrument + statements SQL
+
+Requisições sem a flag passam direto pelo middleware (ASGI puro, sem custo extra).
+"""
+import html
+import os
+import time
+from typing import Optional
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import HTMLResponse, JSONResponse
+
+from app.database import get_db
+from app.utils.query_stats import current_stats, start_tracking, stop_tracking
+
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_PARAM = "profile"
+
+
+class ProfilingSlots:
+    """Limite de requisições perfiladas simultâneas (por worker)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+
+    def acquire(self) -> bool:
+        if self.active >= self.limit:
+            return False
+        self.active += 1
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+
+
+profiling_slots = ProfilingSlots(int(os.getenv("PROFILING_MAX_CONCURRENT", "2")))
+
+
+def _profile_mode(scope) -> Optional[str]:
+    """Retorna o modo de profiling pedido (json/html) ou None"""
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value.decode("latin-1").strip().lower() or None
+
+    query_string = scope.get("query_string", b"")
+    if b"profile=" not in query_string:
+        return None
+    values = parse_qs(query_string.decode("latin-1")).get(PROFILE_QUERY_PARAM)
+    return values[0].strip().lower() if values else None
+
+
+def _is_admin(app, authorization: Optional[str]) -> bool:
+    """Valida o token com as mesmas dependencies das rotas (require_role(["admin"]))"""
+    from app.routes.auth import get_current_user, require_role
+
+    if not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+
+    # Respeita dependency_overrides (testes usam outro banco)
+    db_provider = app.dependency_overrides.get(get_db, get_db)
+    db_gen = db_provider()
+    db = next(db_gen)
+    try:
+        credentials = HTTPAuthorizationCredentials(scheme=scheme, credentials=token)
+        user = get_current_user(credentials=credentials, db=db)
+        require_role(["admin"])(current_user=user)
+        return True
+    except HTTPException:
+        return False
+    finally:
+        db_gen.close()
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI que perfila requisições marcadas por um admin"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = _profile_mode(scope)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+
+        if not await run_in_threadpool(_is_admin, scope["app"], authorization):
+            response = JSONResponse(
+                status_code=403,
+                content={"detail": "Profiling disponível apenas para administradores"}
+            )
+            await response(scope, receive, send)
+            return
+
+        if not profiling_slots.acquire():
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Limite de requisições perfiladas simultâneas atingido"}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            response = await self._profile(scope, receive, mode)
+        finally:
+            profiling_slots.release()
+
+        await response(scope, receive, send)
+
+    async def _profile(self, scope, receive, mode: str):
+        from pyinstrument import Profiler
+
+        # Reaproveita a contagem do MetricsMiddleware quando presente
+        stats = current_stats()
+        token = None
+        if stats is None:
+            stats, token = start_tracking()
+        stats.statements = []
+
+        status_code = 500
+
+        async def capture_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        profiler = Profiler(interval=0.001)
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, capture_send)
+        finally:
+            profiler.stop()
+            duration_ms = (time.perf_counter() - start) * 1000
+            statements = stats.statements
+            stats.statements = None
+            if token is not None:
+                stop_tracking(token)
+
+        sql = [
+            {"statement": statement, "duration_ms": round(elapsed * 1000, 3)}
+            for statement, elapsed in statements
+        ]
+
+        if mode == "html":
+            sql_html = "".join(
+                f"<li><code>{item['duration_ms']:.3f} ms</code><pre>{html.escape(item['statement'])}</pre></li>"
+                for item in sql
+            )
+            report = profiler.output_html().replace(
+                "</body>",
+                f"<section><h2>SQL ({len(sql)} statements)</h2><ol>{sql_html}</ol></section></body>",
+            )
+            return HTMLResponse(report, headers={"X-Profiled-Status": str(status_code)})
+
+        return JSONResponse({
+            "method": scope["method"],
+            "path": scope["path"],
+            "status_code": status_code,
+            "duration_ms": round(duration_ms, 3),
+            "call_tree": profiler.output_text(unicode=True, color=False),
+            "sql": {
+                "count": len(sql),
+                "duration_ms": round(sum(item["duration_ms"] for item in sql), 3),
+                "statements": sql,
+            },
+        })
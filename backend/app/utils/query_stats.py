@@ -0,0 +1,97 @@
+"""
+Contabilização de queries SQL por requisição via eventos do SQLAlchemy
+"""
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar, Token
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    """Estatísticas de banco de dados acumuladas durante uma requisição"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0  # segundos
+        # Contagem por statement (texto SQL com placeholders) para detectar N+1
+        self.shapes: Counter = Counter()
+        # Lista de (statement, duração) - só é preenchida quando habilitada (profiling)
+        self.statements: Optional[list] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration * 1000
+
+
+# Estatísticas da requisição corrente (None = nada sendo medido)
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def start_tracking() -> tuple[QueryStats, Token]:
+    """
+    Inicia a contagem de queries para o contexto atual
+
+    Returns:
+        tuple: (estatísticas, token para encerrar com stop_tracking)
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    return stats, token
+
+
+def stop_tracking(token: Token) -> None:
+    """Encerra a contagem iniciada por start_tracking"""
+    _current_stats.reset(token)
+
+
+def current_stats() -> Optional[QueryStats]:
+    """Retorna as estatísticas da requisição corrente (se houver)"""
+    return _current_stats.get()
+
+
+# Listas de parâmetros expandidas (IN (?, ?, ?)) variam de tamanho mas são o mesmo formato
+_IN_LIST_RE = re.compile(r"\bIN \([^()]*\)", re.IGNORECASE)
+
+
+def normalize_statement(statement: str) -> str:
+    """Normaliza um statement SQL para comparar formatos (espaços e listas IN)"""
+    return _IN_LIST_RE.sub("IN (...)", " ".join(statement.split()))
+
+
+def repeated_statements(stats: QueryStats, threshold: int) -> list[tuple[str, int]]:
+    """
+    Retorna os formatos de statement executados mais de `threshold` vezes
+    (sintoma típico de N+1: uma query por item de uma listagem)
+    """
+    shapes: Counter = Counter()
+    for statement, count in stats.shapes.items():
+        shapes[normalize_statement(statement)] += count
+
+    return [(statement, count) for statement, count in shapes.most_common() if count > threshold]
+
+
+# Listeners registrados na classe Engine: valem para qualquer engine criada
+# (inclusive as de teste), sem custo quando não há requisição sendo medida.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        context._query_start_time = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    start = getattr(context, "_query_start_time", None)
+    if stats is None or start is None:
+        return
+
+    elapsed = time.perf_counter() - start
+    stats.count += 1
+    stats.duration += elapsed
+    stats.shapes[statement] += 1
+    if stats.statements is not None:
+        stats.statements.append((statement, elapsed))
@@ -0,0 +1,194 @@
+"""
+Camada de repositório: alterações e exclusões em um único statement
+
+As rotas faziam SELECT, setattr, commit e refresh (3 idas ao banco, mais uma
+consulta de existência para cada chave estrangeira). Aqui cada operação é um
+único UPDATE ... RETURNING ou DELETE ... RETURNING:
+
+- nenhuma linha retornada -> 404
+- chave estrangeira inexistente ou valor único duplicado -> o próprio banco
+  recusa (IntegrityError), traduzido para a mesma resposta da antiga pré-checagem
+
+Modelos com coluna de versão (version_id_col no mapper) têm a versão
+incrementada em todo UPDATE; com expected_version o UPDATE só acontece se a
+versão ainda for a esperada (WHERE version = :v) - conflito -> 409, sem lock.
+
+UPDATE/DELETE em massa não passam pelo flush: o change feed é gravado aqui
+(record_changes); as versões de tabela (cache/ETag) são marcadas pelo evento
+do_orm_execute de app.utils.table_versions.
+
+Colunas calculadas na gravação (ex: telefone_e164 a partir do telefone)
+são declaradas em derived_columns: o UPDATE não passa pelos @validates do
+modelo, então o valor é calculado aqui sempre que a coluna de origem muda.
+
+O objeto retornado expira no commit: serialize a resposta antes de commitar
+para não gerar um SELECT de refresh.
+"""
+from typing import Any, Callable, Mapping, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, update
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.utils.change_log import record_changes
+from app.utils.conditional import version_etag
+
+
+class Repository:
+    """
+    Operações de escrita de um modelo
+
+    Args:
+        model: modelo SQLAlchemy (com chave primária `id`)
+        not_found: mensagem do 404
+        constraint_errors: coluna -> (status, mensagem) para violações de
+            chave estrangeira ou unicidade nessa coluna
+        derived_columns: coluna -> (coluna de origem, função) para colunas
+            recalculadas quando a origem é alterada
+    """
+
+    def __init__(
+        self, model: Any, not_found: str, constraint_errors: Optional[Mapping[str, tuple]] = None,
+        derived_columns: Optional[Mapping[str, Tuple[str, Callable[[Any], Any]]]] = None
+    ):
+        self.model = model
+        self.table = model.__table__
+        self.not_found = not_found
+        self.constraint_errors = dict(constraint_errors or {})
+        self.derived_columns = dict(derived_columns or {})
+        self.version_col = model.__mapper__.version_id_col
+
+    def update(
+        self, db: Session, id: int, values: Mapping[str, Any], *conditions: Any,
+        expected_version: Optional[int] = None
+    ) -> Any:
+        """
+        UPDATE ... WHERE id = :id RETURNING *
+
+        Args:
+            db: sessão (a transação não é commitada aqui)
+            id: chave primária
+            values: colunas a alterar (vazio = apenas busca o registro)
+            conditions: condições extras do WHERE
+            expected_version: versão que o cliente leu (If-Match); None = sem checagem
+
+        Returns:
+            O objeto atualizado (mesma instância do identity map, se já carregada)
+
+        Raises:
+            HTTPException: 404 se nenhuma linha foi alterada; 409 se a versão
+                mudou desde a leitura; status de constraint_errors em violação
+                de constraint
+        """
+        obj = self.update_returning(db, id, values, *conditions, expected_version=expected_version)
+        if obj is None:
+            if expected_version is not None:
+                # Só no caminho de erro: registro inexistente ou alterado por outra pessoa?
+                current = db.query(self.version_col).filter(self.model.id == id).scalar()
+                if current is not None:
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"Registro alterado por outro usuário (versão atual: {current}). "
+                               "Recarregue e tente novamente.",
+                        headers={"ETag": version_etag(current)},
+                    )
+            raise HTTPException(status_code=404, detail=self.not_found)
+        return obj
+
+    def update_returning(
+        self, db: Session, id: int, values: Mapping[str, Any], *conditions: Any,
+        expected_version: Optional[int] = None
+    ) -> Optional[Any]:
+        """Como update, mas retorna None em vez de 404/409"""
+        if expected_version is not None:
+            conditions = (*conditions, self.version_col == expected_version)
+        if not values:
+            return db.query(self.model).filter(self.model.id == id, *conditions).first()
+        values = {
+            **values,
+            **{
+                column: derive(values[source])
+                for column, (source, derive) in self.derived_columns.items() if source in values
+            },
+        }
+        if self.version_col is not None:
+            values = {**values, self.version_col.key: self.version_col + 1}
+
+        stmt = (
+            update(self.model)
+            .where(self.model.id == id, *conditions)
+            .values(**values)
+            .returning(self.model)
+        )
+        # Instância já carregada na sessão: expira para receber os valores
+        # retornados pelo banco (e não os valores Python do UPDATE)
+        loaded = db.identity_map.get(db.identity_key(self.model, id))
+        if loaded is not None:
+            db.expire(loaded)
+        obj = self._execute(db, stmt, values).scalar_one_or_none()
+        if obj is not None:
+            record_changes(db, self.table.name, [obj.id], "update")
+        return obj
+
+    def delete(self, db: Session, id: int, *conditions: Any) -> Row:
+        """
+        DELETE ... WHERE id = :id RETURNING *
+
+        Returns:
+            Row com os valores da linha excluída
+
+        Raises:
+            HTTPException: 404 se nenhuma linha foi excluída
+        """
+        row = self.delete_where(db, self.model.id == id, *conditions)
+        if row is None:
+            raise HTTPException(status_code=404, detail=self.not_found)
+        return row
+
+    def delete_where(self, db: Session, *conditions: Any) -> Optional[Row]:
+        """DELETE com condições arbitrárias (no máximo uma linha); None se nada foi excluído"""
+        stmt = delete(self.model).where(*conditions).returning(*self.table.c)
+        row = self._execute(db, stmt).first()
+        if row is not None:
+            # Instância carregada na sessão sai do identity map (como em db.delete)
+            loaded = db.identity_map.get(db.identity_key(self.model, row.id))
+            if loaded is not None:
+                db.expunge(loaded)
+            record_changes(db, self.table.name, [row.id], "delete")
+        return row
+
+    def _execute(self, db: Session, stmt: Any, values: Optional[Mapping[str, Any]] = None):
+        try:
+            return db.execute(stmt, execution_options={"synchronize_session": False})
+        except IntegrityError as exc:
+            db.rollback()
+            raise self._constraint_error(exc, values or {}) from exc
+
+    def _constraint_error(self, exc: IntegrityError, values: Mapping[str, Any]) -> HTTPException:
+        column = self._violated_column(exc, values)
+        if column is not None:
+            status_code, detail = self.constraint_errors[column]
+            return HTTPException(status_code=status_code, detail=detail)
+        return HTTPException(status_code=400, detail="Operação viola uma restrição do banco de dados")
+
+    def _violated_column(self, exc: IntegrityError, values: Mapping[str, Any]) -> Optional[str]:
+        # PostgreSQL informa o nome da constraint (ex: pagamentos_aluno_id_fkey,
+        # ix_professores_email); SQLite informa "UNIQUE constraint failed: tabela.coluna"
+        diag = getattr(exc.orig, "diag", None)
+        constraint = getattr(diag, "constraint_name", None) or ""
+        message = str(exc.orig)
+        for column in self.constraint_errors:
+            if f"_{column}_" in f"{constraint}_" or f"{self.table.name}.{column}" in message:
+                return column
+
+        # SQLite não diz qual chave estrangeira falhou: usa a única alterada
+        if "FOREIGN KEY" in message:
+            candidates = [
+                column for column in self.constraint_errors
+                if column in values and self.table.c[column].foreign_keys
+            ]
+            if len(candidates) == 1:
+                return candidates[0]
+        return None
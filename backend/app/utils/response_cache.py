@@ -0,0 +1,119 @@
+"""
+Cache de respostas JSON para dados de referência (planos, professores, horários)
+
+A resposta serializada (bytes) fica guardada junto com a versão das tabelas
+de que depende (app.utils.table_versions). Enquanto nenhum commit alterar
+essas tabelas, as próximas requisições recebem os mesmos bytes sem consultar
+o banco nem serializar de novo.
+
+A autenticação continua sendo feita pelas dependencies do router: o cache só
+é consultado dentro do endpoint, depois que o usuário foi validado.
+"""
+import os
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from app.utils.metrics import RESPONSE_CACHE_HITS, RESPONSE_CACHE_MISSES
+from app.utils.table_versions import table_versions
+
+
+ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+class ResponseCache:
+    """Respostas serializadas indexadas por (recurso, parâmetros) e versão das tabelas"""
+
+    def __init__(self, enabled: bool = ENABLED):
+        self.enabled = enabled
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+
+    def get_or_build(
+        self,
+        resource: str,
+        tables: Iterable[str],
+        key: str,
+        build: Callable[[], bytes],
+        db: Optional[Session] = None,
+    ) -> tuple[bytes, bool]:
+        """
+        Retorna a resposta do cache ou a constrói
+
+        Args:
+            resource: nome do recurso (rótulo das métricas)
+            tables: tabelas das quais a resposta depende
+            key: parâmetros da requisição que alteram a resposta
+            build: função que consulta o banco e serializa a resposta
+            db: sessão da requisição (leitura das versões compartilhadas)
+
+        Returns:
+            tuple: (corpo JSON, True se veio do cache)
+        """
+        if not self.enabled:
+            return build(), False
+
+        # Versão lida ANTES da consulta: se os dados mudarem durante o build,
+        # a entrada já nasce desatualizada e será refeita na próxima requisição
+        version = table_versions.get(tables, db)
+        entry = self._entries.get((resource, key))
+        if entry is not None and entry[0] == version:
+            RESPONSE_CACHE_HITS.labels(resource).inc()
+            return entry[1], True
+
+        RESPONSE_CACHE_MISSES.labels(resource).inc()
+        body = build()
+        with self._lock:
+            self._entries[(resource, key)] = (version, body)
+        return body, False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def cached_json_response(
+    resource: str,
+    tables: Iterable[str],
+    key: str,
+    query: Callable[[], Any],
+    schema: Any,
+    db: Optional[Session] = None,
+) -> Response:
+    """
+    Resposta JSON servida do cache de respostas
+
+    Args:
+        resource: nome do recurso (ex: "planos")
+        tables: tabelas das quais a resposta depende
+        key: parâmetros da requisição que alteram a resposta
+        query: função que executa a consulta (só chamada em cache miss)
+        schema: tipo de resposta (ex: List[PlanoResponse]) usado para serializar
+        db: sessão da requisição
+    """
+    adapter = _adapter(schema)
+
+    def build() -> bytes:
+        return adapter.dump_json(adapter.validate_python(query(), from_attributes=True))
+
+    body, hit = response_cache.get_or_build(resource, tables, key, build, db)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"X-Cache": "HIT" if hit else "MISS"},
+    )
+
+
+_adapters: dict = {}
+
+
+def _adapter(schema: Any) -> TypeAdapter:
+    if schema not in _adapters:
+        _adapters[schema] = TypeAdapter(schema)
+    return _adapters[schema]
@@ -0,0 +1,172 @@
+"""
+Coalescência de leituras caras (single-flight)
+
+Quando várias recepções abrem o painel ao mesmo tempo, requisições idênticas
+(mesmo recurso, parâmetros e role do usuário) que chegam enquanto uma consulta
+já está em andamento esperam por ela em vez de repetir a consulta no banco.
+
+Opcionalmente (SINGLE_FLIGHT_STALE_SECONDS > 0) o último resultado de cada
+chave é guardado: enquanto as tabelas não mudarem ele é servido direto, e
+depois de uma alteração continua sendo servido por até esse número de
+segundos enquanto a consulta é refeita em segundo plano.
+
+A consulta roda no threadpool com uma sessão própria (session_scope): se a
+requisição que a iniciou for cancelada, as demais continuam recebendo o
+resultado.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Callable, Iterable, Mapping, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import session_scope
+from app.utils.metrics import SINGLE_FLIGHT_REQUESTS
+from app.utils.response_cache import _adapter
+from app.utils.table_versions import table_versions
+
+
+ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+STALE_SECONDS = float(os.getenv("SINGLE_FLIGHT_STALE_SECONDS", "0"))
+
+
+class SingleFlight:
+    """Execuções em andamento (e últimos resultados) indexadas por chave"""
+
+    def __init__(self, enabled: bool = ENABLED, stale_seconds: float = STALE_SECONDS):
+        self.enabled = enabled
+        self.stale_seconds = stale_seconds
+        # (loop, chave) -> task da execução em andamento
+        self._inflight: dict = {}
+        # chave -> (versão das tabelas, corpo, instante da construção)
+        self._results: dict = {}
+
+    async def do(self, key: Any, build: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Executa build (no threadpool) uma única vez entre chamadas concorrentes
+
+        Returns:
+            tuple: (resultado, True se aproveitou uma execução já em andamento)
+        """
+        if not self.enabled:
+            return await run_in_threadpool(build), False
+
+        inflight_key = (asyncio.get_running_loop(), key)
+        task = self._inflight.get(inflight_key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(run_in_threadpool(build))
+            self._inflight[inflight_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+        # shield: cancelar uma das requisições não cancela a execução compartilhada
+        return await asyncio.shield(task), shared
+
+    async def get(
+        self,
+        resource: str,
+        key: Any,
+        tables: Iterable[str],
+        build: Callable[[], tuple[str, bytes]],
+        db: Optional[Session] = None,
+    ) -> tuple[bytes, str]:
+        """
+        Resultado para a chave, coalescendo execuções concorrentes
+
+        Args:
+            resource: nome do recurso (rótulo das métricas)
+            key: chave completa (recurso, parâmetros e escopo de autorização)
+            tables: tabelas das quais o resultado depende
+            build: função que retorna (versão das tabelas lida antes da consulta, corpo)
+            db: sessão da requisição (leitura das versões compartilhadas)
+
+        Returns:
+            tuple: (corpo, resultado: "computed", "shared", "hit" ou "stale")
+        """
+        if self.enabled and self.stale_seconds > 0:
+            entry = self._results.get(key)
+            if entry is not None:
+                version, body, built_at = entry
+                if version == table_versions.get(tables, db):
+                    result = "hit"
+                elif time.monotonic() - built_at <= self.stale_seconds:
+                    result = "stale"
+                    self._revalidate(key, build)
+                else:
+                    entry = None
+                if entry is not None:
+                    SINGLE_FLIGHT_REQUESTS.labels(resource, result).inc()
+                    return body, result
+
+        (version, body), shared = await self.do(key, self._storing(key, build))
+        result = "shared" if shared else "computed"
+        SINGLE_FLIGHT_REQUESTS.labels(resource, result).inc()
+        return body, result
+
+    def _storing(self, key: Any, build: Callable[[], tuple[str, bytes]]) -> Callable[[], tuple[str, bytes]]:
+        def run() -> tuple[str, bytes]:
+            version, body = build()
+            if self.stale_seconds > 0:
+                self._results[key] = (version, body, time.monotonic())
+            return version, body
+        return run
+
+    def _revalidate(self, key: Any, build: Callable[[], tuple[str, bytes]]) -> None:
+        inflight_key = (asyncio.get_running_loop(), key)
+        if inflight_key not in self._inflight:
+            # Erros da revalidação são descartados: a próxima requisição tenta de novo
+            task = asyncio.ensure_future(self.do(key, self._storing(key, build)))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def clear(self) -> None:
+        self._results.clear()
+
+
+single_flight = SingleFlight()
+
+
+async def coalesced_json_response(
+    request: Request,
+    resource: str,
+    tables: Iterable[str],
+    params: dict,
+    scope: str,
+    query: Callable[[Session], Any],
+    schema: Any,
+    db: Optional[Session] = None,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """
+    Resposta JSON de uma leitura cara, coalescida entre requisições idênticas
+
+    Args:
+        request: requisição (a consulta usa uma sessão própria da aplicação)
+        resource: nome do recurso (ex: "inadimplentes")
+        tables: tabelas das quais a resposta depende
+        params: parâmetros que alteram a resposta
+        scope: escopo de autorização (role do usuário)
+        query: função que recebe uma sessão e executa a consulta
+        schema: tipo de resposta usado para serializar
+        db: sessão da requisição
+        headers: headers extras da resposta (ex: ETag definido por uma dependency)
+    """
+    adapter = _adapter(schema)
+    tables = list(tables)
+    key = (resource, tuple(sorted(params.items())), scope)
+
+    def build() -> tuple[str, bytes]:
+        with session_scope(request.app) as session:
+            # Versão lida ANTES da consulta (ver response_cache)
+            version = table_versions.get(tables, session)
+            body = adapter.dump_json(adapter.validate_python(query(session), from_attributes=True))
+        return version, body
+
+    body, result = await single_flight.get(resource, key, tables, build, db)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**(headers or {}), "X-Single-Flight": result},
+    )
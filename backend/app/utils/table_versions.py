@@ -0,0 +1,129 @@
+"""
+Contadores de versão por tabela, incrementados a cada commit que altera a tabela
+
+Os eventos da Session marcam as tabelas alteradas (flush de objetos ORM e
+UPDATE/DELETE/INSERT em massa via session.execute) e, após o commit, os
+contadores correspondentes são incrementados. Qualquer cache pode então
+comparar a versão guardada com a atual para saber se os dados mudaram.
+
+Modo compartilhado (TABLE_VERSIONS_SHARED=true): com vários workers, cada um
+só enxerga os próprios commits. Neste modo o incremento também é gravado na
+tabela cache_versions, na mesma transação da alteração, e as versões são lidas
+do banco no máximo a cada TABLE_VERSIONS_TTL segundos por worker.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+
+SHARED = os.getenv("TABLE_VERSIONS_SHARED", "false").lower() in ("1", "true", "yes")
+SHARED_TTL = float(os.getenv("TABLE_VERSIONS_TTL", "1.0"))
+
+_CHANGED_KEY = "changed_tables"
+
+_BUMP_SQL = text("""
+    INSERT INTO cache_versions (table_name, version) VALUES (:table_name, 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = cache_versions.version + 1
+""")
+
+
+class TableVersions:
+    """Versões das tabelas vistas por este processo"""
+
+    def __init__(self, shared: bool = SHARED, ttl: float = SHARED_TTL):
+        self.shared = shared
+        self.ttl = ttl
+        # Identifica o processo: contadores locais de workers diferentes não são comparáveis
+        self._epoch = uuid.uuid4().hex[:8]
+        self._local: dict = defaultdict(int)
+        self._lock = threading.Lock()
+        self._shared_versions: dict = {}
+        self._shared_loaded_at = 0.0
+
+    def bump(self, tables: Iterable[str]) -> None:
+        """Registra commit que alterou as tabelas"""
+        with self._lock:
+            for table in tables:
+                self._local[table] += 1
+            # Força nova leitura do banco: o próprio worker vê suas alterações na hora
+            self._shared_loaded_at = 0.0
+
+    def get(self, tables: Iterable[str], db: Optional[Session] = None) -> str:
+        """
+        Versão combinada de um conjunto de tabelas
+
+        Args:
+            tables: tabelas das quais o recurso depende
+            db: sessão usada para ler as versões compartilhadas (modo compartilhado)
+        """
+        if self.shared and db is not None:
+            versions = self._load_shared(db)
+            return ".".join(str(versions.get(table, 0)) for table in tables)
+
+        return self._epoch + "." + ".".join(str(self._local[table]) for table in tables)
+
+    def _load_shared(self, db: Session) -> dict:
+        now = time.monotonic()
+        if now - self._shared_loaded_at > self.ttl:
+            rows = db.execute(text("SELECT table_name, version FROM cache_versions")).all()
+            self._shared_versions = dict(rows)
+            self._shared_loaded_at = now
+        return self._shared_versions
+
+
+table_versions = TableVersions()
+
+
+def _mark(session: Session, tables: Iterable[str]) -> None:
+    session.info.setdefault(_CHANGED_KEY, set()).update(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    tables = {
+        obj.__table__.name
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if hasattr(obj, "__table__")
+    }
+    if tables:
+        _mark(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _do_orm_execute(orm_execute_state):
+    # UPDATE/DELETE/INSERT em massa não passam pelo flush
+    if orm_execute_state.is_select:
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    name = getattr(table, "name", None)
+    if name:
+        _mark(orm_execute_state.session, {name})
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    if not table_versions.shared:
+        return
+    # Garante que o flush final (feito pelo commit) também seja contabilizado
+    session.flush()
+    for table in sorted(session.info.get(_CHANGED_KEY, ())):
+        if table != "cache_versions":
+            session.connection().execute(_BUMP_SQL, {"table_name": table})
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    tables = session.info.pop(_CHANGED_KEY, None)
+    if tables:
+        table_versions.bump(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_CHANGED_KEY, None)
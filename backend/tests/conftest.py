@@ -20,8 +20,12 @@ from decimal import Decimal
 # Adicionar app ao path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Sem passada de renovação na inicialização: ela usaria a sessão do teste em outra thread
+os.environ.setdefault("CONTRATO_RENOVACAO_NA_INICIALIZACAO", "false")
+
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.pool import StaticPool
 
@@ -33,6 +37,9 @@ from app.models.horario import Horario
 from app.models.turma import AlunoHorario
 from app.models.user import User
 from app.utils.auth import get_password_hash, create_access_token
+from app.utils.response_cache import response_cache
+from app.utils.single_flight import single_flight
+from app.services.presenca_service import presencas_buffer
 
 
 # ============================================================================
@@ -84,6 +91,21 @@ def db_session(test_engine) -> Generator[Session, None, None]:
     connection.close()
 
 
+@pytest.fixture(autouse=True)
+def limpar_cache_respostas():
+    """
+    Esvazia o cache de respostas (e resultados do single-flight) entre testes
+    O rollback do banco ao fim de cada teste não passa pelos eventos de commit
+    O buffer de presenças também começa vazio em cada teste
+    """
+    response_cache.clear()
+    single_flight.clear()
+    presencas_buffer.clear()
+    yield
+    response_cache.clear()
+    single_flight.clear()
+
+
 @pytest.fixture(scope="function")
 def client(db_session: Session) -> Generator[TestClient, None, None]:
     """
@@ -423,6 +445,91 @@ def performance_monitor(request):
         print(f"\n⚠️  SLOW TEST: {request.node.nodeid} took {duration:.2f}s")
 
 
+# ============================================================================
+# ORÇAMENTO DE QUERIES (detecção de N+1)
+# ============================================================================
+
+class QueryCounter:
+    """
+    Conta as queries executadas em qualquer engine enquanto ativo.
+    Usa listener global (não contextvar) porque o TestClient executa a
+    aplicação em outra thread.
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(Engine, "after_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, "after_cursor_execute", self._on_execute)
+        return False
+
+    def report(self) -> str:
+        return "\n".join(f"  {i + 1}. {' '.join(s.split())[:200]}" for i, s in enumerate(self.statements))
+
+
+def query_budget(max_queries: int):
+    """
+    Decorator: falha o teste se o corpo do teste executar mais de `max_queries` queries.
+    Fixtures (criação de dados) não entram na conta, apenas o corpo do teste.
+
+    Exemplo:
+        @query_budget(3)
+        def test_listar(client, auth_headers): ...
+    """
+    return pytest.mark.query_budget(max_queries)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """Aplica o orçamento de queries declarado com @query_budget"""
+    marker = item.get_closest_marker("query_budget")
+    if marker is None:
+        yield
+        return
+
+    max_queries = marker.args[0]
+    with QueryCounter() as counter:
+        outcome = yield
+
+    if outcome.excinfo is None and counter.count > max_queries:
+        pytest.fail(
+            f"Orçamento de queries excedido: {counter.count} > {max_queries}\n{counter.report()}",
+            pytrace=False
+        )
+
+
+@pytest.fixture
+def assert_query_budget():
+    """
+    Context manager que falha se o bloco executar mais de N queries
+
+    Exemplo:
+        with assert_query_budget(2):
+            client.get("/api/alunos", headers=auth_headers)
+    """
+    from contextlib import contextmanager
+
+    @contextmanager
+    def _budget(max_queries: int):
+        with QueryCounter() as counter:
+            yield counter
+        assert counter.count <= max_queries, \
+            f"Orçamento de queries excedido: {counter.count} > {max_queries}\n{counter.report()}"
+
+    return _budget
+
+
 # ============================================================================
 # FIXTURES DE CLEANUP
 # ============================================================================
@@ -448,6 +555,9 @@ def pytest_configure(config):
     config.addinivalue_line(
         "markers", "smoke: Smoke tests for critical paths"
     )
+    config.addinivalue_line(
+        "markers", "query_budget(max_queries): falha se o teste executar mais queries que o orçamento"
+    )
 
 
 def pytest_collection_modifyitems(config, items):
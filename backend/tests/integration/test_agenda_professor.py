@@ -0,0 +1,171 @@
+"""
+Testes de Integração - Agenda do professor (aulas sobrepostas) e carga horária
+"""
+import pytest
+from datetime import time
+
+from app.models.horario import Horario
+from app.models.professor import Professor
+from app.models.turma import AlunoHorario
+from tests.conftest import QueryCounter
+
+
+def _professor(db_session, nome="Professor", email="prof@example.com", cpf="123.456.789-00", **kwargs):
+    professor = Professor(nome=nome, email=email, cpf=cpf, **kwargs)
+    db_session.add(professor)
+    db_session.commit()
+    return professor
+
+
+@pytest.fixture
+def professor(db_session):
+    return _professor(db_session)
+
+
+def _novo_horario(client, headers, professor_id, dia="segunda", hora="08:00", duracao=50):
+    return client.post("/api/horarios", json={
+        "dia_semana": dia, "horario": hora, "capacidade_maxima": 10, "tipo_aula": "natacao",
+        "professor_id": professor_id, "duracao_minutos": duracao,
+    }, headers=headers)
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestAgendaProfessor:
+    """Um professor não dá duas aulas ao mesmo tempo"""
+
+    def test_criar_sobreposto_retorna_409(self, client, auth_headers, professor):
+        """Teste: 08:30 invade a aula das 08:00 (50 min)"""
+        primeira = _novo_horario(client, auth_headers, professor.id, hora="08:00")
+
+        response = _novo_horario(client, auth_headers, professor.id, hora="08:30")
+
+        assert primeira.status_code == 201
+        assert response.status_code == 409
+        assert f"(horário {primeira.json()['id']})" in response.json()["detail"]
+        assert "08:00-08:50" in response.json()["detail"]
+
+    def test_aulas_encostadas_e_outros_dias(self, client, auth_headers, professor, db_session):
+        """Teste: Aula que começa quando a outra termina, ou em outro dia, é permitida"""
+        assert _novo_horario(client, auth_headers, professor.id, hora="08:00").status_code == 201
+        assert _novo_horario(client, auth_headers, professor.id, hora="08:50").status_code == 201
+        assert _novo_horario(client, auth_headers, professor.id, dia="terca", hora="08:30").status_code == 201
+
+        outro = _professor(db_session, nome="Outro", email="outro@example.com", cpf="987.654.321-00")
+        assert _novo_horario(client, auth_headers, outro.id, hora="08:30").status_code == 201
+
+    def test_sem_professor_nao_conflita(self, client, auth_headers):
+        """Teste: Horários sem professor não entram na regra"""
+        assert _novo_horario(client, auth_headers, None).status_code == 201
+        assert _novo_horario(client, auth_headers, None).status_code == 201
+
+    def test_atualizar_para_sobreposicao_retorna_409(self, client, auth_headers, professor, db_session):
+        """Teste: Mudar o início para dentro de outra aula é recusado e nada muda"""
+        _novo_horario(client, auth_headers, professor.id, hora="08:00")
+        segunda = _novo_horario(client, auth_headers, professor.id, hora="10:00").json()
+
+        response = client.put(f"/api/horarios/{segunda['id']}", json={"horario": "08:40"}, headers=auth_headers)
+
+        assert response.status_code == 409
+        assert "08:00-08:50" in response.json()["detail"]
+        db_session.expire_all()
+        horario = db_session.get(Horario, segunda["id"])
+        assert (horario.horario, horario.version) == (time(10, 0), segunda["version"])
+
+    def test_aumentar_duracao_e_trocar_professor(self, client, auth_headers, professor, db_session):
+        """Teste: Duração maior ou troca de professor também passam pela regra"""
+        _novo_horario(client, auth_headers, professor.id, hora="09:00")
+        outro = _professor(db_session, nome="Outro", email="outro@example.com", cpf="987.654.321-00")
+        horario = _novo_horario(client, auth_headers, outro.id, hora="08:00").json()
+
+        assert client.put(
+            f"/api/horarios/{horario['id']}", json={"professor_id": professor.id}, headers=auth_headers
+        ).status_code == 200
+        response = client.put(f"/api/horarios/{horario['id']}", json={"duracao_minutos": 90}, headers=auth_headers)
+
+        assert response.status_code == 409
+
+    def test_atualizar_a_propria_aula(self, client, auth_headers, professor):
+        """Teste: A aula não conflita com ela mesma ao mudar a duração"""
+        horario = _novo_horario(client, auth_headers, professor.id).json()
+
+        response = client.put(f"/api/horarios/{horario['id']}", json={"duracao_minutos": 60}, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.json()["duracao_minutos"] == 60
+
+    def test_atualizar_checa_no_proprio_update(self, client, auth_headers, professor, db_session):
+        """Teste: A regra vai no WHERE do UPDATE (sem SELECT antes)"""
+        horario = _novo_horario(client, auth_headers, professor.id).json()
+
+        with QueryCounter() as counter:
+            response = client.put(f"/api/horarios/{horario['id']}", json={"horario": "09:00"}, headers=auth_headers)
+
+        assert response.status_code == 200
+        updates = [s for s in counter.statements if s.lstrip().upper().startswith("UPDATE HORARIOS")]
+        assert len(updates) == 1 and "EXISTS" in updates[0].upper()
+
+    def test_atualizar_inexistente_retorna_404(self, client, auth_headers, professor):
+        """Teste: Com a regra no WHERE, horário inexistente continua 404"""
+        response = client.put("/api/horarios/999999", json={"horario": "09:00"}, headers=auth_headers)
+
+        assert response.status_code == 404
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestCargaProfessor:
+    """GET /professores/{id}/carga e GET /professores/carga"""
+
+    def test_carga_do_professor(self, client, auth_headers, professor, horario_factory, sample_alunos, db_session):
+        """Teste: Totais, minutos por dia e agenda em ordem"""
+        quarta = horario_factory.create(db_session, dia_semana="quarta", horario=time(9, 0), professor_id=professor.id)
+        segunda = horario_factory.create(
+            db_session, dia_semana="segunda", horario=time(8, 0), capacidade_maxima=10,
+            professor_id=professor.id, duracao_minutos=60,
+        )
+        db_session.add_all([AlunoHorario(horario_id=segunda.id, aluno_id=aluno.id) for aluno in sample_alunos[:5]])
+        db_session.commit()
+
+        response = client.get(f"/api/professores/{professor.id}/carga", headers=auth_headers)
+
+        corpo = response.json()
+        assert response.status_code == 200
+        assert (corpo["aulas_semana"], corpo["minutos_semana"], corpo["horas_semana"]) == (2, 110, 1.83)
+        assert (corpo["vagas"], corpo["alunos"], corpo["dias_com_aula"]) == (30, 5, 2)
+        assert list(corpo["minutos_por_dia"].items()) == [("segunda", 60), ("quarta", 50)]
+        assert [a["horario_id"] for a in corpo["agenda"]] == [segunda.id, quarta.id]
+        assert (corpo["agenda"][0]["fim"], corpo["agenda"][0]["alunos"]) == ("09:00:00", 5)
+
+    def test_carga_professor_inexistente(self, client, auth_headers):
+        """Teste: Professor inexistente retorna 404"""
+        assert client.get("/api/professores/999999/carga", headers=auth_headers).status_code == 404
+
+    def test_relatorio_em_uma_query(self, client, auth_headers, professor, horario_factory, sample_alunos, db_session):
+        """Teste: Todos os professores em uma query agregada, da maior carga para a menor"""
+        livre = _professor(db_session, nome="Sem aulas", email="livre@example.com", cpf="987.654.321-00")
+        _professor(db_session, nome="Inativo", email="inativo@example.com", cpf="111.222.333-44", is_active=False)
+        for hora in (8, 9, 10):
+            horario = horario_factory.create(
+                db_session, dia_semana="segunda", horario=time(hora, 0), professor_id=professor.id
+            )
+            db_session.add(AlunoHorario(horario_id=horario.id, aluno_id=sample_alunos[hora - 8].id))
+        db_session.commit()
+
+        with QueryCounter() as counter:
+            response = client.get("/api/professores/carga", headers=auth_headers)
+
+        corpo = response.json()
+        assert [p["professor_id"] for p in corpo] == [professor.id, livre.id]
+        assert (corpo[0]["aulas_semana"], corpo[0]["minutos_semana"], corpo[0]["alunos"]) == (3, 150, 3)
+        assert corpo[0]["ocupacao_percentual"] == 5.0
+        assert (corpo[1]["aulas_semana"], corpo[1]["minutos_semana"], corpo[1]["ocupacao_percentual"]) == (0, 0, 0.0)
+        assert len([s for s in counter.statements if "professores" in s.lower()]) == 1
+
+    def test_relatorio_com_inativos(self, client, auth_headers, professor, db_session):
+        """Teste: apenas_ativos=false inclui os inativos"""
+        _professor(db_session, nome="Inativo", email="inativo@example.com", cpf="111.222.333-44", is_active=False)
+
+        response = client.get("/api/professores/carga?apenas_ativos=false", headers=auth_headers)
+
+        assert len(response.json()) == 2
@@ -0,0 +1,212 @@
+"""
+Testes de Integração - Alocação automática da grade (POST /api/horarios/alocacao)
+"""
+import pytest
+from datetime import date, time, timedelta
+
+from app.models.horario import DIAS_SEMANA
+from app.models.plano import Plano
+from app.models.turma import AlunoHorario
+from app.routes import horarios as horarios_module
+from app.services.reposicao_service import gerar_ocorrencias, reservar
+
+
+def _alunos(*itens):
+    """[(aluno_id, [(dia, "HH:MM" ou None), ...]), ...] -> corpo da requisição"""
+    return [
+        {
+            "aluno_id": aluno_id,
+            "preferencias": [{"dia_semana": dia, "horario": hora} for dia, hora in prefs],
+        }
+        for aluno_id, prefs in itens
+    ]
+
+
+def _matriculas(db_session):
+    return {(m.horario_id, m.aluno_id) for m in db_session.query(AlunoHorario)}
+
+
+@pytest.fixture
+def plano_2x(db_session):
+    plano = Plano(nome="2x por semana", valor_mensal=180, aulas_por_semana=2)
+    db_session.add(plano)
+    db_session.commit()
+    return plano
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestAlocacaoGrade:
+    """Preferências, capacidade, plano e dry-run"""
+
+    def test_dry_run_nao_grava(self, client, auth_headers, horario_factory, sample_aluno, db_session):
+        """Teste: Sem "aplicar" só o diff é devolvido"""
+        horario = horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0))
+
+        response = client.post(
+            "/api/horarios/alocacao",
+            json={"alunos": _alunos((sample_aluno.id, [("segunda", "08:00")]))},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 200
+        corpo = response.json()
+        assert corpo["aplicado"] is False
+        assert corpo["adicionar"] == [{"horario_id": horario.id, "aluno_id": sample_aluno.id}]
+        assert _matriculas(db_session) == set()
+
+    def test_primeira_opcao_quando_cabe(self, client, auth_headers, horario_factory, sample_alunos, db_session):
+        """Teste: Quem não tem alternativa fica com a vaga disputada; o outro vai para a 2ª opção"""
+        disputado = horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0), capacidade_maxima=1)
+        alternativo = horario_factory.create(db_session, dia_semana="terca", horario=time(8, 0), capacidade_maxima=1)
+        flexivel, restrito = sample_alunos[:2]
+
+        response = client.post("/api/horarios/alocacao", json={"alunos": _alunos(
+            (flexivel.id, [("segunda", "08:00"), ("terca", "08:00")]),
+            (restrito.id, [("segunda", "08:00")]),
+        )}, headers=auth_headers)
+
+        corpo = response.json()
+        assert {(m["horario_id"], m["aluno_id"]) for m in corpo["adicionar"]} == {
+            (disputado.id, restrito.id), (alternativo.id, flexivel.id)
+        }
+        assert corpo["por_preferencia"] == {"0": 1, "1": 1}
+
+    def test_capacidade_e_nao_alocados(self, client, auth_headers, horario_factory, sample_alunos, db_session):
+        """Teste: Acima da capacidade os alunos aparecem em nao_alocados"""
+        horario = horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0), capacidade_maxima=2)
+        db_session.add(AlunoHorario(horario_id=horario.id, aluno_id=sample_alunos[9].id))
+        db_session.commit()
+
+        response = client.post("/api/horarios/alocacao", json={"alunos": _alunos(
+            *[(aluno.id, [("segunda", None)]) for aluno in sample_alunos[:3]]
+        )}, headers=auth_headers)
+
+        corpo = response.json()
+        assert len(corpo["adicionar"]) == 1  # a outra vaga é de um aluno fora da alocação
+        assert len(corpo["nao_alocados"]) == 2
+        assert corpo["ocupacao"] == [{"horario_id": horario.id, "capacidade_maxima": 2, "matriculados": 2}]
+
+    def test_plano_limita_aulas_e_uma_por_dia(self, client, auth_headers, horario_factory, aluno_factory, plano_2x, db_session):
+        """Teste: aulas_por_semana do plano e no máximo uma aula por dia"""
+        aluno = aluno_factory.create(db_session, plano_id=plano_2x.id)
+        for dia in ("segunda", "quarta", "sexta"):
+            for hora in (8, 9):
+                horario_factory.create(db_session, dia_semana=dia, horario=time(hora, 0))
+
+        response = client.post("/api/horarios/alocacao", json={"alunos": _alunos(
+            (aluno.id, [("segunda", None), ("quarta", None), ("sexta", None)])
+        )}, headers=auth_headers)
+
+        corpo = response.json()
+        assert corpo["aulas_alocadas"] == 2
+        assert corpo["por_preferencia"] == {"0": 1, "1": 1}
+        assert corpo["nao_alocados"] == []
+
+    def test_tipo_de_aula(self, client, auth_headers, horario_factory, aluno_factory, db_session):
+        """Teste: Aluno de hidroginástica não vai para turma de natação"""
+        aluno = aluno_factory.create(db_session, tipo_aula="hidroginastica")
+        horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0), tipo_aula="natacao")
+
+        response = client.post("/api/horarios/alocacao", json={"alunos": _alunos(
+            (aluno.id, [("segunda", "08:00")])
+        )}, headers=auth_headers)
+
+        assert response.json()["adicionar"] == []
+        assert response.json()["nao_alocados"] == [{"aluno_id": aluno.id, "aulas_faltando": 1}]
+
+    def test_ocupacao_equilibrada(self, client, auth_headers, horario_factory, aluno_factory, db_session):
+        """Teste: Entre horários equivalentes os alunos são distribuídos"""
+        horarios = [
+            horario_factory.create(db_session, dia_semana="segunda", horario=time(8 + i, 0), capacidade_maxima=10)
+            for i in range(3)
+        ]
+        alunos = aluno_factory.create_batch(db_session, count=9)
+
+        response = client.post("/api/horarios/alocacao", json={"alunos": _alunos(
+            *[(aluno.id, [("segunda", None)]) for aluno in alunos]
+        )}, headers=auth_headers)
+
+        assert sorted(o["matriculados"] for o in response.json()["ocupacao"]) == [3, 3, 3]
+        assert {o["horario_id"] for o in response.json()["ocupacao"]} == {h.id for h in horarios}
+
+    def test_ignorados(self, client, auth_headers, horario_factory, sample_alunos, db_session):
+        """Teste: Alunos inexistentes e inativos ficam de fora, sem perder matrículas"""
+        horario = horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0), capacidade_maxima=1)
+        inativo = sample_alunos[0]
+        db_session.add(AlunoHorario(horario_id=horario.id, aluno_id=inativo.id))
+        inativo.ativo = False
+        db_session.commit()
+
+        response = client.post("/api/horarios/alocacao", json={"alunos": _alunos(
+            (inativo.id, [("segunda", "08:00")]),
+            (999999, [("segunda", "08:00")]),
+            (sample_alunos[1].id, [("segunda", "08:00")]),
+        ), "aplicar": True}, headers=auth_headers)
+
+        corpo = response.json()
+        assert {(i["aluno_id"], i["detail"]) for i in corpo["ignorados"]} == {
+            (inativo.id, "Aluno está inativo"), (999999, "Aluno não encontrado")
+        }
+        assert corpo["remover"] == [] and corpo["adicionar"] == []
+        assert _matriculas(db_session) == {(horario.id, inativo.id)}
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestAplicarAlocacao:
+    """Gravação do diff"""
+
+    def test_aplica_diff(self, client, auth_headers, horario_factory, sample_alunos, db_session):
+        """Teste: Matrículas fora da solução saem, as novas entram e as iguais ficam"""
+        antigo = horario_factory.create(db_session, dia_semana="segunda", horario=time(7, 0))
+        novo = horario_factory.create(db_session, dia_semana="terca", horario=time(8, 0))
+        mantido = horario_factory.create(db_session, dia_semana="quarta", horario=time(8, 0))
+        a, b = sample_alunos[:2]
+        db_session.add_all([
+            AlunoHorario(horario_id=antigo.id, aluno_id=a.id),
+            AlunoHorario(horario_id=mantido.id, aluno_id=b.id),
+        ])
+        db_session.commit()
+
+        response = client.post("/api/horarios/alocacao", json={"alunos": _alunos(
+            (a.id, [("terca", "08:00")]),
+            (b.id, [("quarta", "08:00")]),
+        ), "aplicar": True}, headers=auth_headers)
+
+        corpo = response.json()
+        assert corpo["aplicado"] is True
+        assert corpo["manter"] == 1
+        assert corpo["remover"] == [{"horario_id": antigo.id, "aluno_id": a.id}]
+        assert _matriculas(db_session) == {(novo.id, a.id), (mantido.id, b.id)}
+
+    def test_reposicao_ocupa_vaga(self, client, auth_headers, horario_factory, sample_alunos, db_session):
+        """Teste: Reposição marcada numa aula futura tira a vaga do cálculo, e o aplicar não dá conflito"""
+        hoje = DIAS_SEMANA[date.today().isoweekday() - 1]
+        horario = horario_factory.create(db_session, dia_semana=hoje, horario=time(8, 0), capacidade_maxima=2)
+        a, b, visitante = sample_alunos[:3]
+        db_session.add(AlunoHorario(horario_id=horario.id, aluno_id=a.id))
+        db_session.commit()
+        gerar_ocorrencias(db_session)
+        assert reservar(db_session, visitante.id, horario.id, date.today() + timedelta(days=7)).status == 201
+        db_session.commit()
+
+        response = client.post("/api/horarios/alocacao", json={"alunos": _alunos(
+            (a.id, [(hoje, "08:00")]),
+            (b.id, [(hoje, "08:00")]),
+        ), "aplicar": True}, headers=auth_headers)
+
+        corpo = response.json()
+        assert response.status_code == 200 and corpo["aplicado"] is True
+        assert (corpo["manter"], corpo["adicionar"]) == (1, [])
+        assert corpo["nao_alocados"] == [{"aluno_id": b.id, "aulas_faltando": 1}]
+
+    def test_limite_de_alunos(self, client, auth_headers, monkeypatch):
+        """Teste: Acima do limite do lote retorna 400"""
+        monkeypatch.setattr(horarios_module, "MAX_ITENS_LOTE", 1)
+
+        response = client.post("/api/horarios/alocacao", json={"alunos": _alunos(
+            (1, [("segunda", None)]), (2, [("segunda", None)])
+        )}, headers=auth_headers)
+
+        assert response.status_code == 400
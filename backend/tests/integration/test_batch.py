@@ -0,0 +1,104 @@
+"""
+Testes de Integração - Várias leituras em uma requisição (/api/batch)
+"""
+import pytest
+
+from app.routes import batch as batch_module
+from tests.conftest import QueryCounter
+
+
+def _batch(client, headers, *paths):
+    response = client.post(
+        "/api/batch",
+        json={"requests": [{"id": str(i), "path": path} for i, path in enumerate(paths)]},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["responses"]
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestBatch:
+    """Sub-requisições executadas dentro de uma requisição"""
+
+    def test_resultados_iguais_as_chamadas_diretas(self, client, auth_headers, sample_aluno, sample_pagamento):
+        """Teste: Cada resultado traz o mesmo status e corpo da chamada direta"""
+        paths = ["/api/alunos", f"/api/alunos/{sample_aluno.id}", "/api/pagamentos?limit=10", "/api/planos"]
+
+        respostas = _batch(client, auth_headers, *paths)
+
+        assert [r["id"] for r in respostas] == ["0", "1", "2", "3"]
+        for path, resposta in zip(paths, respostas):
+            direta = client.get(path, headers=auth_headers)
+            assert resposta["status"] == direta.status_code
+            assert resposta["body"] == direta.json()
+
+    def test_erro_em_uma_sub_requisicao_nao_afeta_as_demais(self, client, auth_headers):
+        """Teste: 404 e 422 ficam restritos à sub-requisição"""
+        respostas = _batch(client, auth_headers, "/api/alunos/999999", "/api/alunos?ativo=talvez", "/api/planos", "/api/nada")
+
+        assert [r["status"] for r in respostas] == [404, 422, 200, 404]
+        assert respostas[0]["body"] == {"detail": "Aluno não encontrado"}
+
+    def test_roles_verificadas_por_sub_requisicao(self, client, aluno_auth_headers):
+        """Teste: Usuário aluno recebe 403 nas rotas da recepção, mesmo dentro do batch"""
+        respostas = _batch(client, aluno_auth_headers, "/api/alunos", "/api/auth/me")
+
+        assert respostas[0]["status"] == 403
+        assert respostas[1]["status"] == 200
+        assert respostas[1]["body"]["role"] == "aluno"
+
+    def test_headers_de_cache_repassados(self, client, auth_headers):
+        """Teste: ETag das listagens volta junto com o resultado"""
+        resposta = _batch(client, auth_headers, "/api/alunos")[0]
+
+        assert resposta["headers"]["etag"] == client.get("/api/alunos", headers=auth_headers).headers["etag"]
+
+    def test_autenticacao_feita_uma_vez(self, client, auth_headers):
+        """Teste: Sub-requisições não repetem a busca do usuário no banco"""
+        with QueryCounter() as counter:
+            _batch(client, auth_headers, "/api/alunos", "/api/pagamentos", "/api/horarios", "/api/professores")
+
+        assert sum("FROM users" in statement for statement in counter.statements) <= 1
+
+    def test_exige_autenticacao(self, client):
+        """Teste: Batch sem token é rejeitado"""
+        response = client.post("/api/batch", json={"requests": [{"id": "a", "path": "/api/planos"}]})
+
+        assert response.status_code in [401, 403]
+
+    @pytest.mark.parametrize("path", [
+        "/api/batch", "/api/stream?tipos=aluno", "/api/%73tream", "/api/alunos/../stream", "/api//stream/",
+    ])
+    def test_rotas_bloqueadas(self, client, auth_headers, path):
+        """Teste: Batch recursivo e stream não são executados"""
+        assert _batch(client, auth_headers, path)[0]["status"] == 400
+
+    def test_path_fora_da_api(self, client, auth_headers):
+        """Teste: Apenas rotas /api/ são aceitas"""
+        response = client.post("/api/batch", json={"requests": [{"id": "a", "path": "/metrics"}]}, headers=auth_headers)
+
+        assert response.status_code == 422
+
+    def test_ids_duplicados(self, client, auth_headers):
+        """Teste: ids repetidos tornariam a resposta ambígua"""
+        response = client.post(
+            "/api/batch",
+            json={"requests": [{"id": "a", "path": "/api/planos"}, {"id": "a", "path": "/api/alunos"}]},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 422
+
+    def test_limite_de_sub_requisicoes(self, client, auth_headers, monkeypatch):
+        """Teste: Acima do limite retorna 400"""
+        monkeypatch.setattr(batch_module, "MAX_REQUESTS", 2)
+
+        response = client.post(
+            "/api/batch",
+            json={"requests": [{"id": str(i), "path": "/api/planos"} for i in range(3)]},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 400
@@ -0,0 +1,197 @@
+"""
+Testes de Integração - Change feed (/api/changes)
+"""
+import pytest
+from datetime import time
+
+from sqlalchemy import select, text, update
+
+from app.models.aluno import Aluno
+from app.models.change_log import ChangeLog
+from app.models.horario import Horario
+from app.models.plano import Plano
+from app.models.presenca import PresencaResumo
+from app.models.reposicao import OcorrenciaAula
+from app.utils import change_log
+from tests.conftest import QueryCounter
+
+
+ALUNO = {
+    "nome_completo": "Aluno Sync",
+    "tipo_aula": "natacao",
+    "valor_mensalidade": 150,
+    "dia_vencimento": 10,
+}
+
+
+def _feed(client, headers, since=0, **params):
+    response = client.get("/api/changes", params={"since": since, **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestChangeFeed:
+    """Alterações incrementais de alunos, pagamentos, horários e matrículas"""
+
+    def test_insercao_aparece_com_registro_atual(self, client, auth_headers):
+        """Teste: Aluno criado vem como insert com os dados"""
+        aluno_id = client.post("/api/alunos", json=ALUNO, headers=auth_headers).json()["id"]
+
+        feed = _feed(client, auth_headers)
+
+        assert [(c["table"], c["id"], c["op"]) for c in feed["changes"]] == [("alunos", aluno_id, "insert")]
+        assert feed["changes"][0]["data"]["nome_completo"] == "Aluno Sync"
+        assert feed["next_since"] == feed["changes"][0]["seq"]
+        assert feed["has_more"] is False
+
+    def test_cursor_retorna_apenas_alteracoes_novas(self, client, auth_headers):
+        """Teste: Com next_since o cliente recebe só o delta"""
+        aluno_id = client.post("/api/alunos", json=ALUNO, headers=auth_headers).json()["id"]
+        cursor = _feed(client, auth_headers)["next_since"]
+
+        client.put(f"/api/alunos/{aluno_id}", json={"observacoes": "Nova obs"}, headers=auth_headers)
+        feed = _feed(client, auth_headers, since=cursor)
+
+        assert len(feed["changes"]) == 1
+        assert feed["changes"][0]["op"] == "update"
+        assert feed["changes"][0]["data"]["observacoes"] == "Nova obs"
+        assert _feed(client, auth_headers, since=feed["next_since"])["changes"] == []
+
+    def test_exclusao_gera_tombstone(self, client, auth_headers, sample_pagamento):
+        """Teste: Pagamento excluído vem como delete sem dados"""
+        pagamento_id = sample_pagamento.id
+        cursor = _feed(client, auth_headers)["next_since"]
+
+        client.delete(f"/api/pagamentos/{pagamento_id}", headers=auth_headers)
+        feed = _feed(client, auth_headers, since=cursor)
+
+        assert feed["changes"] == [
+            {"seq": feed["next_since"], "table": "pagamentos", "id": pagamento_id, "op": "delete", "data": None}
+        ]
+
+    def test_matricula_e_desmatricula(self, client, auth_headers, sample_aluno, horario_factory, db_session):
+        """Teste: Matrículas entram no feed como tabela 'matriculas'"""
+        horario_id = horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0)).id
+        aluno_id = sample_aluno.id
+        cursor = _feed(client, auth_headers)["next_since"]
+
+        matricula_id = client.post(f"/api/horarios/{horario_id}/alunos/{aluno_id}", headers=auth_headers).json()["matricula_id"]
+        inseridas = _feed(client, auth_headers, since=cursor)
+        client.delete(f"/api/horarios/{horario_id}/alunos/{aluno_id}", headers=auth_headers)
+        removidas = _feed(client, auth_headers, since=inseridas["next_since"])
+
+        assert inseridas["changes"][0]["table"] == "matriculas"
+        assert inseridas["changes"][0]["data"] == {"id": matricula_id, "aluno_id": aluno_id, "horario_id": horario_id}
+        assert [(c["id"], c["op"]) for c in removidas["changes"]] == [(matricula_id, "delete")]
+
+    def test_alteracoes_do_mesmo_registro_sao_compactadas(self, client, auth_headers):
+        """Teste: Insert seguido de updates vira uma entrada com o estado final"""
+        aluno_id = client.post("/api/alunos", json=ALUNO, headers=auth_headers).json()["id"]
+        client.put(f"/api/alunos/{aluno_id}", json={"observacoes": "1"}, headers=auth_headers)
+        client.put(f"/api/alunos/{aluno_id}", json={"observacoes": "2"}, headers=auth_headers)
+
+        feed = _feed(client, auth_headers)
+
+        assert len(feed["changes"]) == 1
+        assert feed["changes"][0]["data"]["observacoes"] == "2"
+        assert feed["next_since"] == feed["changes"][0]["seq"]
+
+    def test_paginacao(self, client, auth_headers, aluno_factory, db_session):
+        """Teste: limit pagina o log e has_more indica páginas restantes"""
+        aluno_factory.create_batch(db_session, count=5)
+
+        primeira = _feed(client, auth_headers, limit=3)
+        segunda = _feed(client, auth_headers, since=primeira["next_since"], limit=3)
+
+        assert len(primeira["changes"]) == 3 and primeira["has_more"] is True
+        assert len(segunda["changes"]) == 2 and segunda["has_more"] is False
+
+    def test_filtro_por_tabela(self, client, auth_headers, sample_pagamento):
+        """Teste: ?tabelas= restringe o feed"""
+        feed = _feed(client, auth_headers, tabelas="pagamentos")
+
+        assert {c["table"] for c in feed["changes"]} == {"pagamentos"}
+
+    def test_tabela_invalida(self, client, auth_headers):
+        """Teste: Tabela desconhecida retorna 400"""
+        response = client.get("/api/changes?tabelas=users", headers=auth_headers)
+
+        assert response.status_code == 400
+
+    def test_update_sem_mudanca_real_nao_gera_entrada(self, db_session, sample_aluno):
+        """Teste: Objeto marcado como sujo sem alteração líquida não entra no log"""
+        total = db_session.query(ChangeLog).count()
+
+        sample_aluno.nome_completo = sample_aluno.nome_completo
+        db_session.commit()
+
+        assert db_session.query(ChangeLog).count() == total
+
+    def test_rollback_descarta_entradas(self, db_session):
+        """Teste: Log é gravado na mesma transação da alteração"""
+        total = db_session.query(ChangeLog).count()
+        savepoint = db_session.begin_nested()
+
+        db_session.add(Aluno(**ALUNO))
+        db_session.flush()
+        savepoint.rollback()
+
+        assert db_session.query(ChangeLog).count() == total
+
+    def test_exige_autenticacao(self, client):
+        """Teste: Feed protegido pelas mesmas roles das listagens"""
+        response = client.get("/api/changes")
+
+        assert response.status_code in [401, 403]
+
+
+@pytest.mark.integration
+class TestLockDoFeed:
+    """Advisory lock do feed pego antes do primeiro lock de linha da transação"""
+
+    @pytest.fixture
+    def locks(self, monkeypatch):
+        """Posição (nº de statements já executados no teste) de cada pedido de lock"""
+        posicoes = []
+        original = change_log._lock
+
+        def espiao(session):
+            if not session.info.get(change_log._LOCKED_KEY):
+                posicoes.append(len(counter.statements))
+            original(session)
+
+        monkeypatch.setattr(change_log, "_lock", espiao)
+        with QueryCounter() as counter:
+            yield posicoes
+
+    @pytest.mark.parametrize("statement", [
+        select(Horario).with_for_update(),
+        update(Horario).values(capacidade_maxima=Horario.capacidade_maxima),
+    ])
+    def test_lock_antes_do_primeiro_statement(self, db_session, locks, statement):
+        """Teste: FOR UPDATE ou UPDATE em massa numa tabela do feed pega o lock antes de executar"""
+        db_session.execute(statement)
+        db_session.execute(update(Aluno).values(ativo=Aluno.ativo))
+
+        assert locks == [0]
+
+    def test_flush_pega_o_lock(self, db_session, locks):
+        """Teste: O flush de um modelo do feed pega o lock antes do INSERT"""
+        db_session.add(Aluno(**ALUNO))
+        db_session.flush()
+
+        assert locks == [0]
+
+    def test_leituras_e_tabelas_fora_do_feed_nao_pegam(self, db_session, locks):
+        """Teste: SELECT comum, SQL textual e escrita só em tabelas fora do feed não serializam"""
+        db_session.execute(select(Aluno))
+        db_session.execute(text("SELECT 1"))
+        db_session.execute(update(PresencaResumo).values(total=PresencaResumo.total))
+        db_session.execute(update(OcorrenciaAula).values(ocupadas=OcorrenciaAula.ocupadas))
+        db_session.execute(select(Plano).with_for_update())
+        db_session.add(Plano(nome="Livre", valor_mensal=100, acesso_livre=True))
+        db_session.flush()
+
+        assert locks == []
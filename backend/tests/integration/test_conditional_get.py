@@ -0,0 +1,97 @@
+"""
+Testes de Integração - ETag e GET condicional nas listagens
+"""
+import pytest
+from datetime import time
+
+from app.utils.conditional import cache_control_for, etag_matches
+
+
+LISTAGENS = ["/api/alunos", "/api/pagamentos", "/api/horarios/grade-completa"]
+
+
+@pytest.fixture
+def horario(db_session, horario_factory):
+    """Horário de segunda às 8h (retorna o ID)"""
+    return horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0)).id
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestGetCondicional:
+    """If-None-Match responde 304 sem executar a query principal"""
+
+    @pytest.mark.parametrize("rota", LISTAGENS)
+    def test_listagem_retorna_etag_e_cache_control(self, client, auth_headers, rota):
+        """Teste: Resposta 200 traz ETag forte e política de cache"""
+        response = client.get(rota, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.headers["ETag"].startswith('"')
+        assert response.headers["Cache-Control"] == "private, no-cache"
+
+    @pytest.mark.parametrize("rota", LISTAGENS)
+    def test_etag_igual_retorna_304_sem_query_principal(self, client, auth_headers, sample_pagamento, horario, assert_query_budget, rota):
+        """Teste: Cliente com a lista em dia recebe 304 vazio"""
+        etag = client.get(rota, headers=auth_headers).headers["ETag"]
+
+        with assert_query_budget(1):  # apenas a busca do usuário autenticado
+            response = client.get(rota, headers={**auth_headers, "If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+    def test_alteracao_muda_etag(self, client, auth_headers, sample_aluno):
+        """Teste: Commit na tabela gera nova versão da lista"""
+        etag = client.get("/api/alunos", headers=auth_headers).headers["ETag"]
+
+        client.put(f"/api/alunos/{sample_aluno.id}", json={"observacoes": "Atualizado"}, headers=auth_headers)
+        response = client.get("/api/alunos", headers={**auth_headers, "If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_matricula_muda_etag_da_grade(self, client, auth_headers, sample_aluno, horario):
+        """Teste: Grade depende também das matrículas"""
+        etag = client.get("/api/horarios/grade-completa", headers=auth_headers).headers["ETag"]
+
+        client.post(f"/api/horarios/{horario}/alunos/{sample_aluno.id}", headers=auth_headers)
+        response = client.get("/api/horarios/grade-completa", headers={**auth_headers, "If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert len(response.json()[0]["alunos"]) == 1
+
+    def test_filtros_diferentes_tem_etags_diferentes(self, client, auth_headers):
+        """Teste: Parâmetros da requisição fazem parte do ETag"""
+        ativos = client.get("/api/alunos", headers=auth_headers).headers["ETag"]
+        inativos = client.get("/api/alunos?ativo=false", headers=auth_headers).headers["ETag"]
+
+        assert ativos != inativos
+
+    def test_304_exige_autenticacao(self, client, auth_headers):
+        """Teste: ETag válido não dispensa o token"""
+        etag = client.get("/api/alunos", headers=auth_headers).headers["ETag"]
+
+        response = client.get("/api/alunos", headers={"If-None-Match": etag})
+
+        assert response.status_code in [401, 403]
+
+
+@pytest.mark.unit
+class TestEtagUtils:
+    """Comparação de ETags e política por router"""
+
+    def test_comparacao_fraca_e_listas(self):
+        """Teste: W/, listas e * são aceitos no If-None-Match"""
+        assert etag_matches('W/"abc"', '"abc"')
+        assert etag_matches('"x", "abc"', '"abc"')
+        assert etag_matches("*", '"abc"')
+        assert not etag_matches('"x"', '"abc"')
+
+    def test_cache_control_configuravel_por_router(self, monkeypatch):
+        """Teste: CACHE_CONTROL_<ROUTER> sobrescreve o padrão"""
+        monkeypatch.setenv("CACHE_CONTROL_PAGAMENTOS", "private, max-age=30")
+
+        assert cache_control_for("pagamentos") == "private, max-age=30"
+        assert cache_control_for("alunos") == "private, no-cache"
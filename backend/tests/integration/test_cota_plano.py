@@ -0,0 +1,163 @@
+"""
+Testes de Integração - Cota semanal do plano (Plano.aulas_por_semana) nas matrículas
+"""
+import pytest
+from datetime import time
+
+from app.models.fila_espera import FilaEspera
+from app.models.plano import Plano
+from app.models.turma import AlunoHorario
+from app.services import matricula_service
+from tests.conftest import QueryCounter
+
+
+def _plano(db_session, aulas_por_semana=2, **kwargs):
+    plano = Plano(nome=f"{aulas_por_semana}x por semana", valor_mensal=150, aulas_por_semana=aulas_por_semana, **kwargs)
+    db_session.add(plano)
+    db_session.commit()
+    return plano
+
+
+@pytest.fixture
+def horarios(db_session, horario_factory):
+    """Quatro horários de segunda, capacidade 5"""
+    return [
+        horario_factory.create(db_session, dia_semana="segunda", horario=time(7 + i, 0), capacidade_maxima=5)
+        for i in range(4)
+    ]
+
+
+@pytest.fixture
+def aluno_2x(db_session, aluno_factory, horarios):
+    """Aluno de plano 2x por semana já matriculado em um horário"""
+    aluno = aluno_factory.create(db_session, nome_completo="Aluno Dois", plano_id=_plano(db_session).id)
+    db_session.add(AlunoHorario(horario_id=horarios[0].id, aluno_id=aluno.id))
+    db_session.commit()
+    return aluno
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestCotaNaMatricula:
+    """Matrícula individual, em lote e promoção da fila"""
+
+    def test_matricula_individual(self, client, auth_headers, aluno_2x, horarios):
+        """Teste: A segunda aula entra, a terceira é recusada"""
+        ok = client.post(f"/api/horarios/{horarios[1].id}/alunos/{aluno_2x.id}", headers=auth_headers)
+        response = client.post(f"/api/horarios/{horarios[2].id}/alunos/{aluno_2x.id}", headers=auth_headers)
+
+        assert ok.status_code == 201
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Aluno já atingiu o limite de aulas por semana do plano"
+
+    def test_cota_no_proprio_insert(self, client, auth_headers, aluno_2x, horarios):
+        """Teste: O plano é consultado só dentro do INSERT da matrícula"""
+        with QueryCounter() as counter:
+            client.post(f"/api/horarios/{horarios[1].id}/alunos/{aluno_2x.id}", headers=auth_headers)
+
+        com_plano = [s for s in counter.statements if "planos" in s]
+        assert len(com_plano) == 1 and com_plano[0].startswith("INSERT INTO aluno_horario")
+
+    def test_lote_conta_itens_do_proprio_lote(self, client, auth_headers, aluno_2x, horarios):
+        """Teste: No lote, itens além da cota recebem erro na ordem enviada"""
+        response = client.post("/api/horarios/matriculas:batch", json={"matriculas": [
+            {"horario_id": h.id, "aluno_id": aluno_2x.id} for h in horarios[1:]
+        ]}, headers=auth_headers)
+
+        assert [r["status"] for r in response.json()["resultados"]] == [201, 400, 400]
+        assert response.json()["resultados"][1]["detail"].endswith("plano (2)")
+
+    def test_lote_confere_cota_no_insert(self, client, auth_headers, db_session, aluno_factory, horarios, monkeypatch):
+        """Teste: Matrícula gravada depois da leitura dos alunos é contada pelo INSERT do lote"""
+        aluno = aluno_factory.create(db_session, plano_id=_plano(db_session, 3).id)
+        db_session.add(AlunoHorario(horario_id=horarios[0].id, aluno_id=aluno.id))
+        db_session.commit()
+        original = matricula_service.ocupar_vagas
+
+        def matricula_concorrente(db, deltas):
+            db.add(AlunoHorario(horario_id=horarios[3].id, aluno_id=aluno.id))
+            db.flush()
+            return original(db, deltas)
+
+        monkeypatch.setattr(matricula_service, "ocupar_vagas", matricula_concorrente)
+
+        with QueryCounter() as counter:
+            response = client.post("/api/horarios/matriculas:batch", json={"matriculas": [
+                {"horario_id": h.id, "aluno_id": aluno.id} for h in horarios[1:3]
+            ]}, headers=auth_headers)
+
+        resultados = response.json()["resultados"]
+        assert [r["status"] for r in resultados] == [201, 400]
+        assert resultados[1]["detail"] == "Aluno já atingiu o limite de aulas por semana do plano (3)"
+        lote = [s for s in counter.statements if s.startswith("INSERT INTO aluno_horario (horario_id, aluno_id) SELECT")]
+        assert len(lote) == 1 and "row_number()" in lote[0]
+
+    @pytest.mark.parametrize("plano", ["acesso_livre", "sem_plano"])
+    def test_sem_limite(self, client, auth_headers, db_session, aluno_factory, horarios, plano):
+        """Teste: Plano com acesso livre ou aluno sem plano não tem cota"""
+        plano_id = _plano(db_session, 1, acesso_livre=True).id if plano == "acesso_livre" else None
+        aluno = aluno_factory.create(db_session, plano_id=plano_id)
+
+        response = client.post("/api/horarios/matriculas:batch", json={"matriculas": [
+            {"horario_id": h.id, "aluno_id": aluno.id} for h in horarios
+        ]}, headers=auth_headers)
+
+        assert response.json()["sucesso"] == 4
+
+    def test_fila_pula_aluno_na_cota(self, client, auth_headers, db_session, aluno_2x, horarios, sample_alunos):
+        """Teste: Quem já está na cota continua na fila e a vaga vai para o próximo"""
+        horario = horarios[3]
+        horario.capacidade_maxima = 1
+        db_session.add_all([
+            AlunoHorario(horario_id=horarios[1].id, aluno_id=aluno_2x.id),
+            AlunoHorario(horario_id=horario.id, aluno_id=sample_alunos[0].id),
+        ])
+        db_session.commit()
+        client.post(f"/api/horarios/{horario.id}/fila-espera", json={"aluno_id": aluno_2x.id, "prioridade": 5}, headers=auth_headers)
+        client.post(f"/api/horarios/{horario.id}/fila-espera", json={"aluno_id": sample_alunos[1].id}, headers=auth_headers)
+
+        client.delete(f"/api/horarios/{horario.id}/alunos/{sample_alunos[0].id}", headers=auth_headers)
+
+        matriculados = {a for (a,) in db_session.query(AlunoHorario.aluno_id).filter_by(horario_id=horario.id)}
+        assert matriculados == {sample_alunos[1].id}
+        assert db_session.query(FilaEspera).filter_by(horario_id=horario.id).one().aluno_id == aluno_2x.id
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestRelatorioCotas:
+    """GET /api/alunos/cotas"""
+
+    @pytest.fixture
+    def alunos(self, db_session, aluno_factory, aluno_2x, horarios):
+        """aluno_2x abaixo (1 de 2); acima com 3 de 1; em dia com 1 de 1; acesso livre com 3"""
+        um = _plano(db_session, 1).id
+        livre = _plano(db_session, 1, acesso_livre=True).id
+        acima = aluno_factory.create(db_session, nome_completo="Aluno Acima", plano_id=um)
+        em_dia = aluno_factory.create(db_session, nome_completo="Aluno Em Dia", plano_id=um)
+        sem_limite = aluno_factory.create(db_session, nome_completo="Aluno Livre", plano_id=livre)
+        db_session.add_all(
+            [AlunoHorario(horario_id=h.id, aluno_id=acima.id) for h in horarios[:3]]
+            + [AlunoHorario(horario_id=h.id, aluno_id=sem_limite.id) for h in horarios[:3]]
+            + [AlunoHorario(horario_id=horarios[0].id, aluno_id=em_dia.id)]
+        )
+        db_session.commit()
+        return {"abaixo": aluno_2x, "acima": acima}
+
+    def test_acima_e_abaixo(self, client, auth_headers, alunos):
+        """Teste: Só quem está fora da cota, maiores diferenças primeiro"""
+        with QueryCounter() as counter:
+            response = client.get("/api/alunos/cotas", headers=auth_headers)
+
+        assert [(r["aluno_id"], r["matriculadas"], r["diferenca"], r["situacao"]) for r in response.json()] == [
+            (alunos["acima"].id, 3, 2, "acima"),
+            (alunos["abaixo"].id, 1, -1, "abaixo"),
+        ]
+        assert len([s for s in counter.statements if "FROM alunos" in s]) == 1
+
+    @pytest.mark.parametrize("situacao", ["acima", "abaixo"])
+    def test_filtro(self, client, auth_headers, alunos, situacao):
+        """Teste: situacao restringe o relatório"""
+        response = client.get(f"/api/alunos/cotas?situacao={situacao}", headers=auth_headers)
+
+        assert [r["aluno_id"] for r in response.json()] == [alunos[situacao].id]
@@ -0,0 +1,261 @@
+"""
+Testes de Integração - Fila de espera com promoção automática e outbox
+"""
+import json
+import pytest
+from datetime import time
+
+from app.models.fila_espera import FilaEspera
+from app.models.horario import Horario
+from app.models.outbox import OutboxMessage
+from app.models.turma import AlunoHorario
+from app.services import outbox
+from tests.conftest import QueryCounter
+
+
+@pytest.fixture
+def horario_lotado(db_session, horario_factory, sample_alunos):
+    """Horário com capacidade 2 ocupada pelos dois primeiros alunos"""
+    horario = horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0), capacidade_maxima=2)
+    db_session.add_all([AlunoHorario(horario_id=horario.id, aluno_id=aluno.id) for aluno in sample_alunos[:2]])
+    db_session.commit()
+    return horario
+
+
+def _entrar(client, headers, horario_id, aluno_id, prioridade=0):
+    return client.post(
+        f"/api/horarios/{horario_id}/fila-espera",
+        json={"aluno_id": aluno_id, "prioridade": prioridade},
+        headers=headers,
+    )
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestFilaEspera:
+    """Entrada, posição e saída da fila"""
+
+    def test_entrar_retorna_posicao(self, client, auth_headers, horario_lotado, sample_alunos, db_session):
+        """Teste: Cada entrada informa a posição e o total da fila"""
+        horario_id = horario_lotado.id
+        _entrar(client, auth_headers, horario_id, sample_alunos[2].id)
+        response = _entrar(client, auth_headers, horario_id, sample_alunos[3].id)
+
+        assert response.status_code == 201
+        assert (response.json()["posicao"], response.json()["total"]) == (2, 2)
+        assert db_session.query(Horario.fila_espera).filter(Horario.id == horario_id).scalar() == 2
+
+    def test_prioridade_passa_na_frente(self, client, auth_headers, horario_lotado, sample_alunos):
+        """Teste: Maior prioridade primeiro; na mesma prioridade, ordem de chegada"""
+        a, b, c = sample_alunos[2:5]
+        _entrar(client, auth_headers, horario_lotado.id, a.id)
+        _entrar(client, auth_headers, horario_lotado.id, b.id)
+        _entrar(client, auth_headers, horario_lotado.id, c.id, prioridade=5)
+
+        response = client.get(f"/api/horarios/{horario_lotado.id}/fila-espera", headers=auth_headers)
+
+        assert response.json()["total"] == 3
+        assert [(x["posicao"], x["aluno_id"]) for x in response.json()["alunos"]] == [(1, c.id), (2, a.id), (3, b.id)]
+
+    def test_posicao_em_uma_query(self, client, auth_headers, horario_lotado, sample_alunos):
+        """Teste: Consultar a posição não lê a fila inteira"""
+        horario_id = horario_lotado.id
+        for aluno in sample_alunos[2:8]:
+            _entrar(client, auth_headers, horario_id, aluno.id)
+        aluno_id = sample_alunos[4].id
+
+        with QueryCounter() as counter:
+            response = client.get(f"/api/horarios/{horario_id}/fila-espera/{aluno_id}", headers=auth_headers)
+
+        assert (response.json()["posicao"], response.json()["total"]) == (3, 6)
+        assert counter.count == 2, counter.statements  # usuário + posição
+
+    def test_posicoes_do_aluno(self, client, auth_headers, horario_lotado, horario_factory, sample_alunos, db_session):
+        """Teste: /alunos/{id}/fila-espera lista a posição em cada horário"""
+        outro = horario_factory.create(db_session, dia_semana="terca", horario=time(9, 0), capacidade_maxima=1)
+        db_session.add(AlunoHorario(horario_id=outro.id, aluno_id=sample_alunos[0].id))
+        db_session.commit()
+        aluno = sample_alunos[5]
+        _entrar(client, auth_headers, horario_lotado.id, sample_alunos[6].id)
+        _entrar(client, auth_headers, horario_lotado.id, aluno.id)
+        _entrar(client, auth_headers, outro.id, aluno.id)
+
+        response = client.get(f"/api/alunos/{aluno.id}/fila-espera", headers=auth_headers)
+
+        assert [(p["horario_id"], p["posicao"], p["total"]) for p in response.json()] == [
+            (horario_lotado.id, 2, 2), (outro.id, 1, 1)
+        ]
+
+    def test_horario_com_vagas_recusa(self, client, auth_headers, horario_factory, sample_aluno, db_session):
+        """Teste: Com vaga livre o aluno deve ser matriculado, não entrar na fila"""
+        horario = horario_factory.create(db_session, dia_semana="quarta", horario=time(8, 0), capacidade_maxima=2)
+
+        response = _entrar(client, auth_headers, horario.id, sample_aluno.id)
+
+        assert response.status_code == 400
+
+    def test_validacoes(self, client, auth_headers, horario_lotado, sample_alunos, db_session):
+        """Teste: Matriculado, repetido, inativo e inexistente são recusados"""
+        inativo = sample_alunos[3]
+        inativo.ativo = False
+        db_session.commit()
+        _entrar(client, auth_headers, horario_lotado.id, sample_alunos[2].id)
+
+        assert _entrar(client, auth_headers, horario_lotado.id, sample_alunos[0].id).json()["detail"] == \
+            "Aluno já está matriculado neste horário"
+        assert _entrar(client, auth_headers, horario_lotado.id, sample_alunos[2].id).json()["detail"] == \
+            "Aluno já está na fila de espera deste horário"
+        assert _entrar(client, auth_headers, horario_lotado.id, inativo.id).json()["detail"] == "Aluno está inativo"
+        assert _entrar(client, auth_headers, horario_lotado.id, 999999).status_code == 404
+        assert _entrar(client, auth_headers, 999999, sample_alunos[2].id).status_code == 404
+
+    def test_sair_da_fila(self, client, auth_headers, horario_lotado, sample_alunos, db_session):
+        """Teste: Saída atualiza o contador e as posições"""
+        a, b = sample_alunos[2:4]
+        _entrar(client, auth_headers, horario_lotado.id, a.id)
+        _entrar(client, auth_headers, horario_lotado.id, b.id)
+
+        response = client.delete(f"/api/horarios/{horario_lotado.id}/fila-espera/{a.id}", headers=auth_headers)
+        posicao = client.get(f"/api/horarios/{horario_lotado.id}/fila-espera/{b.id}", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert (posicao.json()["posicao"], posicao.json()["total"]) == (1, 1)
+        repetida = client.delete(f"/api/horarios/{horario_lotado.id}/fila-espera/{a.id}", headers=auth_headers)
+        assert repetida.status_code == 404
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestPromocaoFila:
+    """Vaga liberada vai para o próximo da fila na mesma transação"""
+
+    def test_desmatricula_promove_o_proximo(self, client, auth_headers, horario_lotado, sample_alunos, db_session):
+        """Teste: O primeiro da fila é matriculado, sai da fila e recebe uma mensagem na outbox"""
+        primeiro, segundo = sample_alunos[2:4]
+        _entrar(client, auth_headers, horario_lotado.id, primeiro.id)
+        _entrar(client, auth_headers, horario_lotado.id, segundo.id)
+
+        response = client.delete(f"/api/horarios/{horario_lotado.id}/alunos/{sample_alunos[0].id}", headers=auth_headers)
+
+        assert response.status_code == 200
+        matriculados = {m.aluno_id for m in db_session.query(AlunoHorario).filter_by(horario_id=horario_lotado.id)}
+        assert matriculados == {sample_alunos[1].id, primeiro.id}
+        assert [e.aluno_id for e in db_session.query(FilaEspera)] == [segundo.id]
+        assert db_session.query(Horario.fila_espera).filter(Horario.id == horario_lotado.id).scalar() == 1
+
+        (mensagem,) = db_session.query(OutboxMessage).all()
+        payload = json.loads(mensagem.payload)
+        assert mensagem.tipo == "fila_espera_promocao" and mensagem.enviado_em is None
+        assert (payload["aluno_id"], payload["horario"], payload["telefone"]) == (
+            primeiro.id, "08:00", primeiro.telefone_e164
+        )
+
+    def test_inativo_e_pulado(self, client, auth_headers, horario_lotado, sample_alunos, db_session):
+        """Teste: Aluno inativado depois de entrar na fila não é promovido"""
+        inativo, ativo = sample_alunos[2:4]
+        _entrar(client, auth_headers, horario_lotado.id, inativo.id)
+        _entrar(client, auth_headers, horario_lotado.id, ativo.id)
+        inativo.ativo = False
+        db_session.commit()
+
+        client.delete(f"/api/horarios/{horario_lotado.id}/alunos/{sample_alunos[0].id}", headers=auth_headers)
+
+        assert db_session.query(AlunoHorario).filter_by(horario_id=horario_lotado.id, aluno_id=ativo.id).count() == 1
+        assert [e.aluno_id for e in db_session.query(FilaEspera)] == [inativo.id]
+
+    def test_desmatricula_em_lote_preenche_as_vagas(self, client, auth_headers, horario_lotado, sample_alunos, db_session):
+        """Teste: Cada vaga liberada no lote recebe um aluno da fila"""
+        fila = sample_alunos[2:5]
+        for aluno in fila:
+            _entrar(client, auth_headers, horario_lotado.id, aluno.id)
+
+        client.request(
+            "DELETE", f"/api/horarios/{horario_lotado.id}/alunos:batch",
+            json={"aluno_ids": [a.id for a in sample_alunos[:2]]}, headers=auth_headers,
+        )
+
+        matriculados = {m.aluno_id for m in db_session.query(AlunoHorario).filter_by(horario_id=horario_lotado.id)}
+        assert matriculados == {fila[0].id, fila[1].id}
+        assert db_session.query(OutboxMessage).count() == 2
+
+    def test_aumento_de_capacidade_promove(self, client, auth_headers, horario_lotado, sample_alunos, db_session):
+        """Teste: Aumentar a capacidade matricula os próximos da fila"""
+        for aluno in sample_alunos[2:4]:
+            _entrar(client, auth_headers, horario_lotado.id, aluno.id)
+
+        response = client.put(f"/api/horarios/{horario_lotado.id}", json={"capacidade_maxima": 3}, headers=auth_headers)
+
+        assert response.json()["fila_espera"] == 1
+        assert db_session.query(AlunoHorario).filter_by(horario_id=horario_lotado.id).count() == 3
+
+    def test_sem_fila_custa_uma_query(self, client, auth_headers, horario_lotado, sample_alunos):
+        """Teste: Sem fila a promoção para na consulta de vagas (horarios.fila_espera = 0)"""
+        horario_id, aluno_id = horario_lotado.id, sample_alunos[0].id
+
+        with QueryCounter() as counter:
+            client.delete(f"/api/horarios/{horario_id}/alunos/{aluno_id}", headers=auth_headers)
+
+        assert not any("FROM fila_espera" in s or "INTO outbox" in s for s in counter.statements)
+
+
+@pytest.mark.integration
+@pytest.mark.database
+class TestOutbox:
+    """Despacho das mensagens pendentes"""
+
+    def test_envia_e_marca(self, db_session, monkeypatch):
+        """Teste: Mensagem enviada recebe enviado_em e não é enviada de novo"""
+        enviados = []
+        monkeypatch.setitem(outbox._handlers, "teste", lambda payload: enviados.append(payload) or True)
+        outbox.enqueue(db_session, "teste", [{"n": 1}, {"n": 2}])
+        db_session.commit()
+
+        assert outbox.dispatch_pending(db_session) == 2
+        assert outbox.dispatch_pending(db_session) == 0
+        assert enviados == [{"n": 1}, {"n": 2}]
+
+    def test_falha_tenta_de_novo_ate_o_limite(self, db_session, monkeypatch):
+        """Teste: Falhas contam tentativas e guardam o erro; no limite a mensagem é deixada de lado"""
+        monkeypatch.setitem(outbox._handlers, "teste", lambda payload: False)
+        monkeypatch.setattr(outbox, "MAX_TENTATIVAS", 2)
+        outbox.enqueue(db_session, "teste", [{"n": 1}])
+        db_session.commit()
+
+        for _ in range(3):
+            assert outbox.dispatch_pending(db_session) == 0
+
+        mensagem = db_session.query(OutboxMessage).one()
+        assert (mensagem.tentativas, mensagem.enviado_em) == (2, None)
+        assert mensagem.ultimo_erro == "Envio recusado"
+
+    def test_reservada_por_outro_worker_nao_e_enviada(self, db_session, monkeypatch):
+        """Teste: Só o worker que reservou envia; reserva vencida volta a ficar disponível"""
+        enviados = []
+        monkeypatch.setitem(outbox._handlers, "teste", lambda payload: enviados.append(payload) or True)
+        outbox.enqueue(db_session, "teste", [{"n": 1}, {"n": 2}])
+        db_session.commit()
+
+        assert len(outbox.reservar_pendentes(db_session, limit=1, worker="outro:1")) == 1
+        assert outbox.dispatch_pending(db_session) == 1
+        assert enviados == [{"n": 2}]
+
+        monkeypatch.setattr(outbox, "RESERVA_SECONDS", -1)
+        assert outbox.dispatch_pending(db_session) == 1
+        assert enviados == [{"n": 2}, {"n": 1}]
+
+    def test_reserva_em_um_update(self, db_session, monkeypatch):
+        """Teste: O lote é reservado em um único UPDATE ... RETURNING antes dos envios"""
+        monkeypatch.setitem(outbox._handlers, "teste", lambda payload: True)
+        outbox.enqueue(db_session, "teste", [{"n": n} for n in range(3)])
+        db_session.commit()
+
+        with QueryCounter() as counter:
+            outbox.dispatch_pending(db_session)
+
+        updates = [s for s in counter.statements if s.startswith("UPDATE outbox")]
+        assert "RETURNING" in updates[0] and "reservado_por" in updates[0]
+        assert len(updates) == 1 + 3
+
+    def test_promocao_sem_telefone(self):
+        """Teste: Aluno promovido sem telefone não trava a outbox"""
+        assert outbox._handlers["fila_espera_promocao"]({"aluno_id": 1, "telefone": None}) is True
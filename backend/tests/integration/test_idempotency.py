@@ -0,0 +1,202 @@
+"""
+Testes de Integração - Idempotency-Key nos POSTs de pagamento, aluno e matrícula
+"""
+import pytest
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.aluno import Aluno
+from app.models.idempotency_key import IdempotencyKey
+from app.models.pagamento import Pagamento
+from app.models.turma import AlunoHorario
+from app.utils.idempotency import IdempotentRequest, purge_expired
+from tests.conftest import QueryCounter
+
+
+def _pagamento(aluno_id: int, valor: str = "150.00") -> dict:
+    return {
+        "aluno_id": aluno_id,
+        "valor": valor,
+        "data_pagamento": date.today().isoformat(),
+        "mes_referencia": date.today().strftime("%Y-%m"),
+        "forma_pagamento": "pix",
+    }
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestIdempotencyKey:
+    """Repetições com a mesma chave devolvem a resposta gravada"""
+
+    def test_repeticao_nao_duplica_pagamento(self, client, auth_headers, sample_aluno, db_session):
+        """Teste: Mesmo pagamento enviado duas vezes cria um único registro"""
+        headers = {**auth_headers, "Idempotency-Key": "pag-1"}
+
+        primeira = client.post("/api/pagamentos", json=_pagamento(sample_aluno.id), headers=headers)
+        segunda = client.post("/api/pagamentos", json=_pagamento(sample_aluno.id), headers=headers)
+
+        assert primeira.status_code == segunda.status_code == 201
+        assert segunda.json() == primeira.json()
+        assert segunda.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in primeira.headers
+        assert db_session.query(Pagamento).filter_by(aluno_id=sample_aluno.id).count() == 1
+
+    def test_repeticao_nao_consulta_tabelas_de_negocio(self, client, auth_headers, sample_aluno):
+        """Teste: A resposta gravada sai de uma leitura da chave, sem tocar em alunos/pagamentos"""
+        headers = {**auth_headers, "Idempotency-Key": "pag-2"}
+        corpo = _pagamento(sample_aluno.id)
+        client.post("/api/pagamentos", json=corpo, headers=headers)
+
+        with QueryCounter() as counter:
+            response = client.post("/api/pagamentos", json=corpo, headers=headers)
+
+        assert response.status_code == 201
+        assert not any(
+            tabela in statement
+            for statement in counter.statements
+            for tabela in ("FROM alunos", "INTO pagamentos", "change_log")
+        )
+        assert counter.count == 2  # usuário autenticado + chave
+
+    def test_sem_chave_mantem_comportamento(self, client, auth_headers, sample_aluno, db_session):
+        """Teste: Sem o header, cada POST cria um registro"""
+        client.post("/api/pagamentos", json=_pagamento(sample_aluno.id), headers=auth_headers)
+        client.post("/api/pagamentos", json=_pagamento(sample_aluno.id), headers=auth_headers)
+
+        assert db_session.query(Pagamento).filter_by(aluno_id=sample_aluno.id).count() == 2
+
+    def test_mesma_chave_com_outro_corpo(self, client, auth_headers, sample_aluno):
+        """Teste: Reutilizar a chave com outro conteúdo é recusado"""
+        headers = {**auth_headers, "Idempotency-Key": "pag-3"}
+        client.post("/api/pagamentos", json=_pagamento(sample_aluno.id), headers=headers)
+
+        response = client.post("/api/pagamentos", json=_pagamento(sample_aluno.id, "99.00"), headers=headers)
+
+        assert response.status_code == 422
+
+    def test_chave_por_usuario(self, client, auth_headers, recep_auth_headers, sample_aluno, db_session):
+        """Teste: A mesma chave enviada por outro usuário é outra operação"""
+        client.post("/api/pagamentos", json=_pagamento(sample_aluno.id), headers={**auth_headers, "Idempotency-Key": "k"})
+        response = client.post(
+            "/api/pagamentos", json=_pagamento(sample_aluno.id), headers={**recep_auth_headers, "Idempotency-Key": "k"}
+        )
+
+        assert response.status_code == 201
+        assert "Idempotent-Replayed" not in response.headers
+        assert db_session.query(Pagamento).filter_by(aluno_id=sample_aluno.id).count() == 2
+
+    def test_criar_aluno(self, client, auth_headers, db_session):
+        """Teste: Cadastro repetido de aluno cria um único registro"""
+        headers = {**auth_headers, "Idempotency-Key": "aluno-1"}
+        aluno = {"nome_completo": "Aluno Idempotente", "tipo_aula": "natacao", "valor_mensalidade": "150.00", "dia_vencimento": 10}
+
+        respostas = [client.post("/api/alunos", json=aluno, headers=headers) for _ in range(3)]
+
+        assert {r.json()["id"] for r in respostas} == {respostas[0].json()["id"]}
+        assert db_session.query(Aluno).filter_by(nome_completo="Aluno Idempotente").count() == 1
+
+    def test_matricula_por_horario(self, client, auth_headers, sample_aluno, horario_factory, db_session):
+        """Teste: A chave vale por endpoint (path): matrícula repetida não é recusada como duplicada"""
+        horario = horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0))
+        outro = horario_factory.create(db_session, dia_semana="terca", horario=time(8, 0))
+        headers = {**auth_headers, "Idempotency-Key": "mat-1"}
+
+        primeira = client.post(f"/api/horarios/{horario.id}/alunos/{sample_aluno.id}", headers=headers)
+        repetida = client.post(f"/api/horarios/{horario.id}/alunos/{sample_aluno.id}", headers=headers)
+        outro_horario = client.post(f"/api/horarios/{outro.id}/alunos/{sample_aluno.id}", headers=headers)
+
+        assert primeira.status_code == repetida.status_code == outro_horario.status_code == 201
+        assert repetida.json()["matricula_id"] == primeira.json()["matricula_id"]
+        assert "Idempotent-Replayed" not in outro_horario.headers
+        assert db_session.query(AlunoHorario).filter_by(aluno_id=sample_aluno.id).count() == 2
+
+    def test_erro_nao_e_gravado(self, client, auth_headers, db_session):
+        """Teste: Respostas de erro são validadas de novo na repetição"""
+        headers = {**auth_headers, "Idempotency-Key": "pag-erro"}
+
+        primeira = client.post("/api/pagamentos", json=_pagamento(999999), headers=headers)
+        segunda = client.post("/api/pagamentos", json=_pagamento(999999), headers=headers)
+
+        assert primeira.status_code == segunda.status_code == 404
+        assert "Idempotent-Replayed" not in segunda.headers
+        assert db_session.query(IdempotencyKey).count() == 0
+
+    def test_chave_expirada_executa_de_novo(self, client, auth_headers, sample_aluno, db_session):
+        """Teste: Após o TTL a chave é liberada"""
+        headers = {**auth_headers, "Idempotency-Key": "pag-ttl"}
+        client.post("/api/pagamentos", json=_pagamento(sample_aluno.id), headers=headers)
+        db_session.query(IdempotencyKey).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db_session.commit()
+
+        response = client.post("/api/pagamentos", json=_pagamento(sample_aluno.id), headers=headers)
+
+        assert response.status_code == 201
+        assert "Idempotent-Replayed" not in response.headers
+        assert db_session.query(Pagamento).filter_by(aluno_id=sample_aluno.id).count() == 2
+
+    @pytest.mark.parametrize("chave", ["", "x" * 256])
+    def test_chave_invalida(self, client, auth_headers, sample_aluno, chave):
+        """Teste: Chave vazia ou longa demais retorna 400"""
+        response = client.post(
+            "/api/pagamentos", json=_pagamento(sample_aluno.id), headers={**auth_headers, "Idempotency-Key": chave}
+        )
+
+        assert response.status_code == 400
+
+
+@pytest.mark.integration
+@pytest.mark.database
+class TestIdempotencyStorage:
+    """Gravação concorrente e limpeza das chaves"""
+
+    @pytest.fixture
+    def sessoes(self, tmp_path):
+        """Duas sessões independentes sobre o mesmo banco (duas requisições simultâneas)"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'idem.db'}")
+        Base.metadata.create_all(engine)
+        Sessao = sessionmaker(bind=engine)
+        with Sessao() as primeira, Sessao() as segunda:
+            yield primeira, segunda
+        engine.dispose()
+
+    def test_requisicao_simultanea_devolve_resposta_da_vencedora(self, sessoes):
+        """Teste: Quem grava a chave depois desfaz o próprio registro e devolve a resposta da primeira"""
+        primeira, segunda = sessoes
+        aluno = Aluno(nome_completo="Aluno", tipo_aula="natacao", valor_mensalidade=150, dia_vencimento=10)
+        primeira.add(aluno)
+        primeira.commit()
+
+        # As duas passaram pela busca da chave antes de qualquer uma gravá-la
+        chave = dict(key="k", user_id=1, endpoint="POST /api/pagamentos", request_hash="h")
+        resultados = []
+        for sessao, valor in ((primeira, 100), (segunda, 200)):
+            sessao.add(Pagamento(
+                aluno_id=aluno.id, valor=valor, data_pagamento=date.today(),
+                mes_referencia="2025-01", forma_pagamento="pix"
+            ))
+            sessao.flush()
+            resultados.append(IdempotentRequest(**chave).commit(sessao, 201, {"valor": valor}))
+
+        vencedora, replay = resultados
+        assert vencedora is None
+
+        assert replay is not None
+        assert replay.body == b'{"valor": 100}'
+        assert segunda.query(Pagamento).count() == 1
+
+    def test_purge_remove_apenas_expiradas(self, sessoes):
+        """Teste: Limpeza remove só as chaves vencidas"""
+        db, _ = sessoes
+        agora = datetime.utcnow()
+        for key, expira in (("velha", agora - timedelta(hours=1)), ("nova", agora + timedelta(hours=1))):
+            db.add(IdempotencyKey(
+                user_id=1, endpoint="POST /api/alunos", key=key, request_hash="h",
+                status_code=200, response_body="{}", created_at=agora, expires_at=expira
+            ))
+        db.commit()
+
+        assert purge_expired(db) == 1
+        assert [row.key for row in db.query(IdempotencyKey)] == ["nova"]
@@ -0,0 +1,104 @@
+"""
+Testes de Integração - Lembretes de vencimento agrupados por responsável
+"""
+import json
+import pytest
+from datetime import date
+from decimal import Decimal
+
+from app.models.outbox import OutboxMessage
+from app.models.pagamento import Pagamento
+from app.services import outbox
+from app.services.notificacao_service import enfileirar_lembretes, lembretes_vencimento
+from app.services.whatsapp_service import EvolutionWhatsAppService
+from tests.conftest import QueryCounter
+
+
+DIA_AVISO = date(2026, 10, 22)
+
+
+@pytest.fixture
+def familias(db_session, aluno_factory):
+    """Dois irmãos com o telefone em formatos diferentes, um aluno sozinho, um já pago e um sem telefone"""
+    def criar(nome, telefone, valor="150.00", dia=22, responsavel="Maria Silva"):
+        return aluno_factory.create(
+            db_session, nome_completo=nome, telefone_whatsapp=telefone, valor_mensalidade=Decimal(valor),
+            dia_vencimento=dia, responsavel=responsavel,
+        )
+
+    alunos = {
+        "ana": criar("Ana Silva", "(11) 99999-9999"),
+        "bruno": criar("Bruno Silva", "+55 11 99999 9999", valor="120.00"),
+        "carla": criar("Carla Souza", "(21) 98888-7777", responsavel="José Souza"),
+        "pago": criar("Diego Lima", "(31) 97777-6666"),
+        "sem_telefone": criar("Eva Rocha", ""),
+        "outro_dia": criar("Fabio Silva", "(11) 99999-9999", dia=10),
+    }
+    db_session.add(Pagamento(
+        aluno_id=alunos["pago"].id, valor=Decimal("150.00"), data_pagamento=date(2026, 10, 1),
+        mes_referencia="2026-10", forma_pagamento="pix",
+    ))
+    db_session.commit()
+    return alunos
+
+
+@pytest.mark.integration
+class TestLembretesVencimento:
+    """Agrupamento por telefone normalizado em uma query"""
+
+    def test_um_grupo_por_telefone(self, db_session, familias):
+        """Teste: Irmãos com o mesmo número formatado de jeitos diferentes viram um grupo"""
+        with QueryCounter() as counter:
+            grupos = lembretes_vencimento(db_session, DIA_AVISO)
+
+        assert counter.count == 1
+        assert [(g.telefone, g.responsavel, float(g.total)) for g in grupos] == [
+            ("+5511999999999", "Maria Silva", 270.0), ("+5521988887777", "José Souza", 150.0),
+        ]
+        assert sorted(aluno[0] for aluno in grupos[0].alunos) == [familias["ana"].id, familias["bruno"].id]
+
+    def test_fim_do_mes_inclui_dias_inexistentes(self, db_session, aluno_factory):
+        """Teste: No último dia de novembro entra quem vence no dia 31"""
+        aluno = aluno_factory.create(db_session, dia_vencimento=31)
+
+        grupos = lembretes_vencimento(db_session, date(2026, 11, 30))
+
+        assert [aluno_id for g in grupos for aluno_id, _, _ in g.alunos] == [aluno.id]
+
+    def test_uma_mensagem_por_responsavel(self, db_session, familias):
+        """Teste: A outbox recebe uma mensagem por telefone, com os alunos e o total"""
+        assert enfileirar_lembretes(db_session, DIA_AVISO) == 2
+
+        payloads = [json.loads(m.payload) for m in db_session.query(OutboxMessage).filter_by(tipo="lembrete_vencimento")]
+        assert len(payloads) == 2
+        silva = next(p for p in payloads if p["telefone"] == "+5511999999999")
+        assert (silva["total"], silva["vencimento"]) == (270.0, "2026-10-22")
+        assert [(a["nome"], a["valor"]) for a in silva["alunos"]] == [("Ana Silva", 150.0), ("Bruno Silva", 120.0)]
+
+
+@pytest.mark.integration
+class TestMensagemLembrete:
+    """Handler da outbox que envia o lembrete"""
+
+    def test_mensagem_consolidada(self, db_session, familias, monkeypatch):
+        """Teste: Uma chamada à API por responsável, listando cada filho e o total"""
+        enviadas = []
+        monkeypatch.setattr(
+            EvolutionWhatsAppService, "send_text_message",
+            lambda self, telefone, mensagem: enviadas.append((telefone, mensagem)) or True,
+        )
+        enfileirar_lembretes(db_session, DIA_AVISO)
+
+        assert outbox.dispatch_pending(db_session) == 2
+
+        mensagens = dict(enviadas)
+        assert len(enviadas) == 2
+        assert "Ana Silva: R$ 150.00" in mensagens["+5511999999999"]
+        assert "Bruno Silva: R$ 120.00" in mensagens["+5511999999999"]
+        assert "*Total:* R$ 270.00" in mensagens["+5511999999999"]
+        assert mensagens["+5521988887777"].startswith("Olá, Carla Souza!")
+        assert "22/10/2026" in mensagens["+5521988887777"]
+
+    def test_sem_telefone_dada_como_entregue(self):
+        """Teste: Payload sem telefone não chama a API"""
+        assert outbox._handlers["lembrete_vencimento"]({"telefone": None, "alunos": []}) is True
@@ -0,0 +1,208 @@
+"""
+Testes de Integração - Matrícula e desmatrícula em lote
+"""
+import pytest
+from datetime import time
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.models.change_log import ChangeLog
+from app.models.turma import AlunoHorario
+from app.routes import horarios as horarios_module
+from app.services import matricula_service
+from tests.conftest import QueryCounter
+
+
+@pytest.fixture
+def horario(db_session, horario_factory):
+    return horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0), capacidade_maxima=3)
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestMatriculaEmLote:
+    """POST /api/horarios/{id}/alunos:batch e /api/horarios/matriculas:batch"""
+
+    def test_matricula_varios_alunos(self, client, auth_headers, horario, sample_alunos, db_session):
+        """Teste: Todos os alunos válidos são matriculados com o id da matrícula"""
+        ids = [aluno.id for aluno in sample_alunos[:3]]
+
+        response = client.post(f"/api/horarios/{horario.id}/alunos:batch", json={"aluno_ids": ids}, headers=auth_headers)
+
+        assert response.status_code == 200
+        corpo = response.json()
+        assert corpo["sucesso"] == 3 and corpo["erros"] == 0
+        assert [r["aluno_id"] for r in corpo["resultados"]] == ids
+        assert all(r["status"] == 201 and r["matricula_id"] for r in corpo["resultados"])
+        assert db_session.query(AlunoHorario).filter_by(horario_id=horario.id).count() == 3
+
+    def test_resultado_por_item(self, client, auth_headers, horario, sample_alunos, db_session):
+        """Teste: Inativo, inexistente, repetido e acima da capacidade falham sem afetar os demais"""
+        a, b, c, d, inativo = sample_alunos[:5]
+        inativo.ativo = False
+        db_session.add(AlunoHorario(horario_id=horario.id, aluno_id=a.id))
+        db_session.commit()
+
+        response = client.post(
+            f"/api/horarios/{horario.id}/alunos:batch",
+            json={"aluno_ids": [a.id, b.id, inativo.id, 999999, b.id, c.id, d.id]},
+            headers=auth_headers,
+        )
+
+        resultados = response.json()["resultados"]
+        assert [(r["status"], r["detail"]) for r in resultados] == [
+            (400, "Aluno já está matriculado neste horário"),
+            (201, None),
+            (400, "Aluno está inativo"),
+            (404, "Aluno não encontrado"),
+            (400, "Aluno já está matriculado neste horário"),
+            (201, None),
+            (400, "Horário já está com capacidade máxima (3 alunos)"),
+        ]
+        assert db_session.query(AlunoHorario).filter_by(horario_id=horario.id).count() == 3
+
+    def test_horario_inexistente(self, client, auth_headers, sample_aluno):
+        """Teste: Lote em um horário inexistente retorna 404"""
+        response = client.post("/api/horarios/999999/alunos:batch", json={"aluno_ids": [sample_aluno.id]}, headers=auth_headers)
+
+        assert response.status_code == 404
+
+    def test_varios_horarios(self, client, auth_headers, horario, horario_factory, sample_alunos, db_session):
+        """Teste: Lote entre horários aplica a capacidade de cada um"""
+        outro = horario_factory.create(db_session, dia_semana="terca", horario=time(9, 0), capacidade_maxima=1)
+        matriculas = [
+            {"horario_id": horario.id, "aluno_id": sample_alunos[0].id},
+            {"horario_id": outro.id, "aluno_id": sample_alunos[0].id},
+            {"horario_id": outro.id, "aluno_id": sample_alunos[1].id},
+            {"horario_id": 999999, "aluno_id": sample_alunos[1].id},
+        ]
+
+        response = client.post("/api/horarios/matriculas:batch", json={"matriculas": matriculas}, headers=auth_headers)
+
+        assert [r["status"] for r in response.json()["resultados"]] == [201, 201, 400, 404]
+        assert response.json()["resultados"][3]["detail"] == "Horário não encontrado"
+
+    def test_consultas_fixas(self, client, auth_headers, horario_factory, aluno_factory, db_session):
+        """Teste: O número de queries não cresce com o tamanho do lote"""
+        horarios = [
+            horario_factory.create(db_session, dia_semana="quarta", horario=time(6 + i, 0), capacidade_maxima=20)
+            for i in range(5)
+        ]
+        alunos = aluno_factory.create_batch(db_session, count=60)
+        matriculas = [
+            {"horario_id": horarios[i % 5].id, "aluno_id": aluno.id} for i, aluno in enumerate(alunos)
+        ]
+
+        with QueryCounter() as counter:
+            response = client.post("/api/horarios/matriculas:batch", json={"matriculas": matriculas}, headers=auth_headers)
+
+        assert response.json()["sucesso"] == 60
+        # usuário + ocupação + alunos + existentes + INSERT + change_log + aulas datadas
+        assert counter.count <= 7, counter.statements
+        assert sum(s.startswith("INSERT INTO aluno_horario") for s in counter.statements) == 1
+
+    def test_change_feed(self, client, auth_headers, horario, sample_aluno, db_session):
+        """Teste: Matrículas em lote aparecem no change_log"""
+        response = client.post(f"/api/horarios/{horario.id}/alunos:batch", json={"aluno_ids": [sample_aluno.id]}, headers=auth_headers)
+        matricula_id = response.json()["resultados"][0]["matricula_id"]
+
+        assert db_session.query(ChangeLog).filter_by(
+            table_name="aluno_horario", row_id=matricula_id, operation="insert"
+        ).count() == 1
+
+    def test_bloqueia_horarios(self, client, auth_headers, horario, sample_aluno, monkeypatch):
+        """Teste: A ocupação do lote é lida com FOR UPDATE, como na promoção da fila"""
+        chamadas = []
+        original = matricula_service.ocupacao_horarios
+
+        def espiao(db, horario_ids, *criterios, **kwargs):
+            chamadas.append(kwargs)
+            return original(db, horario_ids, *criterios, **kwargs)
+
+        monkeypatch.setattr(matricula_service, "ocupacao_horarios", espiao)
+
+        client.post(f"/api/horarios/{horario.id}/alunos:batch", json={"aluno_ids": [sample_aluno.id]}, headers=auth_headers)
+
+        assert chamadas == [{"bloquear": True}]
+
+    def test_bloqueio_antes_da_contagem(self):
+        """Teste: No PostgreSQL o FOR UPDATE é um statement próprio, antes da contagem dos matriculados"""
+        db = MagicMock()
+        db.get_bind.return_value.dialect.name = "postgresql"
+
+        matricula_service.ocupacao_horarios(db, [1, 2], bloquear=True)
+
+        bloqueio, contagem = (
+            str(chamada.args[0].compile(dialect=postgresql.dialect())) for chamada in db.execute.call_args_list
+        )
+        assert bloqueio.endswith("FOR UPDATE") and "aluno_horario" not in bloqueio
+        assert "count(" in contagem and "FOR UPDATE" not in contagem
+
+    def test_bloqueia_horarios_e_depois_alunos(self, client, auth_headers, horario, sample_aluno, monkeypatch):
+        """Teste: Capacidade e cota são conferidas com as linhas de horários e alunos bloqueadas, nessa ordem"""
+        modelos = []
+        original = matricula_service.bloquear_linhas
+
+        def espiao(db, modelo, *criterios):
+            modelos.append(modelo.__tablename__)
+            original(db, modelo, *criterios)
+
+        monkeypatch.setattr(matricula_service, "bloquear_linhas", espiao)
+
+        client.post(f"/api/horarios/{horario.id}/alunos:batch", json={"aluno_ids": [sample_aluno.id]}, headers=auth_headers)
+
+        assert modelos == ["horarios", "alunos"]
+
+    def test_limite_de_itens(self, client, auth_headers, horario, monkeypatch):
+        """Teste: Acima do limite retorna 400"""
+        monkeypatch.setattr(horarios_module, "MAX_ITENS_LOTE", 2)
+
+        response = client.post(f"/api/horarios/{horario.id}/alunos:batch", json={"aluno_ids": [1, 2, 3]}, headers=auth_headers)
+
+        assert response.status_code == 400
+
+    def test_lote_vazio(self, client, auth_headers, horario):
+        """Teste: Lista vazia é recusada na validação"""
+        response = client.post(f"/api/horarios/{horario.id}/alunos:batch", json={"aluno_ids": []}, headers=auth_headers)
+
+        assert response.status_code == 422
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestDesmatriculaEmLote:
+    """DELETE /api/horarios/{id}/alunos:batch e /api/horarios/matriculas:batch"""
+
+    def test_remove_matriculados(self, client, auth_headers, horario, sample_alunos, db_session):
+        """Teste: Remove os matriculados e informa 404 para quem não estava no horário"""
+        a, b, c = sample_alunos[:3]
+        db_session.add_all([AlunoHorario(horario_id=horario.id, aluno_id=aluno.id) for aluno in (a, b)])
+        db_session.commit()
+
+        response = client.request(
+            "DELETE", f"/api/horarios/{horario.id}/alunos:batch",
+            json={"aluno_ids": [a.id, c.id, b.id]}, headers=auth_headers,
+        )
+
+        assert [r["status"] for r in response.json()["resultados"]] == [200, 404, 200]
+        assert db_session.query(AlunoHorario).filter_by(horario_id=horario.id).count() == 0
+
+    def test_remove_apenas_os_pares_pedidos(self, client, auth_headers, horario, horario_factory, sample_alunos, db_session):
+        """Teste: Lote entre horários não remove combinações que não foram enviadas"""
+        outro = horario_factory.create(db_session, dia_semana="terca", horario=time(9, 0))
+        a, b = sample_alunos[:2]
+        db_session.add_all([
+            AlunoHorario(horario_id=h.id, aluno_id=aluno.id) for h in (horario, outro) for aluno in (a, b)
+        ])
+        db_session.commit()
+
+        response = client.request(
+            "DELETE", "/api/horarios/matriculas:batch",
+            json={"matriculas": [{"horario_id": horario.id, "aluno_id": a.id}, {"horario_id": outro.id, "aluno_id": b.id}]},
+            headers=auth_headers,
+        )
+
+        assert response.json()["sucesso"] == 2
+        restantes = {(m.horario_id, m.aluno_id) for m in db_session.query(AlunoHorario)}
+        assert restantes == {(horario.id, b.id), (outro.id, a.id)}
@@ -0,0 +1,66 @@
+"""
+Testes de Integração - Métricas Prometheus e Server-Timing
+"""
+import pytest
+from sqlalchemy import text
+
+from app.utils.query_stats import start_tracking, stop_tracking, current_stats
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestMetricas:
+    """Testes do endpoint /metrics e do middleware de métricas"""
+
+    def test_server_timing_presente(self, client, auth_headers, sample_aluno):
+        """Teste: Respostas trazem header Server-Timing com tempo de app e de banco"""
+        response = client.get("/api/alunos", headers=auth_headers)
+
+        assert response.status_code == 200
+        server_timing = response.headers["Server-Timing"]
+        assert "app;dur=" in server_timing
+        assert "db;dur=" in server_timing
+        assert "queries" in server_timing
+
+    def test_metrics_formato_prometheus(self, client, auth_headers):
+        """Teste: /metrics expõe histogramas agrupados pelo template da rota"""
+        client.get("/api/alunos/99999", headers=auth_headers)
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert "http_request_duration_seconds_bucket" in body
+        assert "http_request_db_queries_bucket" in body
+        assert 'route="/api/alunos/{id}"' in body
+        assert 'route="/api/alunos/99999"' not in body
+
+    def test_metrics_exige_token_quando_configurado(self, client, monkeypatch):
+        """Teste: METRICS_TOKEN protege o endpoint /metrics"""
+        monkeypatch.setenv("METRICS_TOKEN", "segredo")
+
+        assert client.get("/metrics").status_code == 401
+        response = client.get("/metrics", headers={"Authorization": "Bearer segredo"})
+        assert response.status_code == 200
+
+
+@pytest.mark.unit
+class TestQueryStats:
+    """Testes da contagem de queries por contexto"""
+
+    def test_conta_queries_apenas_durante_rastreamento(self, db_session):
+        """Teste: Queries só são contadas entre start_tracking e stop_tracking"""
+        db_session.execute(text("SELECT 1"))
+        assert current_stats() is None
+
+        stats, token = start_tracking()
+        db_session.execute(text("SELECT 1"))
+        db_session.execute(text("SELECT 2"))
+        stop_tracking(token)
+
+        db_session.execute(text("SELECT 3"))
+
+        assert stats.count == 2
+        assert stats.duration >= 0
+        assert current_stats() is None
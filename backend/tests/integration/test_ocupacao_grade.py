@@ -0,0 +1,123 @@
+"""
+Testes de Integração - Dia da semana numérico e mapa de ocupação (GET /api/horarios/ocupacao)
+"""
+import pytest
+from datetime import time
+
+from app.models.horario import Horario
+from app.models.turma import AlunoHorario
+from tests.conftest import QueryCounter
+
+
+@pytest.fixture
+def grade(db_session, horario_factory, sample_alunos):
+    """quarta 08:00, segunda 08:00 (natação + hidro) e segunda 09:00, com matrículas"""
+    quarta = horario_factory.create(db_session, dia_semana="quarta", horario=time(8, 0), capacidade_maxima=4)
+    natacao = horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0), capacidade_maxima=4)
+    hidro = horario_factory.create(
+        db_session, dia_semana="segunda", horario=time(8, 0), capacidade_maxima=6, tipo_aula="hidroginastica"
+    )
+    tarde = horario_factory.create(db_session, dia_semana="segunda", horario=time(9, 0), capacidade_maxima=5)
+    db_session.add_all(
+        [AlunoHorario(horario_id=natacao.id, aluno_id=aluno.id) for aluno in sample_alunos[:4]]
+        + [AlunoHorario(horario_id=hidro.id, aluno_id=aluno.id) for aluno in sample_alunos[4:5]]
+        + [AlunoHorario(horario_id=quarta.id, aluno_id=aluno.id) for aluno in sample_alunos[5:7]]
+    )
+    natacao.fila_espera = 3
+    db_session.commit()
+    return {"quarta": quarta, "natacao": natacao, "hidro": hidro, "tarde": tarde}
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestDiaSemanaNumero:
+    """Coluna gerada pelo banco a partir de dia_semana"""
+
+    def test_coluna_gerada(self, db_session, grade):
+        """Teste: 1 = segunda ... e acompanha mudanças de dia_semana"""
+        assert grade["natacao"].dia_semana_numero == 1
+        assert grade["quarta"].dia_semana_numero == 3
+
+        db_session.query(Horario).filter(Horario.id == grade["quarta"].id).update(
+            {"dia_semana": "domingo"}, synchronize_session=False
+        )
+        db_session.expire_all()
+
+        assert db_session.get(Horario, grade["quarta"].id).dia_semana_numero == 7
+
+    def test_listagem_em_ordem_de_dia(self, client, auth_headers, grade):
+        """Teste: segunda vem antes de quarta (ordem alfabética colocaria quarta primeiro)"""
+        response = client.get("/api/horarios", headers=auth_headers)
+
+        assert [h["dia_semana"] for h in response.json()] == ["segunda", "segunda", "segunda", "quarta"]
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestMapaOcupacao:
+    """Matriz dia x horário"""
+
+    def test_matriz(self, client, auth_headers, grade):
+        """Teste: Turmas no mesmo dia/horário somadas; células vazias são null"""
+        response = client.get("/api/horarios/ocupacao", headers=auth_headers)
+
+        corpo = response.json()
+        assert response.status_code == 200
+        assert corpo["dias"] == ["segunda", "quarta"]
+        assert corpo["horarios"] == ["08:00:00", "09:00:00"]
+        assert corpo["celulas"][0][0] == {
+            "turmas": 2, "matriculados": 5, "capacidade": 10, "fila_espera": 3, "percentual": 50.0
+        }
+        assert corpo["celulas"][0][1]["percentual"] == 0.0
+        assert corpo["celulas"][1] == [
+            {"turmas": 1, "matriculados": 2, "capacidade": 4, "fila_espera": 0, "percentual": 50.0}, None
+        ]
+        assert corpo["total"] == {
+            "turmas": 4, "matriculados": 7, "capacidade": 19, "fila_espera": 3, "percentual": 36.8
+        }
+
+    def test_ocupacao_por_turma(self, client, auth_headers, grade):
+        """Teste: Turmas do mesmo dia/horário aparecem separadas, com o tipo de aula"""
+        corpo = client.get("/api/horarios/ocupacao", headers=auth_headers).json()
+
+        segunda_8h = [t for t in corpo["por_horario"] if (t["dia_semana"], t["horario"]) == ("segunda", "08:00:00")]
+        assert [(t["horario_id"], t["tipo_aula"], t["matriculados"], t["percentual"]) for t in segunda_8h] == [
+            (grade["natacao"].id, "natacao", 4, 100.0),
+            (grade["hidro"].id, "hidroginastica", 1, 16.7),
+        ]
+        assert len(corpo["por_horario"]) == 4
+        # Média dos percentuais das turmas (100 + 16.7 + 0 + 50) / 4, não total/capacidade
+        assert corpo["percentual_medio"] == 41.7
+
+    def test_filtro_tipo_aula(self, client, auth_headers, grade):
+        """Teste: tipo_aula restringe as turmas somadas"""
+        response = client.get("/api/horarios/ocupacao?tipo_aula=hidroginastica", headers=auth_headers)
+
+        corpo = response.json()
+        assert (corpo["dias"], corpo["horarios"]) == (["segunda"], ["08:00:00"])
+        assert corpo["celulas"][0][0]["matriculados"] == 1
+
+    def test_uma_query_agrupada(self, client, auth_headers, grade):
+        """Teste: Matriz e turmas saem de uma única query (matrículas agrupadas por horário)"""
+        with QueryCounter() as counter:
+            response = client.get("/api/horarios/ocupacao", headers=auth_headers)
+
+        assert response.status_code == 200
+        consultas = [s for s in counter.statements if "FROM horarios" in s]
+        assert len(consultas) == 1 and "GROUP BY" in consultas[0]
+
+    def test_cache_invalidado_por_matricula(self, client, auth_headers, grade, sample_alunos):
+        """Teste: Matricular um aluno muda o mapa servido do cache"""
+        client.get("/api/horarios/ocupacao", headers=auth_headers)
+        client.post(f"/api/horarios/{grade['tarde'].id}/alunos/{sample_alunos[9].id}", headers=auth_headers)
+
+        response = client.get("/api/horarios/ocupacao", headers=auth_headers)
+
+        assert response.json()["celulas"][0][1]["matriculados"] == 1
+
+    def test_grade_vazia(self, client, auth_headers):
+        """Teste: Sem horários a matriz é vazia"""
+        corpo = client.get("/api/horarios/ocupacao", headers=auth_headers).json()
+
+        assert (corpo["dias"], corpo["celulas"], corpo["por_horario"]) == ([], [], [])
+        assert (corpo["total"]["percentual"], corpo["percentual_medio"]) == (0.0, 0.0)
@@ -0,0 +1,171 @@
+"""
+Testes de Integração - Check-in de presença com buffer e gravação em lote
+"""
+import asyncio
+import pytest
+from datetime import datetime, time, timedelta
+from unittest.mock import MagicMock
+
+from app.main import app
+from app.models.presenca import Presenca, PresencaResumo
+from app.models.turma import AlunoHorario
+from app.services import presenca_service
+from app.services.presenca_service import BufferPresencas, CheckIn, flush_pendentes, presencas_buffer
+from tests.conftest import QueryCounter
+
+
+AULA = datetime(2026, 10, 19, 8, 5)
+
+
+@pytest.fixture
+def turma(db_session, horario_factory, sample_alunos):
+    """Horário de segunda 08:00 com os 5 primeiros alunos matriculados"""
+    horario = horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0), capacidade_maxima=10)
+    db_session.add_all([AlunoHorario(horario_id=horario.id, aluno_id=aluno.id) for aluno in sample_alunos[:5]])
+    db_session.commit()
+    return horario
+
+
+def _checkin(client, headers, aluno_id, horario_id, registrado_em=AULA, origem="catraca"):
+    return client.post("/api/presencas", json={
+        "aluno_id": aluno_id, "horario_id": horario_id,
+        "registrado_em": registrado_em.isoformat(), "origem": origem,
+    }, headers=headers)
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestCheckIn:
+    """POST /api/presencas e gravação do buffer"""
+
+    def test_checkin_nao_grava_na_requisicao(self, client, auth_headers, db_session, turma, sample_alunos):
+        """Teste: 202 sem tocar nas tabelas de presença; a leitura fica no buffer"""
+        with QueryCounter() as counter:
+            response = _checkin(client, auth_headers, sample_alunos[0].id, turma.id)
+
+        assert response.status_code == 202
+        assert response.json() == {"recebidas": 1, "pendentes": 1}
+        assert not [s for s in counter.statements if "presencas" in s]
+        assert db_session.query(Presenca).count() == 0
+
+    def test_lote_em_tres_statements(self, client, auth_headers, db_session, turma, sample_alunos):
+        """Teste: O lote inteiro é gravado com SELECT + INSERT multi-linha + rollup"""
+        client.post("/api/presencas:batch", json={"leituras": [
+            {"aluno_id": aluno.id, "horario_id": turma.id, "registrado_em": AULA.isoformat()}
+            for aluno in sample_alunos[:5]
+        ]}, headers=auth_headers)
+
+        with QueryCounter() as counter:
+            resultado = presencas_buffer.flush(db_session)
+
+        assert (resultado.gravadas, len(presencas_buffer)) == (5, 0)
+        assert sum(s.startswith(("SELECT", "INSERT")) for s in counter.statements) == 3
+        assert db_session.query(Presenca).filter_by(origem="recepcao").count() == 5
+
+    def test_repetidas_contam_uma_vez(self, client, auth_headers, db_session, turma, sample_alunos):
+        """Teste: Leituras repetidas no lote ou em lotes seguintes não duplicam a presença"""
+        aluno_id = sample_alunos[0].id
+        _checkin(client, auth_headers, aluno_id, turma.id)
+        _checkin(client, auth_headers, aluno_id, turma.id, AULA + timedelta(minutes=1))
+        primeiro = presencas_buffer.flush(db_session)
+        _checkin(client, auth_headers, aluno_id, turma.id, AULA + timedelta(minutes=2))
+        segundo = presencas_buffer.flush(db_session)
+
+        assert (primeiro.gravadas, primeiro.repetidas, segundo.gravadas, segundo.repetidas) == (1, 1, 0, 1)
+        presenca = db_session.query(Presenca).one()
+        assert presenca.registrado_em == AULA
+        assert db_session.get(AlunoHorario, presenca.aluno_horario_id).aluno_id == aluno_id
+        assert db_session.query(PresencaResumo).one().total == 1
+
+    def test_sem_matricula_descartada(self, client, auth_headers, db_session, turma, sample_alunos):
+        """Teste: Aluno não matriculado no horário não gera presença"""
+        _checkin(client, auth_headers, sample_alunos[9].id, turma.id)
+
+        resultado = presencas_buffer.flush(db_session)
+
+        assert (resultado.gravadas, resultado.sem_matricula) == (0, 1)
+        assert db_session.query(Presenca).count() == 0
+
+    def test_buffer_cheio_responde_503(self, client, auth_headers, turma, sample_alunos, monkeypatch):
+        """Teste: Acima do limite o POST recusa em vez de acumular sem fim"""
+        monkeypatch.setattr(presencas_buffer, "limite", 1)
+        _checkin(client, auth_headers, sample_alunos[0].id, turma.id)
+
+        response = _checkin(client, auth_headers, sample_alunos[1].id, turma.id)
+
+        assert response.status_code == 503
+        assert len(presencas_buffer) == 1
+
+    def test_encerramento_grava_pendentes(self, client, auth_headers, db_session, turma, sample_alunos):
+        """Teste: O flush do encerramento grava o que restou no buffer"""
+        _checkin(client, auth_headers, sample_alunos[0].id, turma.id)
+
+        asyncio.run(flush_pendentes(app))
+
+        assert len(presencas_buffer) == 0
+        assert db_session.query(Presenca).count() == 1
+
+
+@pytest.mark.integration
+class TestBufferPresencas:
+    """Gatilho por tamanho e falha na gravação"""
+
+    def test_tamanho_acorda_gravacao(self):
+        """Teste: ao_encher é chamado quando o buffer atinge o tamanho do lote"""
+        buffer = BufferPresencas(tamanho_lote=2)
+        buffer.ao_encher = MagicMock()
+        leitura = CheckIn(1, 1, AULA, "catraca")
+
+        buffer.adicionar([leitura])
+        buffer.ao_encher.assert_not_called()
+        buffer.adicionar([leitura])
+        buffer.ao_encher.assert_called_once()
+
+    def test_falha_devolve_leituras(self, monkeypatch):
+        """Teste: Se a gravação falha o lote volta para o início do buffer"""
+        buffer = BufferPresencas()
+        buffer.adicionar([CheckIn(1, 1, AULA, "catraca")])
+        monkeypatch.setattr(presenca_service, "gravar_presencas", MagicMock(side_effect=RuntimeError("banco fora")))
+        db = MagicMock()
+
+        with pytest.raises(RuntimeError):
+            buffer.flush(db)
+        buffer.adicionar([CheckIn(2, 1, AULA, "catraca")])
+
+        assert [l.aluno_id for l in buffer._leituras] == [1, 2]
+        db.rollback.assert_called_once()
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestFrequencia:
+    """GET /api/presencas/frequencia (resumo mensal)"""
+
+    @pytest.fixture
+    def presencas(self, client, auth_headers, db_session, turma, sample_alunos):
+        """Aluno 0: duas aulas em outubro e uma em novembro; aluno 1: uma em outubro"""
+        for registrado_em in (AULA, AULA + timedelta(weeks=1), AULA + timedelta(weeks=3)):
+            _checkin(client, auth_headers, sample_alunos[0].id, turma.id, registrado_em)
+        _checkin(client, auth_headers, sample_alunos[1].id, turma.id)
+        presencas_buffer.flush(db_session)
+
+    def test_frequencia_do_rollup(self, client, auth_headers, presencas, turma, sample_alunos):
+        """Teste: Totais por aluno e horário, lidos do resumo mensal em uma query"""
+        with QueryCounter() as counter:
+            response = client.get(f"/api/presencas/frequencia?horario_id={turma.id}", headers=auth_headers)
+
+        assert [(f["aluno_id"], f["presencas"]) for f in response.json()] == [
+            (sample_alunos[0].id, 3), (sample_alunos[1].id, 1),
+        ]
+        assert response.json()[0]["ultima_presenca"] == (AULA + timedelta(weeks=3)).isoformat()
+        consultas = [s for s in counter.statements if "presencas" in s]
+        assert len(consultas) == 1 and "presencas_resumo" in consultas[0]
+
+    def test_filtro_por_mes(self, client, auth_headers, presencas, sample_alunos):
+        """Teste: mes_inicio/mes_fim recortam pelo mês (qualquer dia do mês serve)"""
+        response = client.get(
+            f"/api/presencas/frequencia?aluno_id={sample_alunos[0].id}&mes_inicio=2026-10-31&mes_fim=2026-10-01",
+            headers=auth_headers,
+        )
+
+        assert [f["presencas"] for f in response.json()] == [2]
@@ -0,0 +1,59 @@
+"""
+Testes de Integração - Profiling sob demanda
+"""
+import pytest
+
+from app.utils.profiling import profiling_slots
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestProfiling:
+    """Testes do middleware de profiling (apenas admin)"""
+
+    def test_admin_recebe_relatorio_json(self, client, auth_headers, sample_aluno):
+        """Teste: Admin com X-Profile recebe call tree e statements SQL"""
+        headers = {**auth_headers, "X-Profile": "json"}
+
+        response = client.get("/api/alunos", headers=headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status_code"] == 200
+        assert data["path"] == "/api/alunos"
+        assert data["call_tree"]
+        assert data["sql"]["count"] >= 1  # listagem (nos testes o usuário já está no identity map da sessão)
+        assert any("alunos" in item["statement"] for item in data["sql"]["statements"])
+
+    def test_admin_recebe_relatorio_html_por_query_param(self, client, auth_headers):
+        """Teste: ?profile=html retorna o flame graph do pyinstrument com SQL"""
+        response = client.get("/api/alunos?profile=html", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/html")
+        assert response.headers["X-Profiled-Status"] == "200"
+        assert "SQL (" in response.text
+
+    def test_recepcionista_nao_pode_perfilar(self, client, recep_auth_headers):
+        """Teste: Profiling é negado para quem não é admin"""
+        headers = {**recep_auth_headers, "X-Profile": "json"}
+
+        response = client.get("/api/alunos", headers=headers)
+
+        assert response.status_code == 403
+
+    def test_requisicao_sem_flag_nao_e_perfilada(self, client, auth_headers):
+        """Teste: Sem a flag a resposta original é devolvida"""
+        response = client.get("/api/alunos", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert isinstance(response.json(), list)
+
+    def test_limite_de_requisicoes_perfiladas(self, client, auth_headers, monkeypatch):
+        """Teste: Acima do limite de profiling simultâneo retorna 429"""
+        monkeypatch.setattr(profiling_slots, "limit", 0)
+        headers = {**auth_headers, "X-Profile": "json"}
+
+        response = client.get("/api/alunos", headers=headers)
+
+        assert response.status_code == 429
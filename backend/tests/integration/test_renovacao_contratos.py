@@ -0,0 +1,136 @@
+"""
+Testes de Integração - Renovação automática de contratos em lote
+"""
+import asyncio
+import pytest
+from datetime import date, timedelta
+
+from app.models.aluno import Aluno
+from app.models.change_log import ChangeLog
+from app.services import contrato_service
+from tests.conftest import QueryCounter
+
+
+HOJE = date.today()
+
+
+@pytest.fixture
+def contratos(db_session, aluno_factory):
+    """Dois contratos a renovar, um sem opção, um inativo e um que vence depois da antecedência"""
+    def criar(nome, fim, renovacao=True, ativo=True, duracao=12):
+        return aluno_factory.create(
+            db_session, nome_completo=nome, data_fim_contrato=fim, duracao_contrato_meses=duracao,
+            renovacao_automatica=renovacao, ativo=ativo,
+        )
+
+    return {
+        "vencendo": criar("Vencendo", HOJE + timedelta(days=3)),
+        "vencido": criar("Vencido Fim de Mês", date(2026, 1, 31), duracao=1),
+        "sem_opcao": criar("Sem Opção", HOJE + timedelta(days=2), renovacao=False),
+        "inativo": criar("Inativo", HOJE + timedelta(days=2), ativo=False),
+        "depois": criar("Depois", HOJE + timedelta(days=30)),
+    }
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestPreviaRenovacao:
+    """GET /api/alunos/contratos/renovacao"""
+
+    def test_previa(self, client, auth_headers, db_session, contratos):
+        """Teste: Só ativos com renovação automática dentro da antecedência, sem alterar nada"""
+        response = client.get("/api/alunos/contratos/renovacao?dias=7", headers=auth_headers)
+
+        corpo = response.json()
+        assert (corpo["ate"], corpo["total"]) == ((HOJE + timedelta(days=7)).isoformat(), 2)
+        assert [(c["aluno_id"], c["nova_data_fim"]) for c in corpo["contratos"]][0] == (contratos["vencido"].id, "2026-02-28")
+        vencendo = corpo["contratos"][1]
+        assert vencendo["aluno_id"] == contratos["vencendo"].id
+        assert date.fromisoformat(vencendo["nova_data_fim"]) - date.fromisoformat(vencendo["data_fim_contrato"]) >= timedelta(days=365)
+        db_session.expire_all()
+        assert db_session.get(Aluno, contratos["vencido"].id).data_fim_contrato == date(2026, 1, 31)
+
+    def test_total_alem_do_limite(self, client, auth_headers, contratos):
+        """Teste: total conta todos os contratos do critério, mesmo com limite menor"""
+        corpo = client.get("/api/alunos/contratos/renovacao?limite=1", headers=auth_headers).json()
+
+        assert (corpo["total"], len(corpo["contratos"])) == (2, 1)
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestPassadaRenovacao:
+    """POST /api/alunos/contratos/renovacao"""
+
+    def test_um_update_para_o_conjunto(self, client, auth_headers, db_session, contratos):
+        """Teste: Um único UPDATE renova os contratos, incrementa a versão e grava o change_log"""
+        versao = contratos["vencendo"].version
+
+        with QueryCounter() as counter:
+            response = client.post("/api/alunos/contratos/renovacao", headers=auth_headers)
+
+        renovados = {contratos["vencendo"].id, contratos["vencido"].id}
+        assert set(response.json()["aluno_ids"]) == renovados
+        assert sum(s.startswith("UPDATE alunos") for s in counter.statements) == 1
+        db_session.expire_all()
+        vencido = db_session.get(Aluno, contratos["vencido"].id)
+        assert (vencido.data_fim_contrato, db_session.get(Aluno, contratos["vencendo"].id).version) == (
+            date(2026, 2, 28), versao + 1
+        )
+        assert db_session.get(Aluno, contratos["sem_opcao"].id).data_fim_contrato == HOJE + timedelta(days=2)
+        assert {
+            row_id for (row_id,) in db_session.query(ChangeLog.row_id).filter_by(table_name="alunos", operation="update")
+        } == renovados
+
+    def test_segunda_passada_nao_renova_de_novo(self, client, auth_headers, contratos):
+        """Teste: O contrato renovado sai do critério; só o vencido há meses continua alcançando a data"""
+        client.post("/api/alunos/contratos/renovacao", headers=auth_headers)
+
+        response = client.post("/api/alunos/contratos/renovacao", headers=auth_headers)
+
+        assert response.json()["aluno_ids"] == [contratos["vencido"].id]
+
+    def test_versao_antiga_recebe_409(self, client, auth_headers, contratos):
+        """Teste: Edição com If-Match anterior à renovação é recusada"""
+        aluno_id, versao = contratos["vencendo"].id, contratos["vencendo"].version
+        client.post("/api/alunos/contratos/renovacao", headers=auth_headers)
+
+        response = client.put(
+            f"/api/alunos/{aluno_id}", json={"observacoes": "x", "version": versao}, headers=auth_headers
+        )
+
+        assert response.status_code == 409
+
+    def test_opcao_pelo_put(self, client, auth_headers, db_session, contratos):
+        """Teste: renovacao_automatica pode ser ligada pelo PUT do aluno"""
+        aluno = contratos["sem_opcao"]
+        response = client.put(f"/api/alunos/{aluno.id}", json={"renovacao_automatica": True}, headers=auth_headers)
+
+        assert response.json()["renovacao_automatica"] is True
+        assert client.get("/api/alunos/contratos/renovacao", headers=auth_headers).json()["total"] == 3
+
+
+@pytest.mark.integration
+class TestTarefaRenovacao:
+    """renovacao_loop (tarefa em segundo plano)"""
+
+    @pytest.mark.parametrize("na_inicializacao, esperado", [
+        (True, ["passada", "sleep", "passada", "sleep"]),
+        (False, ["sleep", "passada", "sleep"]),
+    ])
+    def test_passada_na_inicializacao(self, monkeypatch, na_inicializacao, esperado):
+        """Teste: A primeira passada roda antes da primeira espera, então um deploy não a adia"""
+        eventos = []
+
+        async def sleep(interval):
+            eventos.append("sleep")
+            if len(eventos) >= len(esperado):
+                raise asyncio.CancelledError
+
+        monkeypatch.setattr(contrato_service, "_renovar_once", lambda app: eventos.append("passada") or 0)
+        monkeypatch.setattr(contrato_service.asyncio, "sleep", sleep)
+
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(contrato_service.renovacao_loop(interval=60, na_inicializacao=na_inicializacao))
+
+        assert eventos == esperado
@@ -0,0 +1,294 @@
+"""
+Testes de Integração - Reposições de aula e índice de vagas das aulas datadas
+"""
+import pytest
+from datetime import date, datetime, time, timedelta
+
+from app.models.fila_espera import FilaEspera
+from app.models.horario import DIAS_SEMANA
+from app.models.plano import Plano
+from app.models.reposicao import OcorrenciaAula, Reposicao
+from app.models.turma import AlunoHorario
+from app.services.fila_espera_service import atualizar_contador
+from app.services.reposicao_service import JANELA_DIAS, gerar_ocorrencias
+from tests.conftest import QueryCounter
+
+
+HOJE = date.today()
+DIA_DE_HOJE = DIAS_SEMANA[HOJE.isoweekday() - 1]
+PROXIMA_SEMANA = HOJE + timedelta(days=7)
+
+
+def _ocupadas(db_session, horario_id):
+    """data -> lugares ocupados das aulas datadas do horário"""
+    db_session.expire_all()
+    return dict(
+        db_session.query(OcorrenciaAula.data, OcorrenciaAula.ocupadas)
+        .filter(OcorrenciaAula.horario_id == horario_id)
+        .order_by(OcorrenciaAula.data)
+        .all()
+    )
+
+
+@pytest.fixture
+def horario(db_session, horario_factory, sample_alunos):
+    """Horário de natação no dia da semana de hoje, capacidade 3, com 2 matriculados"""
+    horario = horario_factory.create(db_session, dia_semana=DIA_DE_HOJE, horario=time(8, 0), capacidade_maxima=3)
+    db_session.add_all([AlunoHorario(horario_id=horario.id, aluno_id=aluno.id) for aluno in sample_alunos[:2]])
+    db_session.commit()
+    gerar_ocorrencias(db_session)
+    db_session.commit()
+    return horario
+
+
+def _reservar(client, headers, aluno_id, horario_id, data=PROXIMA_SEMANA):
+    return client.post(
+        "/api/reposicoes",
+        json={"aluno_id": aluno_id, "horario_id": horario_id, "data": data.isoformat()},
+        headers=headers,
+    )
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestOcorrencias:
+    """Aulas datadas e atualização incremental da ocupação"""
+
+    def test_janela_gerada(self, db_session, horario):
+        """Teste: Uma aula por semana de hoje até a janela, com os matriculados"""
+        ocupadas = _ocupadas(db_session, horario.id)
+
+        assert list(ocupadas) == [HOJE + timedelta(weeks=i) for i in range(JANELA_DIAS // 7 + 1)]
+        assert set(ocupadas.values()) == {2}
+
+    def test_matricula_e_desmatricula(self, client, auth_headers, db_session, horario, sample_alunos):
+        """Teste: Matricular ocupa um lugar em todas as aulas futuras; desmatricular libera"""
+        client.post(f"/api/horarios/{horario.id}/alunos/{sample_alunos[2].id}", headers=auth_headers)
+        assert set(_ocupadas(db_session, horario.id).values()) == {3}
+
+        client.request(
+            "DELETE", f"/api/horarios/{horario.id}/alunos:batch",
+            json={"aluno_ids": [sample_alunos[0].id, sample_alunos[1].id]}, headers=auth_headers,
+        )
+        assert set(_ocupadas(db_session, horario.id).values()) == {1}
+
+    def test_criar_horario_gera_aulas(self, client, auth_headers, db_session):
+        """Teste: POST /horarios já cria as aulas datadas"""
+        response = client.post("/api/horarios", json={
+            "dia_semana": DIA_DE_HOJE, "horario": "10:00", "capacidade_maxima": 5, "tipo_aula": "natacao",
+        }, headers=auth_headers)
+
+        assert len(_ocupadas(db_session, response.json()["id"])) == JANELA_DIAS // 7 + 1
+
+    def test_mudar_dia_refaz_aulas(self, client, auth_headers, db_session, horario):
+        """Teste: Mudar o dia da semana move as aulas datadas"""
+        amanha = HOJE + timedelta(days=1)
+
+        client.put(
+            f"/api/horarios/{horario.id}", json={"dia_semana": DIAS_SEMANA[amanha.isoweekday() - 1]},
+            headers=auth_headers,
+        )
+
+        ocupadas = _ocupadas(db_session, horario.id)
+        assert min(ocupadas) == amanha
+        assert set(ocupadas.values()) == {2}
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestMatriculaComReposicao:
+    """Reposições marcadas contam na capacidade de todas as formas de matrícula"""
+
+    CAPACIDADE = "Horário já está com capacidade máxima (3 alunos)"
+
+    def test_matricula_individual(self, client, auth_headers, db_session, horario, sample_alunos):
+        """Teste: Aula da próxima semana lotada por reposição recusa a matrícula sem mexer nas aulas"""
+        _reservar(client, auth_headers, sample_alunos[5].id, horario.id)
+
+        response = client.post(f"/api/horarios/{horario.id}/alunos/{sample_alunos[2].id}", headers=auth_headers)
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == self.CAPACIDADE
+        ocupadas = _ocupadas(db_session, horario.id)
+        assert (ocupadas[HOJE], ocupadas[PROXIMA_SEMANA]) == (2, 3)
+        assert db_session.query(AlunoHorario).filter_by(horario_id=horario.id).count() == 2
+
+    def test_matricula_em_lote(self, client, auth_headers, db_session, horario, sample_alunos):
+        """Teste: No lote, o item sem lugar na aula lotada recebe erro de capacidade"""
+        _reservar(client, auth_headers, sample_alunos[5].id, horario.id)
+
+        response = client.post(
+            f"/api/horarios/{horario.id}/alunos:batch", json={"aluno_ids": [sample_alunos[2].id]}, headers=auth_headers
+        )
+
+        assert [(r["status"], r["detail"]) for r in response.json()["resultados"]] == [(400, self.CAPACIDADE)]
+        assert set(_ocupadas(db_session, horario.id).values()) == {2, 3}
+
+    def test_lote_fica_com_as_vagas_que_cabem(self, client, auth_headers, db_session, horario, sample_alunos):
+        """Teste: Com uma vaga livre em todas as aulas, só o primeiro item do lote entra"""
+        client.delete(f"/api/horarios/{horario.id}/alunos/{sample_alunos[1].id}", headers=auth_headers)
+        _reservar(client, auth_headers, sample_alunos[5].id, horario.id)
+
+        response = client.post(
+            f"/api/horarios/{horario.id}/alunos:batch",
+            json={"aluno_ids": [sample_alunos[2].id, sample_alunos[3].id]}, headers=auth_headers,
+        )
+
+        assert [r["status"] for r in response.json()["resultados"]] == [201, 400]
+        ocupadas = _ocupadas(db_session, horario.id)
+        assert (ocupadas[HOJE], ocupadas[PROXIMA_SEMANA]) == (2, 3)
+
+    def test_promocao_da_fila(self, client, auth_headers, db_session, horario, sample_alunos):
+        """Teste: A vaga aberta só promove quem cabe na aula que tem reposição"""
+        _reservar(client, auth_headers, sample_alunos[5].id, horario.id)
+        db_session.add_all([
+            FilaEspera(horario_id=horario.id, aluno_id=aluno.id, created_at=datetime(2026, 1, 1, 8, i))
+            for i, aluno in enumerate(sample_alunos[2:4])
+        ])
+        db_session.flush()
+        atualizar_contador(db_session, [horario.id])
+        db_session.commit()
+
+        client.delete(f"/api/horarios/{horario.id}/alunos/{sample_alunos[0].id}", headers=auth_headers)
+
+        db_session.expire_all()
+        matriculados = {m.aluno_id for m in db_session.query(AlunoHorario).filter_by(horario_id=horario.id)}
+        assert matriculados == {sample_alunos[1].id, sample_alunos[2].id}
+        ocupadas = _ocupadas(db_session, horario.id)
+        assert (ocupadas[HOJE], ocupadas[PROXIMA_SEMANA]) == (2, 3)
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestVagasReposicao:
+    """GET /api/reposicoes/vagas"""
+
+    def test_busca_em_uma_query(self, client, auth_headers, db_session, horario, horario_factory):
+        """Teste: Vagas dos próximos 7 dias, filtradas por tipo, em uma query"""
+        horario_factory.create(db_session, dia_semana=DIA_DE_HOJE, horario=time(9, 0), tipo_aula="hidroginastica")
+        gerar_ocorrencias(db_session)
+        db_session.commit()
+
+        with QueryCounter() as counter:
+            response = client.get("/api/reposicoes/vagas?tipo_aula=natacao&dias=7", headers=auth_headers)
+
+        assert response.json() == [{
+            "horario_id": horario.id, "data": HOJE.isoformat(), "dia_semana": DIA_DE_HOJE,
+            "horario": "08:00:00", "tipo_aula": "natacao", "professor_id": None, "vagas": 1,
+        }]
+        assert len([s for s in counter.statements if "ocorrencias_aula" in s]) == 1
+
+    def test_capacidade_nova_vale_sem_atualizar_aulas(self, client, auth_headers, horario):
+        """Teste: Vagas = capacidade atual - ocupadas"""
+        client.put(f"/api/horarios/{horario.id}", json={"capacidade_maxima": 10}, headers=auth_headers)
+
+        response = client.get("/api/reposicoes/vagas?dias=1", headers=auth_headers)
+
+        assert response.json()[0]["vagas"] == 8
+
+    def test_aula_lotada_fora_da_busca(self, client, auth_headers, horario, sample_alunos):
+        """Teste: Aula sem vaga não aparece"""
+        client.post(f"/api/horarios/{horario.id}/alunos/{sample_alunos[2].id}", headers=auth_headers)
+
+        assert client.get("/api/reposicoes/vagas", headers=auth_headers).json() == []
+
+    def test_dias_limitado_a_janela(self, client, auth_headers):
+        """Teste: Busca além da janela de aulas datadas retorna 422"""
+        response = client.get(f"/api/reposicoes/vagas?dias={JANELA_DIAS + 1}", headers=auth_headers)
+
+        assert response.status_code == 422
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestReservaReposicao:
+    """POST/DELETE /api/reposicoes"""
+
+    def test_reserva_ocupa_a_aula_da_data(self, client, auth_headers, db_session, horario, sample_alunos):
+        """Teste: A reposição ocupa um lugar só na aula reservada"""
+        response = _reservar(client, auth_headers, sample_alunos[5].id, horario.id)
+
+        assert response.status_code == 201
+        assert (response.json()["aluno_id"], response.json()["data"]) == (sample_alunos[5].id, PROXIMA_SEMANA.isoformat())
+        ocupadas = _ocupadas(db_session, horario.id)
+        assert (ocupadas[HOJE], ocupadas[PROXIMA_SEMANA]) == (2, 3)
+
+    def test_ultima_vaga(self, client, auth_headers, horario, sample_alunos):
+        """Teste: Com a aula cheia a próxima reserva é recusada"""
+        assert _reservar(client, auth_headers, sample_alunos[5].id, horario.id).status_code == 201
+
+        response = _reservar(client, auth_headers, sample_alunos[6].id, horario.id)
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Não há vagas nesta aula"
+
+    def test_reserva_repetida(self, client, auth_headers, db_session, horario, sample_alunos):
+        """Teste: Mesma aula duas vezes é recusada sem ocupar outro lugar"""
+        horario.capacidade_maxima = 10
+        db_session.commit()
+        _reservar(client, auth_headers, sample_alunos[5].id, horario.id)
+
+        response = _reservar(client, auth_headers, sample_alunos[5].id, horario.id)
+
+        assert response.status_code == 400
+        assert _ocupadas(db_session, horario.id)[PROXIMA_SEMANA] == 3
+
+    @pytest.mark.parametrize("caso,detail", [
+        ("matriculado", "Aluno já está matriculado neste horário"),
+        ("outro_dia", "A data não é um dia de aula deste horário"),
+        ("passado", "Reposição só pode ser marcada para hoje ou datas futuras"),
+    ])
+    def test_regras(self, client, auth_headers, horario, sample_alunos, caso, detail):
+        """Teste: Matriculado no horário, data fora do dia da aula e data passada"""
+        aluno_id, data = sample_alunos[5].id, PROXIMA_SEMANA
+        if caso == "matriculado":
+            aluno_id = sample_alunos[0].id
+        elif caso == "outro_dia":
+            data = PROXIMA_SEMANA + timedelta(days=1)
+        else:
+            data = HOJE - timedelta(days=7)
+
+        response = _reservar(client, auth_headers, aluno_id, horario.id, data)
+
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith(detail)
+
+    def test_plano_sem_reposicao(self, client, auth_headers, db_session, horario, aluno_factory):
+        """Teste: Plano com permite_reposicao=False bloqueia a reserva"""
+        plano = Plano(nome="Básico", valor_mensal=120, permite_reposicao=False)
+        db_session.add(plano)
+        db_session.commit()
+        aluno = aluno_factory.create(db_session, plano_id=plano.id)
+
+        response = _reservar(client, auth_headers, aluno.id, horario.id)
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "O plano do aluno não permite reposição"
+
+    def test_data_alem_da_janela(self, client, auth_headers, db_session, horario, sample_alunos):
+        """Teste: Aula ainda sem linha datada é criada na reserva"""
+        data = HOJE + timedelta(weeks=JANELA_DIAS // 7 + 2)
+
+        response = _reservar(client, auth_headers, sample_alunos[5].id, horario.id, data)
+
+        assert response.status_code == 201
+        assert _ocupadas(db_session, horario.id)[data] == 3
+
+    def test_desmarcar_libera_vaga(self, client, auth_headers, db_session, horario, sample_alunos):
+        """Teste: DELETE devolve o lugar à aula"""
+        reposicao_id = _reservar(client, auth_headers, sample_alunos[5].id, horario.id).json()["id"]
+
+        response = client.delete(f"/api/reposicoes/{reposicao_id}", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert _ocupadas(db_session, horario.id)[PROXIMA_SEMANA] == 2
+        assert db_session.query(Reposicao).count() == 0
+        assert client.delete(f"/api/reposicoes/{reposicao_id}", headers=auth_headers).status_code == 404
+
+    def test_listar_por_aluno(self, client, auth_headers, horario, sample_alunos):
+        """Teste: Filtro por aluno"""
+        _reservar(client, auth_headers, sample_alunos[5].id, horario.id)
+
+        response = client.get(f"/api/reposicoes?aluno_id={sample_alunos[5].id}", headers=auth_headers)
+
+        assert [r["horario_id"] for r in response.json()] == [horario.id]
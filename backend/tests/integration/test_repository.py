@@ -0,0 +1,104 @@
+"""
+Testes de Integração - Alterações e exclusões via UPDATE/DELETE ... RETURNING
+"""
+import pytest
+from datetime import time
+
+from app.models.change_log import ChangeLog
+from app.models.professor import Professor
+from app.models.turma import AlunoHorario
+from tests.conftest import QueryCounter
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestRepositorio:
+    """Respostas de erro sem consultas de pré-checagem"""
+
+    @pytest.mark.parametrize("metodo,rota", [
+        ("PUT", "/api/alunos/999999"),
+        ("DELETE", "/api/alunos/999999"),
+        ("PUT", "/api/pagamentos/999999"),
+        ("DELETE", "/api/pagamentos/999999"),
+        ("PUT", "/api/horarios/999999"),
+        ("DELETE", "/api/horarios/999999"),
+        ("PUT", "/api/planos/999999"),
+        ("DELETE", "/api/planos/999999"),
+        ("PUT", "/api/professores/999999"),
+        ("DELETE", "/api/professores/999999"),
+    ])
+    def test_registro_inexistente_retorna_404(self, client, auth_headers, metodo, rota):
+        """Teste: Nenhuma linha alterada resulta em 404"""
+        json = {"observacoes": "x"} if metodo == "PUT" else None
+
+        response = client.request(metodo, rota, headers=auth_headers, json=json)
+
+        assert response.status_code == 404
+
+    def test_pagamento_com_aluno_inexistente(self, client, auth_headers, sample_pagamento):
+        """Teste: Chave estrangeira recusada pelo banco vira 404, sem SELECT do aluno"""
+        with QueryCounter() as counter:
+            response = client.put(
+                f"/api/pagamentos/{sample_pagamento.id}",
+                json={"aluno_id": 999999},
+                headers=auth_headers,
+            )
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Aluno não encontrado"
+        assert not any("FROM alunos" in statement for statement in counter.statements)
+
+    def test_professor_com_email_duplicado(self, client, auth_headers, db_session):
+        """Teste: Violação de unicidade vira 400 com a mensagem da antiga pré-checagem"""
+        db_session.add_all([
+            Professor(nome="Prof. A", email="a@test.com", cpf="111.111.111-11"),
+            Professor(nome="Prof. B", email="b@test.com", cpf="222.222.222-22"),
+        ])
+        db_session.commit()
+        professor_b = db_session.query(Professor).filter_by(email="b@test.com").one()
+
+        response = client.put(
+            f"/api/professores/{professor_b.id}",
+            json={"email": "a@test.com"},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 400
+        assert "email" in response.json()["detail"].lower()
+
+    def test_horario_com_alunos_nao_e_excluido(self, client, auth_headers, db_session, sample_aluno, horario_factory):
+        """Teste: DELETE condicional não remove horário com matrículas"""
+        horario = horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0))
+        db_session.add(AlunoHorario(aluno_id=sample_aluno.id, horario_id=horario.id))
+        db_session.commit()
+
+        response = client.delete(f"/api/horarios/{horario.id}", headers=auth_headers)
+
+        assert response.status_code == 400
+        assert client.get(f"/api/horarios/{horario.id}", headers=auth_headers).status_code == 200
+
+    def test_resposta_traz_valores_do_banco(self, client, auth_headers, sample_aluno):
+        """Teste: O objeto retornado reflete o UPDATE com a tipagem das colunas"""
+        response = client.put(
+            f"/api/alunos/{sample_aluno.id}",
+            json={"valor_mensalidade": 200, "observacoes": "Nova"},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 200
+        assert response.json()["valor_mensalidade"] == "200.00"
+        assert response.json()["observacoes"] == "Nova"
+
+    def test_change_feed_registra_alteracoes(self, client, auth_headers, db_session, sample_pagamento):
+        """Teste: UPDATE e DELETE em massa continuam gravando no change_log"""
+        pagamento_id = sample_pagamento.id
+
+        client.put(f"/api/pagamentos/{pagamento_id}", json={"observacoes": "x"}, headers=auth_headers)
+        client.delete(f"/api/pagamentos/{pagamento_id}", headers=auth_headers)
+
+        ops = [
+            entry.operation for entry in db_session.query(ChangeLog)
+            .filter_by(table_name="pagamentos", row_id=pagamento_id)
+            .order_by(ChangeLog.id)
+        ]
+        assert ops[-2:] == ["update", "delete"]
@@ -0,0 +1,149 @@
+"""
+Testes de Integração - Cache de respostas de dados de referência
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.plano import Plano
+from app.utils.metrics import RESPONSE_CACHE_HITS, RESPONSE_CACHE_MISSES
+from app.utils.table_versions import table_versions
+
+
+PLANO = {"nome": "Plano 2x", "valor_mensal": 150.0, "aulas_por_semana": 2}
+PROFESSOR = {"nome": "Prof. Cache", "email": "cache@test.com", "cpf": "111.222.333-44"}
+HORARIO = {"dia_semana": "segunda", "horario": "08:00:00", "tipo_aula": "natacao"}
+
+
+def _contador(metrica, recurso: str) -> float:
+    return metrica.labels(recurso)._value.get()
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestCacheDeRespostas:
+    """Listagens de planos, professores e horários servidas do cache"""
+
+    @pytest.mark.parametrize("rota,payload", [
+        ("/api/planos", PLANO),
+        ("/api/professores", PROFESSOR),
+        ("/api/horarios", HORARIO),
+    ])
+    def test_segunda_leitura_vem_do_cache(self, client, auth_headers, assert_query_budget, rota, payload):
+        """Teste: Primeira leitura consulta o banco, a segunda só autentica"""
+        client.post(rota, json=payload, headers=auth_headers)
+
+        primeira = client.get(rota, headers=auth_headers)
+        with assert_query_budget(1):  # apenas a busca do usuário autenticado
+            segunda = client.get(rota, headers=auth_headers)
+
+        assert primeira.headers["X-Cache"] == "MISS"
+        assert segunda.headers["X-Cache"] == "HIT"
+        assert segunda.json() == primeira.json()
+        assert len(segunda.json()) == 1
+
+    @pytest.mark.parametrize("rota,payload,alteracao", [
+        ("/api/planos", PLANO, {"valor_mensal": 99.0}),
+        ("/api/professores", PROFESSOR, {"telefone": "(11) 99999-0000"}),
+        ("/api/horarios", HORARIO, {"capacidade_maxima": 30}),
+    ])
+    def test_alteracao_invalida_o_cache(self, client, auth_headers, rota, payload, alteracao):
+        """Teste: Commit na tabela incrementa a versão e a próxima leitura é refeita"""
+        criado = client.post(rota, json=payload, headers=auth_headers).json()
+        client.get(rota, headers=auth_headers)
+
+        client.put(f"{rota}/{criado['id']}", json=alteracao, headers=auth_headers)
+        response = client.get(rota, headers=auth_headers)
+
+        assert response.headers["X-Cache"] == "MISS"
+        campo, valor = next(iter(alteracao.items()))
+        assert response.json()[0][campo] == valor
+
+    def test_alteracao_fora_da_api_invalida_o_cache(self, client, auth_headers, db_session):
+        """Teste: Eventos da Session cobrem qualquer commit, não só os endpoints"""
+        client.get("/api/planos", headers=auth_headers)
+
+        db_session.add(Plano(**PLANO))
+        db_session.commit()
+        response = client.get("/api/planos", headers=auth_headers)
+
+        assert response.headers["X-Cache"] == "MISS"
+        assert len(response.json()) == 1
+
+    def test_parametros_diferentes_tem_entradas_separadas(self, client, auth_headers):
+        """Teste: Filtros fazem parte da chave do cache"""
+        client.post("/api/planos", json=PLANO, headers=auth_headers)
+        client.get("/api/planos", headers=auth_headers)
+
+        inativos = client.get("/api/planos?ativo=false", headers=auth_headers)
+
+        assert inativos.headers["X-Cache"] == "MISS"
+        assert inativos.json() == []
+
+    def test_rollback_nao_incrementa_versao(self, test_engine):
+        """Teste: Alteração desfeita não invalida o cache"""
+        versao = table_versions.get(["planos"])
+
+        with Session(bind=test_engine) as session:
+            session.add(Plano(**PLANO))
+            session.flush()
+            session.rollback()
+
+        assert table_versions.get(["planos"]) == versao
+
+    def test_cache_exige_autenticacao(self, client, auth_headers):
+        """Teste: Resposta em cache não é entregue sem token"""
+        client.get("/api/planos", headers=auth_headers)
+
+        response = client.get("/api/planos")
+
+        assert response.status_code in [401, 403]
+
+    def test_metricas_de_hit_e_miss(self, client, auth_headers):
+        """Teste: Hits e misses são contados por recurso"""
+        hits, misses = _contador(RESPONSE_CACHE_HITS, "horarios"), _contador(RESPONSE_CACHE_MISSES, "horarios")
+
+        client.get("/api/horarios", headers=auth_headers)
+        client.get("/api/horarios", headers=auth_headers)
+
+        assert _contador(RESPONSE_CACHE_MISSES, "horarios") == misses + 1
+        assert _contador(RESPONSE_CACHE_HITS, "horarios") == hits + 1
+
+
+@pytest.mark.integration
+@pytest.mark.database
+class TestVersoesCompartilhadas:
+    """Modo compartilhado: versões gravadas em cache_versions na mesma transação"""
+
+    @pytest.fixture(autouse=True)
+    def modo_compartilhado(self, monkeypatch):
+        monkeypatch.setattr(table_versions, "shared", True)
+        monkeypatch.setattr(table_versions, "ttl", 60.0)
+
+    def test_commit_incrementa_versao_no_banco(self, client, auth_headers, db_session):
+        """Teste: Alteração grava a nova versão em cache_versions"""
+        client.post("/api/planos", json=PLANO, headers=auth_headers)
+
+        versao = db_session.execute(
+            text("SELECT version FROM cache_versions WHERE table_name = 'planos'")
+        ).scalar()
+
+        assert versao == 1
+
+    def test_alteracao_de_outro_worker_invalida_o_cache(self, client, auth_headers, db_session, monkeypatch):
+        """Teste: Versão incrementada por outro processo é vista após o TTL"""
+        client.get("/api/planos", headers=auth_headers)
+        assert client.get("/api/planos", headers=auth_headers).headers["X-Cache"] == "HIT"
+
+        # Outro worker: grava direto no banco, sem passar pelos contadores deste processo
+        db_session.execute(text(
+            "INSERT INTO planos (nome, valor_mensal, aulas_por_semana, duracao_aula_minutos, ativo, "
+            "acesso_livre, permite_reposicao, dias_tolerancia) VALUES ('Outro', 10, 1, 50, 1, 0, 1, 5)"
+        ))
+        db_session.execute(text("INSERT INTO cache_versions (table_name, version) VALUES ('planos', 7)"))
+        monkeypatch.setattr(table_versions, "ttl", 0.0)
+
+        response = client.get("/api/planos", headers=auth_headers)
+
+        assert response.headers["X-Cache"] == "MISS"
+        assert [plano["nome"] for plano in response.json()] == ["Outro"]
@@ -0,0 +1,122 @@
+"""
+Testes de Integração - Concorrência otimista (coluna version + If-Match)
+"""
+import pytest
+from datetime import time
+
+import sqlalchemy as sa
+from sqlalchemy.orm.exc import StaleDataError
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestIfMatch:
+    """PUT condicional pela versão do registro"""
+
+    def test_get_retorna_versao_como_etag(self, client, auth_headers, sample_aluno):
+        """Teste: GET por ID traz a versão no corpo e no ETag"""
+        response = client.get(f"/api/alunos/{sample_aluno.id}", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.json()["version"] == 1
+        assert response.headers["etag"] == '"1"'
+
+    def test_get_com_if_none_match_retorna_304(self, client, auth_headers, sample_aluno):
+        """Teste: Cliente com a versão atual recebe 304"""
+        response = client.get(f"/api/alunos/{sample_aluno.id}", headers={**auth_headers, "If-None-Match": '"1"'})
+
+        assert response.status_code == 304
+
+    def test_put_incrementa_versao(self, client, auth_headers, sample_aluno):
+        """Teste: Todo UPDATE incrementa a versão, com ou sem If-Match"""
+        primeira = client.put(f"/api/alunos/{sample_aluno.id}", json={"observacoes": "a"}, headers=auth_headers)
+        segunda = client.put(
+            f"/api/alunos/{sample_aluno.id}",
+            json={"observacoes": "b"},
+            headers={**auth_headers, "If-Match": primeira.headers["etag"]},
+        )
+
+        assert primeira.json()["version"] == 2
+        assert segunda.status_code == 200
+        assert segunda.json()["version"] == 3
+        assert segunda.headers["etag"] == '"3"'
+
+    @pytest.mark.parametrize("recurso", ["alunos", "pagamentos", "horarios"])
+    def test_edicao_concorrente_retorna_409(self, client, auth_headers, sample_pagamento, horario_factory, db_session, recurso):
+        """Teste: Segunda recepcionista com a versão antiga recebe 409 e não sobrescreve"""
+        ids = {
+            "alunos": sample_pagamento.aluno_id,
+            "pagamentos": sample_pagamento.id,
+            "horarios": horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0)).id,
+        }
+        url = f"/api/{recurso}/{ids[recurso]}"
+        etag = client.get(url, headers=auth_headers).headers["etag"]
+        campo = {"horarios": {"capacidade_maxima": 12}}.get(recurso, {"observacoes": "primeira"})
+
+        vencedora = client.put(url, json=campo, headers={**auth_headers, "If-Match": etag})
+        perdedora = client.put(url, json=campo, headers={**auth_headers, "If-Match": etag})
+
+        assert vencedora.status_code == 200
+        assert perdedora.status_code == 409
+        assert perdedora.headers["etag"] == vencedora.headers["etag"]
+        assert client.get(url, headers=auth_headers).json()["version"] == 2
+
+    def test_versao_no_corpo(self, client, auth_headers, sample_aluno):
+        """Teste: "version" no corpo funciona como If-Match"""
+        url = f"/api/alunos/{sample_aluno.id}"
+
+        assert client.put(url, json={"observacoes": "a", "version": 1}, headers=auth_headers).status_code == 200
+        conflito = client.put(url, json={"observacoes": "b", "version": 1}, headers=auth_headers)
+
+        assert conflito.status_code == 409
+        assert client.get(url, headers=auth_headers).json()["observacoes"] == "a"
+
+    def test_if_match_em_registro_inexistente(self, client, auth_headers):
+        """Teste: Registro inexistente continua 404, não 409"""
+        response = client.put("/api/alunos/999999", json={"observacoes": "x"}, headers={**auth_headers, "If-Match": '"1"'})
+
+        assert response.status_code == 404
+
+    @pytest.mark.parametrize("if_match", ['"abc"', "1", '"1", "2"'])
+    def test_if_match_invalido(self, client, auth_headers, sample_aluno, if_match):
+        """Teste: If-Match que não é um ETag de versão retorna 400"""
+        response = client.put(
+            f"/api/alunos/{sample_aluno.id}",
+            json={"observacoes": "x"},
+            headers={**auth_headers, "If-Match": if_match},
+        )
+
+        assert response.status_code == 400
+
+    def test_if_match_asterisco(self, client, auth_headers, sample_aluno):
+        """Teste: If-Match: * aceita qualquer versão"""
+        response = client.put(
+            f"/api/alunos/{sample_aluno.id}",
+            json={"observacoes": "x"},
+            headers={**auth_headers, "If-Match": "*"},
+        )
+
+        assert response.status_code == 200
+
+
+@pytest.mark.integration
+@pytest.mark.database
+class TestVersaoNoFlush:
+    """Alterações feitas pelo ORM também respeitam a versão"""
+
+    def test_flush_incrementa_versao(self, db_session, sample_aluno):
+        """Teste: Alteração via sessão incrementa a versão"""
+        sample_aluno.observacoes = "via ORM"
+        db_session.commit()
+
+        assert sample_aluno.version == 2
+
+    def test_flush_com_versao_desatualizada(self, db_session, sample_aluno):
+        """Teste: Registro alterado por fora entre a leitura e o flush gera StaleDataError"""
+        db_session.execute(
+            sa.text("UPDATE alunos SET version = version + 1 WHERE id = :id"), {"id": sample_aluno.id}
+        )
+        sample_aluno.observacoes = "versão antiga"
+
+        with pytest.raises(StaleDataError):
+            db_session.flush()
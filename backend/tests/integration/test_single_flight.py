@@ -0,0 +1,162 @@
+"""
+Testes de Integração - Coalescência de leituras caras (single-flight)
+"""
+import asyncio
+import threading
+import time
+import pytest
+
+from app.utils.single_flight import SingleFlight, single_flight
+from app.utils.table_versions import table_versions
+
+
+def _build_lento(chamadas: list, resultado=(None, b"[]"), atraso=0.05):
+    def build():
+        chamadas.append(threading.get_ident())
+        time.sleep(atraso)
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado
+    return build
+
+
+@pytest.mark.integration
+class TestSingleFlight:
+    """Execuções concorrentes da mesma chave"""
+
+    def test_chamadas_concorrentes_executam_uma_vez(self):
+        """Teste: Chamadas simultâneas compartilham a mesma execução"""
+        flight = SingleFlight()
+        chamadas = []
+
+        async def cenario():
+            return await asyncio.gather(*[
+                flight.get("grade", "chave", ["horarios"], _build_lento(chamadas)) for _ in range(10)
+            ])
+
+        resultados = asyncio.run(cenario())
+
+        assert len(chamadas) == 1
+        assert sorted(r for _, r in resultados) == ["computed"] + ["shared"] * 9
+
+    def test_chaves_diferentes_nao_compartilham(self):
+        """Teste: Parâmetros ou escopo diferentes executam separadamente"""
+        flight = SingleFlight()
+        chamadas = []
+
+        async def cenario():
+            await asyncio.gather(
+                flight.get("grade", ("grade", (), "admin"), ["horarios"], _build_lento(chamadas)),
+                flight.get("grade", ("grade", (), "recepcionista"), ["horarios"], _build_lento(chamadas)),
+            )
+
+        asyncio.run(cenario())
+
+        assert len(chamadas) == 2
+
+    def test_erro_propagado_e_nao_guardado(self):
+        """Teste: Falha chega a todos os que esperavam e a próxima chamada tenta de novo"""
+        flight = SingleFlight(stale_seconds=60)
+        chamadas = []
+
+        async def cenario():
+            return await asyncio.gather(*[
+                flight.get("grade", "chave", ["horarios"], _build_lento(chamadas, RuntimeError("falhou")))
+                for _ in range(3)
+            ], return_exceptions=True)
+
+        erros = asyncio.run(cenario())
+        assert all(isinstance(erro, RuntimeError) for erro in erros)
+
+        async def nova_tentativa():
+            return await flight.get("grade", "chave", ["horarios"], _build_lento(chamadas))
+
+        assert asyncio.run(nova_tentativa()) == (b"[]", "computed")
+        assert len(chamadas) == 2
+
+    def test_sem_stale_sempre_consulta(self):
+        """Teste: Por padrão nada é guardado entre requisições não simultâneas"""
+        flight = SingleFlight(stale_seconds=0)
+        chamadas = []
+
+        async def cenario():
+            for _ in range(3):
+                await flight.get("grade", "chave", ["horarios"], _build_lento(chamadas, atraso=0))
+
+        asyncio.run(cenario())
+
+        assert len(chamadas) == 3
+
+    def test_stale_while_revalidate(self):
+        """Teste: Após alteração, serve o resultado anterior e revalida em segundo plano"""
+        flight = SingleFlight(stale_seconds=60)
+        chamadas = []
+
+        def build():
+            chamadas.append(1)
+            return table_versions.get(["horarios"]), f"v{len(chamadas)}".encode()
+
+        async def cenario():
+            primeira = await flight.get("grade", "chave", ["horarios"], build)
+            repetida = await flight.get("grade", "chave", ["horarios"], build)
+            table_versions.bump(["horarios"])
+            stale = await flight.get("grade", "chave", ["horarios"], build)
+            await asyncio.sleep(0.1)  # revalidação em segundo plano
+            revalidada = await flight.get("grade", "chave", ["horarios"], build)
+            return primeira, repetida, stale, revalidada
+
+        assert asyncio.run(cenario()) == (
+            (b"v1", "computed"), (b"v1", "hit"), (b"v1", "stale"), (b"v2", "hit")
+        )
+
+    def test_stale_expirado_consulta_na_hora(self):
+        """Teste: Resultado desatualizado além da janela não é servido"""
+        flight = SingleFlight(stale_seconds=0.01)
+
+        def build():
+            return table_versions.get(["horarios"]), b"novo"
+
+        async def cenario():
+            await flight.get("grade", "chave", ["horarios"], lambda: (table_versions.get(["horarios"]), b"antigo"))
+            table_versions.bump(["horarios"])
+            await asyncio.sleep(0.05)
+            return await flight.get("grade", "chave", ["horarios"], build)
+
+        assert asyncio.run(cenario()) == (b"novo", "computed")
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestEndpointsCoalescidos:
+    """Endpoints que usam o single-flight"""
+
+    @pytest.mark.parametrize("endpoint", [
+        "/api/alunos/inadimplentes",
+        "/api/horarios/grade-completa",
+        "/api/pagamentos/relatorio-mensal?ano=2025",
+    ])
+    def test_resposta_indica_execucao(self, client, auth_headers, endpoint):
+        """Teste: Requisição isolada executa a consulta"""
+        response = client.get(endpoint, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.headers["X-Single-Flight"] == "computed"
+
+    def test_inadimplentes_reflete_alteracoes(self, client, auth_headers, sample_aluno, pagamento_factory, db_session):
+        """Teste: Sem janela de stale, alterações aparecem na requisição seguinte"""
+        assert [a["id"] for a in client.get("/api/alunos/inadimplentes", headers=auth_headers).json()] == [sample_aluno.id]
+
+        pagamento_factory.create(db_session, aluno=sample_aluno)
+
+        assert client.get("/api/alunos/inadimplentes", headers=auth_headers).json() == []
+
+    def test_stale_configurado_serve_cache_ate_alteracao(self, client, auth_headers, sample_pagamento, monkeypatch):
+        """Teste: Com janela de stale, repetições sem alteração não consultam o banco"""
+        monkeypatch.setattr(single_flight, "stale_seconds", 30)
+
+        primeira = client.get("/api/pagamentos/relatorio-mensal", headers=auth_headers)
+        segunda = client.get("/api/pagamentos/relatorio-mensal", headers=auth_headers)
+
+        assert primeira.headers["X-Single-Flight"] == "computed"
+        assert segunda.headers["X-Single-Flight"] == "hit"
+        assert primeira.content == segunda.content
@@ -0,0 +1,227 @@
+"""
+Testes de Integração - Stream SSE (/api/stream)
+
+O TestClient lê a resposta inteira, então o stream (infinito) é testado pelo
+gerador event_stream; a rota é testada nos caminhos que não abrem o stream.
+"""
+import asyncio
+import json
+import time as relogio
+import pytest
+from datetime import time, timedelta
+
+from app.routes import stream as stream_module
+from app.routes.stream import event_stream, format_sse
+from app.services.event_bus import EventBus, event_bus
+from app.utils.auth import create_access_token
+
+
+@pytest.fixture
+def eventos(monkeypatch):
+    """Captura os eventos publicados pelos routers"""
+    publicados = []
+    monkeypatch.setattr(event_bus, "publish", lambda type, data: publicados.append((type, data)))
+    return publicados
+
+
+def _parse(mensagem: str) -> tuple:
+    campos = dict(linha.split(": ", 1) for linha in mensagem.strip().splitlines())
+    return campos["event"], json.loads(campos["data"])
+
+
+@pytest.mark.integration
+class TestEventStream:
+    """Gerador de mensagens SSE"""
+
+    def test_entrega_eventos_filtrados(self):
+        """Teste: Só eventos dos tipos e filtros pedidos chegam ao cliente"""
+        async def cenario():
+            gen = event_stream({"ocupacao"}, {"horario_id": 1}, heartbeat=5)
+            assert (await gen.__anext__()).startswith("retry:")
+
+            event_bus.publish("pagamento", {"pagamento_id": 9})
+            event_bus.publish("ocupacao", {"horario_id": 2, "matriculados": 1})
+            event_bus.publish("ocupacao", {"horario_id": 1, "matriculados": 3})
+            mensagem = await asyncio.wait_for(gen.__anext__(), timeout=1)
+            await gen.aclose()
+            return mensagem
+
+        assert _parse(asyncio.run(cenario())) == ("ocupacao", {"horario_id": 1, "matriculados": 3})
+        assert event_bus.subscriber_count == 0
+
+    def test_heartbeat_quando_ocioso(self):
+        """Teste: Sem eventos, envia comentário de keep-alive"""
+        async def cenario():
+            gen = event_stream(heartbeat=0.01)
+            await gen.__anext__()
+            mensagem = await gen.__anext__()
+            await gen.aclose()
+            return mensagem
+
+        assert asyncio.run(cenario()) == ": ping\n\n"
+
+    def test_fila_cheia_pede_resync(self, monkeypatch):
+        """Teste: Cliente lento recebe resync em vez de crescer memória"""
+        async def cenario():
+            bus = EventBus()
+            monkeypatch.setattr(stream_module, "event_bus", bus)
+            gen = event_stream(heartbeat=5)
+            await gen.__anext__()
+            subscription = next(iter(bus._subscriptions))
+            for i in range(subscription.queue.maxsize + 10):
+                bus.publish("aluno", {"aluno_id": i})
+
+            tipos = [_parse(await gen.__anext__())[0] for _ in range(subscription.queue.maxsize + 1)]
+            await gen.aclose()
+            return tipos
+
+        tipos = asyncio.run(cenario())
+        assert tipos[-1] == "resync"
+        assert set(tipos[:-1]) == {"aluno"}
+
+    def test_publicacao_de_outra_thread(self):
+        """Teste: Rotas síncronas (threadpool) publicam no loop da conexão"""
+        async def cenario():
+            gen = event_stream(heartbeat=5)
+            await gen.__anext__()
+            await asyncio.to_thread(event_bus.publish, "aluno", {"aluno_id": 1})
+            mensagem = await asyncio.wait_for(gen.__anext__(), timeout=1)
+            await gen.aclose()
+            return mensagem
+
+        assert _parse(asyncio.run(cenario())) == ("aluno", {"aluno_id": 1})
+
+    def test_centenas_de_conexoes_ociosas(self):
+        """Teste: Conexões ociosas não acumulam trabalho nem vazam inscrições"""
+        async def cenario():
+            geradores = [event_stream(heartbeat=60) for _ in range(500)]
+            for gen in geradores:
+                await gen.__anext__()
+            assert event_bus.subscriber_count == 500
+
+            event_bus.publish("ocupacao", {"horario_id": 1, "matriculados": 1})
+            mensagens = [await gen.__anext__() for gen in geradores]
+            for gen in geradores:
+                await gen.aclose()
+            return mensagens
+
+        mensagens = asyncio.run(cenario())
+        assert len(set(mensagens)) == 1
+        assert event_bus.subscriber_count == 0
+
+    def test_encerra_quando_o_token_expira(self):
+        """Teste: Na expiração do token o stream avisa o cliente e termina"""
+        async def cenario():
+            gen = event_stream(heartbeat=5, expira_em=relogio.time() + 0.05)
+            await gen.__anext__()
+            mensagem = await asyncio.wait_for(gen.__anext__(), timeout=1)
+            with pytest.raises(StopAsyncIteration):
+                await gen.__anext__()
+            return mensagem
+
+        assert _parse(asyncio.run(cenario()))[0] == "token_expirado"
+        assert event_bus.subscriber_count == 0
+
+    def test_format_sse(self):
+        """Teste: Mensagem no formato do protocolo"""
+        assert format_sse("aluno", {"nome": "João"}, 7) == 'id: 7\nevent: aluno\ndata: {"nome": "João"}\n\n'
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestStreamRoute:
+    """Abertura do stream"""
+
+    def test_exige_token(self, client):
+        """Teste: Sem token retorna 401"""
+        assert client.get("/api/stream").status_code == 401
+
+    def test_token_invalido(self, client):
+        """Teste: Token inválido pela query string retorna 401"""
+        assert client.get("/api/stream?token=invalido").status_code == 401
+
+    def test_token_de_login_nao_vale_na_query_string(self, client, auth_headers):
+        """Teste: O token de login não é aceito em ?token= (ficaria nos logs de acesso)"""
+        token_login = auth_headers["Authorization"].split(" ", 1)[1]
+
+        assert client.get(f"/api/stream?token={token_login}").status_code == 401
+
+    def test_token_de_stream_abre_o_stream(self, client, auth_headers, monkeypatch):
+        """Teste: Token emitido por POST /api/stream/token autentica pela query string"""
+        response = client.post("/api/stream/token", headers=auth_headers)
+        monkeypatch.setattr(stream_module, "MAX_CLIENTS", 0)
+
+        assert response.status_code == 200
+        assert response.json()["expires_in"] == stream_module.STREAM_TOKEN_SECONDS
+        # 503 = passou pela autenticação (abrir o stream prenderia o TestClient)
+        assert client.get(f"/api/stream?token={response.json()['token']}").status_code == 503
+
+    def test_token_de_stream_nao_vale_nas_rotas(self, client, auth_headers):
+        """Teste: O token de stream não substitui o token de login"""
+        token = client.post("/api/stream/token", headers=auth_headers).json()["token"]
+
+        assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+    def test_token_de_stream_expirado(self, client, admin_user):
+        """Teste: Token de stream expirado retorna 401"""
+        token = create_access_token(
+            {"user_id": admin_user.id, "scope": stream_module.STREAM_SCOPE}, expires_delta=timedelta(seconds=-1)
+        )
+
+        assert client.get(f"/api/stream?token={token}").status_code == 401
+
+    def test_tipo_invalido(self, client, auth_headers):
+        """Teste: Tipo desconhecido retorna 400"""
+        response = client.get("/api/stream?tipos=aluno,nada", headers=auth_headers)
+
+        assert response.status_code == 400
+        assert "nada" in response.json()["detail"]
+
+    def test_limite_de_conexoes(self, client, auth_headers, monkeypatch):
+        """Teste: Acima do limite de conexões retorna 503"""
+        monkeypatch.setattr(stream_module, "MAX_CLIENTS", 0)
+
+        assert client.get("/api/stream", headers=auth_headers).status_code == 503
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestPublicacao:
+    """Eventos publicados pelos routers após o commit"""
+
+    def test_matricula_publica_ocupacao(self, client, auth_headers, sample_aluno, horario_factory, db_session, eventos):
+        """Teste: Matrícula publica o evento e a nova ocupação do horário"""
+        horario = horario_factory.create(db_session, dia_semana="segunda", horario=time(8, 0), capacidade_maxima=10)
+        horario_id, aluno_id = horario.id, sample_aluno.id
+
+        client.post(f"/api/horarios/{horario_id}/alunos/{aluno_id}", headers=auth_headers)
+
+        assert [tipo for tipo, _ in eventos] == ["matricula", "ocupacao"]
+        assert eventos[0][1]["op"] == "insert" and eventos[0][1]["aluno_id"] == aluno_id
+        assert eventos[1][1] == {
+            "horario_id": horario_id, "matriculados": 1, "capacidade_maxima": 10, "vagas_disponiveis": 9
+        }
+
+    def test_pagamento_publica_evento(self, client, auth_headers, sample_pagamento, eventos):
+        """Teste: Exclusão de pagamento publica os dados do pagamento removido"""
+        pagamento_id, aluno_id = sample_pagamento.id, sample_pagamento.aluno_id
+
+        client.delete(f"/api/pagamentos/{pagamento_id}", headers=auth_headers)
+
+        assert eventos == [("pagamento", {
+            "op": "delete",
+            "pagamento_id": pagamento_id,
+            "aluno_id": aluno_id,
+            "valor": str(sample_pagamento.valor),
+            "data_pagamento": str(sample_pagamento.data_pagamento),
+            "mes_referencia": sample_pagamento.mes_referencia,
+        })]
+
+    def test_aluno_publica_evento(self, client, auth_headers, sample_aluno, eventos):
+        """Teste: Desativação de aluno publica update com ativo falso"""
+        aluno_id = sample_aluno.id
+
+        client.delete(f"/api/alunos/{aluno_id}", headers=auth_headers)
+
+        assert eventos[-1][0] == "aluno"
+        assert eventos[-1][1]["aluno_id"] == aluno_id and eventos[-1][1]["ativo"] is False
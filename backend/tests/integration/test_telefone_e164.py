@@ -0,0 +1,111 @@
+"""
+Testes de Integração - Telefone normalizado (E.164) na gravação, backfill e busca por telefone
+"""
+import pytest
+from sqlalchemy import text
+
+from app.models.aluno import Aluno
+from app.models.professor import Professor
+from app.services.telefone_service import backfill_telefones
+from tests.conftest import QueryCounter
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestTelefoneNaGravacao:
+    """telefone_e164 calculado no POST e no PUT"""
+
+    def test_criacao_normaliza(self, client, auth_headers):
+        """Teste: POST grava o telefone em E.164 e devolve na resposta"""
+        response = client.post("/api/alunos", json={
+            "nome_completo": "Ana Souza", "tipo_aula": "natacao", "valor_mensalidade": 150.0,
+            "dia_vencimento": 10, "telefone_whatsapp": "(11) 98765-4321",
+        }, headers=auth_headers)
+
+        assert response.json()["telefone_e164"] == "+5511987654321"
+
+    def test_atualizacao_recalcula(self, client, auth_headers, db_session, aluno_factory):
+        """Teste: PUT com telefone novo recalcula no mesmo UPDATE; sem telefone não mexe"""
+        aluno = aluno_factory.create(db_session)
+
+        with QueryCounter() as counter:
+            response = client.put(
+                f"/api/alunos/{aluno.id}", json={"telefone_whatsapp": "21 3333-4444"}, headers=auth_headers
+            )
+        outro = client.put(f"/api/alunos/{aluno.id}", json={"observacoes": "x"}, headers=auth_headers)
+
+        assert response.json()["telefone_e164"] == "+552133334444"
+        assert sum(s.startswith("UPDATE alunos") for s in counter.statements) == 1
+        assert outro.json()["telefone_e164"] == "+552133334444"
+
+    def test_telefone_invalido_fica_sem_e164(self, client, auth_headers, db_session, aluno_factory):
+        """Teste: Telefone que não dá para normalizar é mantido, mas sem telefone_e164"""
+        aluno = aluno_factory.create(db_session)
+
+        response = client.put(f"/api/alunos/{aluno.id}", json={"telefone_whatsapp": "123"}, headers=auth_headers)
+
+        assert (response.json()["telefone_whatsapp"], response.json()["telefone_e164"]) == ("123", None)
+
+    def test_professor(self, client, auth_headers, db_session):
+        """Teste: Professor também grava o telefone normalizado"""
+        professor = Professor(nome="Prof. A", email="a@test.com", cpf="111.111.111-11", telefone="(11) 3333-4444")
+        db_session.add(professor)
+        db_session.commit()
+        assert professor.telefone_e164 == "+551133334444"
+
+        response = client.put(
+            f"/api/professores/{professor.id}", json={"telefone": "+1 415 555 0100"}, headers=auth_headers
+        )
+
+        assert response.json()["telefone_e164"] == "+14155550100"
+
+
+@pytest.mark.integration
+class TestBackfillTelefones:
+    """Preenchimento dos registros gravados antes da coluna"""
+
+    def test_preenche_so_quem_falta(self, db_session, aluno_factory):
+        """Teste: Registros sem telefone_e164 são preenchidos em lotes; inválidos continuam vazios"""
+        alunos = [aluno_factory.create(db_session, telefone_whatsapp=f"(11) 9000{i}-000{i}") for i in range(3)]
+        invalido = aluno_factory.create(db_session, telefone_whatsapp="123")
+        db_session.execute(text("UPDATE alunos SET telefone_e164 = NULL"))
+
+        preenchidos = backfill_telefones(db_session, lote=2)
+
+        assert preenchidos == {"alunos": 3, "professores": 0}
+        db_session.expire_all()
+        assert [db_session.get(Aluno, a.id).telefone_e164 for a in alunos] == [
+            "+5511900000000", "+5511900010001", "+5511900020002",
+        ]
+        assert db_session.get(Aluno, invalido.id).telefone_e164 is None
+        assert backfill_telefones(db_session) == {"alunos": 0, "professores": 0}
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestBuscaPorTelefone:
+    """GET /api/alunos/por-telefone"""
+
+    def test_irmaos_em_qualquer_formato(self, client, auth_headers, db_session, aluno_factory):
+        """Teste: Busca por qualquer formatação do número devolve todos os alunos do telefone"""
+        ana = aluno_factory.create(db_session, nome_completo="Ana", telefone_whatsapp="(11) 99999-9999")
+        bruno = aluno_factory.create(db_session, nome_completo="Bruno", telefone_whatsapp="5511999999999")
+        aluno_factory.create(db_session, nome_completo="Carla", telefone_whatsapp="(21) 98888-7777")
+
+        response = client.get("/api/alunos/por-telefone", params={"numero": "+55 11 99999-9999"}, headers=auth_headers)
+
+        assert [a["id"] for a in response.json()] == [ana.id, bruno.id]
+
+    def test_usa_indice(self, db_session):
+        """Teste: A busca é feita pelo índice de telefone_e164, sem varrer a tabela"""
+        plano = db_session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM alunos WHERE telefone_e164 = '+5511999999999'"
+        )).all()
+
+        assert "ix_alunos_telefone_e164" in " ".join(str(linha[-1]) for linha in plano)
+
+    def test_numero_invalido(self, client, auth_headers):
+        """Teste: Número que não dá para normalizar retorna 400"""
+        response = client.get("/api/alunos/por-telefone", params={"numero": "abc"}, headers=auth_headers)
+
+        assert response.status_code == 400
@@ -0,0 +1,81 @@
+"""
+Testes de Performance - Alocação automática da grade
+
+5.000 alunos com 4 preferências de dia (metade com horário fixo) em 300
+horários: o fluxo de custo mínimo precisa resolver em poucos segundos.
+"""
+import random
+import time as clock
+import pytest
+from datetime import time
+
+from sqlalchemy import insert
+
+from app.models.aluno import Aluno
+from app.models.horario import Horario
+from app.models.plano import Plano
+from app.services.alocacao_service import Preferencia, calcular_alocacao
+
+
+ALUNOS = 5000
+HORARIOS = 300
+CAPACIDADE = 40
+
+DIAS = ["segunda", "terca", "quarta", "quinta", "sexta", "sabado"]
+
+
+@pytest.fixture
+def novo_periodo(db_session):
+    """300 horários vazios e 5.000 alunos com planos de 2 e 3 aulas; retorna as preferências"""
+    db_session.add_all([
+        Plano(nome="2x por semana", valor_mensal=180, aulas_por_semana=2),
+        Plano(nome="3x por semana", valor_mensal=220, aulas_por_semana=3),
+    ])
+    db_session.flush()
+    planos = [id for (id,) in db_session.query(Plano.id).order_by(Plano.id)]
+    db_session.execute(insert(Horario), [
+        {
+            "dia_semana": DIAS[i % len(DIAS)], "horario": time(6 + (i // len(DIAS)) % 16, 0),
+            "capacidade_maxima": CAPACIDADE, "tipo_aula": "hidroginastica" if i % 4 == 0 else "natacao",
+        }
+        for i in range(HORARIOS)
+    ])
+    db_session.execute(insert(Aluno), [
+        {
+            "nome_completo": f"Aluno {i}", "tipo_aula": "hidroginastica" if i % 4 == 0 else "natacao",
+            "valor_mensalidade": 150, "dia_vencimento": 10, "ativo": True, "plano_id": planos[i % 2],
+        }
+        for i in range(ALUNOS)
+    ])
+    db_session.commit()
+
+    sorteio = random.Random(42)
+    return {
+        aluno_id: [
+            Preferencia(dia, time(sorteio.randint(6, 21), 0) if sorteio.random() < 0.5 else None)
+            for dia in sorteio.sample(DIAS, 4)
+        ]
+        for (aluno_id,) in db_session.query(Aluno.id)
+    }
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+class TestBenchmarkAlocacao:
+    """5.000 alunos em 300 horários"""
+
+    def test_resolve_em_segundos(self, db_session, novo_periodo):
+        """Teste: A alocação completa (consultas + fluxo) termina em poucos segundos"""
+        inicio = clock.perf_counter()
+        plano = calcular_alocacao(db_session, novo_periodo)
+        tempo = clock.perf_counter() - inicio
+
+        print(
+            f"\n{ALUNOS} alunos / {HORARIOS} horários: {tempo:.2f}s, "
+            f"{plano.aulas_alocadas} aulas alocadas, por preferência {dict(sorted(plano.por_preferencia.items()))}"
+        )
+        assert tempo < 10
+        assert plano.aulas_alocadas > 0
+        assert all(matriculados <= capacidade for capacidade, matriculados in plano.ocupacao.values())
+        # Uma vaga por par e no máximo uma aula por aluno em cada dia
+        assert len(set(plano.adicionar)) == len(plano.adicionar)
@@ -0,0 +1,92 @@
+"""
+Testes de Performance - Matrícula em lote (grade de um novo período)
+
+Matricula 2.000 alunos em 150 horários com uma chamada a
+/api/horarios/matriculas:batch e compara com a matrícula individual
+(POST /api/horarios/{id}/alunos/{aluno_id}), medida em uma amostra.
+"""
+import time as clock
+import pytest
+from datetime import time
+
+from sqlalchemy import insert
+
+from app.models.aluno import Aluno
+from app.models.horario import Horario
+from app.models.turma import AlunoHorario
+from tests.conftest import QueryCounter
+
+
+ALUNOS = 2000
+HORARIOS = 150
+CAPACIDADE = 15  # 2.250 vagas (lote + amostra individual)
+AMOSTRA_INDIVIDUAL = 100
+
+DIAS = ["segunda", "terca", "quarta", "quinta", "sexta", "sabado"]
+
+
+@pytest.fixture
+def novo_periodo(db_session):
+    """150 horários vazios e 2.000 alunos ativos (+ amostra individual); retorna (horario_ids, aluno_ids)"""
+    db_session.execute(insert(Horario), [
+        {
+            "dia_semana": DIAS[i % len(DIAS)], "horario": time(6 + (i // len(DIAS)) % 16, 0),
+            "capacidade_maxima": CAPACIDADE, "tipo_aula": "natacao", "fila_espera": 0,
+        }
+        for i in range(HORARIOS)
+    ])
+    db_session.execute(insert(Aluno), [
+        {
+            "nome_completo": f"Aluno {i}", "tipo_aula": "natacao",
+            "valor_mensalidade": 150, "dia_vencimento": 10, "ativo": True,
+        }
+        for i in range(ALUNOS + AMOSTRA_INDIVIDUAL)
+    ])
+    db_session.commit()
+    horario_ids = [id for (id,) in db_session.query(Horario.id).order_by(Horario.id)]
+    aluno_ids = [id for (id,) in db_session.query(Aluno.id).order_by(Aluno.id)]
+    return horario_ids, aluno_ids
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+class TestBenchmarkMatriculaLote:
+    """2.000 matrículas em 150 horários"""
+
+    def test_lote_vs_individual(self, client, auth_headers, novo_periodo, db_session):
+        """Teste: O lote usa um número fixo de queries e é muito mais rápido que chamadas individuais"""
+        horario_ids, aluno_ids = novo_periodo
+
+        # Matrícula individual: amostra com alunos que não entram no lote
+        amostra = aluno_ids[ALUNOS:]
+        inicio = clock.perf_counter()
+        with QueryCounter() as individual:
+            for i, aluno_id in enumerate(amostra):
+                response = client.post(f"/api/horarios/{horario_ids[i]}/alunos/{aluno_id}", headers=auth_headers)
+                assert response.status_code == 201
+        tempo_individual = (clock.perf_counter() - inicio) / AMOSTRA_INDIVIDUAL
+
+        lote = aluno_ids[:ALUNOS]
+        matriculas = [
+            {"horario_id": horario_ids[i % HORARIOS], "aluno_id": aluno_id}
+            for i, aluno_id in enumerate(lote)
+        ]
+        inicio = clock.perf_counter()
+        with QueryCounter() as em_lote:
+            response = client.post("/api/horarios/matriculas:batch", json={"matriculas": matriculas}, headers=auth_headers)
+        tempo_lote = clock.perf_counter() - inicio
+
+        assert response.status_code == 200
+        assert response.json()["sucesso"] == len(lote)
+        assert db_session.query(AlunoHorario).count() == ALUNOS + AMOSTRA_INDIVIDUAL
+
+        estimado_individual = tempo_individual * len(lote)
+        print(
+            f"\n{len(lote)} matrículas em {HORARIOS} horários: "
+            f"lote {tempo_lote:.2f}s / {em_lote.count} queries; "
+            f"individual ~{estimado_individual:.2f}s / ~{individual.count // AMOSTRA_INDIVIDUAL * len(lote)} queries "
+            f"({individual.count / AMOSTRA_INDIVIDUAL:.1f} por matrícula)"
+        )
+
+        assert em_lote.count <= 7, em_lote.statements
+        assert tempo_lote < estimado_individual / 5
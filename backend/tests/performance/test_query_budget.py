@@ -0,0 +1,199 @@
+"""
+Testes de Performance - Orçamento de queries por endpoint
+Garante que nenhuma rota regrida para padrões N+1: o número de queries
+não pode crescer com a quantidade de registros.
+"""
+import pytest
+from datetime import time
+from decimal import Decimal
+
+from app.models.pagamento import Pagamento
+from app.models.plano import Plano
+from app.models.professor import Professor
+from app.models.turma import AlunoHorario
+from app.utils.query_stats import QueryStats, repeated_statements
+from tests.conftest import query_budget
+
+
+@pytest.fixture
+def grade_populada(db_session, aluno_factory, horario_factory, pagamento_factory):
+    """
+    Grade com 6 horários, 12 alunos matriculados, professor, plano e pagamentos
+    Retorna apenas IDs: acessar objetos expirados no corpo do teste geraria queries extras
+    """
+    professor = Professor(nome="Prof. Teste", email="prof@test.com", cpf="123.456.789-00")
+    plano = Plano(nome="Plano 2x", valor_mensal=150.0, aulas_por_semana=2)
+    db_session.add_all([professor, plano])
+    db_session.commit()
+
+    alunos = aluno_factory.create_batch(db_session, count=12)
+    horarios = [
+        horario_factory.create(
+            db_session,
+            dia_semana=dia,
+            horario=time(8 + i, 0),
+            professor_id=professor.id
+        )
+        for i, dia in enumerate(["segunda", "terca", "quarta", "quinta", "sexta", "sabado"])
+    ]
+
+    for i, aluno in enumerate(alunos):
+        db_session.add(AlunoHorario(aluno_id=aluno.id, horario_id=horarios[i % 6].id))
+        db_session.add(AlunoHorario(aluno_id=aluno.id, horario_id=horarios[(i + 1) % 6].id))
+        pagamento_factory.create(db_session, aluno=aluno, valor=Decimal("150.00"))
+    db_session.commit()
+
+    novo_aluno = aluno_factory.create(db_session, nome_completo="Aluno Sem Matrícula")
+
+    return {
+        "alunos": [aluno.id for aluno in alunos],
+        "horarios": [horario.id for horario in horarios],
+        "professor": professor.id,
+        "plano": plano.id,
+        "novo_aluno": novo_aluno.id,
+    }
+
+
+# (endpoint, orçamento) - a autenticação consome 1 query (busca do usuário)
+ORCAMENTOS_POR_ROTA = [
+    # Alunos
+    ("/api/alunos", 2),
+    ("/api/alunos/inadimplentes", 2),
+    ("/api/alunos/contratos/expirando", 2),
+    ("/api/alunos/{aluno_id}", 2),
+    ("/api/alunos/{aluno_id}/pagamentos", 3),
+    ("/api/alunos/{aluno_id}/horarios", 3),
+    # Pagamentos
+    ("/api/pagamentos", 2),
+    ("/api/pagamentos/relatorio-mensal", 2),
+    # Horários
+    ("/api/horarios", 2),
+    ("/api/horarios/grade-completa", 3),
+    ("/api/horarios/{horario_id}", 2),
+    ("/api/horarios/{horario_id}/vagas", 3),
+    # Planos
+    ("/api/planos", 2),
+    ("/api/planos/{plano_id}", 2),
+    # Professores
+    ("/api/professores", 2),
+    ("/api/professores/{professor_id}", 2),
+    # Usuários e autenticação
+    ("/api/users", 2),
+    ("/api/auth/me", 1),
+]
+
+# (método, endpoint, corpo, orçamento) - autenticação + UPDATE/DELETE ... RETURNING,
+# mais o INSERT no change_log nas tabelas acompanhadas pelo change feed
+ORCAMENTOS_ESCRITA = [
+    ("put", "/api/alunos/{aluno_id}", {"observacoes": "Atualizado"}, 3),
+    ("delete", "/api/alunos/{aluno_id}", None, 3),
+    ("put", "/api/pagamentos/{pagamento_id}", {"observacoes": "Atualizado", "aluno_id": "aluno_id"}, 3),
+    ("delete", "/api/pagamentos/{pagamento_id}", None, 3),
+    ("put", "/api/horarios/{horario_id}", {"capacidade_maxima": 30}, 3),
+    ("delete", "/api/horarios/{horario_vazio}", None, 3),
+    ("put", "/api/planos/{plano_id}", {"descricao": "Atualizado"}, 2),
+    ("delete", "/api/planos/{plano_id}", None, 2),
+    ("put", "/api/professores/{professor_id}", {"telefone": "11999999999"}, 2),
+    ("delete", "/api/professores/{professor_id}", None, 2),
+    ("put", "/api/users/{user_id}", {"full_name": "Atualizado"}, 2),
+    ("delete", "/api/users/{user_id}", None, 2),
+]
+
+
+@pytest.mark.performance
+@pytest.mark.database
+class TestOrcamentoQueries:
+    """Orçamento de queries aplicado a todos os routers"""
+
+    @pytest.mark.parametrize("rota,orcamento", ORCAMENTOS_POR_ROTA)
+    def test_rota_respeita_orcamento(self, client, auth_headers, grade_populada, assert_query_budget, rota, orcamento):
+        """Teste: Cada endpoint de leitura executa um número fixo de queries"""
+        url = rota.format(
+            aluno_id=grade_populada["alunos"][0],
+            horario_id=grade_populada["horarios"][0],
+            plano_id=grade_populada["plano"],
+            professor_id=grade_populada["professor"],
+        )
+
+        with assert_query_budget(orcamento):
+            response = client.get(url, headers=auth_headers)
+
+        assert response.status_code == 200, response.text
+
+    @pytest.mark.parametrize("metodo,rota,corpo,orcamento", ORCAMENTOS_ESCRITA)
+    def test_escrita_respeita_orcamento(
+        self, client, auth_headers, grade_populada, db_session, recepcionista_user,
+        horario_factory, assert_query_budget, metodo, rota, corpo, orcamento
+    ):
+        """Teste: PUT/DELETE não fazem SELECT antes nem refresh depois da alteração"""
+        ids = {
+            "aluno_id": grade_populada["alunos"][0],
+            "pagamento_id": db_session.query(Pagamento.id).first()[0],
+            "horario_id": grade_populada["horarios"][0],
+            "horario_vazio": horario_factory.create(db_session, dia_semana="domingo", horario=time(7, 0)).id,
+            "plano_id": grade_populada["plano"],
+            "professor_id": grade_populada["professor"],
+            "user_id": recepcionista_user.id,
+        }
+        json = {k: ids.get(v, v) if isinstance(v, str) else v for k, v in (corpo or {}).items()}
+
+        with assert_query_budget(orcamento):
+            response = client.request(metodo.upper(), rota.format(**ids), headers=auth_headers, json=json or None)
+
+        assert response.status_code == 200, response.text
+
+    @query_budget(3)
+    def test_grade_completa_sem_n_mais_1(self, client, auth_headers, grade_populada):
+        """Teste: Grade completa não faz uma query por horário/aluno/professor"""
+        response = client.get("/api/horarios/grade-completa", headers=auth_headers)
+
+        assert response.status_code == 200
+        grade = response.json()
+        assert len(grade) == 6
+        assert sum(len(h["alunos"]) for h in grade) == 24
+        assert all(h["professor_nome"] == "Prof. Teste" for h in grade)
+
+    @query_budget(3)
+    def test_horarios_do_aluno_sem_n_mais_1(self, client, auth_headers, grade_populada):
+        """Teste: Horários de um aluno vêm de um JOIN, não de uma query por matrícula"""
+        aluno_id = grade_populada["alunos"][0]
+
+        response = client.get(f"/api/alunos/{aluno_id}/horarios", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+
+    @query_budget(9)  # inclui a gravação no change_log e o UPDATE das aulas datadas
+    def test_matricula_respeita_orcamento(self, client, auth_headers, grade_populada):
+        """Teste: Matricular aluno em horário tem custo fixo de queries"""
+        horario_id = grade_populada["horarios"][0]
+        aluno_id = grade_populada["novo_aluno"]
+
+        response = client.post(f"/api/horarios/{horario_id}/alunos/{aluno_id}", headers=auth_headers)
+
+        assert response.status_code == 201
+
+
+@pytest.mark.unit
+class TestDetectorNMais1:
+    """Testes do detector de statements repetidos"""
+
+    def test_detecta_statement_repetido(self):
+        """Teste: Mesmo formato repetido acima do limite é reportado"""
+        stats = QueryStats()
+        stats.shapes["SELECT * FROM horarios WHERE horarios.id = ?"] = 8
+        stats.shapes["SELECT * FROM users WHERE users.id = ?"] = 1
+
+        repetidos = repeated_statements(stats, threshold=5)
+
+        assert repetidos == [("SELECT * FROM horarios WHERE horarios.id = ?", 8)]
+
+    def test_listas_in_de_tamanhos_diferentes_sao_o_mesmo_formato(self):
+        """Teste: IN (?, ?) e IN (?, ?, ?) contam como o mesmo statement"""
+        stats = QueryStats()
+        stats.shapes["SELECT * FROM alunos WHERE alunos.id IN (?, ?)"] = 3
+        stats.shapes["SELECT * FROM alunos WHERE alunos.id IN (?, ?, ?)"] = 3
+
+        repetidos = repeated_statements(stats, threshold=5)
+
+        assert repetidos == [("SELECT * FROM alunos WHERE alunos.id IN (...)", 6)]
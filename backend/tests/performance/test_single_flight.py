@@ -0,0 +1,123 @@
+"""
+Testes de Performance - Carga concorrente em leituras coalescidas (single-flight)
+
+Simula a abertura do painel às 9h: dezenas de requisições simultâneas à
+grade completa. Usa um banco SQLite em arquivo com uma sessão por requisição
+(como em produção) para que as requisições rodem de fato em paralelo.
+"""
+import asyncio
+import time as clock
+import pytest
+from datetime import time, timedelta
+
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.aluno import Aluno
+from app.models.horario import Horario
+from app.models.turma import AlunoHorario
+from app.models.user import User
+from app.utils.auth import create_access_token, get_password_hash
+from app.utils.single_flight import single_flight
+
+
+REQUISICOES = 40
+# Atraso artificial da consulta principal: garante que as requisições se sobreponham
+ATRASO_CONSULTA = 0.2
+CONSULTA_PRINCIPAL = "FROM aluno_horario JOIN alunos"
+
+
+@pytest.fixture
+def banco_em_arquivo(tmp_path):
+    """Banco em arquivo com grade populada; retorna (contador de consultas, headers)"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'carga.db'}",
+        connect_args={"check_same_thread": False},
+        pool_size=REQUISICOES,
+    )
+    Base.metadata.create_all(engine)
+    Sessao = sessionmaker(bind=engine)
+
+    with Sessao() as db:
+        admin = User(
+            email="carga@test.com", username="carga", full_name="Carga",
+            password_hash=get_password_hash("carga123"), role="admin", is_active=True
+        )
+        horarios = [
+            Horario(dia_semana=dia, horario=time(8, 0), capacidade_maxima=20, tipo_aula="natacao")
+            for dia in ["segunda", "terca", "quarta", "quinta", "sexta"]
+        ]
+        alunos = [
+            Aluno(nome_completo=f"Aluno {i}", tipo_aula="natacao", valor_mensalidade=150, dia_vencimento=10)
+            for i in range(50)
+        ]
+        db.add_all([admin, *horarios, *alunos])
+        db.flush()
+        db.add_all([
+            AlunoHorario(aluno_id=aluno.id, horario_id=horarios[i % len(horarios)].id)
+            for i, aluno in enumerate(alunos)
+        ])
+        db.commit()
+        token = create_access_token(
+            data={"user_id": admin.id, "email": admin.email, "role": admin.role, "username": admin.username},
+            expires_delta=timedelta(hours=1),
+        )
+
+    consultas = {"principal": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        if CONSULTA_PRINCIPAL in statement:
+            consultas["principal"] += 1
+            clock.sleep(ATRASO_CONSULTA)
+
+    def override_get_db():
+        db = Sessao()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield consultas, {"Authorization": f"Bearer {token}"}
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+
+async def _abrir_paineis(headers: dict) -> list:
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        return await asyncio.gather(*[
+            client.get("/api/horarios/grade-completa", headers=headers) for _ in range(REQUISICOES)
+        ])
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+class TestCargaSingleFlight:
+    """Redução de consultas ao banco sob carga concorrente"""
+
+    def test_requisicoes_simultaneas_compartilham_consulta(self, banco_em_arquivo, monkeypatch):
+        """Teste: 40 aberturas simultâneas da grade geram poucas consultas em vez de 40"""
+        consultas, headers = banco_em_arquivo
+
+        monkeypatch.setattr(single_flight, "enabled", False)
+        sem_coalescencia = asyncio.run(_abrir_paineis(headers))
+        consultas_sem = consultas["principal"]
+
+        consultas["principal"] = 0
+        monkeypatch.setattr(single_flight, "enabled", True)
+        com_coalescencia = asyncio.run(_abrir_paineis(headers))
+        consultas_com = consultas["principal"]
+
+        print(f"\nConsultas da grade para {REQUISICOES} requisições: "
+              f"{consultas_sem} sem single-flight, {consultas_com} com single-flight")
+
+        assert all(r.status_code == 200 for r in sem_coalescencia + com_coalescencia)
+        assert len({r.content for r in com_coalescencia}) == 1
+        assert com_coalescencia[0].content == sem_coalescencia[0].content
+        assert consultas_sem == REQUISICOES
+        assert consultas_com <= REQUISICOES // 4
+        assert sum(r.headers["X-Single-Flight"] == "shared" for r in com_coalescencia) >= REQUISICOES - consultas_com
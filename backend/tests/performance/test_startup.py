@@ -0,0 +1,274 @@
+"""
+Testes de Performance - Cold start e migrações versionadas
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import migrations
+from app.migrations import Migration, current_version, latest_version, run_migrations
+from app.utils.query_stats import start_tracking, stop_tracking
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Orçamento de cold start: import de app.main + primeira requisição (inclui lifespan)
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "5.0"))
+
+# Dependências que só devem ser carregadas no primeiro uso
+LAZY_MODULES = ["passlib", "bcrypt", "jose", "psycopg2"]
+
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+import_seconds = time.perf_counter() - start
+lazy_loaded = [name for name in {lazy} if name in sys.modules]
+
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    status_code = client.get("/health").status_code
+total_seconds = time.perf_counter() - start
+
+print(json.dumps({{
+    "import_seconds": import_seconds,
+    "total_seconds": total_seconds,
+    "lazy_loaded": lazy_loaded,
+    "status_code": status_code,
+}}))
+"""
+
+
+# Schema anterior ao runner de migrações (tabelas como eram antes de version,
+# duracao_minutos, dia_semana_numero, telefone_e164, renovacao_automatica...)
+BASELINE_DDL = [
+    """CREATE TABLE planos (
+        id INTEGER NOT NULL PRIMARY KEY,
+        nome VARCHAR(100) NOT NULL,
+        descricao VARCHAR(500),
+        valor_mensal FLOAT NOT NULL,
+        aulas_por_semana INTEGER NOT NULL,
+        duracao_aula_minutos INTEGER NOT NULL,
+        ativo BOOLEAN NOT NULL,
+        acesso_livre BOOLEAN,
+        permite_reposicao BOOLEAN,
+        dias_tolerancia INTEGER
+    )""",
+    """CREATE TABLE professores (
+        id INTEGER NOT NULL PRIMARY KEY,
+        nome VARCHAR(100) NOT NULL,
+        email VARCHAR(100) NOT NULL UNIQUE,
+        cpf VARCHAR(14) NOT NULL UNIQUE,
+        telefone VARCHAR(20),
+        especialidade VARCHAR(100),
+        is_active BOOLEAN NOT NULL
+    )""",
+    """CREATE TABLE users (
+        id INTEGER NOT NULL PRIMARY KEY,
+        email VARCHAR(255) NOT NULL UNIQUE,
+        username VARCHAR(100) NOT NULL UNIQUE,
+        full_name VARCHAR(200) NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        role VARCHAR(50) NOT NULL,
+        is_active BOOLEAN NOT NULL,
+        is_superuser BOOLEAN NOT NULL,
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP) NOT NULL,
+        updated_at DATETIME,
+        last_login DATETIME
+    )""",
+    """CREATE TABLE alunos (
+        id INTEGER NOT NULL PRIMARY KEY,
+        nome_completo VARCHAR(200) NOT NULL,
+        responsavel VARCHAR(200),
+        tipo_aula VARCHAR(50) NOT NULL,
+        valor_mensalidade NUMERIC(10, 2) NOT NULL,
+        dia_vencimento INTEGER NOT NULL,
+        data_inicio_contrato DATE,
+        data_fim_contrato DATE,
+        duracao_contrato_meses INTEGER,
+        plano_id INTEGER REFERENCES planos (id),
+        ativo BOOLEAN NOT NULL,
+        telefone_whatsapp VARCHAR(20),
+        observacoes TEXT,
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP) NOT NULL,
+        updated_at DATETIME
+    )""",
+    """CREATE TABLE horarios (
+        id INTEGER NOT NULL PRIMARY KEY,
+        dia_semana VARCHAR(20) NOT NULL,
+        horario TIME NOT NULL,
+        capacidade_maxima INTEGER NOT NULL,
+        tipo_aula VARCHAR(50) NOT NULL,
+        professor_id INTEGER REFERENCES professores (id),
+        fila_espera INTEGER NOT NULL
+    )""",
+    """CREATE TABLE aluno_horario (
+        id INTEGER NOT NULL PRIMARY KEY,
+        aluno_id INTEGER NOT NULL REFERENCES alunos (id) ON DELETE CASCADE,
+        horario_id INTEGER NOT NULL REFERENCES horarios (id) ON DELETE CASCADE
+    )""",
+    """CREATE TABLE pagamentos (
+        id INTEGER NOT NULL PRIMARY KEY,
+        aluno_id INTEGER NOT NULL REFERENCES alunos (id) ON DELETE CASCADE,
+        valor NUMERIC(10, 2) NOT NULL,
+        data_pagamento DATE NOT NULL,
+        mes_referencia VARCHAR(7) NOT NULL,
+        forma_pagamento VARCHAR(50) NOT NULL,
+        observacoes TEXT,
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP) NOT NULL
+    )""",
+]
+
+DIAS_SEMANA = ["segunda", "terca", "quarta", "quinta", "sexta", "sabado", "domingo"]
+
+
+def _cold_start(database_url: str) -> dict:
+    """Executa import + primeira requisição em um processo Python novo"""
+    env = {**os.environ, "DATABASE_URL": database_url}
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_START_SCRIPT.format(lazy=LAZY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture
+def banco_vazio(tmp_path):
+    """Engine apontando para um banco SQLite novo"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.performance
+@pytest.mark.database
+class TestMigracoesVersionadas:
+    """Runner de migrações: aplica uma vez, depois só confere a versão"""
+
+    def test_banco_novo_aplica_todas_as_migracoes(self, banco_vazio):
+        """Teste: Banco vazio recebe todas as migrações em ordem"""
+        aplicadas = run_migrations(banco_vazio)
+
+        assert aplicadas == [item.version for item in migrations.MIGRATIONS]
+        assert current_version(banco_vazio) == latest_version()
+        with banco_vazio.connect() as conn:
+            assert conn.execute(text("SELECT count(*) FROM users WHERE role = 'admin'")).scalar() == 1
+
+    def test_boot_com_banco_atualizado_faz_uma_query(self, banco_vazio):
+        """Teste: Caminho rápido executa apenas SELECT max(version)"""
+        run_migrations(banco_vazio)
+
+        stats, token = start_tracking()
+        start = time.perf_counter()
+        try:
+            aplicadas = run_migrations(banco_vazio)
+        finally:
+            stop_tracking(token)
+        duration = time.perf_counter() - start
+
+        assert aplicadas == []
+        assert stats.count == 1
+        assert duration < 0.1, f"Startup com banco atualizado demorou {duration * 1000:.1f}ms (limite: 100ms)"
+
+    def test_banco_legado_sem_tabela_de_versoes(self, banco_vazio):
+        """Teste: Banco com o schema anterior ao runner é migrado e tem os dados preenchidos"""
+        with banco_vazio.begin() as conn:
+            for ddl in BASELINE_DDL:
+                conn.execute(text(ddl))
+            conn.execute(text(
+                "INSERT INTO professores (id, nome, email, cpf, telefone, is_active) "
+                "VALUES (1, 'Prof', 'prof@example.com', '111.111.111-11', '(11) 3333-4444', 1)"
+            ))
+            conn.execute(text(
+                "INSERT INTO alunos (id, nome_completo, tipo_aula, valor_mensalidade, dia_vencimento, "
+                "data_inicio_contrato, ativo, telefone_whatsapp) "
+                "VALUES (1, 'Aluno Legado', 'natacao', 150, 10, '2024-01-10', 1, '11 99999-8888')"
+            ))
+            conn.execute(text(
+                "INSERT INTO horarios (id, dia_semana, horario, capacidade_maxima, tipo_aula, professor_id, fila_espera) "
+                "VALUES (1, :dia, '08:00:00', 10, 'natacao', 1, 0)"
+            ), {"dia": DIAS_SEMANA[date.today().weekday()]})
+            conn.execute(text("INSERT INTO aluno_horario (aluno_id, horario_id) VALUES (1, 1)"))
+
+        aplicadas = run_migrations(banco_vazio)
+
+        assert aplicadas == [item.version for item in migrations.MIGRATIONS]
+        with banco_vazio.connect() as conn:
+            aluno = conn.execute(text(
+                "SELECT version, telefone_e164, renovacao_automatica, data_fim_contrato FROM alunos"
+            )).one()
+            assert tuple(aluno) == (1, "+5511999998888", 0, "2025-01-10")
+            assert conn.execute(text("SELECT telefone_e164 FROM professores")).scalar() == "+551133334444"
+            horario = conn.execute(text("SELECT version, duracao_minutos, dia_semana_numero FROM horarios")).one()
+            assert tuple(horario) == (1, 50, date.today().isoweekday())
+            # Hoje + 4 semanas (janela de 28 dias), com o aluno matriculado já contado
+            ocorrencias = conn.execute(text("SELECT ocupadas FROM ocorrencias_aula WHERE horario_id = 1")).scalars().all()
+            assert ocorrencias == [1] * 5
+        assert run_migrations(banco_vazio) == []
+
+    def test_apenas_migracoes_pendentes_sao_executadas(self, banco_vazio, monkeypatch):
+        """Teste: Migração nova é aplicada sozinha no próximo boot"""
+        run_migrations(banco_vazio)
+        executadas = []
+
+        def nova_migracao(conn):
+            executadas.append(conn.execute(text("SELECT 1")).scalar())
+
+        registro = migrations.MIGRATIONS + [Migration(latest_version() + 1, "nova", nova_migracao)]
+        monkeypatch.setattr(migrations, "MIGRATIONS", registro)
+
+        assert run_migrations(banco_vazio) == [registro[-1].version]
+        assert executadas == [1]
+        assert current_version(banco_vazio) == registro[-1].version
+
+    def test_checksum_divergente_gera_aviso(self, banco_vazio, caplog):
+        """Teste: Alterar uma migração já aplicada é sinalizado no log"""
+        run_migrations(banco_vazio)
+        with banco_vazio.begin() as conn:
+            conn.execute(text("UPDATE schema_migrations SET checksum = 'x' WHERE version = 2"))
+            conn.execute(text("DELETE FROM schema_migrations WHERE version = :v"), {"v": latest_version()})
+
+        with caplog.at_level(logging.WARNING, logger="app.migrations"):
+            run_migrations(banco_vazio)
+
+        assert "checksum divergente" in caplog.text
+
+    def test_registro_fora_de_ordem_e_rejeitado(self, monkeypatch):
+        """Teste: Versões precisam ser crescentes"""
+        monkeypatch.setattr(migrations, "MIGRATIONS", list(migrations.MIGRATIONS))
+
+        with pytest.raises(ValueError):
+            migrations.migration(1, "duplicada")(lambda conn: None)
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+class TestColdStart:
+    """Benchmark de cold start (processo novo, como um deploy no Railway)"""
+
+    def test_import_nao_carrega_dependencias_pesadas(self, tmp_path):
+        """Teste: passlib/bcrypt, jose e driver do banco ficam para o primeiro uso"""
+        resultado = _cold_start(f"sqlite:///{tmp_path / 'cold.db'}")
+
+        assert resultado["lazy_loaded"] == []
+
+    def test_import_e_primeira_requisicao_dentro_do_orcamento(self, tmp_path):
+        """Teste: Import + lifespan + primeira requisição abaixo do orçamento"""
+        database_url = f"sqlite:///{tmp_path / 'cold.db'}"
+        _cold_start(database_url)  # primeiro boot aplica as migrações
+
+        resultado = _cold_start(database_url)
+
+        assert resultado["status_code"] == 200
+        assert resultado["total_seconds"] < STARTUP_BUDGET_SECONDS, (
+            f"Cold start demorou {resultado['total_seconds']:.2f}s "
+            f"(import: {resultado['import_seconds']:.2f}s, limite: {STARTUP_BUDGET_SECONDS}s)"
+        )
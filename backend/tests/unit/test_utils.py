@@ -14,11 +14,13 @@ from app.utils.auth import (
 )
 from app.utils.helpers import (
     formatar_telefone_brasileiro,
+    normalizar_telefone_e164,
     validar_telefone_brasileiro,
     formatar_moeda_brasileira,
     calcular_dias_atraso,
     calcular_proxima_data_vencimento
 )
+from app.utils.min_cost_flow import MinCostFlow
 
 
 # ============================================================================
@@ -154,6 +156,18 @@ class TestHelpersUtils:
 
         assert formatado == "(11) 99999-8888"
 
+    def test_normalizar_telefone_e164(self):
+        """Teste: Qualquer formatação do mesmo número vira o mesmo E.164"""
+        for telefone in ("(11) 99999-8888", "11999998888", "+55 11 99999-8888", "5511999998888"):
+            assert normalizar_telefone_e164(telefone) == "+5511999998888"
+        assert normalizar_telefone_e164("(11) 3333-4444") == "+551133334444"
+        assert normalizar_telefone_e164("+1 (415) 555-0100") == "+14155550100"
+
+    def test_normalizar_telefone_e164_invalido(self):
+        """Teste: Vazio ou fora do formato retorna None"""
+        for telefone in (None, "", "123", "999999999999999"):
+            assert normalizar_telefone_e164(telefone) is None
+
     def test_validar_telefone_brasileiro_valido_11_digitos(self):
         """Teste: Validar telefone brasileiro com 11 dígitos"""
         assert validar_telefone_brasileiro("11999998888") is True
@@ -219,6 +233,53 @@ class TestHelpersUtils:
         assert proximo == date(2025, 11, 10)
 
 
+# ============================================================================
+# TESTES DO FLUXO DE CUSTO MÍNIMO (utils/min_cost_flow.py)
+# ============================================================================
+
+@pytest.mark.unit
+class TestMinCostFlow:
+    """Testes do fluxo de custo mínimo usado na alocação da grade"""
+
+    def test_prefere_caminho_barato(self):
+        """Teste: Com capacidade sobrando, o fluxo vai pelo caminho mais barato"""
+        grafo = MinCostFlow(4)
+        barato = grafo.add_edge(0, 1, 2, 1)
+        caro = grafo.add_edge(0, 2, 2, 5)
+        grafo.add_edge(1, 3, 2, 0)
+        grafo.add_edge(2, 3, 2, 0)
+
+        assert grafo.solve(0, 3) == (4, 12)
+        assert (grafo.flow(barato), grafo.flow(caro)) == (2, 2)
+
+    def test_redireciona_fluxo_para_maximizar(self):
+        """Teste: Desfaz a escolha gulosa para passar mais fluxo (atribuição 2x2)"""
+        # origem 0, alunos 1-2, horários 3-4, destino 5; o aluno 1 aceita os dois horários
+        grafo = MinCostFlow(6)
+        grafo.add_edge(0, 1, 1, 0)
+        grafo.add_edge(0, 2, 1, 0)
+        a1_h3 = grafo.add_edge(1, 3, 1, 0)
+        a1_h4 = grafo.add_edge(1, 4, 1, 1)
+        a2_h3 = grafo.add_edge(2, 3, 1, 0)
+        grafo.add_edge(3, 5, 1, 0)
+        grafo.add_edge(4, 5, 1, 0)
+
+        assert grafo.solve(0, 5) == (2, 1)
+        assert (grafo.flow(a1_h3), grafo.flow(a1_h4), grafo.flow(a2_h3)) == (0, 1, 1)
+
+    def test_sem_caminho(self):
+        """Teste: Destino inalcançável resulta em fluxo zero"""
+        grafo = MinCostFlow(3)
+        grafo.add_edge(0, 1, 5, 1)
+
+        assert grafo.solve(0, 2) == (0, 0)
+
+    def test_custo_negativo_recusado(self):
+        """Teste: Custos iniciais negativos não são aceitos"""
+        with pytest.raises(ValueError):
+            MinCostFlow(2).add_edge(0, 1, 1, -1)
+
+
 # ============================================================================
 # TESTES DE EDGE CASES
 # ============================================================================
@@ -120,15 +120,15 @@ def carregar_relatorio_mensal(ano, mes):
     except Exception as e:
         return []
 
-def carregar_grade_completa():
-    """Carrega grade completa com alunos"""
+def carregar_ocupacao():
+    """Carrega o mapa de ocupação da semana (dia x horário, calculado no backend)"""
     try:
-        response = requests.get(f"{API_URL}/api/horarios/grade-completa", headers=get_auth_headers(), timeout=10)
+        response = requests.get(f"{API_URL}/api/horarios/ocupacao", headers=get_auth_headers(), timeout=10)
         if response.status_code == 200:
             return response.json()
-        return []
+        return None
     except Exception as e:
-        return []
+        return None
 
 st.header("📈 Métricas Principais")
 
@@ -137,7 +137,7 @@ col1, col2, col3, col4 = st.columns(4)
 alunos_ativos = carregar_alunos_ativos()
 inadimplentes = carregar_inadimplentes()
 pagamentos = carregar_pagamentos()
-grade_completa = carregar_grade_completa()
+ocupacao = carregar_ocupacao()
 
 total_alunos_ativos = len(alunos_ativos)
 total_inadimplentes = len(inadimplentes)
@@ -146,16 +146,7 @@ data_30_dias_atras = (date.today() - timedelta(days=30)).isoformat()
 pagamentos_30_dias = [p for p in pagamentos if p['data_pagamento'] >= data_30_dias_atras]
 receita_mensal = sum(float(p['valor']) for p in pagamentos_30_dias)
 
-if grade_completa:
-    ocupacoes = []
-    for horario in grade_completa:
-        num_alunos = len(horario.get('alunos', []))
-        capacidade = horario['capacidade_maxima']
-        if capacidade > 0:
-            ocupacoes.append((num_alunos / capacidade) * 100)
-    taxa_ocupacao_media = sum(ocupacoes) / len(ocupacoes) if ocupacoes else 0
-else:
-    taxa_ocupacao_media = 0
+taxa_ocupacao_media = ocupacao["percentual_medio"] if ocupacao else 0
 
 with col1:
     st.metric(
@@ -311,27 +302,15 @@ with col_tabela1:
     </div>
     """, unsafe_allow_html=True)
 
-    if grade_completa:
-        horarios_ocupacao = []
-        for horario in grade_completa:
-            num_alunos = len(horario.get('alunos', []))
-            capacidade = horario['capacidade_maxima']
-            tipo_emoji = "🏊" if horario['tipo_aula'] == "natacao" else "💧"
-
-            horarios_ocupacao.append({
-                "horario": f"{horario['dia_semana']} - {horario['horario'][:5]}",
-                "tipo": f"{tipo_emoji} {horario['tipo_aula'].capitalize()}",
-                "alunos": num_alunos,
-                "capacidade": capacidade,
-                "ocupacao": f"{(num_alunos/capacidade*100):.0f}%" if capacidade > 0 else "0%"
-            })
-
-        horarios_ordenados = sorted(horarios_ocupacao, key=lambda x: x['alunos'], reverse=True)[:5]
+    if ocupacao and ocupacao["por_horario"]:
+        # Ocupação de cada turma, já com o percentual calculado no backend
+        horarios_ordenados = sorted(ocupacao["por_horario"], key=lambda x: x['matriculados'], reverse=True)[:5]
 
         if horarios_ordenados:
             for idx, h in enumerate(horarios_ordenados, 1):
-                st.write(f"**{idx}. {h['horario']}** - {h['tipo']}")
-                st.write(f"   👥 {h['alunos']}/{h['capacidade']} alunos ({h['ocupacao']})")
+                tipo_emoji = "🏊" if h['tipo_aula'] == "natacao" else "💧"
+                st.write(f"**{idx}. {h['dia_semana']} - {h['horario'][:5]}** - {tipo_emoji} {h['tipo_aula'].capitalize()}")
+                st.write(f"   👥 {h['matriculados']}/{h['capacidade']} alunos ({h['percentual']:.0f}%)")
                 st.write("")
         else:
             st.markdown(components["empty_state"]("📅", "Nenhum horário ocupado", "Matricule alunos nos horários criados"), unsafe_allow_html=True)
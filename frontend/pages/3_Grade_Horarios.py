@@ -2,6 +2,7 @@ import streamlit as st
 import requests
 import os
 from datetime import time
+import plotly.graph_objects as go
 import sys
 
 st.set_page_config(page_title="Grade de Horários", page_icon="📅", layout="wide")
@@ -116,6 +117,43 @@ def carregar_grade_completa():
         st.error(f"❌ Erro ao carregar grade completa.")
         return []
 
+def carregar_ocupacao():
+    """Carrega o mapa de ocupação da semana (dia x horário, calculado no backend)"""
+    try:
+        response = requests.get(
+            f"{API_URL}/api/horarios/ocupacao",
+            headers=get_auth_headers(),
+            timeout=10
+        )
+        if response.status_code == 200:
+            return response.json()
+        return None
+    except Exception as e:
+        return None
+
+def exibir_mapa_ocupacao(ocupacao):
+    """Heatmap dia x horário com matriculados, capacidade e fila de espera"""
+    textos = [
+        [f"{c['matriculados']}/{c['capacidade']}" + (f" (+{c['fila_espera']})" if c['fila_espera'] else "") if c else ""
+         for c in linha]
+        for linha in ocupacao["celulas"]
+    ]
+    fig = go.Figure(go.Heatmap(
+        z=[[c["percentual"] if c else None for c in linha] for linha in ocupacao["celulas"]],
+        x=[h[:5] for h in ocupacao["horarios"]],
+        y=[dia.capitalize() for dia in ocupacao["dias"]],
+        text=textos,
+        texttemplate="%{text}",
+        hovertemplate="%{y} %{x}<br>%{text}<br>%{z:.0f}%<extra></extra>",
+        colorscale="RdYlGn_r",
+        zmin=0,
+        zmax=100,
+        colorbar={"title": "%"},
+    ))
+    fig.update_yaxes(autorange="reversed")
+    fig.update_layout(height=80 + 45 * len(ocupacao["dias"]), margin={"t": 10, "b": 10})
+    st.plotly_chart(fig, use_container_width=True)
+
 tab1, tab2, tab3 = st.tabs(["➕ Criar Horário", "📋 Grade Completa", "👥 Matricular Aluno"])
 
 with tab1:
@@ -186,6 +224,11 @@ with tab2:
     </div>
     """, unsafe_allow_html=True)
 
+    ocupacao = carregar_ocupacao()
+    if ocupacao and ocupacao["dias"]:
+        st.subheader(f"🌡️ Mapa de Ocupação - {ocupacao['total']['percentual']:.0f}% da capacidade")
+        exibir_mapa_ocupacao(ocupacao)
+
     grade_completa = carregar_grade_completa()
 
     if not grade_completa: